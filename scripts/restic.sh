@@ -120,7 +120,31 @@ init() {
 backup() {
   init
   log INFO "Backing up content in ${SRC_DIR} as host ${RESTIC_HOSTNAME}"
-  command restic backup --host "${RESTIC_HOSTNAME}" "${restic_tags_arguments[@]}" "${excludes[@]}" "${SRC_DIR}" | log INFO
+  # eg `--json`, so the API can follow the backup's progress. Word splitting is intended.
+  # shellcheck disable=SC2086
+  command restic backup --host "${RESTIC_HOSTNAME}" "${restic_tags_arguments[@]}" "${excludes[@]}" ${RESTIC_ADDITIONAL_BACKUP_ARGS:-} "${SRC_DIR}" | log INFO
+}
+
+_rcon() {
+  command rcon-cli --host "${RCON_HOST}" --port "${RCON_PORT:-25575}" --password "$(<"${RCON_PASSWORD_FILE}")" "${@}"
+}
+
+# Like mc-backup's `backup now`, which ignores RESTIC_ADDITIONAL_BACKUP_ARGS: keeps the server from writing to the
+# world while restic reads it, then prunes.
+backup_now() {
+  # Otherwise every `| log INFO` below would hide failures.
+  set -o pipefail
+  if ! _rcon save-off | log INFO; then
+    log ERROR "Could not turn off saving on ${RCON_HOST}! Aborting"
+    return 1
+  fi
+  # Whatever happens from here on, the server must not be left in save-off.
+  trap '_rcon save-on | log INFO' EXIT
+  _rcon save-all flush | log INFO
+  backup || return 1
+  if (( PRUNE_BACKUPS_DAYS > 0 )); then
+    prune
+  fi
 }
 
 restore() {
@@ -1,8 +1,14 @@
-from typing import List
+from typing import Any, Dict, List, Literal, Optional
 from flask_openapi3 import Tag  # type: ignore
 from pydantic import BaseModel, Field  # type: ignore
 
-from src.api.lib import Backup, LegacyActiveContainer, LegacyDefinedContainer
+from src.api.lib import (
+    Backup,
+    ContainerCommandResult,
+    ContainerWaitResult,
+    LegacyActiveContainer,
+    LegacyDefinedContainer,
+)
 from src.api.lib.file_management import File
 from src.common.environment import Env, EnvModel
 
@@ -12,6 +18,8 @@ environment_tag = Tag(
     name="Environments", description="Environment management endpoints"
 )
 files_tag = Tag(name="Files", description="File management endpoints")
+jobs_tag = Tag(name="Jobs", description="Background job endpoints")
+metrics_tag = Tag(name="Metrics", description="Internal API metrics")
 server_tag = Tag(name="Server", description="Server management endpoints")
 sockets_tag = Tag(name="Sockets", description="Sockets endpoints")
 
@@ -28,6 +36,10 @@ class TargetIdRequestPath(BaseModel):
     target_id: str = Field(description="Restic Snapshot Target Id")
 
 
+class JobIdRequestPath(BaseModel):
+    job_id: str = Field(description="Job id returned when the job was submitted")
+
+
 class ContainerNameRequestPath(BaseModel):
     container_name: str = Field(description="Container name string")
 
@@ -59,6 +71,78 @@ class LoginResponse(BaseModel):
     access_token: str = Field(description="YC generated access token")
 
 
+# -----------
+# Metrics Models
+# -----------
+
+
+class MetricsResponse(BaseModel):
+    gauges: Dict[str, float] = Field(description="Last recorded value of each gauge")
+    counters: Dict[str, int] = Field(description="Running totals since worker start")
+    timings: Dict[str, Dict[str, float]] = Field(
+        description="count/total_secs/max_secs/last_secs per timed operation"
+    )
+    collected: Dict[str, Dict[str, Any]] = Field(
+        description="Stats reported by registered collectors (caches, pools)"
+    )
+
+
+# -----------
+# Jobs Models
+# -----------
+
+
+class JobModel(BaseModel):
+    id: str = Field(description="Job id")
+    kind: str = Field(description="What the job does, eg 'cluster_up' or 'backup_create'")
+    resources: List[str] = Field(
+        description="Envs/world groups the job holds locks on while unfinished"
+    )
+    status: str = Field(description="queued, running, succeeded or failed")
+    progress: Optional[float] = Field(
+        default=None, description="0.0 - 1.0, for jobs that report progress"
+    )
+    message: Optional[str] = Field(default=None, description="Latest progress message")
+    details: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Latest structured progress, eg bytes done, throughput and ETA for backups and restores",
+    )
+    result: Optional[Any] = Field(
+        default=None, description="Return value of a succeeded job"
+    )
+    error: Optional[str] = Field(default=None, description="Why a failed job failed")
+    user: Optional[str] = Field(default=None, description="Sub of the submitting user")
+    created_at: int = Field(description="Epoch timestamp")
+    started_at: Optional[int] = Field(default=None, description="Epoch timestamp")
+    finished_at: Optional[int] = Field(default=None, description="Epoch timestamp")
+
+
+class SubmitJobResponse(BaseModel):
+    job: JobModel = Field(description="The queued job. Poll /jobs/<id> or listen for 'job' socket events.")
+
+
+class JobBusyResponse(BaseModel):
+    message: str = Field(description="Why the job could not be submitted")
+    resource: str = Field(description="Resource that is busy")
+    job_id: Optional[str] = Field(description="Unfinished job holding the resource")
+
+
+class ListJobsQuery(BaseModel):
+    status: Optional[str] = Field(default=None, description="Only jobs in this status")
+    kind: Optional[str] = Field(default=None, description="Only jobs of this kind")
+    limit: int = Field(default=50, ge=1, le=500, description="Max jobs, newest first")
+
+
+class ListJobsResponse(BaseModel):
+    jobs: List[JobModel] = Field(description="Jobs, newest first")
+
+
+class JobResultResponse(BaseModel):
+    status: str = Field(description="Status of the job")
+    result: Optional[Any] = Field(description="Return value, once the job succeeded")
+    error: Optional[str] = Field(description="Why the job failed, if it did")
+
+
 # -----------
 # Backups Models
 # -----------
@@ -67,10 +151,30 @@ class LoginResponse(BaseModel):
 class ListBackupsRequestBody(BaseModel):
     env_str: str = Field(description="Environment id string")
     target_tags: List[str] = Field(description="Restic target tags to filter for")
+    world_group: Optional[str] = Field(
+        default=None, description="Only list backups of this world group"
+    )
+    since: Optional[float] = Field(
+        default=None,
+        description="Only list backups taken at or after this epoch timestamp",
+    )
+    until: Optional[float] = Field(
+        default=None, description="Only list backups taken before this epoch timestamp"
+    )
+    limit: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=1000,
+        description="Max backups to return, oldest first. All of them if omitted.",
+    )
+    offset: int = Field(
+        default=0, ge=0, description="Matching backups to skip, for paging"
+    )
 
 
 class ListBackupsResponse(BaseModel):
     backups: List[Backup] = Field(description="List of backups found")
+    total: int = Field(description="Number of backups matching, across all pages")
 
 
 class CreateBackupRequestBody(BaseModel):
@@ -80,11 +184,6 @@ class CreateBackupRequestBody(BaseModel):
     )
 
 
-class CreateBackupResponse(BaseModel):
-    success: bool = Field(description="Whether the backup succeeded or not")
-    output: str = Field(description="Stdout from the backup container run")
-
-
 class RestoreBackupRequestBody(BaseModel):
     target_hostname: str = Field(
         description="Hostname of container to restore", pattern=r"YC-\w+-\w+"
@@ -101,11 +200,6 @@ class RestoreBackupRequestBody(BaseModel):
     )
 
 
-class RestoreBackupResponse(BaseModel):
-    success: bool = Field(description="Whether the backup succeeded or not")
-    output: str = Field(description="Stdout from the backup container run")
-
-
 class ListSnapshotWorldsBody(BaseModel):
     target_id: str = Field(
         description="The snapshot id to get list of worlds backed up in"
@@ -198,3 +292,70 @@ class ListActiveContainersResponse(BaseModel):
     active_containers: List[LegacyActiveContainer] = Field(
         description="List of currently running containers"
     )
+
+
+class SendEnvCommandRequestBody(BaseModel):
+    command: str = Field(description="Console command to run on every world group")
+    timeout_secs: float = Field(
+        default=10,
+        gt=0,
+        le=60,
+        description="Containers that haven't answered within this many seconds are reported as timed out",
+    )
+
+
+class WaitForStateRequestBody(BaseModel):
+    state: Literal["running", "healthy", "stopped"] = Field(
+        default="healthy",
+        description="State to wait for. Containers without a healthcheck count as healthy once running.",
+    )
+    timeout_secs: float = Field(
+        default=30,
+        gt=0,
+        le=55,
+        description="Give up after this many seconds. Kept under the proxy's read timeout; re-issue to keep waiting.",
+    )
+
+
+class WaitForStateResponse(BaseModel):
+    reached: bool = Field(description="Whether every container reached the target state")
+    results: Dict[str, ContainerWaitResult] = Field(
+        description="Outcome per container name"
+    )
+
+
+class ClusterStatsQuery(BaseModel):
+    range: str = Field(
+        default="15m",
+        pattern=r"^[0-9]+[smhdSMHD]?$",
+        description="How far back to go, eg '90s', '15m', '6h' or '7d'. Plain numbers are seconds.",
+    )
+
+
+class ClusterStatsPoint(BaseModel):
+    ts: float = Field(description="Start of the sample bucket, unix seconds")
+    cpu_percent: float = Field(description="CPU use. 100 is one full core.")
+    mem_bytes: float = Field(description="Memory used, excluding reclaimable page cache")
+    mem_limit_bytes: float = Field(description="Memory limit of the container")
+    net_rx_bytes: float = Field(description="Bytes received since the container started")
+    net_tx_bytes: float = Field(description="Bytes sent since the container started")
+    blk_read_bytes: float = Field(description="Bytes read from disk since the container started")
+    blk_write_bytes: float = Field(description="Bytes written to disk since the container started")
+
+
+class ClusterStatsResponse(BaseModel):
+    env: EnvModel = Field(description="The env the stats are for")
+    range_secs: int = Field(description="Requested range in seconds")
+    resolution_secs: int = Field(
+        description="Size of each sample bucket. Gauges are averaged over the bucket; byte counters are the last value."
+    )
+    world_groups: Dict[str, List[ClusterStatsPoint]] = Field(
+        description="Samples per world group, oldest first"
+    )
+
+
+class SendEnvCommandResponse(BaseModel):
+    env: EnvModel = Field(description="The env the command was sent to")
+    results: Dict[str, ContainerCommandResult] = Field(
+        description="Result of the command per minecraft container name"
+    )
@@ -4,14 +4,14 @@ import json
 
 from flask_openapi3 import APIBlueprint  # type: ignore
 
-from flask import request  # type: ignore
+from flask import make_response, request  # type: ignore
 
 from http import HTTPStatus
 from datetime import datetime
-from pprint import pformat
 
 from src.api import security
 from src.api.lib.auth import (
+    check_access_token,
     DuplicateJTIError,
     ExpiredJTIError,
     TimeTravelerError,
@@ -23,6 +23,7 @@ from src.api.lib.auth import (
     authenticate_access_token,
 )
 from src.api.lib.helpers import log_request
+from src.api.lib import structured_logging as slog
 from src.api.db import db
 
 from src.api.blueprints import (
@@ -75,7 +76,7 @@ def login_handler(body: LoginRequestBody):
         log_exception(
             message="Got an invalid token!",
             data={
-                "token": body.id_token,
+                "token": slog.redact_token(body.id_token),
             },
         )
     except DuplicateJTIError:
@@ -136,8 +137,35 @@ def me_handler():
     """
     resp = prepare_response()
     user = authenticate_access_token(request.headers, db.session)
-    logger.warning(f"YOU ARE: \n{pformat(user)}")
+    slog.info("Authenticated user", user=user)
     if user:
         resp.data = json.dumps(user.to_dict())
 
     return resp
+
+
+@auth_bp.get(
+    "/check",
+    security=security,
+    responses={
+        HTTPStatus.UNAUTHORIZED: UnauthorizedResponse,
+    },
+)
+def check_handler():
+    """Access token check for nginx `auth_request`
+
+    Returns a bodiless 204 if the request carries a valid access token and a 401 otherwise.
+    The authenticated user is passed back in the `X-Auth-User` and `X-Auth-Email` headers so nginx can forward them.
+
+    Intentionally skips `@log_request` and response body serialization - this runs once for every request proxied to the docker socket.
+    """
+    try:
+        user = check_access_token(request.headers, db.session)
+    except Exception as e:
+        logger.info(f"Rejected auth check: {type(e).__name__}")
+        return make_response("", HTTPStatus.UNAUTHORIZED)
+
+    resp = make_response("", HTTPStatus.NO_CONTENT)
+    resp.headers["X-Auth-User"] = user.sub
+    resp.headers["X-Auth-Email"] = user.email
+    return resp
@@ -1,34 +1,52 @@
 from http import HTTPStatus
 import json
 
+from typing import Any, Dict, List
+
 from flask import request  # type: ignore
 from flask_openapi3 import APIBlueprint  # type: ignore
 
 from src.api import db, security
+from src.api.constants import (
+    BACKUP_SCHEDULER_ENABLED,
+    BACKUP_SCHEDULER_INTERVAL_SECS,
+    BACKUP_SCHEDULER_LOCK_FILE,
+    BACKUP_SCHEDULER_MAX_CONCURRENT,
+    BACKUP_SCHEDULER_TICK_SECS,
+    RESTIC_WORKER_ENABLED,
+    SNAPSHOT_CATALOG_RECONCILE_SECS,
+)
 from src.api.lib.auth import (
     return_cors_response,
     validate_access_token,
     prepare_response,
 )
 from src.api.lib.backup_management import BackupManagement
+from src.api.lib.backup_scheduler import BackupScheduler
 from src.api.lib.helpers import log_request
+from src.api.lib.jobs import JobContext, world_group_resources
+from src.api.lib.restic_progress import StatusListener, format_status
+from src.api.lib.restic_worker import ResticWorker
+from src.api.lib.snapshot_catalog import SnapshotCatalog
+from src.api.lib.snapshot_worlds import SnapshotWorldsCache
 
 from src.api.blueprints import (
     CreateBackupRequestBody,
-    CreateBackupResponse,
+    JobBusyResponse,
     ListBackupsRequestBody,
     ListBackupsResponse,
     RestoreBackupRequestBody,
-    RestoreBackupResponse,
     ListSnapshotWorldsBody,
     ListSnapshotWorldsResponse,
+    SubmitJobResponse,
     TargetIdRequestPath,
     UnauthorizedResponse,
     backups_tag,
 )
+from src.api.blueprints.jobs import submit_job_response
+from src.api.blueprints.server import DockerMgmtApi
 
 from src.common.environment import Env
-from src.common.helpers import log_exception
 
 backups_bp: APIBlueprint = APIBlueprint(
     "backups",
@@ -39,7 +57,15 @@ backups_bp: APIBlueprint = APIBlueprint(
     abp_responses={HTTPStatus.UNAUTHORIZED: UnauthorizedResponse},
 )
 
-BackupsApi = BackupManagement()
+BackupsApi = BackupManagement(
+    docker_management=DockerMgmtApi, snapshot_worlds_cache=SnapshotWorldsCache()
+)
+if RESTIC_WORKER_ENABLED:
+    BackupsApi.restic_worker = ResticWorker(DockerMgmtApi.client)
+if SNAPSHOT_CATALOG_RECONCILE_SECS > 0:
+    BackupsApi.snapshot_catalog = SnapshotCatalog(
+        BackupsApi.call_restic, interval=SNAPSHOT_CATALOG_RECONCILE_SECS
+    )
 
 
 @backups_bp.route("/list", methods=["OPTIONS"])
@@ -57,17 +83,26 @@ def list_backups_options_handler():
 def list_backups_handler(body: ListBackupsRequestBody):
     """List all backups per tags
 
-    List all restic backups that match the queried tags.
+    List all restic backups that match the queried tags, optionally narrowed to a world group and time range, and paged.
     """
     resp = prepare_response()
 
     env_str = body.env_str
     target_tags = body.target_tags
 
-    backups = BackupsApi.list_backups_by_env_and_tags(Env(env_str), target_tags)
+    backups, total = BackupsApi.list_backups_page(
+        Env(env_str),
+        target_tags,
+        world_group=body.world_group,
+        since=body.since,
+        until=body.until,
+        limit=body.limit,
+        offset=body.offset,
+    )
     resp.data = json.dumps(
         {
             "backups": list(map(lambda b: b.model_dump(), backups)),
+            "total": total,
         }
     )
 
@@ -110,36 +145,73 @@ def create_new_minecraft_backup_options_handler():
 
 @backups_bp.post(
     "/create",
-    responses={HTTPStatus.OK: CreateBackupResponse},
+    responses={
+        HTTPStatus.ACCEPTED: SubmitJobResponse,
+        HTTPStatus.CONFLICT: JobBusyResponse,
+    },
 )
 @validate_access_token
 @log_request
 def create_new_minecraft_backup_handler(body: CreateBackupRequestBody):
     """Create a new backup
 
-    Only backs up Minecraft containers at the moment.
+    Only backs up Minecraft containers at the moment. Runs as a background job; the job result is the backup container's output.
     """
-    target_env = body.target_env
-    target_world_group = body.target_world_group
-
-    out = None
-    success = False
-    try:
-        out = BackupsApi.backup_minecraft(Env(target_env), target_world_group)
-        success = True
-    except Exception as e:
-        log_exception(
-            message="Failed to create backup!",
-            data={
-                "env": target_env,
-                "world": target_world_group,
-            },
+    env = Env(body.target_env)
+    return submit_job_response(
+        "backup_create",
+        create_backup_job,
+        world_group_resources(env, body.target_world_group),
+        env_str=env.name,
+        world_group=body.target_world_group,
+    )
+
+
+def restic_job_progress(job: JobContext, action: str) -> StatusListener:
+    """Forwards restic status messages to `job`, which throttles how often they're written and published"""
+
+    def progress(status: Dict[str, Any]) -> None:
+        job.progress(
+            status["percent_done"],
+            message=f"{action}: {format_status(status)}",
+            details=status,
         )
-        out = type(e).__name__
 
-    resp = prepare_response()
-    resp.data = json.dumps({"success": success, "output": out})
-    return resp
+    return progress
+
+
+def create_backup_job(job: JobContext, env_str: str, world_group: str):
+    action = f"Backing up {env_str} {world_group}"
+    job.progress(message=action)
+    return BackupsApi.backup_minecraft(
+        Env(env_str), world_group, progress=restic_job_progress(job, action)
+    )
+
+
+def scheduled_backup_job(job: JobContext, env_str: str, world_group: str):
+    action = f"Backing up {env_str} {world_group} (scheduled)"
+    job.progress(message=action)
+    return BackupsApi.backup_minecraft(
+        Env(env_str),
+        world_group,
+        progress=restic_job_progress(job, action),
+        scheduled=True,
+    )
+
+
+backup_scheduler = (
+    BackupScheduler(
+        scheduled_backup_job,
+        BackupsApi.call_restic,
+        lock_file=BACKUP_SCHEDULER_LOCK_FILE,
+        interval=BACKUP_SCHEDULER_INTERVAL_SECS,
+        max_concurrent=BACKUP_SCHEDULER_MAX_CONCURRENT,
+        tick_secs=BACKUP_SCHEDULER_TICK_SECS,
+        snapshot_catalog=BackupsApi.snapshot_catalog,
+    )
+    if BACKUP_SCHEDULER_ENABLED
+    else None
+)
 
 
 @backups_bp.route("/restore", methods=["OPTIONS"])
@@ -151,7 +223,8 @@ def restore_minecraft_backup_options_handler():
 @backups_bp.post(
     "/restore",
     responses={
-        HTTPStatus.OK: RestoreBackupResponse,
+        HTTPStatus.ACCEPTED: SubmitJobResponse,
+        HTTPStatus.CONFLICT: JobBusyResponse,
     },
 )
 @validate_access_token
@@ -159,38 +232,39 @@ def restore_minecraft_backup_options_handler():
 def restore_minecraft_backup_handler(body: RestoreBackupRequestBody):
     """Restore a backup
 
-    Only supports Minecraft backups for now.
+    Only supports Minecraft backups for now. Runs as a background job; the job result is restic's output.
     """
-    target_hostname = body.target_hostname
-    target_snapshot_id = body.target_snapshot_id
-    target_worlds = body.target_worlds
-    bypass_running_container_restriction = body.bypass_running_container_restriction
-
-    split = target_hostname.split("-")
+    split = body.target_hostname.split("-")
     target_env, target_world_group = split[1], split[2]
 
-    out = None
-    success = False
-    try:
-        out = BackupsApi.restore_minecraft(
-            Env(target_env),
-            target_world_group,
-            target_snapshot_id,
-            target_worlds,
-            bypass_running_container_restriction,
-        )
-        success = True
-    except Exception as e:
-        log_exception(
-            message="Failed to restore backup!",
-            data={
-                "env": target_env,
-                "world": target_world_group,
-                "snapshot_id": target_snapshot_id,
-            },
-        )
-        out = type(e).__name__
+    env = Env(target_env)
+    return submit_job_response(
+        "backup_restore",
+        restore_backup_job,
+        world_group_resources(env, target_world_group),
+        env_str=env.name,
+        world_group=target_world_group,
+        snapshot_id=body.target_snapshot_id,
+        worlds=body.target_worlds,
+        bypass_running_container_restriction=body.bypass_running_container_restriction,
+    )
 
-    resp = prepare_response()
-    resp.data = json.dumps({"success": success, "output": out})
-    return resp
+
+def restore_backup_job(
+    job: JobContext,
+    env_str: str,
+    world_group: str,
+    snapshot_id: str,
+    worlds: List[str],
+    bypass_running_container_restriction: bool,
+):
+    action = f"Restoring {snapshot_id} to {env_str} {world_group}"
+    job.progress(message=action)
+    return BackupsApi.restore_minecraft(
+        Env(env_str),
+        world_group,
+        snapshot_id,
+        worlds,
+        bypass_running_container_restriction,
+        progress=restic_job_progress(job, action),
+    )
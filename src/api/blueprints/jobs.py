@@ -0,0 +1,150 @@
+import json
+
+from http import HTTPStatus
+from typing import Any, Iterable
+
+from flask import request  # type: ignore
+from flask_openapi3 import APIBlueprint  # type: ignore
+
+from src.api import security
+from src.api.db import db
+from src.api.lib.auth import (
+    authenticate_access_token,
+    return_cors_response,
+    validate_access_token,
+    prepare_response,
+)
+from src.api.lib.helpers import log_request
+from src.api.lib.jobs import (
+    JOB_FAILED,
+    JOB_SUCCEEDED,
+    JobFunction,
+    JobNotFoundError,
+    ResourceBusyError,
+    job_manager,
+    job_to_dict,
+)
+
+from src.api.blueprints import (
+    JobIdRequestPath,
+    JobModel,
+    JobResultResponse,
+    ListJobsQuery,
+    ListJobsResponse,
+    UnauthorizedResponse,
+    jobs_tag,
+)
+
+jobs_bp: APIBlueprint = APIBlueprint(
+    "jobs",
+    __name__,
+    url_prefix="/jobs",
+    abp_security=security,
+    abp_tags=[jobs_tag],
+    abp_responses={HTTPStatus.UNAUTHORIZED: UnauthorizedResponse},
+)
+
+
+def submit_job_response(
+    kind: str, fn: JobFunction, resources: Iterable[str], **kwargs: Any
+):
+    """Submits a job and builds the response for it: 202 with the queued job, or 409 if a resource is busy.
+
+    For use by handlers that kick off long operations.
+    """
+    user = authenticate_access_token(request.headers, db.session)
+    try:
+        job = job_manager.submit(
+            kind,
+            fn,
+            resources=resources,
+            user=user.sub if user is not None else None,
+            **kwargs,
+        )
+    except ResourceBusyError as e:
+        resp = prepare_response(status_code=HTTPStatus.CONFLICT)
+        resp.data = json.dumps(
+            {"message": str(e), "resource": e.resource, "job_id": e.job_id}
+        )
+        return resp
+
+    resp = prepare_response(status_code=HTTPStatus.ACCEPTED)
+    resp.data = json.dumps({"job": job_to_dict(job)})
+    return resp
+
+
+@jobs_bp.route("", methods=["OPTIONS"])
+@log_request
+def list_jobs_options_handler():
+    return return_cors_response()
+
+
+@jobs_bp.get("", responses={HTTPStatus.OK: ListJobsResponse})
+@validate_access_token
+@log_request
+def list_jobs_handler(query: ListJobsQuery):
+    """List recent jobs"""
+    jobs = job_manager.list_jobs(
+        limit=query.limit, status=query.status, kind=query.kind
+    )
+
+    resp = prepare_response()
+    resp.data = json.dumps({"jobs": [job_to_dict(job) for job in jobs]})
+    return resp
+
+
+@jobs_bp.route("/<string:job_id>", methods=["OPTIONS"])
+@log_request
+def get_job_options_handler(job_id):
+    return return_cors_response()
+
+
+@jobs_bp.get("/<string:job_id>", responses={HTTPStatus.OK: JobModel})
+@validate_access_token
+@log_request
+def get_job_handler(path: JobIdRequestPath):
+    """Status and progress of a job"""
+    try:
+        job = job_manager.get(path.job_id)
+    except JobNotFoundError:
+        return prepare_response(status_code=HTTPStatus.NOT_FOUND)
+
+    resp = prepare_response()
+    resp.data = json.dumps(job_to_dict(job))
+    return resp
+
+
+@jobs_bp.route("/<string:job_id>/result", methods=["OPTIONS"])
+@log_request
+def get_job_result_options_handler(job_id):
+    return return_cors_response()
+
+
+@jobs_bp.get(
+    "/<string:job_id>/result",
+    responses={
+        HTTPStatus.OK: JobResultResponse,
+        HTTPStatus.CONFLICT: JobResultResponse,
+    },
+)
+@validate_access_token
+@log_request
+def get_job_result_handler(path: JobIdRequestPath):
+    """Result of a finished job
+
+    Responds 409 while the job is still queued or running.
+    """
+    try:
+        job = job_manager.get(path.job_id)
+    except JobNotFoundError:
+        return prepare_response(status_code=HTTPStatus.NOT_FOUND)
+
+    data = job_to_dict(job)
+    finished = job.status in (JOB_SUCCEEDED, JOB_FAILED)
+    resp = prepare_response(
+        status_code=HTTPStatus.OK if finished else HTTPStatus.CONFLICT
+    )
+    resp.data = json.dumps(
+        {"status": data["status"], "result": data["result"], "error": data["error"]}
+    )
+    return resp
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+import json
+
+from http import HTTPStatus
+
+from flask_openapi3 import APIBlueprint  # type: ignore
+
+from src.api import security
+from src.api.blueprints import metrics_tag, MetricsResponse, UnauthorizedResponse
+from src.api.lib.auth import (
+    prepare_response,
+    return_cors_response,
+    validate_access_token,
+)
+from src.api.lib.helpers import log_request
+from src.api.lib.metrics import metrics
+
+metrics_bp: APIBlueprint = APIBlueprint(
+    "metrics",
+    __name__,
+    url_prefix="/metrics",
+    abp_security=security,
+    abp_tags=[metrics_tag],
+    abp_responses={HTTPStatus.UNAUTHORIZED: UnauthorizedResponse},
+)
+
+
+@metrics_bp.route("", methods=["OPTIONS"])
+@log_request
+def metrics_options_handler():
+    return return_cors_response()
+
+
+@metrics_bp.get("", responses={HTTPStatus.OK: MetricsResponse})
+@validate_access_token
+def metrics_handler():
+    """Internal metrics for the worker that served this request
+
+    Metrics are per gunicorn worker; successive calls may be answered by different workers.
+    """
+    resp = prepare_response()
+    resp.data = json.dumps(metrics.snapshot())
+    return resp
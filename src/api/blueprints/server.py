@@ -5,26 +5,51 @@ from flask import request  # type: ignore
 from flask_openapi3 import APIBlueprint  # type: ignore
 
 from src.api import db, security
+from src.api.constants import (
+    COMPOSE_ORCHESTRATOR_ENABLED,
+    COMPOSE_READY_TIMEOUT_SECS,
+    RCON_ENABLED,
+    RCON_PASSWORD_FALLBACK_FILE,
+    RCON_PORT,
+    RCON_TIMEOUT_SECS,
+    STATS_SAMPLER_DIR,
+)
 from src.api.lib.auth import (
     return_cors_response,
     validate_access_token,
     prepare_response,
 )
+from src.api.lib.compose_orchestrator import ComposeOrchestrator
+from src.api.lib.container_inventory import ContainerInventory
 from src.api.lib.docker_management import (
     DockerManagement,
-    convert_dockerpy_container_to_legacy_active_container,
+    world_group_container_names,
 )
+from src.api.lib.health_waiter import OUTCOME_REACHED, HealthWaiter
 from src.api.lib.helpers import log_request
+from src.api.lib.jobs import JobContext, env_resources
+from src.api.lib.rcon import RconPool
+from src.api.lib.stats_sampler import StatsSampler, parse_range_secs
 
 from src.api.blueprints import (
+    ClusterStatsQuery,
+    ClusterStatsResponse,
     ContainerNameRequestPath,
+    JobBusyResponse,
     ListActiveContainersResponse,
     ListDefinedContainersResponse,
     UnauthorizedResponse,
     server_tag,
     EnvRequestPath,
+    SendEnvCommandRequestBody,
+    SendEnvCommandResponse,
+    SubmitJobResponse,
+    WaitForStateRequestBody,
+    WaitForStateResponse,
 )
+from src.api.blueprints.jobs import submit_job_response
 
+from src.common import server_paths
 from src.common.constants import YC_ENV_LABEL
 from src.common.environment import Env
 from src.common.logger_setup import logger
@@ -38,6 +63,26 @@ server_bp: APIBlueprint = APIBlueprint(
     abp_responses={HTTPStatus.UNAUTHORIZED: UnauthorizedResponse},
 )
 DockerMgmtApi = DockerManagement()
+container_inventory = ContainerInventory(DockerMgmtApi.client)
+DockerMgmtApi.inventory = container_inventory
+container_inventory.add_listener(DockerMgmtApi.pty_registry.on_container_event)
+stats_sampler = StatsSampler(DockerMgmtApi.client, data_dir=STATS_SAMPLER_DIR)
+container_inventory.add_listener(stats_sampler.on_container_event)
+health_waiter = HealthWaiter(container_inventory, DockerMgmtApi.client)
+container_inventory.add_listener(health_waiter.on_container_event)
+if RCON_ENABLED:
+    DockerMgmtApi.rcon_pool = RconPool(
+        password_files=[
+            server_paths.get_rcon_password_file_path(),
+            RCON_PASSWORD_FALLBACK_FILE,
+        ],
+        port=RCON_PORT,
+        timeout=RCON_TIMEOUT_SECS,
+    )
+if COMPOSE_ORCHESTRATOR_ENABLED:
+    DockerMgmtApi.orchestrator = ComposeOrchestrator(
+        DockerMgmtApi.client, ready_timeout_secs=COMPOSE_READY_TIMEOUT_SECS
+    )
 
 
 def convert_container_name_to_env(container_name: str) -> Env:
@@ -100,16 +145,10 @@ def list_active_containers_handler(path: EnvRequestPath):
     resp = prepare_response()
 
     env = Env(path.env_str)
-    containers = DockerMgmtApi.list_active_containers(env)
-
-    data = list(
-        map(
-            lambda c: convert_dockerpy_container_to_legacy_active_container(
-                c
-            ).model_dump(),
-            containers,
-        )
-    )
+    data = [
+        container.model_dump()
+        for container in DockerMgmtApi.list_active_container_summaries(env)
+    ]
     resp.data = json.dumps(
         {
             "active_containers": data,
@@ -125,19 +164,32 @@ def up_containers_options_handler(env_str):
     return return_cors_response()
 
 
-@server_bp.post("/cluster/<string:env_str>/up")
+@server_bp.post(
+    "/cluster/<string:env_str>/up",
+    responses={
+        HTTPStatus.ACCEPTED: SubmitJobResponse,
+        HTTPStatus.CONFLICT: JobBusyResponse,
+    },
+)
 @validate_access_token
 @log_request
 def up_containers_handler(path: EnvRequestPath):
-    """Start a cluster"""
-    resp = prepare_response()
+    """Start a cluster
 
+    Runs as a background job. Responds immediately with the queued job.
+    """
     env = Env(path.env_str)
+    return submit_job_response(
+        "cluster_up", cluster_up_job, env_resources(env), env_str=env.name
+    )
+
+
+def cluster_up_job(job: JobContext, env_str: str):
+    env = Env(env_str)
+    job.progress(message=f"Bringing up {env.name}")
     resp_data = DockerMgmtApi.up_containers(env)
     resp_data["env"] = env.to_json()
-
-    resp.data = json.dumps(resp_data)
-    return resp
+    return resp_data
 
 
 @server_bp.route("/cluster/<string:env_str>/down", methods=["OPTIONS"])
@@ -146,19 +198,157 @@ def down_containers_options_handler(env_str):
     return return_cors_response()
 
 
-@server_bp.post("/cluster/<string:env_str>/down")
+@server_bp.post(
+    "/cluster/<string:env_str>/down",
+    responses={
+        HTTPStatus.ACCEPTED: SubmitJobResponse,
+        HTTPStatus.CONFLICT: JobBusyResponse,
+    },
+)
 @validate_access_token
 @log_request
 def down_containers_handler(path: EnvRequestPath):
-    """Shut down a cluster"""
+    """Shut down a cluster
+
+    Runs as a background job. Responds immediately with the queued job.
+    """
     env = Env(path.env_str)
+    return submit_job_response(
+        "cluster_down", cluster_down_job, env_resources(env), env_str=env.name
+    )
 
-    resp = prepare_response()
+
+def cluster_down_job(job: JobContext, env_str: str):
+    env = Env(env_str)
+    job.progress(message=f"Shutting down {env.name}")
     resp_data = DockerMgmtApi.down_containers(env)
     resp_data["env"] = env.to_json()
+    return resp_data
 
-    resp.data = json.dumps(resp_data)
 
+@server_bp.route("/cluster/<string:env_str>/stats", methods=["OPTIONS"])
+@log_request
+def get_cluster_stats_options_handler(env_str):
+    return return_cors_response()
+
+
+@server_bp.get(
+    "/cluster/<string:env_str>/stats",
+    responses={
+        HTTPStatus.OK: ClusterStatsResponse,
+    },
+)
+@validate_access_token
+@log_request
+def get_cluster_stats_handler(path: EnvRequestPath, query: ClusterStatsQuery):
+    """CPU, memory, network and block I/O per world group
+
+    Ranges up to an hour come back at 1s resolution, up to a day at 1m and anything longer at 1h.
+    """
+    try:
+        range_secs = parse_range_secs(query.range)
+    except ValueError as e:
+        resp = prepare_response(status_code=HTTPStatus.BAD_REQUEST)
+        resp.data = json.dumps({"message": str(e)})
+        return resp
+
+    env = Env(path.env_str)
+    container_names = world_group_container_names(env)
+    resolution_secs, points = stats_sampler.query(
+        container_names.values(), range_secs
+    )
+
+    resp = prepare_response()
+    resp.data = json.dumps(
+        {
+            "env": env.to_json(),
+            "range_secs": range_secs,
+            "resolution_secs": resolution_secs,
+            "world_groups": {
+                world_group: points[container_name]
+                for world_group, container_name in container_names.items()
+            },
+        }
+    )
+    return resp
+
+
+def wait_for_state_response(container_names, body: WaitForStateRequestBody):
+    results = health_waiter.wait(container_names, body.state, body.timeout_secs)
+
+    resp = prepare_response()
+    resp.data = json.dumps(
+        {
+            "reached": all(r.outcome == OUTCOME_REACHED for r in results.values()),
+            "results": {
+                container_name: result.model_dump()
+                for container_name, result in results.items()
+            },
+        }
+    )
+    return resp
+
+
+@server_bp.route("/cluster/<string:env_str>/wait", methods=["OPTIONS"])
+@log_request
+def wait_for_cluster_state_options_handler(env_str):
+    return return_cors_response()
+
+
+@server_bp.post(
+    "/cluster/<string:env_str>/wait",
+    responses={
+        HTTPStatus.OK: WaitForStateResponse,
+    },
+)
+@validate_access_token
+@log_request
+def wait_for_cluster_state_handler(
+    path: EnvRequestPath, body: WaitForStateRequestBody
+):
+    """Long-poll until every world group in a cluster reaches a state
+
+    Resolves as soon as Docker reports the last container getting there, or when `timeout_secs` runs out.
+    """
+    env = Env(path.env_str)
+    return wait_for_state_response(world_group_container_names(env).values(), body)
+
+
+@server_bp.route("/cluster/<string:env_str>/command", methods=["OPTIONS"])
+@log_request
+def send_env_command_options_handler(env_str):
+    return return_cors_response()
+
+
+@server_bp.post(
+    "/cluster/<string:env_str>/command",
+    responses={
+        HTTPStatus.OK: SendEnvCommandResponse,
+    },
+)
+@validate_access_token
+@log_request
+def send_env_command_handler(path: EnvRequestPath, body: SendEnvCommandRequestBody):
+    """Send a console command to every world group in a cluster
+
+    Commands run concurrently, so eg pre-restart announcements across every world group take as long as the slowest server.
+    """
+    resp = prepare_response()
+
+    env = Env(path.env_str)
+    results = DockerMgmtApi.send_command_to_env(
+        env, body.command, timeout_secs=body.timeout_secs
+    )
+
+    resp.data = json.dumps(
+        {
+            "env": env.to_json(),
+            "results": {
+                container_name: result.model_dump()
+                for container_name, result in results.items()
+            },
+        }
+    )
     return resp
 
 
@@ -196,6 +386,31 @@ def prepare_ws_attach(path: ContainerNameRequestPath):
     return resp
 
 
+@server_bp.route("/container/<string:container_name>/wait", methods=["OPTIONS"])
+@log_request
+def wait_for_container_state_options_handler(container_name):
+    return return_cors_response()
+
+
+@server_bp.post(
+    "/container/<string:container_name>/wait",
+    responses={
+        HTTPStatus.OK: WaitForStateResponse,
+    },
+)
+@validate_access_token
+@log_request
+def wait_for_container_state_handler(
+    path: ContainerNameRequestPath, body: WaitForStateRequestBody
+):
+    """Long-poll until a container reaches a state
+
+    Meant to follow `/up` or `/restart` instead of polling `/active`. Responds with the time the container took to get
+    there once it does, or when `timeout_secs` runs out.
+    """
+    return wait_for_state_response([path.container_name], body)
+
+
 @server_bp.route("/container/<string:container_name>/up", methods=["OPTIONS"])
 @log_request
 def up_one_container_options_handler(container_name):
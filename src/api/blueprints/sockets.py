@@ -1,18 +1,27 @@
 from http import HTTPStatus
+from typing import Dict, Optional, Set
+
+from flask import request  # type: ignore
 from flask_openapi3 import APIBlueprint  # type: ignore
-from flask_socketio import emit  # type: ignore
+from flask_socketio import emit, join_room, leave_room  # type: ignore
 
 from src.api import security
-from src.api.lib.sockets import socketio
-from src.api.lib.docker_management import DockerManagement
+from src.api.constants import CONSOLE_BUFFER_LINES
+from src.api.db import db
+from src.api.lib.auth import get_access_token_from_headers, verify_access_token_allowed
+from src.api.lib.console_hub import ConsoleHub, console_room
+from src.api.lib.sockets import AUTHED_ROOM, socketio
+from src.api.lib.docker_management import world_group_container_names
+from src.api.lib.health_waiter import OUTCOME_REACHED, TARGET_HEALTHY, TARGET_STATES
 
 from src.api.blueprints import UnauthorizedResponse, sockets_tag
+from src.api.blueprints.server import DockerMgmtApi, health_waiter
 
+from src.common.environment import Env
 from src.common.logger_setup import logger
 
 from src.api.lib.helpers import log_request
 
-DockerMgmtApi = DockerManagement()
 sockets_bp: APIBlueprint = APIBlueprint(
     "sockets",
     __name__,
@@ -21,22 +30,105 @@ sockets_bp: APIBlueprint = APIBlueprint(
     abp_tags=[sockets_tag],
     abp_responses={HTTPStatus.UNAUTHORIZED: UnauthorizedResponse},
 )
+console_hub = ConsoleHub(
+    DockerMgmtApi.client,
+    emit=socketio.emit,
+    buffer_lines=CONSOLE_BUFFER_LINES,
+    start_task=socketio.start_background_task,
+    sleep=socketio.sleep,
+)
+# Socket ids that presented a valid access token when connecting
+authed_sids: Set[str] = set()
+# No proxy read timeout to stay under on a socket, unlike the `/wait` long-poll endpoints
+MAX_SOCKET_WAIT_SECS = 900
+
+
+def is_authed_connection(auth: Optional[Dict]) -> bool:
+    """Checks the access token from the Socket.IO `auth` payload (`{"token": ...}`), or the connect request's headers"""
+    headers = dict(request.headers)
+    if auth and auth.get("token"):
+        headers["Authorization"] = f"Bearer {auth['token']}"
+    try:
+        scheme, token = get_access_token_from_headers(headers)
+        verify_access_token_allowed(scheme, token, db.session)
+    except Exception:
+        return False
+    return True
 
 
 @socketio.on("connect")
 @log_request
-def connect_handler(*args, **kwargs):
+def connect_handler(auth=None, *args, **kwargs):
     logger.info("CLIENT CONNECTED")
-    logger.info(args)
-    logger.info(kwargs)
+    if is_authed_connection(auth):
+        authed_sids.add(request.sid)
+        join_room(AUTHED_ROOM)
 
 
 @socketio.on("disconnect")
 @log_request
 def disconnect_handler(*args, **kwargs):
     logger.info("CLIENT disconnectED")
-    logger.info(args)
-    logger.info(kwargs)
+    authed_sids.discard(request.sid)
+    console_hub.disconnect(request.sid)
+
+
+@socketio.on("console:subscribe")
+@log_request
+def console_subscribe_handler(data):
+    """Starts streaming a world group's console to this socket
+
+    Expects `{"env": "env1", "world_group": "lobby"}`. Acks with the recent backlog; live lines follow as `console` events.
+    """
+    if request.sid not in authed_sids:
+        return {"success": False, "error": "Unauthorized"}
+
+    env_name, world_group = data["env"], data["world_group"]
+    # Join first so no line emitted between reading the backlog and joining is lost.
+    join_room(console_room(env_name, world_group))
+    room, seq, lines = console_hub.subscribe(request.sid, env_name, world_group)
+    return {"success": True, "room": room, "seq": seq, "lines": lines}
+
+
+@socketio.on("console:unsubscribe")
+@log_request
+def console_unsubscribe_handler(data):
+    env_name, world_group = data["env"], data["world_group"]
+    console_hub.unsubscribe(request.sid, env_name, world_group)
+    leave_room(console_room(env_name, world_group))
+    return {"success": True}
+
+
+@socketio.on("containers:wait")
+@log_request
+def containers_wait_handler(data):
+    """Waits for containers to reach a state and acks with the outcome per container
+
+    Expects `{"containers": ["YC-env1-lobby"]}` or `{"env": "env1"}` for every world group, plus optional `state`
+    (running, healthy or stopped; default healthy) and `timeout_secs`.
+    """
+    if request.sid not in authed_sids:
+        return {"success": False, "error": "Unauthorized"}
+
+    state = data.get("state", TARGET_HEALTHY)
+    if state not in TARGET_STATES:
+        return {"success": False, "error": f"Unknown state '{state}'"}
+    container_names = (
+        world_group_container_names(Env(data["env"])).values()
+        if "env" in data
+        else data.get("containers", [])
+    )
+    timeout_secs = min(float(data.get("timeout_secs", 30)), MAX_SOCKET_WAIT_SECS)
+
+    results = health_waiter.wait(container_names, state, timeout_secs)
+    return {
+        "success": True,
+        "reached": all(r.outcome == OUTCOME_REACHED for r in results.values()),
+        "results": {
+            container_name: result.model_dump()
+            for container_name, result in results.items()
+        },
+    }
 
 
 @socketio.on("message")
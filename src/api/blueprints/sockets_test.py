@@ -0,0 +1,41 @@
+import flask  # type: ignore
+import pytest  # type: ignore
+
+from pytest_mock import MockerFixture  # type: ignore
+
+from src.api.blueprints.sockets import authed_sids
+from src.api.lib.jobs import JOB_EVENT, JOB_RUNNING, job_manager
+from src.api.lib.sockets import socketio
+from src.api.models import Job
+
+
+@pytest.fixture
+def app(mocker: MockerFixture):
+    app = flask.Flask(__name__)
+    socketio.init_app(app)
+    # A client is authed if it presented any token at all
+    mocker.patch(
+        "src.api.blueprints.sockets.is_authed_connection",
+        side_effect=lambda auth: bool(auth and auth.get("token")),
+    )
+    yield app
+    authed_sids.clear()
+
+
+def test_job_events_only_reach_authed_sockets(app, mocker: MockerFixture):
+    # SETUP
+    authed = socketio.test_client(app, auth={"token": "a-token"})
+    unauthed = socketio.test_client(app)
+    # Broadcasts bypass the test client's packet capture, so record who they're sent to.
+    send = mocker.patch.object(socketio.server, "_send_eio_packet")
+
+    # EXECUTE
+    job_manager.publish(
+        Job(id="job1", kind="backup_restore", status=JOB_RUNNING, created_at=0)
+    )
+
+    # ASSERT
+    recipients = [c.args[0] for c in send.call_args_list]
+    assert recipients == [authed.eio_sid]
+    assert unauthed.eio_sid not in recipients
+    assert f'"{JOB_EVENT}"' in send.call_args.args[1].data
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Dict
 import os
 
 CONFIGURATION_TYPE = os.getenv("CONFIGURATION_TYPE", "local")
@@ -50,7 +51,132 @@ else:
 
 HOST_PASSWD = "/etc/host-passwd"
 WHITELISTED_USERS_FILE = "secrets/whitelisted_google_sub_ids.txt"
+# The whitelist file and `WhitelistedUser` table are re-read at most this often. See `src/api/lib/whitelist.py`.
+WHITELIST_FILE_CHECK_SECS = float(os.getenv("WHITELIST_FILE_CHECK_SECS", "2"))
+WHITELIST_DB_REFRESH_SECS = float(os.getenv("WHITELIST_DB_REFRESH_SECS", "30"))
 ACCESS_TOKEN_DUR_MINS = 30
+
+# "opaque" tokens are random strings validated against the DB. "signed" tokens are HMAC-signed
+# and verified without any I/O. See `src/api/lib/signed_tokens.py`.
+ACCESS_TOKEN_MODE_OPAQUE = "opaque"
+ACCESS_TOKEN_MODE_SIGNED = "signed"
+ACCESS_TOKEN_MODE = os.getenv("ACCESS_TOKEN_MODE", ACCESS_TOKEN_MODE_OPAQUE)
+if ACCESS_TOKEN_MODE not in (ACCESS_TOKEN_MODE_OPAQUE, ACCESS_TOKEN_MODE_SIGNED):
+    raise RuntimeError(
+        f"ACCESS_TOKEN_MODE must be '{ACCESS_TOKEN_MODE_OPAQUE}' or '{ACCESS_TOKEN_MODE_SIGNED}'. Got '{ACCESS_TOKEN_MODE}'"
+    )
+ACCESS_TOKEN_SIGNING_KEY_FILE: Path = Path("secrets/access_token_signing.key")
+
+# In-process cache of verified access tokens. See `src/api/lib/auth_cache.py`.
+ACCESS_TOKEN_CACHE_MAXSIZE = int(os.getenv("ACCESS_TOKEN_CACHE_MAXSIZE", "1024"))
+ACCESS_TOKEN_CACHE_TTL_SECS = float(os.getenv("ACCESS_TOKEN_CACHE_TTL_SECS", "60"))
+# How often each worker checks the DB for tokens logged out by other workers.
+ACCESS_TOKEN_REVOCATION_SYNC_SECS = float(
+    os.getenv("ACCESS_TOKEN_REVOCATION_SYNC_SECS", "5")
+)
+# Background purge of expired AccessToken/JTI rows. See `src/api/lib/token_sweeper.py`.
+# Set TOKEN_PURGE_INTERVAL_SECS to 0 to disable the sweeper.
+TOKEN_PURGE_INTERVAL_SECS = float(os.getenv("TOKEN_PURGE_INTERVAL_SECS", "600"))
+TOKEN_PURGE_CHUNK_SIZE = int(os.getenv("TOKEN_PURGE_CHUNK_SIZE", "500"))
+# Rows must outlive one token lifetime after expiring; signed token revocation sync reads them.
+TOKEN_PURGE_GRACE_SECS = max(
+    int(os.getenv("TOKEN_PURGE_GRACE_SECS", "86400")), ACCESS_TOKEN_DUR_MINS * 60
+)
+# Google's OAuth2 signing certs are cached here (honoring Cache-Control) so all workers share one fetch.
+GOOGLE_CERTS_CACHE_FILE: Path = Path(
+    os.getenv("GOOGLE_CERTS_CACHE_FILE", "/tmp/yc-api-google-certs.json")
+)
+
+
+def _parse_log_request_sample_every(raw: str) -> Dict[str, int]:
+    rates = {}
+    for entry in filter(None, (e.strip() for e in raw.split(","))):
+        funcname, _, every = entry.partition("=")
+        rates[funcname.strip()] = int(every)
+    return rates
+
+
+# `@log_request` only logs one in every N invocations of these (polled) handlers.
+# Override with eg `LOG_REQUEST_SAMPLE_EVERY="me_handler=10,list_active_containers_handler=20"`.
+LOG_REQUEST_SAMPLE_EVERY: Dict[str, int] = {
+    "list_active_containers_handler": 10,
+    "list_active_containers_options_handler": 10,
+    "list_defined_containers_handler": 10,
+    "list_defined_containers_options_handler": 10,
+    **_parse_log_request_sample_every(os.getenv("LOG_REQUEST_SAMPLE_EVERY", "")),
+}
+# SQLAlchemy engine/pool options for yc-api-mysql. See `src/api/lib/db_pool.py`.
+# Per gunicorn worker, so the MySQL `max_connections` budget is 3 * (DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SECS = float(os.getenv("DB_POOL_TIMEOUT_SECS", "10"))
+# Must stay below MySQL's `wait_timeout` (8h by default).
+DB_POOL_RECYCLE_SECS = int(os.getenv("DB_POOL_RECYCLE_SECS", "3600"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Shared Docker client. See `src/api/lib/docker_client.py`. Pool size is per gunicorn worker.
+DOCKER_MAX_POOL_SIZE = int(os.getenv("DOCKER_MAX_POOL_SIZE", "50"))
+DOCKER_TIMEOUT_SECS = float(os.getenv("DOCKER_TIMEOUT_SECS", "60"))
+# Serve container listings from an in-memory inventory fed by `docker events`. See `src/api/lib/container_inventory.py`.
+CONTAINER_INVENTORY_ENABLED = os.getenv(
+    "CONTAINER_INVENTORY_ENABLED", "true"
+).lower() in ("1", "true", "yes")
+# Console commands go over pooled RCON connections instead of `docker exec rcon-cli`. See `src/api/lib/rcon.py`.
+# yc-api must share a network with the minecraft containers (yc-dynmap) for this to work.
+RCON_ENABLED = os.getenv("RCON_ENABLED", "true").lower() in ("1", "true", "yes")
+RCON_PORT = int(os.getenv("RCON_PORT", "25575"))
+RCON_TIMEOUT_SECS = float(os.getenv("RCON_TIMEOUT_SECS", "5"))
+# `server_paths.get_rcon_password_file_path()` is the host path, which isn't always visible from inside yc-api.
+RCON_PASSWORD_FALLBACK_FILE: Path = Path("secrets/rcon.password")
+# Bring clusters up/down in-process instead of via `make`. See `src/api/lib/compose_orchestrator.py`.
+COMPOSE_ORCHESTRATOR_ENABLED = os.getenv(
+    "COMPOSE_ORCHESTRATOR_ENABLED", "true"
+).lower() in ("1", "true", "yes")
+# How long to wait for a service others depend on (eg mysql, each minecraft server) to become healthy.
+COMPOSE_READY_TIMEOUT_SECS = float(os.getenv("COMPOSE_READY_TIMEOUT_SECS", "900"))
+# Long operations run as background jobs. See `src/api/lib/jobs.py`. Per gunicorn worker.
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "4"))
+JOB_PROGRESS_INTERVAL_SECS = float(os.getenv("JOB_PROGRESS_INTERVAL_SECS", "1"))
+# Workers renew the lease of every job they run this often. Unfinished jobs whose lease ran out are failed.
+JOB_HEARTBEAT_SECS = float(os.getenv("JOB_HEARTBEAT_SECS", "30"))
+JOB_LEASE_SECS = float(os.getenv("JOB_LEASE_SECS", "120"))
+# Run restic commands through a persistent worker container. See `src/api/lib/restic_worker.py`.
+RESTIC_WORKER_ENABLED = os.getenv("RESTIC_WORKER_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Status messages per second restic prints while backing up or restoring for a job. See `src/api/lib/restic_progress.py`.
+RESTIC_PROGRESS_FPS = float(os.getenv("RESTIC_PROGRESS_FPS", "1"))
+# Serve backup listings from a snapshot catalog in the API database, reconciled against the restic repository this
+# often. 0 disables the catalog. See `src/api/lib/snapshot_catalog.py`.
+SNAPSHOT_CATALOG_RECONCILE_SECS = float(
+    os.getenv("SNAPSHOT_CATALOG_RECONCILE_SECS", "900")
+)
+# Staggered backups for envs with `backup_sidecars = false`. See `src/api/lib/backup_scheduler.py`.
+BACKUP_SCHEDULER_ENABLED = os.getenv("BACKUP_SCHEDULER_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+BACKUP_SCHEDULER_INTERVAL_SECS = float(
+    os.getenv("BACKUP_SCHEDULER_INTERVAL_SECS", "7200")
+)
+BACKUP_SCHEDULER_MAX_CONCURRENT = int(os.getenv("BACKUP_SCHEDULER_MAX_CONCURRENT", "1"))
+BACKUP_SCHEDULER_TICK_SECS = float(os.getenv("BACKUP_SCHEDULER_TICK_SECS", "60"))
+# Every gunicorn worker must see the same file: whichever holds its lock is the one that schedules.
+BACKUP_SCHEDULER_LOCK_FILE: Path = Path(
+    os.getenv("BACKUP_SCHEDULER_LOCK_FILE", "/tmp/yc-api-backup-scheduler.lock")
+)
+# Recent console lines kept per minecraft container for new viewers. See `src/api/lib/console_hub.py`.
+CONSOLE_BUFFER_LINES = int(os.getenv("CONSOLE_BUFFER_LINES", "500"))
+# Stream `docker stats` for every running minecraft container. See `src/api/lib/stats_sampler.py`.
+STATS_SAMPLER_ENABLED = os.getenv("STATS_SAMPLER_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Shared by every gunicorn worker: the sampling worker's leader lock and the rollup files the others read.
+STATS_SAMPLER_DIR: Path = Path(os.getenv("STATS_SAMPLER_DIR", "/tmp/yc-api-stats"))
 YC_TOKEN_AUTH_SCHEME = "Bearer"
 ENV_FOLDER: Path = Path("/app/env")
 
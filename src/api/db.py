@@ -1,3 +1,64 @@
+from contextlib import contextmanager
+from typing import Iterator
+
 from flask_sqlalchemy import SQLAlchemy  # type: ignore
+from sqlalchemy import inspect, text  # type: ignore
+from sqlalchemy.exc import DBAPIError  # type: ignore
 
 db = SQLAlchemy()
+
+SCHEMA_LOCK_NAME = "yc-api.schema"
+SCHEMA_LOCK_TIMEOUT_SECS = 60
+
+
+class SchemaLockTimeoutError(RuntimeError):
+    def __init__(self, timeout_secs: int):
+        super().__init__(
+            f"Timed out after {timeout_secs}s waiting for another worker to finish setting up the DB schema!"
+        )
+
+
+@contextmanager
+def schema_lock(timeout_secs: int = SCHEMA_LOCK_TIMEOUT_SECS) -> Iterator[None]:
+    """Holds a MySQL named lock while the schema is set up, so gunicorn workers booting together take turns
+    instead of racing each other's `CREATE TABLE`/`CREATE INDEX`. A no-op on other databases, eg SQLite in tests.
+
+    Must be called inside an app context.
+    """
+    if db.engine.dialect.name != "mysql":
+        yield
+        return
+
+    # Named locks belong to the session that took them, so hold on to this connection until released.
+    with db.engine.connect() as conn:
+        params = {"name": SCHEMA_LOCK_NAME, "timeout": timeout_secs}
+        if not conn.execute(text("SELECT GET_LOCK(:name, :timeout)"), params).scalar():
+            raise SchemaLockTimeoutError(timeout_secs)
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT RELEASE_LOCK(:name)"), params)
+
+
+def create_missing_indexes() -> None:
+    """`db.create_all()` skips tables that already exist, so indexes added to existing models never
+    get created. Creates any declared index that's missing from the live schema.
+
+    Safe to race: if another process creates the same index first, the error is swallowed once a fresh look at
+    the schema confirms the index exists. Must be called inside an app context.
+    """
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind=db.engine)
+            except DBAPIError:
+                # Eg MySQL's "Duplicate key name". `inspector` caches, so ask a new one.
+                created = inspect(db.engine).get_indexes(table.name)
+                if index.name not in {i["name"] for i in created}:
+                    raise
@@ -43,6 +43,23 @@ class Backup(BaseModel):
     parent: Optional[str] = None  # If first back
 
 
+# See docker_management.send_command_to_env
+class ContainerCommandResult(BaseModel):
+    success: bool
+    output: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ContainerWaitResult(BaseModel):
+    outcome: str  # "reached", "failed" or "timed_out"
+    status: Optional[str] = None
+    health: Optional[str] = None
+    elapsed_secs: float
+    # Container start to reaching the target state. Only set if it got there while we were waiting.
+    secs_since_start: Optional[float] = None
+    error: Optional[str] = None
+
+
 # See docker_management.convert_dockerpy_container_to_container_definition
 class LegacyActiveContainer(BaseModel):
     Command: Union[List[str], str]
@@ -11,26 +11,84 @@ from typing import Any, Dict, Optional, Tuple, Callable
 from datetime import datetime, timezone
 from secrets import token_hex
 from google.oauth2 import id_token  # type: ignore
-from google.auth.transport import requests as g_requests  # type: ignore
 from uuid import uuid4
 
 
 from src.api.constants import (
     IS_LOCAL,
+    ACCESS_TOKEN_CACHE_MAXSIZE,
+    ACCESS_TOKEN_CACHE_TTL_SECS,
     ACCESS_TOKEN_DUR_MINS,
+    ACCESS_TOKEN_MODE,
+    ACCESS_TOKEN_MODE_SIGNED,
+    ACCESS_TOKEN_REVOCATION_SYNC_SECS,
+    ACCESS_TOKEN_SIGNING_KEY_FILE,
     G_CLIENT_ID,
+    GOOGLE_CERTS_CACHE_FILE,
     CORS_ORIGINS,
+    WHITELIST_DB_REFRESH_SECS,
+    WHITELIST_FILE_CHECK_SECS,
     WHITELISTED_USERS_FILE,
     YC_TOKEN_AUTH_SCHEME,
 )
 from src.api.db import db
-from src.api.models import AccessToken, User, JTI
+from src.api.lib.auth_cache import VerifiedTokenCache
+from src.api.lib.google_certs import CachedCertsRequest
+from src.api.lib.metrics import metrics
+from src.api.lib import structured_logging as slog
+from src.api.lib.signed_tokens import (
+    InvalidSignedTokenError,
+    MissingSigningKeyError,
+    RevocationList,
+    SignedTokenClaims,
+    SigningKey,
+    decode_signed_access_token,
+    is_signed_access_token,
+    sign_access_token,
+    signed_token_row_id,
+)
+from src.api.lib.whitelist import WhitelistProvider
+from src.api.models import AccessToken, User, JTI, WhitelistedUser
 
 from src.common.helpers import get_now_dt, log_exception
 from src.common.logger_setup import logger
 
-# TODO: Make more sophisticated in the future but for now this suffices.
-WHITELISTED_USERS = set(open(WHITELISTED_USERS_FILE, "r").read().splitlines())
+
+def _load_whitelisted_subs_from_db():
+    return [row.sub for row in db.session.query(WhitelistedUser.sub).all()]
+
+
+WHITELISTED_USERS = WhitelistProvider(
+    WHITELISTED_USERS_FILE,
+    load_db_subs=_load_whitelisted_subs_from_db,
+    file_check_interval=WHITELIST_FILE_CHECK_SECS,
+    db_refresh_interval=WHITELIST_DB_REFRESH_SECS,
+)
+
+verified_token_cache = VerifiedTokenCache(
+    maxsize=ACCESS_TOKEN_CACHE_MAXSIZE,
+    ttl=ACCESS_TOKEN_CACHE_TTL_SECS,
+    sync_interval=ACCESS_TOKEN_REVOCATION_SYNC_SECS,
+)
+metrics.register_collector(
+    "auth.verified_token_cache",
+    lambda: {
+        "size": len(verified_token_cache),
+        "hits": verified_token_cache.hits,
+        "misses": verified_token_cache.misses,
+    },
+)
+
+google_certs_request = CachedCertsRequest(cache_file=GOOGLE_CERTS_CACHE_FILE)
+metrics.register_collector(
+    "auth.google_certs", lambda: {"fetches": google_certs_request.fetches}
+)
+
+access_token_signing_key = SigningKey(ACCESS_TOKEN_SIGNING_KEY_FILE)
+signed_token_revocations = RevocationList(
+    sync_interval=ACCESS_TOKEN_REVOCATION_SYNC_SECS,
+    max_token_lifetime=60 * ACCESS_TOKEN_DUR_MINS,
+)
 
 ## Custom Errors
 
@@ -40,7 +98,7 @@ class InvalidTokenError(RuntimeError):
 
     def __init__(self, token: Any):
         self.token = token
-        super().__init__(f"{self.msg}\n'{pformat(self.token)}'")
+        super().__init__(f"{self.msg}\n'{slog.redact_token(self.token)}'")
 
 
 class InvalidTokenSchemeError(RuntimeError):
@@ -108,6 +166,17 @@ def generate_access_token() -> Tuple[str, int]:
     return token_hex(), (int(get_now_dt().timestamp()) + 60 * ACCESS_TOKEN_DUR_MINS)
 
 
+def generate_signed_access_token(sub: str, email: str) -> Tuple[str, int, str]:
+    """Generates a signed token and its expiration. Used when `ACCESS_TOKEN_MODE` is "signed".
+
+    Returns:
+        Tuple[str, int, str]: The token, its expiration, and the `AccessToken.id` to record it under
+    """
+    exp = int(get_now_dt().timestamp()) + 60 * ACCESS_TOKEN_DUR_MINS
+    token, claims = sign_access_token(sub, email, exp, access_token_signing_key.get())
+    return token, exp, signed_token_row_id(claims)
+
+
 def deserialize_id_token(token: str) -> Dict:
     """Deserializes the oauth token
 
@@ -126,7 +195,7 @@ def deserialize_id_token(token: str) -> Dict:
             "sub": "123456789012345678901",
             "email": "local@development.yc",
         }
-    return id_token.verify_oauth2_token(token, g_requests.Request(), G_CLIENT_ID)
+    return id_token.verify_oauth2_token(token, google_certs_request, G_CLIENT_ID)
 
 
 def get_access_token_from_headers(headers: Dict[str, str]) -> Tuple[str, str]:
@@ -142,7 +211,7 @@ def get_access_token_from_headers(headers: Dict[str, str]) -> Tuple[str, str]:
     # Authorization: Bearer <access_token>
     auth_header = headers.get("Authorization", "")
 
-    logger.info(f"auth_header: {auth_header}")
+    slog.debug("Got auth header", authorization=auth_header)
     if auth_header:
         scheme, token = auth_header.split()
         return scheme, token
@@ -202,7 +271,7 @@ def generate_access_token_if_valid(
 
     idinfo = deserialize_id_token(token)
 
-    logger.debug(pformat(idinfo))
+    slog.debug("Deserialized id_token", idinfo=idinfo)
 
     jti, exp, iat, sub, email = (
         idinfo["jti"],
@@ -218,7 +287,13 @@ def generate_access_token_if_valid(
 
     now = get_now_dt()
 
-    logger.info(pformat([user, exp_dt, exp, iat_dt, iat, now]))
+    slog.info(
+        "Validating login",
+        user=user,
+        exp=exp_dt,
+        iat=iat_dt,
+        now=now,
+    )
     if session.query(JTI).filter(JTI.jti == jti).first():
         raise DuplicateJTIError(idinfo)
     elif now >= exp_dt:
@@ -228,20 +303,111 @@ def generate_access_token_if_valid(
     elif sub not in WHITELISTED_USERS:
         raise UnknownUserError(user)
 
-    access_token, access_token_exp = generate_access_token()
+    if ACCESS_TOKEN_MODE == ACCESS_TOKEN_MODE_SIGNED:
+        access_token, access_token_exp, access_token_row_id = (
+            generate_signed_access_token(sub, email)
+        )
+    else:
+        access_token, access_token_exp = generate_access_token()
+        access_token_row_id = access_token
+
     if not session.query(User).filter(User.sub == sub).first():
         session.add(user)
     session.add(JTI(jti=jti, exp=exp, iat=iat, user=user.sub))
-    session.add(AccessToken(id=access_token, user=user.sub, exp=access_token_exp))
+    session.add(
+        AccessToken(id=access_token_row_id, user=user.sub, exp=access_token_exp)
+    )
     session.commit()
 
+    if access_token_row_id == access_token:
+        verified_token_cache.set(
+            access_token,
+            exp=access_token_exp,
+            user=user,
+            now=int(now.timestamp()),
+        )
+
     return access_token
 
 
+def _fetch_access_tokens_expiring_between(session: scoped_session[Session]):
+    def fetch(since: int, until: int):
+        rows = (
+            session.query(AccessToken.id)
+            .filter(AccessToken.exp >= since, AccessToken.exp <= until)
+            .all()
+        )
+        return [row.id for row in rows]
+
+    return fetch
+
+
+def sync_access_token_cache_revocations(session: scoped_session[Session], now: int):
+    """Evicts cached tokens that were logged out through other gunicorn workers.
+
+    Cheap to call on every request; only hits the DB once every `ACCESS_TOKEN_REVOCATION_SYNC_SECS`.
+
+    Args:
+        session (sqlalchemy.orm.session): Database session used to read recently expired tokens.
+        now (int): Current epoch timestamp
+    """
+    if not verified_token_cache.needs_sync(now):
+        return
+
+    verified_token_cache.sync_revocations(
+        _fetch_access_tokens_expiring_between(session), now
+    )
+
+
+def verify_signed_access_token(
+    scheme: str, access_token: str, session: scoped_session[Session]
+) -> SignedTokenClaims:
+    """Verifies a signed access token by its signature, expiry and the revocation list. No per-request I/O.
+
+    The session is only used to sync the revocation list once every `ACCESS_TOKEN_REVOCATION_SYNC_SECS`.
+
+    Args:
+        scheme (str): The token scheme. We expect it to match `YC_TOKEN_AUTH_SCHEME`
+        access_token (str): Signed token to verify
+        session (sqlalchemy.orm.session): Database session used to sync revoked tokens.
+
+    Raises:
+        InvalidTokenError: If the signature doesn't match or the token was revoked
+        ExpiredJTIError: If token is expired
+        InvalidTokenSchemeError: If scheme doesn't match `YC_TOKEN_AUTH_SCHEME`
+
+    Returns:
+        SignedTokenClaims: Claims carried by the token
+    """
+    now = get_now_dt()
+    now_ts = int(now.timestamp())
+    if signed_token_revocations.needs_sync(now_ts):
+        signed_token_revocations.sync(
+            _fetch_access_tokens_expiring_between(session), now_ts
+        )
+
+    try:
+        claims = decode_signed_access_token(
+            access_token, access_token_signing_key.get()
+        )
+    # Without a key (eg in opaque mode) no signed token we issued can exist, so it's just an invalid token.
+    except (InvalidSignedTokenError, MissingSigningKeyError):
+        raise InvalidTokenError(None)
+
+    if claims.jti in signed_token_revocations:
+        raise InvalidTokenError(None)
+    elif now_ts >= claims.exp:
+        raise ExpiredJTIError(claims.exp, now)
+    elif scheme != YC_TOKEN_AUTH_SCHEME:
+        raise InvalidTokenSchemeError(scheme)
+
+    return claims
+
+
 def verify_access_token_allowed(
     scheme: str, access_token: str, session: scoped_session[Session]
 ):
-    """Verifies we issued the access token by checking the DB
+    """Verifies we issued the access token by checking the verified token cache, falling back to the DB
 
     Args:
         scheme (str): The token scheme. We expect it to match `YC_TOKEN_AUTH_SCHEME`
@@ -253,16 +419,34 @@ def verify_access_token_allowed(
         InvalidTokenSchemeError: If scheme doesn't match `YC_TOKEN_AUTH_SCHEME`
 
     """
-    token = session.query(AccessToken).filter(AccessToken.id == access_token).first()
+    if is_signed_access_token(access_token):
+        verify_signed_access_token(scheme, access_token, session)
+        return
+
     now = get_now_dt()
+    now_ts = int(now.timestamp())
+    sync_access_token_cache_revocations(session, now_ts)
+
+    cached = verified_token_cache.get(access_token, now_ts)
+    if cached is not None:
+        exp = cached.exp
+    else:
+        token = (
+            session.query(AccessToken).filter(AccessToken.id == access_token).first()
+        )
+        if not token:
+            raise InvalidTokenError(token)
+        exp = token.exp
 
-    if not token:
-        raise InvalidTokenError(token)
-    elif now >= datetime.fromtimestamp(token.exp, timezone.utc):
-        raise ExpiredJTIError(token.exp, now)
+    if now >= datetime.fromtimestamp(exp, timezone.utc):
+        verified_token_cache.invalidate(access_token)
+        raise ExpiredJTIError(exp, now)
     elif scheme != YC_TOKEN_AUTH_SCHEME:
         raise InvalidTokenSchemeError(scheme)
 
+    if cached is None:
+        verified_token_cache.set(access_token, exp=exp, now=now_ts)
+
 
 def validate_access_token(func_to_decorate: Callable):
     """Decorator for validating Flask request has a valid access token in its headers
@@ -280,7 +464,7 @@ def validate_access_token(func_to_decorate: Callable):
         unauthed_resp.status = 401
         try:
             scheme, token = get_access_token_from_headers(request.headers)
-            logger.warning(f"INSPECTING AUTH HEADER: '{scheme}' '{token}'")
+            slog.debug("Inspecting auth header", scheme=scheme, token=token)
             verify_access_token_allowed(scheme, token, db.session)
         except Exception as e:
             log_exception()
@@ -306,22 +490,109 @@ def authenticate_access_token(
         Optional[User]: If the access token was found, returns the user it was issued for.
     """
     _scheme, access_token = get_access_token_from_headers(headers)
+
+    if is_signed_access_token(access_token):
+        try:
+            claims = decode_signed_access_token(
+                access_token, access_token_signing_key.get()
+            )
+        except (InvalidSignedTokenError, MissingSigningKeyError):
+            return None
+        return User(sub=claims.sub, email=claims.email)
+
+    now_ts = int(get_now_dt().timestamp())
+    cached = verified_token_cache.get(access_token, now_ts)
+    if cached is not None and now_ts >= cached.exp:
+        return None
+    if cached is not None and cached.user is not None:
+        return cached.user
+
     token = session.query(AccessToken).filter(AccessToken.id == access_token).first()
     if not token:
         return None
     user = session.query(User).filter(User.sub == token.user).first()
+    if user is not None:
+        verified_token_cache.set_user(access_token, user)
+    return user
+
+
+def check_access_token(headers: Dict, session: scoped_session[Session]) -> User:
+    """Verifies the access token in `headers` and resolves the user it was issued for in one step.
+
+    Purpose-built for the nginx `auth_request` subrequest, which is our hottest path. Unlike the
+    `@validate_access_token` + `authenticate_access_token` combo, a cache miss costs a single joined query
+    and a cache hit costs none.
+
+    Args:
+        headers (Dict): Request headers
+        session (sqlalchemy.orm.session): Database session used to read persisted token and user data.
+
+    Raises:
+        InvalidTokenError: If no token was supplied or we never issued it
+        InvalidTokenSchemeError: If scheme doesn't match `YC_TOKEN_AUTH_SCHEME`
+        ExpiredJTIError: If token is expired
+
+    Returns:
+        User: The user the access token was issued for.
+    """
+    scheme, access_token = get_access_token_from_headers(headers)
+    if scheme != YC_TOKEN_AUTH_SCHEME:
+        raise InvalidTokenSchemeError(scheme)
+
+    if is_signed_access_token(access_token):
+        claims = verify_signed_access_token(scheme, access_token, session)
+        return User(sub=claims.sub, email=claims.email)
+
+    now = get_now_dt()
+    now_ts = int(now.timestamp())
+    sync_access_token_cache_revocations(session, now_ts)
+
+    cached = verified_token_cache.get(access_token, now_ts)
+    if cached is not None and now_ts >= cached.exp:
+        raise ExpiredJTIError(cached.exp, now)
+    if cached is not None and cached.user is not None:
+        return cached.user
+
+    row = (
+        session.query(AccessToken, User)
+        .join(User, User.sub == AccessToken.user)
+        .filter(AccessToken.id == access_token)
+        .first()
+    )
+    if not row:
+        raise InvalidTokenError(None)
+
+    token, user = row
+    if now_ts >= token.exp:
+        raise ExpiredJTIError(token.exp, now)
+
+    verified_token_cache.set(access_token, exp=token.exp, user=user, now=now_ts)
     return user
 
 
 def invalidate_access_token(headers: Dict, session: scoped_session[Session]):
     """Expires the access token found in the headers.
 
+    Evicts the token from this worker's verified token cache (or adds a signed token to this worker's
+    revocation list) immediately. Other workers pick up the new `exp` on their next revocation sync.
+
     Args:
         headers (Dict): Request headers
         session (sqlalchemy.orm.session): Database session for persisting token expiration.
     """
     _, token = get_access_token_from_headers(headers)
-    access_token = session.query(AccessToken).filter(AccessToken.id == token).first()
+    verified_token_cache.invalidate(token)
+
+    row_id = token
+    if is_signed_access_token(token):
+        try:
+            claims = decode_signed_access_token(token, access_token_signing_key.get())
+        except (InvalidSignedTokenError, MissingSigningKeyError):
+            return
+        signed_token_revocations.add(claims.jti, int(get_now_dt().timestamp()))
+        row_id = signed_token_row_id(claims)
+
+    access_token = session.query(AccessToken).filter(AccessToken.id == row_id).first()
     if access_token is not None:
         access_token.exp = int(get_now_dt().timestamp())
     session.commit()
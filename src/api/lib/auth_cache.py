@@ -0,0 +1,150 @@
+"""In-process cache of verified access tokens.
+
+Every request proxied through nginx's docker-socket location fires an
+`auth_request` subrequest at us, so token verification is by far our hottest
+path. This cache lets `verify_access_token_allowed` and
+`authenticate_access_token` skip the DB for tokens we've already verified.
+
+Entries live for at most `ttl` seconds. A token that expires while cached stays
+cached until then, so callers must check `CachedToken.exp` on every hit. That
+way, repeated requests with an expired token are rejected without a DB lookup.
+
+Cross-worker invalidation: each gunicorn worker has its own cache, so a logout
+handled by worker A must still evict the token from workers B and C. Logging
+out rewrites `AccessToken.exp` to "now" (see `invalidate_access_token`), so
+every `sync_interval` seconds each worker asks the DB for tokens whose `exp`
+landed since its last sync and evicts them. That is one cheap query per worker
+every few seconds instead of 2-3 queries per request, with staleness bounded
+by `sync_interval`.
+"""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+from src.api.models import User
+
+
+@dataclass
+class CachedToken:
+    """A verified access token and, once resolved, the user it was issued for.
+
+    `user` is a transient (session-less) copy so it stays usable after the
+    request's DB session has been torn down. `expires_at` is when the entry
+    leaves the cache, which may be after the token's own `exp`.
+    """
+
+    exp: int
+    expires_at: float
+    user: Optional[User] = None
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of verified access tokens with per-entry expiry.
+
+    All times are epoch seconds as returned by `now_fn` so they compare
+    directly against `AccessToken.exp`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        sync_interval: float,
+        now_fn: Callable[[], float] = time.time,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._now_fn = now_fn
+        self._store: "OrderedDict[str, CachedToken]" = OrderedDict()
+        self._last_sync: float = now_fn()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def get(
+        self, access_token: str, now: Optional[float] = None
+    ) -> Optional[CachedToken]:
+        now = self._now_fn() if now is None else now
+        entry = self._store.get(access_token)
+        if entry is None:
+            self.misses += 1
+            return None
+        if now >= entry.expires_at:
+            del self._store[access_token]
+            self.misses += 1
+            return None
+
+        self._store.move_to_end(access_token)
+        self.hits += 1
+        return entry
+
+    def set(
+        self,
+        access_token: str,
+        exp: int,
+        user: Optional[User] = None,
+        now: Optional[float] = None,
+    ) -> None:
+        now = self._now_fn() if now is None else now
+        if exp <= now:
+            return
+
+        if user is not None:
+            user = User(sub=user.sub, email=user.email)
+
+        self._store.pop(access_token, None)
+        self._store[access_token] = CachedToken(
+            exp=exp, expires_at=now + self.ttl, user=user
+        )
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+
+    def set_user(self, access_token: str, user: User) -> None:
+        """Attach the resolved user to an already cached token, if present."""
+        entry = self._store.get(access_token)
+        if entry is not None:
+            entry.user = User(sub=user.sub, email=user.email)
+
+    def invalidate(self, access_token: str) -> None:
+        self._store.pop(access_token, None)
+
+    def invalidate_many(self, access_tokens: Iterable[str]) -> None:
+        for access_token in access_tokens:
+            self._store.pop(access_token, None)
+
+    def clear(self) -> None:
+        self._store.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def needs_sync(self, now: Optional[float] = None) -> bool:
+        now = self._now_fn() if now is None else now
+        return now - self._last_sync >= self.sync_interval
+
+    def sync_revocations(
+        self,
+        fetch_revoked_since: Callable[[int, int], Iterable[str]],
+        now: Optional[float] = None,
+    ) -> None:
+        """Evicts tokens that other workers invalidated since our last sync.
+
+        Args:
+            fetch_revoked_since (Callable[[int, int], Iterable[str]]): Given `(since, until)` epoch seconds,
+                returns the ids of tokens whose `exp` falls within that window.
+        """
+        now = self._now_fn() if now is None else now
+        if not self._store:
+            # Nothing to evict. Still advance the watermark so the next sync window stays small.
+            self._last_sync = now
+            return
+
+        # Overlap by a second so a logout committed in the same second as our last sync isn't missed.
+        since = int(self._last_sync) - 1
+        self.invalidate_many(fetch_revoked_since(since, int(now)))
+        self._last_sync = now
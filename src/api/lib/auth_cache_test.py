@@ -0,0 +1,82 @@
+import pytest  # type: ignore
+
+from src.api.lib.auth_cache import VerifiedTokenCache
+from src.api.models import User
+
+
+@pytest.fixture
+def cache() -> VerifiedTokenCache:
+    return VerifiedTokenCache(maxsize=2, ttl=60, sync_interval=5, now_fn=lambda: 1000.0)
+
+
+class TestVerifiedTokenCache:
+    def test_miss_on_unknown_token(self, cache):
+        assert cache.get("nope", now=1000) is None
+        assert cache.misses == 1
+
+    def test_hit_after_set(self, cache):
+        cache.set("tok", exp=2000, now=1000)
+        entry = cache.get("tok", now=1001)
+        assert entry is not None and entry.exp == 2000
+        assert cache.hits == 1
+
+    def test_entry_capped_at_ttl(self, cache):
+        cache.set("tok", exp=5000, now=1000)
+        assert cache.get("tok", now=1059) is not None
+        assert cache.get("tok", now=1060) is None
+
+    def test_entry_outlives_token_exp_until_ttl(self, cache):
+        cache.set("tok", exp=1010, now=1000)
+        entry = cache.get("tok", now=1010)
+        assert entry is not None and entry.exp == 1010
+        assert cache.get("tok", now=1060) is None
+
+    def test_already_expired_token_is_not_cached(self, cache):
+        cache.set("tok", exp=999, now=1000)
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used(self, cache):
+        cache.set("a", exp=2000, now=1000)
+        cache.set("b", exp=2000, now=1000)
+        cache.get("a", now=1000)  # "b" is now the least recently used
+        cache.set("c", exp=2000, now=1000)
+        assert cache.get("a", now=1000) is not None
+        assert cache.get("b", now=1000) is None
+        assert cache.get("c", now=1000) is not None
+
+    def test_user_is_detached_copy(self, cache):
+        user = User(sub="sub", email="a@b.c")
+        cache.set("tok", exp=2000, user=user, now=1000)
+        cached_user = cache.get("tok", now=1000).user
+        assert cached_user is not user
+        assert (cached_user.sub, cached_user.email) == ("sub", "a@b.c")
+
+    def test_invalidate(self, cache):
+        cache.set("tok", exp=2000, now=1000)
+        cache.invalidate("tok")
+        assert cache.get("tok", now=1000) is None
+
+    def test_sync_revocations_evicts_revoked_tokens(self, cache):
+        cache.set("a", exp=2000, now=1000)
+        cache.set("b", exp=2000, now=1000)
+        windows = []
+
+        def fetch(since, until):
+            windows.append((since, until))
+            return ["a"]
+
+        assert cache.needs_sync(now=1004) is False
+        assert cache.needs_sync(now=1005) is True
+        cache.sync_revocations(fetch, now=1005)
+
+        assert windows == [(999, 1005)]
+        assert cache.get("a", now=1005) is None
+        assert cache.get("b", now=1005) is not None
+        assert cache.needs_sync(now=1006) is False
+
+    def test_sync_revocations_skips_fetch_when_empty(self, cache):
+        def fetch(since, until):
+            pytest.fail("Should not query for revocations with nothing cached!")
+
+        cache.sync_revocations(fetch, now=1005)
+        assert cache.needs_sync(now=1006) is False
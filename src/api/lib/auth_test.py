@@ -1,4 +1,5 @@
 from datetime import datetime, timezone
+from pathlib import Path
 from uuid import uuid4
 from unittest import mock
 
@@ -16,20 +17,34 @@ from src.api.lib.auth import (
     TimeTravelerError,
     UnknownUserError,
     _pick_cors_origin,
+    authenticate_access_token,
+    check_access_token,
     generate_access_token,
     deserialize_id_token,
     generate_access_token_if_valid,
     get_access_token_from_headers,
     get_auth_string_from_websocket_request,
+    invalidate_access_token,
     prepare_response,
     validate_access_token,
+    signed_token_revocations,
     verify_access_token_allowed,
+    verified_token_cache,
 )
-from src.api.models import JTI, AccessToken
+from src.api.lib.signed_tokens import MissingSigningKeyError, sign_access_token
+from src.api.models import JTI, AccessToken, User
 
 from src.common.logger_setup import logger
 
 
+@pytest.fixture(autouse=True)
+def clear_verified_token_cache():
+    """The verified token cache is module level, so don't let tokens cached by one test leak into the next."""
+    verified_token_cache.clear()
+    yield
+    verified_token_cache.clear()
+
+
 @pytest.fixture
 def jti():
     return uuid4().hex
@@ -370,6 +385,221 @@ class TestAuth:
                 f"Got an exception when not expected! Got a '{type(e).__name__}'"
             )
 
+    def test__verify_access_token_allowed__cached_skips_db(
+        self, mocker: MockerFixture, expected_scheme, expected_token, exp
+    ):
+        """Once a token has been verified, subsequent verifications should not query the DB."""
+        # SETUP
+        mocker.patch(
+            "src.api.lib.auth.get_now_dt",
+            return_value=datetime.fromtimestamp(exp - 1, timezone.utc),
+        )
+
+        session = UnifiedAlchemyMagicMock(
+            data=[
+                (
+                    [
+                        mock.call.query(AccessToken),
+                        mock.call.filter(AccessToken.id == expected_token),
+                    ],
+                    [AccessToken(id=expected_token, exp=exp)],
+                )
+            ]
+        )
+        verify_access_token_allowed(expected_scheme, expected_token, session)
+        session.reset_mock()
+
+        # EXECUTE
+        verify_access_token_allowed(expected_scheme, expected_token, session)
+
+        # ASSERT
+        session.query.assert_not_called()
+
+    def test__verify_access_token_allowed__cached_still_expires(
+        self, mocker: MockerFixture, expected_scheme, expected_token, exp
+    ):
+        """A cached token must still be rejected, without a DB lookup, once its own `exp` has passed."""
+        # SETUP
+        now_dt = mocker.patch(
+            "src.api.lib.auth.get_now_dt",
+            return_value=datetime.fromtimestamp(exp - 1, timezone.utc),
+        )
+        session = UnifiedAlchemyMagicMock(
+            data=[
+                (
+                    [
+                        mock.call.query(AccessToken),
+                        mock.call.filter(AccessToken.id == expected_token),
+                    ],
+                    [AccessToken(id=expected_token, exp=exp)],
+                )
+            ]
+        )
+        verify_access_token_allowed(expected_scheme, expected_token, session)
+        session.reset_mock()
+        now_dt.return_value = datetime.fromtimestamp(exp + 1, timezone.utc)
+
+        with pytest.raises(ExpiredJTIError):
+            # EXECUTE
+            verify_access_token_allowed(expected_scheme, expected_token, session)
+
+        # ASSERT
+        session.query.assert_not_called()
+
+    def test__check_access_token__success(
+        self, mocker: MockerFixture, expected_scheme, expected_token, exp, sub, email
+    ):
+        """Token and user should be resolved with a single joined query."""
+        # SETUP
+        mocker.patch(
+            "src.api.lib.auth.get_now_dt",
+            return_value=datetime.fromtimestamp(exp - 1, timezone.utc),
+        )
+        session = UnifiedAlchemyMagicMock(
+            data=[
+                (
+                    [
+                        mock.call.query(AccessToken, User),
+                        mock.call.filter(AccessToken.id == expected_token),
+                    ],
+                    [
+                        (
+                            AccessToken(id=expected_token, exp=exp, user=sub),
+                            User(sub=sub, email=email),
+                        )
+                    ],
+                )
+            ]
+        )
+
+        # EXECUTE
+        user = check_access_token(
+            {"Authorization": f"{expected_scheme} {expected_token}"}, session
+        )
+
+        # ASSERT
+        assert user.sub == sub, f"Expected to resolve user '{sub}'!"
+        assert session.query.call_count == 1, "Expected exactly one query!"
+
+    def test__check_access_token__cached_skips_db(
+        self, mocker: MockerFixture, expected_scheme, expected_token, exp, sub, email
+    ):
+        # SETUP
+        mocker.patch(
+            "src.api.lib.auth.get_now_dt",
+            return_value=datetime.fromtimestamp(exp - 1, timezone.utc),
+        )
+        verified_token_cache.set(
+            expected_token, exp=exp, user=User(sub=sub, email=email), now=exp - 2
+        )
+        session = UnifiedAlchemyMagicMock()
+
+        # EXECUTE
+        user = check_access_token(
+            {"Authorization": f"{expected_scheme} {expected_token}"}, session
+        )
+
+        # ASSERT
+        assert user.sub == sub, f"Expected to resolve user '{sub}'!"
+        session.query.assert_not_called()
+
+    def test__check_access_token__invalid_token_error(
+        self, expected_scheme, expected_token
+    ):
+        with pytest.raises(InvalidTokenError):
+            # EXECUTE
+            # ASSERT
+            check_access_token(
+                {"Authorization": f"{expected_scheme} {expected_token}"},
+                UnifiedAlchemyMagicMock(),
+            )
+
+    def test__check_access_token__invalid_token_scheme_error(
+        self, unexpected_scheme, expected_token
+    ):
+        with pytest.raises(InvalidTokenSchemeError):
+            # EXECUTE
+            # ASSERT
+            check_access_token(
+                {"Authorization": f"{unexpected_scheme} {expected_token}"},
+                UnifiedAlchemyMagicMock(),
+            )
+
+    def test__verify_access_token_allowed__signed_token_skips_db(
+        self, mocker: MockerFixture, expected_scheme, exp, sub, email
+    ):
+        """Signed tokens should verify by signature alone."""
+        # SETUP
+        key = b"a-test-signing-key"
+        mocker.patch(
+            "src.api.lib.auth.access_token_signing_key.get", return_value=key
+        )
+        mocker.patch(
+            "src.api.lib.auth.signed_token_revocations.needs_sync", return_value=False
+        )
+        mocker.patch(
+            "src.api.lib.auth.get_now_dt",
+            return_value=datetime.fromtimestamp(exp - 1, timezone.utc),
+        )
+        token, _ = sign_access_token(sub, email, exp, key)
+        session = UnifiedAlchemyMagicMock()
+
+        # EXECUTE
+        verify_access_token_allowed(expected_scheme, token, session)
+
+        # ASSERT
+        session.query.assert_not_called()
+
+    def test__verify_access_token_allowed__revoked_signed_token(
+        self, mocker: MockerFixture, expected_scheme, exp, sub, email
+    ):
+        # SETUP
+        key = b"a-test-signing-key"
+        mocker.patch(
+            "src.api.lib.auth.access_token_signing_key.get", return_value=key
+        )
+        mocker.patch(
+            "src.api.lib.auth.signed_token_revocations.needs_sync", return_value=False
+        )
+        mocker.patch(
+            "src.api.lib.auth.get_now_dt",
+            return_value=datetime.fromtimestamp(exp - 1, timezone.utc),
+        )
+        token, claims = sign_access_token(sub, email, exp, key)
+        signed_token_revocations.add(claims.jti, exp - 2)
+
+        with pytest.raises(InvalidTokenError):
+            # EXECUTE
+            # ASSERT
+            verify_access_token_allowed(
+                expected_scheme, token, UnifiedAlchemyMagicMock()
+            )
+
+    def test__signed_token_without_signing_key_is_invalid(
+        self, mocker: MockerFixture, expected_scheme, exp, sub, email
+    ):
+        """In opaque mode there's no key file, so a `yc1.` token must be a 401 rather than a 500."""
+        # SETUP
+        token, _ = sign_access_token(sub, email, exp, b"a-test-signing-key")
+        mocker.patch(
+            "src.api.lib.auth.access_token_signing_key.get",
+            side_effect=MissingSigningKeyError(Path("missing.key")),
+        )
+        mocker.patch(
+            "src.api.lib.auth.signed_token_revocations.needs_sync", return_value=False
+        )
+        headers = {"Authorization": f"{expected_scheme} {token}"}
+        session = UnifiedAlchemyMagicMock()
+
+        # EXECUTE
+        with pytest.raises(InvalidTokenError):
+            verify_access_token_allowed(expected_scheme, token, session)
+        user = authenticate_access_token(headers, session)
+        invalidate_access_token(headers, session)
+
+        # ASSERT
+        assert user is None
+
     def test__validate_access_token__unauthorized(
         self, mocker: MockerFixture, expected_token, now
     ):
@@ -3,14 +3,25 @@ import time
 import shutil
 
 from pathlib import Path
-from typing import Dict, List, Optional
-from pprint import pformat
+from typing import Dict, Iterator, List, Optional, Tuple
 from unittest.mock import Mock
 
 from docker import DockerClient
 
-from src.api.constants import BACKUP_CONTENT_ROOT
+from src.api.constants import BACKUP_CONTENT_ROOT, RESTIC_PROGRESS_FPS
 from src.api.lib.docker_management import DockerManagement
+from src.api.lib import structured_logging as slog
+from src.api.lib.restic_progress import StatusListener, run_with_progress
+from src.api.lib.restic_worker import (
+    RESTIC_IMAGE,
+    ResticError,
+    ResticWorker,
+    restic_environment,
+    restic_volumes,
+)
+from src.api.lib.snapshot_catalog import SnapshotCatalog, snapshot_timestamp
+from src.api.lib.snapshot_worlds import SnapshotWorldsCache, worlds_in_listing
+from src.common.helpers import log_exception
 from src.common.logger_setup import logger
 from src.common.environment import Env
 from src.common.constants import (
@@ -29,42 +40,114 @@ from src.api.lib import (
     RestoreAlreadyInProgressError,
 )
 
+# Matches `mc_backups_sidecar_template` in the docker compose template.
+SCHEDULED_BACKUP_RETENTION = (
+    "--keep-last 24 --keep-daily 14 --keep-weekly 8 --keep-monthly 24 --keep-yearly 666"
+)
+
 
 class BackupManagement:
     docker_management: DockerManagement
     docker_client = DockerClient
 
-    def __init__(self, docker_management: Optional[DockerManagement] = None):
+    def __init__(
+        self,
+        docker_management: Optional[DockerManagement] = None,
+        restic_worker: Optional[ResticWorker] = None,
+        snapshot_catalog: Optional[SnapshotCatalog] = None,
+        snapshot_worlds_cache: Optional[SnapshotWorldsCache] = None,
+    ):
         self.docker_management = (
             docker_management if docker_management is not None else DockerManagement()
         )
         self.docker_client = self.docker_management.client
+        self.restic_worker = restic_worker
+        self.snapshot_catalog = snapshot_catalog
+        self.snapshot_worlds_cache = snapshot_worlds_cache
 
-    def call_restic(self, command: str, override_args: Optional[Dict] = None) -> str:
+    def call_restic(
+        self,
+        command: str,
+        override_args: Optional[Dict] = None,
+        progress: Optional[StatusListener] = None,
+    ) -> str:
+        """Runs `restic <command>` against the backup repository
+
+        Goes through `restic_worker` when there is one, unless `override_args` or `progress` are given: those need
+        their own container, eg to mount the world files a restore writes to.
+
+        Args:
+            command (str): restic arguments
+            override_args (Optional[Dict]): Extra `containers.run()` arguments, merged with the defaults
+            progress (Optional[StatusListener]): Called with each status message while restic runs. `command`
+                must include `--json`.
+        """
+        if self.restic_worker is not None and not override_args and progress is None:
+            try:
+                return self.restic_worker.run(command)
+            except ResticError:
+                raise
+            except Exception:
+                log_exception(
+                    message="Restic worker failed! Falling back to a one-off container.",
+                    data={"command": command},
+                )
+
+        return self._run_restic_container(command, override_args, progress)
+
+    def stream_restic(self, command: str) -> Iterator[str]:
+        """Like `call_restic()`, but yields restic's output line by line, as it arrives when going through `restic_worker`"""
+        if self.restic_worker is not None:
+            started = False
+            try:
+                for line in self.restic_worker.stream(command):
+                    started = True
+                    yield line
+                return
+            except ResticError:
+                raise
+            except Exception:
+                if started:
+                    raise
+                log_exception(
+                    message="Restic worker failed! Falling back to a one-off container.",
+                    data={"command": command},
+                )
+
+        yield from self._run_restic_container(command).splitlines()
+
+    def _run_restic_container(
+        self,
+        command: str,
+        override_args: Optional[Dict] = None,
+        progress: Optional[StatusListener] = None,
+    ) -> str:
         override_args = override_args if override_args is not None else {}
+        progress_environment = (
+            {"RESTIC_PROGRESS_FPS": str(RESTIC_PROGRESS_FPS)}
+            if progress is not None
+            else {}
+        )
 
         params = {
-            "image": "restic/restic",
+            "image": RESTIC_IMAGE,
             "command": command,
+            "remove": True,
             **override_args,
             "environment": {
-                "RESTIC_REPOSITORY": "/backups",
-                "RESTIC_PASSWORD_FILE": "/restic.password",
+                **restic_environment(),
+                **progress_environment,
                 **(override_args.get("environment", {})),
             },
             "volumes": {
-                str(RESTIC_REPO_PATH): {
-                    "bind": "/backups",
-                    "mode": "rw",
-                },
-                str(server_paths.get_restic_password_file_path()): {
-                    "bind": "/restic.password",
-                    "mode": "ro",
-                },
+                **restic_volumes(),
                 **(override_args.get("volumes", {})),
             },
         }
 
+        if progress is not None:
+            return run_with_progress(self.docker_client, progress, **params)
+
         out = self.docker_client.containers.run(**params)
         if isinstance(out, bytes):
             out = out.decode("utf-8")
@@ -72,23 +155,77 @@ class BackupManagement:
         return out
 
     def list_backups_by_env_and_tags(self, env: Env, tags: List[str]) -> List[Backup]:
-        tags.append(env.name)
-        tags_str = f"--tag {','.join(tags)}"
+        return self.list_backups_page(env, tags)[0]
+
+    def list_backups_page(
+        self,
+        env: Env,
+        tags: List[str],
+        world_group: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Backup], int]:
+        """Lists backups of `env` carrying every tag in `tags`, oldest first
 
-        response_as_json = self.call_restic(f"snapshots --json {tags_str}")
+        Served from `snapshot_catalog` once it has been reconciled, otherwise from `restic snapshots`.
+
+        Args:
+            env (Env): Env the backups were taken in
+            tags (List[str]): Backups must have all of these
+            world_group (Optional[str]): Only backups of this world group
+            since (Optional[float]): Only backups taken at or after this epoch timestamp
+            until (Optional[float]): Only backups taken before this epoch timestamp
+            limit (Optional[int]): Max backups returned. All of them if None.
+            offset (int): Matching backups skipped before the first one returned
+
+        Returns:
+            Tuple[List[Backup], int]: The page of backups, and the total number matching
+        """
+        tags = [*tags, env.name]
+        hostname = (
+            MC_DOCKER_CONTAINER_NAME_FMT.format(env=env.name, name=world_group)
+            if world_group is not None
+            else None
+        )
+
+        if self.snapshot_catalog is not None and self.snapshot_catalog.ready:
+            return self.snapshot_catalog.query(
+                tags,
+                hostname=hostname,
+                since=since,
+                until=until,
+                limit=limit,
+                offset=offset,
+            )
+
+        args = f"--tag {','.join(tags)}"
+        if hostname is not None:
+            args += f" --host {hostname}"
+        response_as_json = self.call_restic(f"snapshots --json {args}")
 
         if isinstance(response_as_json, bytes):
             response_as_json = response_as_json.decode("utf-8")
 
-        logger.info("RESPONSE FROM RESTIC SNAPSHOTS")
-        logger.info(pformat({"msg": "pre", "backups": response_as_json}))
+        slog.debug("Response from restic snapshots", backups=response_as_json)
 
         backups = json.loads(response_as_json)
         backups = list(map(lambda b: Backup(**b), backups))
 
-        logger.info(pformat({"msg": "post", "backups": backups}))
+        slog.debug("Parsed restic snapshots", count=len(backups))
+
+        if since is not None or until is not None:
+            backups = [
+                b
+                for b in backups
+                if (since is None or snapshot_timestamp(b.time) >= since)
+                and (until is None or snapshot_timestamp(b.time) < until)
+            ]
+        total = len(backups)
+        end = offset + limit if limit is not None else None
 
-        return backups
+        return backups[offset:end], total
 
     def get_worlds_backed_up_in_snapshot(self, target_id: str):
         """Given a Restic snapshot id, gets the list of worlds that were backed up in that snapshot.
@@ -103,42 +240,46 @@ class BackupManagement:
         will be calculated as having the "lobby" and "lobby_nether" worlds in the snapshot as those are the directories
         at the first depth after the root (`/worlds-bindmount`)
 
+        Snapshots are immutable, so the result is cached forever in `snapshot_worlds_cache` when there is one.
+
         Args:
             target_id (str): Restic snapshot id
 
         Returns:
-            _type_: _description_
+            List[str]: Sorted world names
         """
-        worlds = set()
-
-        response_as_json = self.call_restic(
-            f"ls {target_id} {BACKUP_CONTENT_ROOT} --json "
+        cache = self.snapshot_worlds_cache
+        if cache is not None:
+            worlds = cache.get(target_id)
+            if worlds is not None:
+                return worlds
+
+        # Without `--recursive`, restic only lists the direct children of `BACKUP_CONTENT_ROOT`. The output
+        # contains both the snapshot and file objects.
+        worlds = worlds_in_listing(
+            self.stream_restic(f"ls {target_id} {BACKUP_CONTENT_ROOT} --json"),
+            BACKUP_CONTENT_ROOT,
         )
-        # The output contains both the snapshot and file objects.
-        for line in response_as_json.splitlines():
-            d = json.loads(line)
-            name = d.get("name")
-            path = d.get("path")
-
-            if path == BACKUP_CONTENT_ROOT:
-                # Output contains the root dir as a file object.
-                # If the object
-                continue
 
-            if name is not None:
-                # We only want file objects.
-                # Only file objects have the "name" field.
-                worlds.add(name)
+        if cache is not None:
+            cache.put(target_id, worlds)
+        return worlds
 
-        return sorted(list(worlds))
-
-    def backup_minecraft(self, env: Env, world_group: str):
+    def backup_minecraft(
+        self,
+        env: Env,
+        world_group: str,
+        progress: Optional[StatusListener] = None,
+        scheduled: bool = False,
+    ):
         """Performs an ad-hoc backup of `world_group` in env `env`
 
         Args:
             env (Env): Target env to restore to
             world_group (str): The world to restore to, as referenced in world groups
-            target_id (str): The restic backup id to restore from
+            progress (Optional[StatusListener]): Called with restic's status messages while the backup runs
+            scheduled (bool): Back up on behalf of `BackupScheduler`, with the tags and retention the per world group
+                backup sidecars use, instead of as an ad-hoc backup
         """
 
         mc_container_name = MC_DOCKER_CONTAINER_NAME_FMT.format(
@@ -152,7 +293,8 @@ class BackupManagement:
 
         mc_container_up = self.docker_management.is_container_up(mc_container_name)
         entrypoint_command = (
-            "/usr/bin/backup now"  # Performs rcon save-off/save-on
+            # Performs rcon save-off/save-on. Unlike mc-backup's `backup now`, honours RESTIC_ADDITIONAL_BACKUP_ARGS.
+            "bash /restic.sh backup_now"
             if mc_container_up
             else "bash /restic.sh backup"  # Just performs the restic command directly
         )
@@ -162,7 +304,15 @@ class BackupManagement:
             f"Backing up container for '{env.name}' '{world_group}' using '{backup_container_name}'"
         )
         logger.info(underscored_env_alias)
-        out = self.docker_client.containers.run(
+        progress_environment = (
+            {
+                "RESTIC_ADDITIONAL_BACKUP_ARGS": "--json",
+                "RESTIC_PROGRESS_FPS": str(RESTIC_PROGRESS_FPS),
+            }
+            if progress is not None
+            else {}
+        )
+        run_kwargs = dict(
             name=backup_container_name,
             image="yukkuricraft/mc-backup-restic",
             remove=True,
@@ -174,13 +324,22 @@ class BackupManagement:
                 "SRC_DIR": BACKUP_CONTENT_ROOT,
                 "RESTIC_REPOSITORY": "/backups",
                 "RESTIC_PASSWORD_FILE": "/restic.password",
-                "RESTIC_ADDITIONAL_TAGS": f"{env.name} adhoc {underscored_env_alias}",
+                "RESTIC_ADDITIONAL_TAGS": (
+                    env.name
+                    if scheduled
+                    else f"{env.name} adhoc {underscored_env_alias}"
+                ),
                 "ENTRYPOINT_TARGET": entrypoint_command,
                 "RESTIC_HOSTNAME": mc_container_name,
                 "RCON_HOST": mc_container_name,
                 "RCON_PASSWORD_FILE": "/rcon.password",
                 "PRUNE_BACKUPS_DAYS": "7",
-                "PRUNE_RESTIC_RETENTION": "--keep-last 8 --keep-daily 7 --keep-weekly 8 --keep-monthly 24 --keep-yearly 666",
+                "PRUNE_RESTIC_RETENTION": (
+                    SCHEDULED_BACKUP_RETENTION
+                    if scheduled
+                    else "--keep-last 8 --keep-daily 7 --keep-weekly 8 --keep-monthly 24 --keep-yearly 666"
+                ),
+                **progress_environment,
             },
             volumes=[
                 # Use explicit volumes instead of volumes_from as the target container name may not be up if compose cluster is down.
@@ -192,9 +351,24 @@ class BackupManagement:
             network=(f"{env.name}_ycnet" if mc_container_up else ""),
         )
 
+        if progress is not None:
+            out = run_with_progress(self.docker_client, progress, **run_kwargs)
+        else:
+            out = self.docker_client.containers.run(**run_kwargs)
+
         if isinstance(out, bytes):
             out = out.decode("utf-8")
 
+        if self.snapshot_catalog is not None:
+            try:
+                self.snapshot_catalog.refresh(mc_container_name)
+            except Exception:
+                # The next reconcile picks the new snapshot up anyway.
+                log_exception(
+                    message="Failed to refresh snapshot catalog after backup!",
+                    data={"hostname": mc_container_name},
+                )
+
         return out
 
     def archive_directory(
@@ -314,6 +488,7 @@ class BackupManagement:
         target_id: str,
         worlds: List[str],
         bypass_running_container_restriction: bool,
+        progress: Optional[StatusListener] = None,
     ):
         """Restores the `target_id` backup to `world_group` in env `env`
 
@@ -321,6 +496,7 @@ class BackupManagement:
             env (Env): Target env to restore to
             world_group (str): The world to restore to, as referenced in world groups
             target_id (str): The restic backup id to restore from
+            progress (Optional[StatusListener]): Called with restic's status messages while the restore runs
         """
 
         container_name = MC_DOCKER_CONTAINER_NAME_FMT.format(
@@ -347,8 +523,11 @@ class BackupManagement:
             world_files_dir,
         )
 
+        command = self.build_restore_minecraft_restic_command(target_id, worlds)
+        if progress is not None:
+            command += " --json"
         out = self.call_restic(
-            self.build_restore_minecraft_restic_command(target_id, worlds),
+            command,
             {
                 "volumes": {
                     str(world_files_dir): {
@@ -357,6 +536,7 @@ class BackupManagement:
                     },
                 }
             },
+            progress=progress,
         )
 
         logger.info(out)
@@ -12,6 +12,7 @@ from src.api.lib import (
     RestoreAlreadyInProgressError,
 )
 from src.api.lib.backup_management import BackupManagement
+from src.common.constants import MC_DOCKER_CONTAINER_NAME_FMT
 from src.common.environment import Env  # type: ignore
 
 
@@ -148,6 +149,37 @@ class TestBackupManagement:
             call_kwargs["environment"][expected_field2] == expected_val2
         ), "Expected override arg to be merged with default arg vals when passed to .run()!"
 
+    def test__call_restic__uses_restic_worker(
+        self, mocker: MockerFixture, backup_mgmt: BackupManagement, restic_command: str
+    ):
+        # SETUP
+        backup_mgmt.restic_worker = mocker.MagicMock()
+        backup_mgmt.restic_worker.run.return_value = "[]"
+
+        # EXECUTE
+        out = backup_mgmt.call_restic(restic_command)
+
+        # ASSERT
+        assert out == "[]"
+        backup_mgmt.restic_worker.run.assert_called_once_with(restic_command)
+        backup_mgmt.docker_client.containers.run.assert_not_called()
+
+    def test__call_restic__falls_back_when_restic_worker_unavailable(
+        self, mocker: MockerFixture, backup_mgmt: BackupManagement, restic_command: str
+    ):
+        # SETUP
+        backup_mgmt.restic_worker = mocker.MagicMock()
+        backup_mgmt.restic_worker.run.side_effect = RuntimeError("image pull failed")
+
+        # EXECUTE
+        out = backup_mgmt.call_restic(restic_command)
+
+        # ASSERT
+        assert out == "[]"
+        call_kwargs = backup_mgmt.docker_client.containers.run.call_args.kwargs
+        assert call_kwargs["command"] == restic_command
+        assert call_kwargs["remove"] is True
+
     def test__list_backups_by_env_and_tags__pydantic_validation_error(
         self,
         backup_mgmt: BackupManagement,
@@ -231,8 +263,8 @@ class TestBackupManagement:
             "environment"
         ]
         assert (
-            "/usr/bin/backup" in env_vars["ENTRYPOINT_TARGET"]
-        ), "Expected ENTRYPOINT_TARGET to call '/usr/bin/backup' if mc container is up!"
+            env_vars["ENTRYPOINT_TARGET"] == "bash /restic.sh backup_now"
+        ), "Expected ENTRYPOINT_TARGET to call 'bash /restic.sh backup_now' if mc container is up!"
 
     def test__backup_minecraft__backup_entrypoint_command_if_container_down(
         self, backup_mgmt: BackupManagement, env1_object: Env, world_group: str
@@ -534,3 +566,177 @@ class TestBackupManagement:
 
         # ASSERT
         backup_mgmt.docker_client.containers.run.assert_called_once()
+
+    def test__list_backups_by_env_and_tags__does_not_mutate_tags(
+        self,
+        backup_mgmt: BackupManagement,
+        env1_object: Env,
+        restic_tags_list: List[str],
+    ):
+        # EXECUTE
+        backup_mgmt.list_backups_by_env_and_tags(env=env1_object, tags=restic_tags_list)
+        backup_mgmt.list_backups_by_env_and_tags(env=env1_object, tags=restic_tags_list)
+
+        # ASSERT
+        assert restic_tags_list == ["tag1", "tag2"]
+        call_kwargs = backup_mgmt.docker_client.containers.run.call_args.kwargs
+        assert call_kwargs["command"] == "snapshots --json --tag tag1,tag2,env1"
+
+    def test__list_backups_page__uses_snapshot_catalog_once_ready(
+        self,
+        mocker: MockerFixture,
+        backup_mgmt: BackupManagement,
+        env1_object: Env,
+        restic_backup_obj,
+    ):
+        # SETUP
+        backup_mgmt.snapshot_catalog = mocker.MagicMock()
+        backup_mgmt.snapshot_catalog.ready = True
+        backup_mgmt.snapshot_catalog.query.return_value = (
+            [Backup(**restic_backup_obj)],
+            12,
+        )
+
+        # EXECUTE
+        result = backup_mgmt.list_backups_page(
+            env1_object, ["adhoc"], world_group="lobby", limit=1, offset=11
+        )
+
+        # ASSERT
+        assert result == ([Backup(**restic_backup_obj)], 12)
+        backup_mgmt.snapshot_catalog.query.assert_called_once_with(
+            ["adhoc", "env1"],
+            hostname=MC_DOCKER_CONTAINER_NAME_FMT.format(env="env1", name="lobby"),
+            since=None,
+            until=None,
+            limit=1,
+            offset=11,
+        )
+        backup_mgmt.docker_client.containers.run.assert_not_called()
+
+    def test__list_backups_page__pages_restic_output_until_catalog_ready(
+        self,
+        backup_mgmt: BackupManagement,
+        env1_object: Env,
+        restic_backup_obj,
+    ):
+        # SETUP
+        backups = [
+            {**restic_backup_obj, "id": f"id-{i}", "time": f"1970-01-01T00:00:0{i}"}
+            for i in range(5)
+        ]
+        backup_mgmt.docker_client.containers.run.return_value = json.dumps(backups)
+
+        # EXECUTE
+        page, total = backup_mgmt.list_backups_page(
+            env1_object, [], since=1, limit=2, offset=1
+        )
+
+        # ASSERT
+        assert [b.id for b in page] == ["id-2", "id-3"]
+        assert total == 4
+
+    def test__get_worlds_backed_up_in_snapshot__streams_and_caches(
+        self,
+        mocker: MockerFixture,
+        backup_mgmt: BackupManagement,
+    ):
+        # SETUP
+        backup_mgmt.restic_worker = mocker.MagicMock()
+        backup_mgmt.restic_worker.stream.return_value = iter(
+            [
+                json.dumps({"name": "worlds-bindmount", "path": "/worlds-bindmount"}),
+                json.dumps({"name": "lobby", "path": "/worlds-bindmount/lobby"}),
+                json.dumps({"name": "nether", "path": "/worlds-bindmount/nether"}),
+            ]
+        )
+        cached = {}
+        backup_mgmt.snapshot_worlds_cache = mocker.MagicMock()
+        backup_mgmt.snapshot_worlds_cache.get.side_effect = cached.get
+        backup_mgmt.snapshot_worlds_cache.put.side_effect = cached.__setitem__
+
+        # EXECUTE
+        first = backup_mgmt.get_worlds_backed_up_in_snapshot("0123abcd")
+        second = backup_mgmt.get_worlds_backed_up_in_snapshot("0123abcd")
+
+        # ASSERT
+        assert first == second == ["lobby", "nether"]
+        backup_mgmt.restic_worker.stream.assert_called_once_with(
+            "ls 0123abcd /worlds-bindmount --json"
+        )
+
+    def test__stream_restic__falls_back_when_restic_worker_unavailable(
+        self, mocker: MockerFixture, backup_mgmt: BackupManagement, restic_command: str
+    ):
+        # SETUP
+        backup_mgmt.restic_worker = mocker.MagicMock()
+        backup_mgmt.restic_worker.stream.side_effect = RuntimeError("no daemon")
+        backup_mgmt.docker_client.containers.run.return_value = b"line1\nline2\n"
+
+        # EXECUTE
+        lines = list(backup_mgmt.stream_restic(restic_command))
+
+        # ASSERT
+        assert lines == ["line1", "line2"]
+        backup_mgmt.restic_worker.run.assert_not_called()
+
+    def test__backup_minecraft__streams_progress(
+        self,
+        mocker: MockerFixture,
+        backup_mgmt: BackupManagement,
+        env1_object: Env,
+        world_group: str,
+    ):
+        # SETUP
+        backup_mgmt.docker_management.is_container_up.side_effect = [False, True]
+        run_with_progress = mocker.patch(
+            "src.api.lib.backup_management.run_with_progress", return_value="done"
+        )
+        progress = mocker.MagicMock()
+
+        # EXECUTE
+        out = backup_mgmt.backup_minecraft(env1_object, world_group, progress=progress)
+
+        # ASSERT
+        assert out == "done"
+        backup_mgmt.docker_client.containers.run.assert_not_called()
+        assert run_with_progress.call_args.args[1] is progress
+        env_vars = run_with_progress.call_args.kwargs["environment"]
+        assert env_vars["RESTIC_ADDITIONAL_BACKUP_ARGS"] == "--json"
+        assert "RESTIC_PROGRESS_FPS" in env_vars
+        # With the server up too, backups go through our script, which passes `--json` on to restic.
+        assert env_vars["ENTRYPOINT_TARGET"] == "bash /restic.sh backup_now"
+
+    def test__restore_minecraft__streams_progress(
+        self,
+        mocker: MockerFixture,
+        backup_mgmt: BackupManagement,
+        env1_object: Env,
+        world_group: str,
+        restic_target_id: str,
+        target_worlds: List[str],
+    ):
+        # SETUP
+        backup_mgmt.docker_management.is_container_up.side_effect = [False, False]
+        backup_mgmt.restic_worker = mocker.MagicMock()
+        mocker.patch(
+            "src.api.lib.backup_management.BackupManagement.archive_directory",
+            return_value=None,
+        )
+        run_with_progress = mocker.patch(
+            "src.api.lib.backup_management.run_with_progress", return_value=""
+        )
+
+        # EXECUTE
+        backup_mgmt.restore_minecraft(
+            env1_object,
+            world_group,
+            restic_target_id,
+            target_worlds,
+            False,
+            progress=mocker.MagicMock(),
+        )
+
+        # ASSERT
+        backup_mgmt.restic_worker.run.assert_not_called()
+        assert run_with_progress.call_args.kwargs["command"].endswith(" --json")
@@ -0,0 +1,308 @@
+"""Schedules world group backups from the API instead of from a `mc_<world>_backup` sidecar per world group.
+
+Every sidecar ran `backup loop` on the same fixed interval from cluster start, so a cluster's world groups all
+backed up at once, contending for disk I/O and the restic repository lock. `BackupScheduler` owns the cadence for
+every env that turns its sidecars off (`backup_sidecars = false` under `[general]`):
+
+- Each world group backs up once per interval, in its own slot. Slots are offset by a hash of the world group, so
+  backups are spread over the interval rather than all firing together.
+- At most `max_concurrent` backups run at a time, counting ad-hoc ones. Backups whose job lease has expired (see
+  `jobs`) don't count: their worker is gone and the next orphan sweep fails them.
+- Nothing starts while another process, eg a sidecar pruning, holds a lock on the repository.
+- World groups whose files haven't changed since their last snapshot are skipped. Walking a world directory is
+  blocking file I/O, so it runs on gevent's native thread pool rather than stalling the worker's other greenlets.
+
+Backups are submitted as jobs, so they take the same world group locks as ad-hoc backups and report progress the
+same way. Only one gunicorn worker schedules: whichever holds an exclusive `flock` on `lock_file`.
+"""
+
+import json
+import os
+import random
+import time
+import zlib
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import gevent  # type: ignore
+
+from src.api.db import db
+from src.api.lib import structured_logging as slog
+from src.api.lib.environment import list_valid_envs
+from src.api.lib.jobs import (
+    UNFINISHED_STATUSES,
+    JobFunction,
+    ResourceBusyError,
+    job_manager,
+    world_group_resources,
+)
+from src.api.lib.leader_lock import LeaderLock
+from src.api.lib.metrics import metrics
+from src.api.lib.restic_worker import ResticError
+from src.api.lib.snapshot_catalog import SnapshotCatalog, snapshot_timestamp
+from src.api.models import Job
+from src.common import server_paths
+from src.common.constants import MC_DOCKER_CONTAINER_NAME_FMT
+from src.common.environment import Env
+from src.common.helpers import log_exception
+from src.common.types import DataDirType
+from src.generator.docker_compose_gen import backup_sidecars_enabled, backups_enabled
+
+SCHEDULED_BACKUP_JOB_KIND = "backup_scheduled"
+BACKUP_JOB_KINDS = ("backup_create", SCHEDULED_BACKUP_JOB_KIND)
+
+# restic itself treats locks older than this as stale.
+STALE_LOCK_SECS = 30 * 60
+
+
+def is_scheduled(env: Env) -> bool:
+    """Whether the scheduler, rather than sidecars, backs up `env`"""
+    return backups_enabled(env) and not backup_sidecars_enabled(env)
+
+
+def slot_start(key: str, now: float, interval: float) -> float:
+    """Start of the current backup slot for `key`. Slots repeat every `interval`, offset by a hash of `key`."""
+    offset = zlib.crc32(key.encode("utf-8")) % int(interval)
+    return (now - offset) // interval * interval + offset
+
+
+def changed_since(path: Path, since: float) -> bool:
+    """Whether anything under `path`, or `path` itself, was modified after `since`. Stops at the first change."""
+    try:
+        if path.stat().st_mtime > since:
+            return True
+    except FileNotFoundError:
+        return False
+
+    stack = [str(path)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.stat(follow_symlinks=False).st_mtime > since:
+                        return True
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                except FileNotFoundError:
+                    continue
+    return False
+
+
+def in_threadpool(fn: Callable[..., Any], *args: Any) -> Any:
+    """Runs blocking `fn(*args)` on a native thread, yielding to other greenlets until it returns"""
+    return gevent.get_hub().threadpool.apply(fn, args)
+
+
+class BackupScheduler:
+    """Submits staggered backup jobs for every scheduled world group
+
+    Args:
+        backup_job (JobFunction): Called as `backup_job(job, env_str=..., world_group=...)`
+        run_restic (Callable[[str], str]): Runs `restic <command>`. Usually `BackupManagement.call_restic`.
+        lock_file (Path): File whose `flock` elects the scheduling worker
+        interval (float): Seconds between backups of each world group
+        max_concurrent (int): Backup jobs allowed to run at once
+        tick_secs (float): Seconds between checks for due backups
+        snapshot_catalog (Optional[SnapshotCatalog]): Source of each world group's last snapshot time, so the
+            schedule survives restarts. Without one, the schedule starts over from when the scheduler started.
+        list_envs (Callable[[], List[Env]]): Envs to consider
+        submit (Optional[Callable]): `job_manager.submit` by default
+        clock (Callable[[], float]): Time source
+        run_blocking (Callable): Runs blocking file I/O as `run_blocking(fn, *args)`. `in_threadpool` by default.
+    """
+
+    def __init__(
+        self,
+        backup_job: JobFunction,
+        run_restic: Callable[[str], str],
+        lock_file: Path,
+        interval: float = 7200,
+        max_concurrent: int = 1,
+        tick_secs: float = 60,
+        snapshot_catalog: Optional[SnapshotCatalog] = None,
+        list_envs: Callable[[], List[Env]] = list_valid_envs,
+        submit: Optional[Callable[..., Job]] = None,
+        clock: Callable[[], float] = time.time,
+        run_blocking: Callable[..., Any] = in_threadpool,
+    ):
+        self.backup_job = backup_job
+        self.run_restic = run_restic
+        self.leader = LeaderLock(lock_file, "backup_scheduler")
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+        self.tick_secs = tick_secs
+        self.snapshot_catalog = snapshot_catalog
+        self.list_envs = list_envs
+        self.submit = submit or job_manager.submit
+        self.clock = clock
+        self.run_blocking = run_blocking
+        self.started_at = clock()
+        # (env, world group) -> when it was last backed up or skipped by this scheduler
+        self._last_considered: Dict[Tuple[str, str], float] = {}
+        # Since when every backup slot has been taken, and when we last warned about it
+        self._full_since: Optional[float] = None
+        self._stall_warned_at: float = 0
+
+    def tick(self) -> List[str]:
+        """Submits whichever backups are due and allowed to start. Must be called inside an app context.
+
+        Returns:
+            List[str]: Ids of the submitted jobs
+        """
+        if not self.leader.acquire():
+            return []
+
+        now = self.clock()
+        running = self.running_backups(now)
+        if running >= self.max_concurrent:
+            self._at_capacity(now, running)
+            return []
+        self._full_since = None
+        capacity = self.max_concurrent - running
+
+        due = self.due_world_groups(now)
+        if not due:
+            return []
+        if self.repo_locked(now):
+            metrics.inc("backup_scheduler.repo_locked")
+            return []
+
+        submitted = []
+        for env, world_group, last_snapshot in due:
+            if len(submitted) >= capacity:
+                break
+
+            key = (env.name, world_group)
+            self._last_considered[key] = now
+            world_files = server_paths.get_data_dir_path(
+                env.name, world_group, DataDirType.WORLD_FILES
+            )
+            if last_snapshot is not None and not self.run_blocking(
+                changed_since, world_files, last_snapshot
+            ):
+                metrics.inc("backup_scheduler.unchanged")
+                slog.info(
+                    "backup_scheduler.unchanged", env=env.name, world_group=world_group
+                )
+                continue
+
+            try:
+                job = self.submit(
+                    SCHEDULED_BACKUP_JOB_KIND,
+                    self.backup_job,
+                    resources=world_group_resources(env, world_group),
+                    env_str=env.name,
+                    world_group=world_group,
+                )
+            except ResourceBusyError:
+                # Eg an ad-hoc backup or a restore. Try again next tick.
+                del self._last_considered[key]
+                continue
+
+            metrics.inc("backup_scheduler.submitted")
+            slog.info(
+                "backup_scheduler.submitted",
+                env=env.name,
+                world_group=world_group,
+                job_id=job.id,
+            )
+            submitted.append(job.id)
+
+        return submitted
+
+    def due_world_groups(self, now: float) -> List[Tuple[Env, str, Optional[float]]]:
+        """World groups not yet backed up in their current slot, most overdue first, with their last snapshot time"""
+        due = []
+        for env in self.list_envs():
+            if not is_scheduled(env):
+                continue
+            for world_group in env.world_groups:
+                key = (env.name, world_group)
+                last_snapshot = self.last_snapshot(env, world_group)
+                last = max(
+                    self._last_considered.get(key, self.started_at),
+                    last_snapshot or 0,
+                )
+                start = slot_start(f"{env.name}/{world_group}", now, self.interval)
+                if last < start:
+                    due.append((env, world_group, last_snapshot, start))
+
+        due.sort(key=lambda d: d[3])
+        return [d[:3] for d in due]
+
+    def last_snapshot(self, env: Env, world_group: str) -> Optional[float]:
+        if self.snapshot_catalog is None:
+            return None
+        return self.snapshot_catalog.last_snapshot_time(
+            MC_DOCKER_CONTAINER_NAME_FMT.format(env=env.name, name=world_group)
+        )
+
+    def running_backups(self, now: float) -> int:
+        """Unfinished backup jobs whose worker is still renewing their lease"""
+        return (
+            db.session.query(Job)
+            .filter(
+                Job.kind.in_(BACKUP_JOB_KINDS),
+                Job.status.in_(UNFINISHED_STATUSES),
+                Job.lease_expires_at >= int(now),
+            )
+            .count()
+        )
+
+    def _at_capacity(self, now: float, running: int) -> None:
+        metrics.inc("backup_scheduler.at_capacity")
+        if self._full_since is None:
+            self._full_since = self._stall_warned_at = now
+        elif now - self._stall_warned_at >= self.interval:
+            # A whole interval without a free slot, so every world group has missed a backup. Warn once per interval.
+            slog.warning(
+                "backup_scheduler.stalled",
+                running=running,
+                max_concurrent=self.max_concurrent,
+                full_secs=int(now - self._full_since),
+            )
+            self._stall_warned_at = now
+
+    def repo_locked(self, now: float) -> bool:
+        """Whether anything holds a non-stale lock on the restic repository. Errors count as locked."""
+        try:
+            for lock_id in self.run_restic("list locks").split():
+                try:
+                    lock = json.loads(self.run_restic(f"cat lock {lock_id}"))
+                except ResticError:
+                    # Released between listing and reading it.
+                    continue
+                if now - snapshot_timestamp(lock["time"]) < STALE_LOCK_SECS:
+                    return True
+        except Exception:
+            log_exception(message="Failed to check restic repository locks!")
+            return True
+        return False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "leader": self.leader.held,
+            "tracked_world_groups": len(self._last_considered),
+            "at_capacity": self._full_since is not None,
+        }
+
+    def run_forever(self, app, sleep=time.sleep, iterations: Optional[int] = None):
+        """Scheduling loop. Meant to be started with `socketio.start_background_task()`."""
+        while iterations is None or iterations > 0:
+            sleep(self.tick_secs * (1 + random.uniform(0, 0.1)))
+            with app.app_context():
+                try:
+                    self.tick()
+                except Exception:
+                    db.session.rollback()
+                    log_exception(message="Backup scheduler tick failed!")
+                finally:
+                    db.session.remove()
+
+            if iterations is not None:
+                iterations -= 1
@@ -0,0 +1,320 @@
+import json
+import os
+import threading
+
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import flask  # type: ignore
+import pytest  # type: ignore
+
+from src.api.db import db
+from src.api.lib.backup_scheduler import (
+    SCHEDULED_BACKUP_JOB_KIND,
+    BackupScheduler,
+    changed_since,
+    in_threadpool,
+    slot_start,
+)
+from src.api.lib.jobs import JOB_RUNNING, ResourceBusyError
+from src.api.models import Job
+
+INTERVAL = 7200
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/scheduler.db"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def env():
+    env = MagicMock()
+    env.name = "env1"
+    env.world_groups = ["lobby", "survival"]
+    env.is_prod.return_value = True
+    env.config.general.get.side_effect = lambda key, default=None: {
+        "backup_sidecars": False
+    }.get(key, default)
+    return env
+
+
+@pytest.fixture
+def world_files(tmp_path, mocker):
+    def get_data_dir_path(env, world_group, data_dir_type):
+        return tmp_path / "data" / env / world_group
+
+    mocker.patch(
+        "src.api.lib.backup_scheduler.server_paths.get_data_dir_path",
+        side_effect=get_data_dir_path,
+    )
+    return tmp_path / "data"
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def submit():
+    submit = MagicMock()
+    submit.side_effect = lambda kind, fn, resources, **kwargs: MagicMock(
+        id=f"job-{kwargs['world_group']}"
+    )
+    return submit
+
+
+@pytest.fixture
+def run_restic():
+    return MagicMock(return_value="")
+
+
+def make_scheduler(tmp_path, env, clock, submit, run_restic, **kwargs):
+    return BackupScheduler(
+        MagicMock(),
+        run_restic,
+        lock_file=tmp_path / "scheduler.lock",
+        interval=INTERVAL,
+        list_envs=lambda: [env],
+        submit=submit,
+        clock=clock,
+        **kwargs,
+    )
+
+
+def test_slots_are_staggered_within_the_interval():
+    # SETUP
+    now = 1_000_000.0
+    keys = [f"env1/world{i}" for i in range(20)]
+
+    # EXECUTE
+    starts = [slot_start(key, now, INTERVAL) for key in keys]
+
+    # ASSERT
+    assert all(now - INTERVAL < start <= now for start in starts)
+    assert len(set(starts)) == len(keys)
+    assert slot_start(keys[0], now + INTERVAL, INTERVAL) == starts[0] + INTERVAL
+
+
+def test_changed_since_stops_at_first_change(tmp_path):
+    # SETUP
+    region = tmp_path / "lobby" / "region"
+    region.mkdir(parents=True)
+    (region / "r.0.0.mca").write_text("chunks")
+    for path in (region / "r.0.0.mca", region, region.parent, tmp_path):
+        os.utime(path, (100, 100))
+
+    # EXECUTE / ASSERT
+    assert changed_since(tmp_path, 100) is False
+    os.utime(region / "r.0.0.mca", (200, 200))
+    assert changed_since(tmp_path, 100) is True
+    assert changed_since(tmp_path / "missing", 100) is False
+
+
+def test_in_threadpool_runs_on_another_thread():
+    # EXECUTE
+    ident = in_threadpool(threading.get_ident)
+
+    # ASSERT
+    assert ident != threading.get_ident()
+
+
+def test_due_world_groups_are_submitted_one_slot_at_a_time(
+    app, tmp_path, env, clock, submit, run_restic, world_files
+):
+    # SETUP
+    scheduler = make_scheduler(tmp_path, env, clock, submit, run_restic)
+
+    # EXECUTE
+    at_start = scheduler.tick()
+    clock.now += INTERVAL
+    first = scheduler.tick()
+    second = scheduler.tick()
+    third = scheduler.tick()
+
+    # ASSERT
+    assert at_start == []
+    assert sorted(first + second) == ["job-lobby", "job-survival"]
+    assert len(first) == 1
+    assert third == []
+    assert submit.call_args.args[0] == SCHEDULED_BACKUP_JOB_KIND
+    assert submit.call_args.kwargs["resources"] == [f"env1/{second[0][4:]}"]
+
+
+def test_running_backups_count_against_the_cap(
+    app, tmp_path, env, clock, submit, run_restic, world_files, mocker
+):
+    # SETUP
+    scheduler = make_scheduler(tmp_path, env, clock, submit, run_restic)
+    clock.now += INTERVAL
+    db.session.add(
+        Job(
+            id="adhoc",
+            kind="backup_create",
+            status=JOB_RUNNING,
+            created_at=0,
+            lease_expires_at=int(clock.now) + 60,
+        )
+    )
+    db.session.commit()
+    inc = mocker.patch("src.api.lib.backup_scheduler.metrics.inc")
+
+    # EXECUTE
+    submitted = scheduler.tick()
+
+    # ASSERT
+    assert submitted == []
+    submit.assert_not_called()
+    inc.assert_called_once_with("backup_scheduler.at_capacity")
+    assert scheduler.stats()["at_capacity"] is True
+
+
+def test_orphaned_backups_dont_count_against_the_cap(
+    app, tmp_path, env, clock, submit, run_restic, world_files
+):
+    # SETUP
+    env.world_groups = ["lobby"]
+    scheduler = make_scheduler(tmp_path, env, clock, submit, run_restic)
+    clock.now += INTERVAL
+    # Its worker died: the lease ran out and nothing has swept it yet.
+    db.session.add(
+        Job(
+            id="orphan",
+            kind="backup_create",
+            status=JOB_RUNNING,
+            created_at=0,
+            lease_expires_at=int(clock.now) - 1,
+        )
+    )
+    db.session.commit()
+
+    # EXECUTE
+    submitted = scheduler.tick()
+
+    # ASSERT
+    assert submitted == ["job-lobby"]
+
+
+def test_staying_at_capacity_warns_once_per_interval(
+    app, tmp_path, env, clock, submit, run_restic, world_files, mocker
+):
+    # SETUP
+    scheduler = make_scheduler(tmp_path, env, clock, submit, run_restic)
+    db.session.add(
+        Job(
+            id="stuck",
+            kind="backup_create",
+            status=JOB_RUNNING,
+            created_at=0,
+            lease_expires_at=int(clock.now) + 10 * INTERVAL,
+        )
+    )
+    db.session.commit()
+    warning = mocker.patch("src.api.lib.backup_scheduler.slog.warning")
+
+    # EXECUTE
+    for _ in range(5):
+        scheduler.tick()
+        clock.now += INTERVAL / 2
+
+    # ASSERT
+    assert [c.args[0] for c in warning.call_args_list] == [
+        "backup_scheduler.stalled"
+    ] * 2
+    assert warning.call_args.kwargs["full_secs"] == 2 * INTERVAL
+
+
+def test_envs_with_sidecars_are_left_alone(
+    app, tmp_path, env, clock, submit, run_restic, world_files
+):
+    # SETUP
+    env.config.general.get.side_effect = lambda key, default=None: default
+    scheduler = make_scheduler(tmp_path, env, clock, submit, run_restic)
+    clock.now += INTERVAL
+
+    # EXECUTE
+    submitted = scheduler.tick()
+
+    # ASSERT
+    assert submitted == []
+
+
+def test_nothing_starts_while_the_repo_is_locked(
+    app, tmp_path, env, clock, submit, run_restic, world_files
+):
+    # SETUP
+    clock.now += INTERVAL
+    lock_time = datetime.fromtimestamp(clock.now - 60, tz=timezone.utc).isoformat()
+    run_restic.side_effect = lambda command: (
+        "abc123\n" if command == "list locks" else json.dumps({"time": lock_time})
+    )
+    scheduler = make_scheduler(tmp_path, env, clock, submit, run_restic)
+    scheduler.started_at -= INTERVAL
+
+    # EXECUTE
+    submitted = scheduler.tick()
+
+    # ASSERT
+    assert submitted == []
+    run_restic.assert_any_call("cat lock abc123")
+
+
+def test_unchanged_world_groups_are_skipped_until_next_slot(
+    app, tmp_path, env, clock, submit, run_restic, world_files
+):
+    # SETUP
+    catalog = MagicMock()
+    last_snapshot = clock.now - 60
+    catalog.last_snapshot_time.return_value = last_snapshot
+    for world_group in env.world_groups:
+        (world_files / "env1" / world_group).mkdir(parents=True)
+        os.utime(world_files / "env1" / world_group, (0, 0))
+    scheduler = make_scheduler(
+        tmp_path, env, clock, submit, run_restic, snapshot_catalog=catalog
+    )
+    clock.now += INTERVAL
+    os.utime(world_files / "env1" / "survival", (clock.now, clock.now))
+
+    # EXECUTE
+    first = scheduler.tick()
+    second = scheduler.tick()
+
+    # ASSERT
+    assert first + second == ["job-survival"]
+    catalog.last_snapshot_time.assert_any_call("YC-env1-lobby")
+
+
+def test_busy_world_groups_are_retried(
+    app, tmp_path, env, clock, submit, run_restic, world_files
+):
+    # SETUP
+    env.world_groups = ["lobby"]
+    scheduler = make_scheduler(tmp_path, env, clock, submit, run_restic)
+    clock.now += INTERVAL
+    side_effect = submit.side_effect
+    submit.side_effect = ResourceBusyError("env1/lobby", "restore")
+
+    # EXECUTE
+    busy = scheduler.tick()
+    submit.side_effect = side_effect
+    retried = scheduler.tick()
+
+    # ASSERT
+    assert busy == []
+    assert retried == ["job-lobby"]
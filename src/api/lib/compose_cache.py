@@ -0,0 +1,100 @@
+"""Caches parsed generated compose files, keyed on path, mtime and size.
+
+Every dashboard navigation hits `/defined`, which used to re-parse the whole generated `docker-compose-<env>.yml`.
+`ComposeCache` parses a file once and keeps the result, plus anything derived from it, until a `stat()` shows the
+file changed. Rewrites by the generators, whether in this process or via `make`, change mtime and size, so stale
+entries are never served. Generators run from the API also call `invalidate()` directly.
+"""
+
+import os
+import threading
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from src.api.lib import structured_logging as slog
+from src.api.lib.metrics import metrics
+from src.common.config import load_yaml_config
+from src.common.config.config_node import ConfigNode
+
+StatKey = Tuple[int, int]
+
+
+def stat_key(path: Union[str, Path]) -> StatKey:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class CachedCompose:
+    """A parsed compose file and values derived from it"""
+
+    def __init__(self, key: StatKey, config: ConfigNode):
+        self.key = key
+        self.config = config
+        self.derived: Dict[str, Any] = {}
+
+
+class ComposeCache:
+    """Parsed compose files by path
+
+    Args:
+        load (Callable): Parses a path. `load_yaml_config(path, no_cache=True)` by default.
+    """
+
+    def __init__(self, load: Optional[Callable[[Path], ConfigNode]] = None):
+        self.load = load or (lambda path: load_yaml_config(path, no_cache=True))
+        self._entries: Dict[Path, CachedCompose] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Union[str, Path]) -> ConfigNode:
+        """Parsed compose file at `path`, re-parsed only if it changed since the last call
+
+        Raises:
+            FileNotFoundError: If `path` doesn't exist
+        """
+        return self._entry(Path(path)).config
+
+    def derived(
+        self, path: Union[str, Path], name: str, derive: Callable[[ConfigNode], Any]
+    ) -> Any:
+        """`derive(config)` for the compose file at `path`, cached alongside the parsed file under `name`"""
+        entry = self._entry(Path(path))
+        with self._lock:
+            if name in entry.derived:
+                return entry.derived[name]
+        value = derive(entry.config)
+        with self._lock:
+            entry.derived[name] = value
+        return value
+
+    def invalidate(self, path: Union[str, Path]) -> None:
+        with self._lock:
+            self._entries.pop(Path(path), None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries)}
+
+    def _entry(self, path: Path) -> CachedCompose:
+        key = stat_key(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.key == key:
+                metrics.inc("compose_cache.hit")
+                return entry
+
+        metrics.inc("compose_cache.miss")
+        with metrics.timer("compose_cache.parse"):
+            config = self.load(path)
+        slog.debug(
+            "Loaded generated compose file",
+            path=path,
+            docker_compose=slog.lazy_pformat(config),
+        )
+
+        entry = CachedCompose(key, config)
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+
+compose_cache = ComposeCache()
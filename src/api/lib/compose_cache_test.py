@@ -0,0 +1,70 @@
+import os
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.api.lib.compose_cache import ComposeCache
+
+
+@pytest.fixture
+def compose_file(tmp_path):
+    path = tmp_path / "docker-compose-env1.yml"
+    path.write_text("services: {}\n")
+    return path
+
+
+def test_get_parses_once_per_version(compose_file):
+    # SETUP
+    load = MagicMock(side_effect=lambda path: path.read_text())
+    cache = ComposeCache(load=load)
+
+    # EXECUTE
+    first = cache.get(compose_file)
+    second = cache.get(str(compose_file))
+    compose_file.write_text("services: {lobby: {}}\n")
+    third = cache.get(compose_file)
+
+    # ASSERT
+    assert first == second == "services: {}\n"
+    assert third == "services: {lobby: {}}\n"
+    assert load.call_count == 2
+
+
+def test_same_size_rewrite_is_detected_by_mtime(compose_file):
+    # SETUP
+    load = MagicMock(side_effect=lambda path: path.read_text())
+    cache = ComposeCache(load=load)
+    cache.get(compose_file)
+
+    # EXECUTE
+    compose_file.write_text("services: {ab}\n")
+    st = compose_file.stat()
+    os.utime(compose_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    config = cache.get(compose_file)
+
+    # ASSERT
+    assert config == "services: {ab}\n"
+
+
+def test_derived_values_are_dropped_with_their_file(compose_file):
+    # SETUP
+    cache = ComposeCache(load=lambda path: path.read_text())
+    derive = MagicMock(side_effect=lambda config: config.upper())
+
+    # EXECUTE
+    first = cache.derived(compose_file, "upper", derive)
+    second = cache.derived(compose_file, "upper", derive)
+    cache.invalidate(compose_file)
+    third = cache.derived(compose_file, "upper", derive)
+
+    # ASSERT
+    assert first == second == third == "SERVICES: {}\n"
+    assert derive.call_count == 2
+
+
+def test_missing_file_raises(tmp_path):
+    cache = ComposeCache(load=MagicMock())
+
+    with pytest.raises(FileNotFoundError):
+        cache.get(tmp_path / "missing.yml")
@@ -0,0 +1,407 @@
+"""In-process replacement for `make up`/`make down`/`make restart` on YC clusters.
+
+`make up` runs all three generator scripts, each in a fresh interpreter, before handing the whole compose file to
+`docker compose up`. `ComposeOrchestrator` instead:
+
+- Runs the generators in-process, and only when one of their inputs changed since the last run.
+- Reads the generated compose file and groups services into waves from their `depends_on`. Every service in a
+  wave only depends on services from earlier waves, so a wave is started with a single
+  `docker compose up -d --no-deps` and its services come up in parallel.
+- Waits for a service only if a later service depends on it becoming healthy (or completing), so a cold start
+  takes as long as the slowest dependency chain rather than the sum of every service.
+
+Each run reports when every service was started and became ready.
+
+Once compose has been asked to change a cluster's containers, failures raise `ComposeStartedError`. Falling back
+to `make` at that point would regenerate and rerun compose just to hit the same failure again.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+import docker  # type: ignore
+from docker import DockerClient
+
+from src.api.lib import structured_logging as slog
+from src.api.lib.compose_cache import compose_cache
+from src.api.lib.metrics import metrics
+from src.common import server_paths
+from src.common.environment import Env
+from src.generator.generator import GeneratorType, get_generator
+
+GENERATOR_DIR = Path(__file__).resolve().parent.parent.parent / "generator"
+COMMON_DIR = GENERATOR_DIR.parent / "common"
+DYNMAP_NETWORK = "yc-dynmap"
+
+CONDITION_STARTED = "service_started"
+CONDITION_HEALTHY = "service_healthy"
+CONDITION_COMPLETED = "service_completed_successfully"
+
+
+class ComposeError(RuntimeError):
+    pass
+
+
+class ComposeStartedError(ComposeError):
+    """Compose failed after it had started changing the cluster's containers, eg a service turned unhealthy"""
+
+
+@contextmanager
+def changing_containers(action: str) -> Iterator[None]:
+    """Re-raises any failure as `ComposeStartedError`"""
+    try:
+        yield
+    except Exception as e:
+        raise ComposeStartedError(f"{action} failed: {e}") from e
+
+
+def get_depends_on(service: Dict) -> Dict[str, str]:
+    """Normalizes a service's `depends_on` (list or mapping form) to `{service: condition}`"""
+    depends_on = service.get("depends_on") or {}
+    if isinstance(depends_on, list):
+        return {dep: CONDITION_STARTED for dep in depends_on}
+    return {
+        dep: (opts or {}).get("condition", CONDITION_STARTED)
+        for dep, opts in depends_on.items()
+    }
+
+
+def dependency_waves(services: Dict[str, Dict]) -> List[List[str]]:
+    """Groups compose services into waves. Services in a wave only depend on services from earlier waves.
+
+    Raises:
+        ComposeError: On dependencies on unknown services or dependency cycles.
+    """
+    remaining = {name: set(get_depends_on(svc)) for name, svc in services.items()}
+    for name, deps in remaining.items():
+        unknown = deps - remaining.keys()
+        if unknown:
+            raise ComposeError(
+                f"Service '{name}' depends on unknown services {sorted(unknown)}!"
+            )
+
+    waves: List[List[str]] = []
+    done: set = set()
+    while remaining:
+        wave = sorted(name for name, deps in remaining.items() if deps <= done)
+        if not wave:
+            raise ComposeError(f"Dependency cycle between {sorted(remaining)}!")
+        waves.append(wave)
+        done.update(wave)
+        for name in wave:
+            del remaining[name]
+    return waves
+
+
+def required_conditions(services: Dict[str, Dict]) -> Dict[str, str]:
+    """The strictest condition any dependent waits on, per service. Services nobody waits on are left out."""
+    strictness = [CONDITION_STARTED, CONDITION_HEALTHY, CONDITION_COMPLETED]
+    conditions: Dict[str, str] = {}
+    for service in services.values():
+        for dep, condition in get_depends_on(service).items():
+            current = conditions.get(dep, CONDITION_STARTED)
+            if strictness.index(condition) >= strictness.index(current):
+                conditions[dep] = condition
+    return {dep: c for dep, c in conditions.items() if c != CONDITION_STARTED}
+
+
+def generator_input_paths(env: Env) -> List[Path]:
+    """Every file the generators read. If none of these changed, nor did `generator_input_values()`, regenerating
+    would write the same files.
+
+    Besides the env's config, that's the DB secrets `env_file_gen` embeds in the generated `.env`, and the code and
+    templates of both the generators and `src/common`.
+    """
+    paths = [
+        server_paths.get_env_toml_config_path(env.name),
+        server_paths.get_minecraft_db_env_file_path(),
+        server_paths.get_pg_pw_file_path(),
+    ]
+    for source_dir in (GENERATOR_DIR, COMMON_DIR):
+        paths.extend(
+            sorted(
+                p for p in source_dir.rglob("*") if p.is_file() and p.suffix != ".pyc"
+            )
+        )
+    return paths
+
+
+def generator_input_values() -> Dict[str, Any]:
+    """Everything the generators read that isn't a file"""
+    return {
+        "uid": os.getuid(),
+        "gid": os.getgid(),
+        "hostname": socket.gethostname(),
+    }
+
+
+def generator_output_paths(env: Env) -> List[Path]:
+    return [
+        server_paths.get_generated_docker_compose_path(env.name),
+        server_paths.get_generated_env_file_path(env.name),
+        server_paths.get_generated_velocity_config_path(env.name),
+    ]
+
+
+def fingerprint(paths: Iterable[Path]) -> Dict[str, List[int]]:
+    fp = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+            fp[str(path)] = [stat.st_mtime_ns, stat.st_size]
+        except FileNotFoundError:
+            fp[str(path)] = []
+    return fp
+
+
+def run_cmd(cmd: List[str], env_vars: Dict[str, str]) -> str:
+    """Runs `cmd`, returning its output
+
+    Raises:
+        ComposeError: If the command exits non-zero
+    """
+    proc = subprocess.run(
+        cmd,
+        env={**os.environ, **env_vars},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise ComposeError(
+            f"'{' '.join(cmd)}' exited with {proc.returncode}: {proc.stdout.strip()}"
+        )
+    return proc.stdout
+
+
+class ComposeOrchestrator:
+    """Brings YC clusters up and down from their generated compose files
+
+    Args:
+        client (DockerClient): Docker client, used to create the shared network and poll container health
+        ready_timeout_secs (float): How long to wait for a service that others depend on to become ready
+        poll_interval_secs (float): How often to poll container state while waiting
+    """
+
+    GENERATOR_TYPES = [
+        GeneratorType.VELOCITY_CONFIG,
+        GeneratorType.ENV_FILE,
+        GeneratorType.DOCKER_COMPOSE,
+    ]
+
+    def __init__(
+        self,
+        client: DockerClient,
+        ready_timeout_secs: float = 900,
+        poll_interval_secs: float = 2,
+        run_cmd: Callable[[List[str], Dict[str, str]], str] = run_cmd,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = client
+        self.ready_timeout_secs = ready_timeout_secs
+        self.poll_interval_secs = poll_interval_secs
+        self.run_cmd = run_cmd
+        self.sleep = sleep
+        self.clock = clock
+        # Generators write shared files, so only one env may regenerate at a time.
+        self._generate_lock = threading.Lock()
+
+    # -----------
+    # Generation
+    # -----------
+
+    def fingerprint_path(self, env: Env) -> Path:
+        compose_path = server_paths.get_generated_docker_compose_path(env.name)
+        return compose_path.with_name(f".{compose_path.name}.inputs.json")
+
+    def generate_if_changed(self, env: Env, force: bool = False) -> bool:
+        """Runs the generators unless their inputs are unchanged since the last run and all outputs exist
+
+        Returns:
+            bool: Whether the generators ran
+        """
+        with self._generate_lock:
+            fp_path = self.fingerprint_path(env)
+            current = {
+                "paths": fingerprint(generator_input_paths(env)),
+                "values": generator_input_values(),
+            }
+            outputs_exist = all(p.exists() for p in generator_output_paths(env))
+            if not force and outputs_exist and fp_path.exists():
+                try:
+                    if json.loads(fp_path.read_text()) == current:
+                        slog.debug("compose.generate.skipped", env=env.name)
+                        return False
+                except ValueError:
+                    pass
+
+            with metrics.timer("compose.generate"):
+                for gen_type in self.GENERATOR_TYPES:
+                    get_generator(gen_type, env).run()
+
+            compose_cache.invalidate(
+                server_paths.get_generated_docker_compose_path(env.name)
+            )
+            fp_path.parent.mkdir(parents=True, exist_ok=True)
+            fp_path.write_text(json.dumps(current))
+            slog.info("compose.generate.done", env=env.name)
+            return True
+
+    # -----------
+    # Cluster lifecycle
+    # -----------
+
+    def up(self, env: Env) -> Dict:
+        """Starts every service of `env` in dependency waves. Equivalent to `make up`."""
+        start = self.clock()
+        regenerated = self.generate_if_changed(env)
+        self.ensure_network(DYNMAP_NETWORK)
+
+        services = self.load_services(env)
+        waves = dependency_waves(services)
+        conditions = required_conditions(services)
+
+        timings: Dict[str, Dict] = {}
+        with changing_containers(f"Bringing up '{env.name}'"):
+            for i, wave in enumerate(waves):
+                wave_start = self.clock()
+                self.compose(env, ["up", "-d", "--no-deps", *wave])
+                started_secs = self.clock() - start
+
+                waits = {name: conditions[name] for name in wave if name in conditions}
+                ready_secs = self.wait_for_services(env, services, waits, start)
+                for name in wave:
+                    timings[name] = {
+                        "wave": i,
+                        "started_secs": round(started_secs, 3),
+                        "ready_secs": round(ready_secs.get(name, started_secs), 3),
+                        "waited_for": waits.get(name),
+                    }
+                slog.info(
+                    "compose.wave.ready",
+                    env=env.name,
+                    wave=i,
+                    services=wave,
+                    secs=round(self.clock() - wave_start, 3),
+                )
+
+        elapsed = self.clock() - start
+        metrics.observe("compose.up", elapsed)
+        return {
+            "regenerated": regenerated,
+            "waves": waves,
+            "services": timings,
+            "elapsed_secs": round(elapsed, 3),
+        }
+
+    def down(self, env: Env) -> Dict:
+        """Equivalent to `make down`. Compose already stops services in reverse dependency order, in parallel."""
+        start = self.clock()
+        with changing_containers(f"Bringing down '{env.name}'"):
+            self.compose(env, ["down"])
+        return {"elapsed_secs": round(self.clock() - start, 3)}
+
+    def restart(self, env: Env) -> Dict:
+        """Equivalent to `make restart`"""
+        start = self.clock()
+        regenerated = self.generate_if_changed(env)
+        with changing_containers(f"Restarting '{env.name}'"):
+            self.compose(env, ["restart"])
+        return {
+            "regenerated": regenerated,
+            "elapsed_secs": round(self.clock() - start, 3),
+        }
+
+    # -----------
+    # Helpers
+    # -----------
+
+    def load_services(self, env: Env) -> Dict[str, Dict]:
+        compose_path = server_paths.get_generated_docker_compose_path(env.name)
+        return compose_cache.get(compose_path).services.as_dict()
+
+    def compose(self, env: Env, args: List[str]) -> str:
+        cmd = [
+            "docker",
+            "compose",
+            "-f",
+            str(server_paths.get_generated_docker_compose_path(env.name)),
+            "--project-name",
+            env.name,
+            "--project-directory",
+            os.getcwd(),
+            "--env-file",
+            str(server_paths.get_generated_env_file_path(env.name)),
+            *args,
+        ]
+        return self.run_cmd(cmd, {"ENV": env.name})
+
+    def ensure_network(self, name: str) -> None:
+        if not self.client.networks.list(names=[name]):
+            self.client.networks.create(name)
+
+    def wait_for_services(
+        self, env: Env, services: Dict[str, Dict], waits: Dict[str, str], start: float
+    ) -> Dict[str, float]:
+        """Waits for every service in `waits` to meet its condition, concurrently
+
+        Returns:
+            Dict[str, float]: Seconds since `start` at which each service became ready
+        """
+        if not waits:
+            return {}
+
+        def wait_one(name: str) -> float:
+            container_name = services[name].get("container_name") or name
+            self.wait_for_container(container_name, waits[name])
+            ready = self.clock() - start
+            metrics.observe(f"compose.service_ready.{name}", ready)
+            return ready
+
+        with ThreadPoolExecutor(max_workers=len(waits)) as executor:
+            futures = {name: executor.submit(wait_one, name) for name in waits}
+            return {name: future.result() for name, future in futures.items()}
+
+    def wait_for_container(self, container_name: str, condition: str) -> None:
+        """
+        Raises:
+            ComposeError: If the container exits unexpectedly, turns unhealthy, or isn't ready within `ready_timeout_secs`
+        """
+        deadline = self.clock() + self.ready_timeout_secs
+        while True:
+            try:
+                state = self.client.api.inspect_container(container_name)["State"]
+            except docker.errors.NotFound:
+                state = {}
+
+            status = state.get("Status")
+            health = (state.get("Health") or {}).get("Status")
+            if condition == CONDITION_COMPLETED:
+                if status == "exited":
+                    if state.get("ExitCode") != 0:
+                        raise ComposeError(
+                            f"'{container_name}' exited with {state.get('ExitCode')}!"
+                        )
+                    return
+            elif status == "running" and health in (None, "healthy"):
+                return
+            elif health == "unhealthy" or status in ("exited", "dead"):
+                raise ComposeError(
+                    f"'{container_name}' is {health or status}! Dependent services were not started."
+                )
+
+            if self.clock() >= deadline:
+                raise ComposeError(
+                    f"Timed out after {self.ready_timeout_secs}s waiting for '{container_name}' to be ready!"
+                )
+            self.sleep(self.poll_interval_secs)
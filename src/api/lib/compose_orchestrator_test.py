@@ -0,0 +1,301 @@
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+from pytest_mock import MockerFixture  # type: ignore
+
+from src.api.lib.compose_orchestrator import (
+    ComposeError,
+    ComposeStartedError,
+    ComposeOrchestrator,
+    dependency_waves,
+    generator_input_paths,
+    required_conditions,
+)
+
+
+@pytest.fixture
+def services() -> Dict[str, Dict]:
+    """Shaped like a generated YC compose file"""
+    return {
+        "mysql": {"container_name": "YC-env1-mysql"},
+        "postgres": {"container_name": "YC-env1-postgres"},
+        "mc_lobby": {
+            "container_name": "YC-env1-lobby",
+            "depends_on": {
+                "mysql": {"condition": "service_healthy"},
+                "postgres": {"condition": "service_healthy"},
+            },
+        },
+        "mc_survival": {
+            "container_name": "YC-env1-survival",
+            "depends_on": {
+                "mysql": {"condition": "service_healthy"},
+                "postgres": {"condition": "service_healthy"},
+            },
+        },
+        "velocity": {
+            "container_name": "YC-env1-velocity",
+            "depends_on": {
+                "mc_lobby": {"condition": "service_healthy"},
+                "mc_survival": {"condition": "service_healthy"},
+            },
+        },
+        "mysql_backup": {
+            "container_name": "YC-env1-mysql-backup",
+            "depends_on": ["mysql"],
+        },
+    }
+
+
+@pytest.fixture
+def env(mocker: MockerFixture):
+    env = mocker.MagicMock()
+    env.name = "env1"
+    return env
+
+
+@pytest.fixture
+def server_paths(mocker: MockerFixture, tmp_path: Path):
+    paths = mocker.patch("src.api.lib.compose_orchestrator.server_paths")
+    paths.get_env_toml_config_path.return_value = tmp_path / "env1.toml"
+    paths.get_generated_docker_compose_path.return_value = tmp_path / "compose.yml"
+    paths.get_generated_env_file_path.return_value = tmp_path / "env1.env"
+    paths.get_generated_velocity_config_path.return_value = tmp_path / "velocity.toml"
+    return paths
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, secs: float):
+        self.now += secs
+
+
+class TestDependencyWaves:
+    def test__dependency_waves__layers(self, services):
+        assert dependency_waves(services) == [
+            ["mysql", "postgres"],
+            ["mc_lobby", "mc_survival", "mysql_backup"],
+            ["velocity"],
+        ]
+
+    def test__dependency_waves__cycle(self):
+        with pytest.raises(ComposeError):
+            dependency_waves({"a": {"depends_on": ["b"]}, "b": {"depends_on": ["a"]}})
+
+    def test__dependency_waves__unknown_service(self):
+        with pytest.raises(ComposeError):
+            dependency_waves({"a": {"depends_on": ["nope"]}})
+
+    def test__required_conditions__only_waited_on_services(self, services):
+        assert required_conditions(services) == {
+            "mysql": "service_healthy",
+            "postgres": "service_healthy",
+            "mc_lobby": "service_healthy",
+            "mc_survival": "service_healthy",
+        }
+
+
+class TestGenerateIfChanged:
+    def test__generate_if_changed__skips_unchanged_inputs(
+        self, mocker: MockerFixture, env, server_paths, tmp_path: Path
+    ):
+        # SETUP
+        mocker.patch(
+            "src.api.lib.compose_orchestrator.generator_input_paths",
+            return_value=[tmp_path / "env1.toml"],
+        )
+        (tmp_path / "env1.toml").write_text("[general]")
+        generator = mocker.MagicMock()
+
+        def fake_get_generator(gen_type, env):
+            # Generators write their outputs
+            for name in ("compose.yml", "env1.env", "velocity.toml"):
+                (tmp_path / name).write_text("generated")
+            return generator
+
+        get_generator_mock = mocker.patch(
+            "src.api.lib.compose_orchestrator.get_generator",
+            side_effect=fake_get_generator,
+        )
+        orchestrator = ComposeOrchestrator(mocker.MagicMock())
+
+        # EXECUTE
+        first = orchestrator.generate_if_changed(env)
+        second = orchestrator.generate_if_changed(env)
+        (tmp_path / "env1.toml").write_text("[general]\nenable_backups = true")
+        third = orchestrator.generate_if_changed(env)
+
+        # ASSERT
+        assert (first, second, third) == (True, False, True)
+        assert get_generator_mock.call_count == 2 * len(
+            ComposeOrchestrator.GENERATOR_TYPES
+        )
+
+    def test__generate_if_changed__tracks_secrets_and_process_values(
+        self, mocker: MockerFixture, env, server_paths, tmp_path: Path
+    ):
+        # SETUP
+        server_paths.get_minecraft_db_env_file_path.return_value = tmp_path / "db.env"
+        server_paths.get_pg_pw_file_path.return_value = tmp_path / "postgres_pw"
+        (tmp_path / "env1.toml").write_text("[general]")
+        (tmp_path / "db.env").write_text("MYSQL_PASSWORD=old")
+        common_dir = tmp_path / "common"
+        common_dir.mkdir()
+        (common_dir / "server_paths.py").write_text("")
+        mocker.patch("src.api.lib.compose_orchestrator.COMMON_DIR", common_dir)
+
+        def fake_get_generator(gen_type, env):
+            for name in ("compose.yml", "env1.env", "velocity.toml"):
+                (tmp_path / name).write_text("generated")
+            return mocker.MagicMock()
+
+        mocker.patch(
+            "src.api.lib.compose_orchestrator.get_generator",
+            side_effect=fake_get_generator,
+        )
+        hostname = mocker.patch(
+            "src.api.lib.compose_orchestrator.socket.gethostname",
+            return_value="yc-host",
+        )
+        orchestrator = ComposeOrchestrator(mocker.MagicMock())
+        orchestrator.generate_if_changed(env)
+
+        # EXECUTE
+        unchanged = orchestrator.generate_if_changed(env)
+        (tmp_path / "db.env").write_text("MYSQL_PASSWORD=rotated")
+        rotated = orchestrator.generate_if_changed(env)
+        hostname.return_value = "yc-other-host"
+        renamed = orchestrator.generate_if_changed(env)
+
+        # ASSERT
+        assert (unchanged, rotated, renamed) == (False, True, True)
+        input_paths = generator_input_paths(env)
+        assert tmp_path / "postgres_pw" in input_paths
+        assert common_dir / "server_paths.py" in input_paths
+
+    def test__generate_if_changed__regenerates_missing_outputs(
+        self, mocker: MockerFixture, env, server_paths, tmp_path: Path
+    ):
+        # SETUP
+        mocker.patch(
+            "src.api.lib.compose_orchestrator.generator_input_paths",
+            return_value=[tmp_path / "env1.toml"],
+        )
+        get_generator_mock = mocker.patch(
+            "src.api.lib.compose_orchestrator.get_generator"
+        )
+        orchestrator = ComposeOrchestrator(mocker.MagicMock())
+
+        # EXECUTE
+        orchestrator.generate_if_changed(env)
+        regenerated = orchestrator.generate_if_changed(env)
+
+        # ASSERT
+        assert regenerated, "Outputs were never written, so generators should rerun"
+        assert get_generator_mock.call_count == 2 * len(
+            ComposeOrchestrator.GENERATOR_TYPES
+        )
+
+
+class TestComposeOrchestrator:
+    def make_orchestrator(self, mocker: MockerFixture, services, states):
+        """`states` maps container name to the `State` dicts successive inspects return"""
+        clock = FakeClock()
+        commands: List[List[str]] = []
+        client = mocker.MagicMock()
+
+        def inspect_container(name):
+            history = states.get(name) or [{"Status": "running"}]
+            return {"State": history.pop(0) if len(history) > 1 else history[0]}
+
+        client.api.inspect_container.side_effect = inspect_container
+        orchestrator = ComposeOrchestrator(
+            client,
+            ready_timeout_secs=30,
+            poll_interval_secs=1,
+            run_cmd=lambda cmd, env_vars: commands.append(cmd) or "",
+            sleep=clock.sleep,
+            clock=clock,
+        )
+        mocker.patch.object(orchestrator, "generate_if_changed", return_value=False)
+        mocker.patch.object(orchestrator, "load_services", return_value=services)
+        return orchestrator, commands
+
+    def test__up__starts_waves_in_order(
+        self, mocker: MockerFixture, env, server_paths, services
+    ):
+        # SETUP
+        starting = {"Status": "running", "Health": {"Status": "starting"}}
+        healthy = {"Status": "running", "Health": {"Status": "healthy"}}
+        orchestrator, commands = self.make_orchestrator(
+            mocker,
+            services,
+            {
+                "YC-env1-mysql": [starting, starting, healthy],
+                "YC-env1-postgres": [healthy],
+                "YC-env1-lobby": [starting, healthy],
+                "YC-env1-survival": [healthy],
+            },
+        )
+
+        # EXECUTE
+        result = orchestrator.up(env)
+
+        # ASSERT
+        up_args = [cmd[cmd.index("up") :] for cmd in commands]
+        assert up_args == [
+            ["up", "-d", "--no-deps", "mysql", "postgres"],
+            ["up", "-d", "--no-deps", "mc_lobby", "mc_survival", "mysql_backup"],
+            ["up", "-d", "--no-deps", "velocity"],
+        ]
+        assert result["services"]["mysql"]["waited_for"] == "service_healthy"
+        assert result["services"]["mysql_backup"]["waited_for"] is None
+        assert (
+            result["services"]["mysql"]["ready_secs"]
+            <= result["services"]["mc_lobby"]["started_secs"]
+        )
+
+    def test__up__unhealthy_dependency_stops_later_waves(
+        self, mocker: MockerFixture, env, server_paths, services
+    ):
+        # SETUP
+        orchestrator, commands = self.make_orchestrator(
+            mocker,
+            services,
+            {
+                "YC-env1-mysql": [
+                    {"Status": "running", "Health": {"Status": "unhealthy"}}
+                ]
+            },
+        )
+
+        # EXECUTE
+        with pytest.raises(ComposeStartedError, match="YC-env1-mysql' is unhealthy"):
+            orchestrator.up(env)
+
+        # ASSERT
+        assert len(commands) == 1, "Only the first wave should have been started"
+
+    def test__wait_for_container__times_out(
+        self, mocker: MockerFixture, env, server_paths, services
+    ):
+        # SETUP
+        orchestrator, _ = self.make_orchestrator(
+            mocker,
+            services,
+            {
+                "YC-env1-mysql": [
+                    {"Status": "running", "Health": {"Status": "starting"}}
+                ]
+            },
+        )
+
+        # EXECUTE / ASSERT
+        with pytest.raises(ComposeError, match="Timed out"):
+            orchestrator.wait_for_container("YC-env1-mysql", "service_healthy")
@@ -0,0 +1,246 @@
+"""Shares one Docker log stream per minecraft container between every Socket.IO client watching its console.
+
+Attaching the browser straight to Docker costs one attach per viewer. `ConsoleHub` instead follows each container's
+logs once, keeps the most recent lines in a ring buffer and fans new lines out to a Socket.IO room per env/world
+group. A new viewer gets the buffered backlog immediately and then live lines from the room.
+
+Every line gets a sequence number. Backlogs report the sequence number of their last line and live batches the
+sequence number of their first, so a client that joins while lines are being emitted can drop the overlap.
+
+Streams are started by the first subscriber and closed when the last one leaves. If the container stops, the
+stream is reopened once it's back, for as long as anyone is still watching. Logs are read with Docker's timestamps so
+a reopened stream resumes from the last line we got, without losing or repeating any.
+"""
+
+import threading
+import time
+
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import docker  # type: ignore
+from docker import DockerClient
+
+from src.api.lib import structured_logging as slog
+from src.common.constants import MC_DOCKER_CONTAINER_NAME_FMT
+from src.common.helpers import log_exception
+
+CONSOLE_EVENT = "console"
+
+
+def console_room(env_name: str, world_group: str) -> str:
+    return f"console:{env_name}/{world_group}"
+
+
+def parse_log_timestamp_ns(timestamp: str) -> int:
+    """Nanoseconds since the epoch for a Docker log timestamp, eg `2026-01-01T00:00:00.123456789Z`
+
+    Raises:
+        ValueError: If `timestamp` isn't an RFC3339 UTC timestamp
+    """
+    secs, _, fraction = timestamp.rstrip("Z").partition(".")
+    dt = datetime.strptime(secs, "%Y-%m-%dT%H:%M:%S").replace(tzinfo=timezone.utc)
+    return int(dt.timestamp()) * 10**9 + int(fraction.ljust(9, "0")[:9])
+
+
+class ConsoleStream:
+    """A container's log stream, its recent lines and who is watching it"""
+
+    def __init__(self, env_name: str, world_group: str, buffer_lines: int):
+        self.env_name = env_name
+        self.world_group = world_group
+        self.container_name = MC_DOCKER_CONTAINER_NAME_FMT.format(
+            env=env_name, name=world_group
+        )
+        self.room = console_room(env_name, world_group)
+        self.lines: Deque[str] = deque(maxlen=buffer_lines)
+        # Sequence number of the last line seen
+        self.seq = 0
+        self.subscribers: Set[str] = set()
+        self.stopped = False
+        self.handle: Optional[Any] = None
+        # Docker timestamp of the last line seen, in nanoseconds. Where a reopened stream resumes.
+        self.last_ts_ns: Optional[int] = None
+        self._partial = ""
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """Splits a raw log chunk into complete lines, holding back any trailing partial line"""
+        text = self._partial + chunk.decode("utf-8", errors="replace")
+        *lines, self._partial = text.split("\n")
+        return [line.rstrip("\r") for line in lines]
+
+    def take_new(self, lines: List[str]) -> List[str]:
+        """Strips Docker's timestamps from `lines`, dropping any line at or before the last one seen"""
+        new_lines = []
+        for line in lines:
+            timestamp, _, text = line.partition(" ")
+            try:
+                ts_ns = parse_log_timestamp_ns(timestamp)
+            except ValueError:
+                new_lines.append(line)
+                continue
+            if self.last_ts_ns is not None and ts_ns <= self.last_ts_ns:
+                continue
+            self.last_ts_ns = ts_ns
+            new_lines.append(text)
+        return new_lines
+
+    def close_handle(self) -> None:
+        handle, self.handle = self.handle, None
+        # A reopened stream resends any line we only got part of.
+        self._partial = ""
+        if handle is not None:
+            try:
+                handle.close()
+            except Exception:
+                pass
+
+
+class ConsoleHub:
+    """Keeps at most one log stream per minecraft container and fans its lines out to Socket.IO rooms
+
+    Args:
+        client (DockerClient): Docker client
+        emit (Callable): `socketio.emit`. Called as `emit("console", payload, to=room)`.
+        buffer_lines (int): Lines of backlog kept per container
+        start_task (Callable): Runs `target(*args)` in the background. `socketio.start_background_task` in the app.
+        reconnect_delay_secs (float): Delay before reopening a stream that ended while it still has subscribers
+    """
+
+    def __init__(
+        self,
+        client: DockerClient,
+        emit: Callable[..., None],
+        buffer_lines: int = 500,
+        start_task: Optional[Callable[..., Any]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        reconnect_delay_secs: float = 2,
+    ):
+        self.client = client
+        self.emit = emit
+        self.buffer_lines = buffer_lines
+        self.start_task = start_task or self._start_thread
+        self.sleep = sleep
+        self.reconnect_delay_secs = reconnect_delay_secs
+
+        self._streams: Dict[str, ConsoleStream] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(
+        self, sid: str, env_name: str, world_group: str
+    ) -> Tuple[str, int, List[str]]:
+        """Adds `sid` as a viewer of a world group's console, starting its stream if it's the first.
+
+        Join the socket to the returned room *before* calling this so no live lines are missed.
+
+        Returns:
+            Tuple[str, int, List[str]]: Room name, sequence number of the last backlog line, and the backlog
+        """
+        room = console_room(env_name, world_group)
+        with self._lock:
+            stream = self._streams.get(room)
+            start = stream is None
+            if start:
+                stream = self._streams[room] = ConsoleStream(
+                    env_name, world_group, self.buffer_lines
+                )
+            stream.subscribers.add(sid)
+            backlog = (stream.seq, list(stream.lines))
+
+        if start:
+            slog.info("console.stream.start", container=stream.container_name)
+            self.start_task(self._pump, stream)
+        return (room, *backlog)
+
+    def unsubscribe(self, sid: str, env_name: str, world_group: str) -> None:
+        room = console_room(env_name, world_group)
+        with self._lock:
+            stream = self._streams.get(room)
+            if stream is None:
+                return
+            stream.subscribers.discard(sid)
+            if stream.subscribers:
+                return
+            del self._streams[room]
+            stream.stopped = True
+
+        slog.info("console.stream.stop", container=stream.container_name)
+        stream.close_handle()
+
+    def disconnect(self, sid: str) -> None:
+        """Drops `sid` from every console it was watching"""
+        with self._lock:
+            watched = [s for s in self._streams.values() if sid in s.subscribers]
+        for stream in watched:
+            self.unsubscribe(sid, stream.env_name, stream.world_group)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "streams": len(self._streams),
+                "subscribers": sum(len(s.subscribers) for s in self._streams.values()),
+            }
+
+    def _pump(self, stream: ConsoleStream) -> None:
+        while not stream.stopped:
+            # A little before the last line, since `since` is a float. `take_new()` drops lines we already have.
+            since = (
+                (stream.last_ts_ns - 1000) / 10**9
+                if stream.last_ts_ns is not None
+                else None
+            )
+            try:
+                stream.handle = self.client.api.logs(
+                    stream.container_name,
+                    stream=True,
+                    follow=True,
+                    timestamps=True,
+                    # First connect fills the backlog. Reconnects only pick up what we missed.
+                    tail=self.buffer_lines if since is None else "all",
+                    since=since,
+                )
+                if stream.stopped:
+                    # Unsubscribed while we were connecting. `unsubscribe()` couldn't close this handle.
+                    break
+                for chunk in stream.handle:
+                    self._publish(stream, stream.take_new(stream.feed(chunk)))
+            except docker.errors.NotFound:
+                # Container was removed. Keep waiting in case it gets recreated.
+                pass
+            except Exception:
+                if not stream.stopped:
+                    log_exception(
+                        message="Console stream failed!",
+                        data={"container": stream.container_name},
+                    )
+            finally:
+                stream.close_handle()
+
+            if not stream.stopped:
+                self.sleep(self.reconnect_delay_secs)
+
+    def _publish(self, stream: ConsoleStream, lines: List[str]) -> None:
+        if not lines:
+            return
+        with self._lock:
+            stream.lines.extend(lines)
+            first_seq = stream.seq + 1
+            stream.seq += len(lines)
+
+        self.emit(
+            CONSOLE_EVENT,
+            {
+                "env": stream.env_name,
+                "world_group": stream.world_group,
+                "seq": first_seq,
+                "lines": lines,
+            },
+            to=stream.room,
+        )
+
+    @staticmethod
+    def _start_thread(target: Callable[..., Any], *args: Any) -> threading.Thread:
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
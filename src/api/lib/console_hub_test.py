@@ -0,0 +1,174 @@
+import threading
+
+from typing import List
+
+import docker
+import pytest
+from pytest_mock import MockerFixture  # type: ignore
+
+from src.api.lib.console_hub import ConsoleHub, ConsoleStream, console_room
+from src.common.constants import MC_DOCKER_CONTAINER_NAME_FMT
+
+
+class FakeLogStream:
+    """Stands in for docker-py's CancellableStream. Yields queued chunks until closed."""
+
+    def __init__(self, chunks: List[bytes], end: bool = False):
+        self.chunks = list(chunks)
+        self.end = end
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield chunk
+        if not self.end:
+            self.closed.wait(5)
+
+    def close(self):
+        self.closed.set()
+
+
+@pytest.fixture
+def emitted():
+    return []
+
+
+@pytest.fixture
+def tasks():
+    return []
+
+
+@pytest.fixture
+def hub(mocker: MockerFixture, emitted, tasks):
+    def start_task(target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        tasks.append(thread)
+        thread.start()
+
+    return ConsoleHub(
+        mocker.MagicMock(),
+        emit=lambda event, data, to: emitted.append((event, data, to)),
+        buffer_lines=3,
+        start_task=start_task,
+        sleep=lambda secs: None,
+    )
+
+
+def join(tasks):
+    for task in tasks:
+        task.join(5)
+        assert not task.is_alive()
+
+
+class TestConsoleStream:
+    def test_feed_holds_back_partial_lines(self):
+        stream = ConsoleStream("env1", "lobby", 10)
+
+        assert stream.feed(b"[12:00] Done (3.2s)!\r\n[12:0") == ["[12:00] Done (3.2s)!"]
+        assert stream.feed(b"1] Steve joined\n") == ["[12:01] Steve joined"]
+
+    def test_take_new_strips_timestamps_and_drops_seen_lines(self):
+        stream = ConsoleStream("env1", "lobby", 10)
+
+        first = stream.take_new(
+            [
+                "2026-01-01T00:00:00.5Z [12:00] Done (3.2s)!",
+                "2026-01-01T00:00:01.000000001Z [12:01] Steve joined",
+            ]
+        )
+        resent = stream.take_new(
+            [
+                "2026-01-01T00:00:01.000000001Z [12:01] Steve joined",
+                "2026-01-01T00:00:02Z [12:02] Alex joined",
+            ]
+        )
+
+        assert first == ["[12:00] Done (3.2s)!", "[12:01] Steve joined"]
+        assert resent == ["[12:02] Alex joined"]
+        assert stream.last_ts_ns == 1767225602 * 10**9
+
+
+class TestConsoleHub:
+    def test_one_stream_shared_by_viewers(self, hub, emitted, tasks):
+        log_stream = FakeLogStream([b"a\nb\n", b"c\nd\n"])
+        hub.client.api.logs.return_value = log_stream
+
+        room, _, _ = hub.subscribe("sid1", "env1", "lobby")
+        hub.subscribe("sid2", "env1", "lobby")
+        hub.subscribe("sid3", "env1", "lobby")
+
+        hub.client.api.logs.assert_called_once()
+        assert hub.client.api.logs.call_args[0][
+            0
+        ] == MC_DOCKER_CONTAINER_NAME_FMT.format(env="env1", name="lobby")
+        assert hub.stats() == {"streams": 1, "subscribers": 3}
+
+        hub.disconnect("sid1")
+        hub.unsubscribe("sid2", "env1", "lobby")
+        assert not log_stream.closed.is_set(), "sid3 is still watching"
+        hub.unsubscribe("sid3", "env1", "lobby")
+        join(tasks)
+
+        assert log_stream.closed.is_set()
+        assert hub.stats() == {"streams": 0, "subscribers": 0}
+        assert room == console_room("env1", "lobby")
+        assert [(data["seq"], data["lines"]) for _, data, _ in emitted] == [
+            (1, ["a", "b"]),
+            (3, ["c", "d"]),
+        ]
+        assert all(to == room for _, _, to in emitted)
+
+    def test_late_viewer_gets_bounded_backlog(self, hub, emitted, tasks):
+        log_stream = FakeLogStream([b"1\n2\n3\n4\n5\n"])
+        hub.client.api.logs.return_value = log_stream
+        hub.subscribe("sid1", "env1", "lobby")
+        for _ in range(100):
+            if emitted:
+                break
+            threading.Event().wait(0.01)
+
+        _, seq, lines = hub.subscribe("sid2", "env1", "lobby")
+
+        assert (seq, lines) == (5, ["3", "4", "5"])
+        hub.disconnect("sid1")
+        hub.disconnect("sid2")
+        join(tasks)
+
+    def test_reconnects_after_container_restart(self, hub, emitted, tasks):
+        first = FakeLogStream(
+            [b"2026-01-01T00:00:00.25Z running\n2026-01-01T00:00:01.5Z stopping\n"],
+            end=True,
+        )
+        # Docker resends lines at `since`, which is a little before the last line we got.
+        second = FakeLogStream(
+            [b"2026-01-01T00:00:01.5Z stopping\n2026-01-01T00:00:09Z starting\n"]
+        )
+        restarted = threading.Event()
+
+        def logs(container_name, **kwargs):
+            if hub.client.api.logs.call_count == 1:
+                return first
+            if hub.client.api.logs.call_count == 2:
+                raise docker.errors.NotFound("gone")
+            restarted.set()
+            return second
+
+        hub.client.api.logs.side_effect = logs
+        hub.subscribe("sid1", "env1", "lobby")
+        assert restarted.wait(5)
+        for _ in range(100):
+            if len(emitted) == 2:
+                break
+            threading.Event().wait(0.01)
+        hub.disconnect("sid1")
+        join(tasks)
+
+        assert [data["lines"] for _, data, _ in emitted] == [
+            ["running", "stopping"],
+            ["starting"],
+        ]
+        first_call, _, third_call = hub.client.api.logs.call_args_list
+        assert first_call.kwargs["tail"] == 3
+        assert first_call.kwargs["timestamps"] is True
+        assert third_call.kwargs["since"] == pytest.approx(1767225601.5, abs=1e-5)
+        assert third_call.kwargs["since"] < 1767225601.5
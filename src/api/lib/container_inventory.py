@@ -0,0 +1,190 @@
+"""Per-process inventory of YC containers, kept current by the Docker events stream.
+
+Listing containers through docker-py costs one `/containers/json` call plus a full inspect per container, and
+the dashboard polls `/server/cluster/<env>/active` constantly. `ContainerInventory` pays that cost once when
+it (re)connects, then only re-inspects the single container named in each lifecycle event. Reads are served
+from memory.
+
+While the events stream is down the inventory reports itself as not `ready` and callers fall back to asking
+Docker directly. Every reconnect opens the stream *before* resyncing so no event can slip between the two.
+"""
+
+import threading
+import time
+
+from typing import Callable, Dict, List, Optional
+
+import docker  # type: ignore
+from docker import DockerClient
+from docker.models.containers import Container
+
+from src.common.constants import YC_ENV_LABEL
+from src.common.environment import Env
+from src.common.helpers import log_exception
+from src.common.logger_setup import logger
+
+# Actions that don't change anything we report. `exec_*` in particular fires for every rcon-cli call and healthcheck.
+IGNORED_ACTION_PREFIXES = (
+    "exec_",
+    "attach",
+    "detach",
+    "resize",
+    "top",
+    "archive-path",
+    "extract-to-dir",
+    "copy",
+    "commit",
+    "export",
+)
+REMOVED_ACTIONS = ("destroy",)
+
+InventoryListener = Callable[[str, str, Optional[Container]], None]
+"""Called with `(action, container_id, container)` after the inventory applies an event.
+`container` is `None` if the container was removed."""
+
+
+class ContainerInventory:
+    """In-memory view of every container labelled with `YC_ENV_LABEL`.
+
+    Args:
+        client (DockerClient): Docker client
+        reconnect_backoff_secs (float): Initial delay before reconnecting a dropped events stream. Doubles up to `max_backoff_secs`.
+        max_backoff_secs (float): Cap on the reconnect delay.
+    """
+
+    def __init__(
+        self,
+        client: DockerClient,
+        reconnect_backoff_secs: float = 1,
+        max_backoff_secs: float = 30,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        self.reconnect_backoff_secs = reconnect_backoff_secs
+        self.max_backoff_secs = max_backoff_secs
+        self.sleep = sleep
+
+        self.ready = False
+        self._containers: Dict[str, Container] = {}
+        self._ids_by_name: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[InventoryListener] = []
+        self._stream = None
+        self._stopped = False
+
+    # -----------
+    # Reads
+    # -----------
+
+    def list_containers(self, env: Env) -> List[Container]:
+        with self._lock:
+            containers = list(self._containers.values())
+        return [c for c in containers if c.labels.get(YC_ENV_LABEL) == env.name]
+
+    def get(self, name_or_id: str) -> Optional[Container]:
+        with self._lock:
+            container_id = self._ids_by_name.get(name_or_id, name_or_id)
+            return self._containers.get(container_id)
+
+    def __len__(self) -> int:
+        return len(self._containers)
+
+    def add_listener(self, listener: InventoryListener) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: InventoryListener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    # -----------
+    # Updates
+    # -----------
+
+    def resync(self) -> None:
+        """Replaces the whole inventory with a fresh listing from Docker"""
+        containers = self.client.containers.list(
+            all=True, filters={"label": YC_ENV_LABEL}
+        )
+        with self._lock:
+            self._containers = {c.id: c for c in containers}
+            self._ids_by_name = {c.name: c.id for c in containers}
+        logger.info(f"Container inventory resynced with {len(containers)} containers")
+
+    def apply_event(self, event: Dict) -> None:
+        """Applies a single decoded event from `client.events(decode=True)`"""
+        if event.get("Type") != "container":
+            return
+
+        action = event.get("Action", event.get("status", ""))
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        if not container_id or action.startswith(IGNORED_ACTION_PREFIXES):
+            return
+
+        container: Optional[Container] = None
+        if action not in REMOVED_ACTIONS:
+            try:
+                container = self.client.containers.get(container_id)
+            except docker.errors.NotFound:
+                # Removed before we got to it. We'll see its destroy event next.
+                pass
+
+        with self._lock:
+            previous = self._containers.pop(container_id, None)
+            if previous is not None:
+                self._ids_by_name.pop(previous.name, None)
+            if container is not None:
+                self._containers[container.id] = container
+                self._ids_by_name[container.name] = container.id
+
+        for listener in list(self._listeners):
+            try:
+                listener(action, container_id, container)
+            except Exception:
+                log_exception(
+                    message="Container inventory listener failed!",
+                    data={"action": action, "container_id": container_id},
+                )
+
+    # -----------
+    # Lifecycle
+    # -----------
+
+    def run(self) -> None:
+        """Subscribes to Docker events until `stop()` is called, reconnecting and resyncing whenever the stream drops.
+
+        Meant to be started with `socketio.start_background_task()`.
+        """
+        backoff = self.reconnect_backoff_secs
+        while not self._stopped:
+            try:
+                self._stream = self.client.events(
+                    decode=True, filters={"type": "container", "label": YC_ENV_LABEL}
+                )
+                self.resync()
+                self.ready = True
+                backoff = self.reconnect_backoff_secs
+
+                for event in self._stream:
+                    self.apply_event(event)
+            except Exception:
+                if not self._stopped:
+                    log_exception(message="Docker events stream failed!")
+            finally:
+                self.ready = False
+                self._close_stream()
+
+            if not self._stopped:
+                self.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff_secs)
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._close_stream()
+
+    def _close_stream(self) -> None:
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
@@ -0,0 +1,152 @@
+from typing import Dict
+
+import docker
+import pytest
+from pytest_mock import MockerFixture  # type: ignore
+
+from src.api.lib.container_inventory import ContainerInventory
+from src.api.lib.docker_management import DockerManagement
+from src.common.constants import YC_ENV_LABEL
+
+
+def make_container(mocker: MockerFixture, id: str, name: str, env: str, status: str):
+    container = mocker.MagicMock()
+    container.id = id
+    container.name = name
+    container.labels = {YC_ENV_LABEL: env}
+    container.status = status
+    return container
+
+
+def make_env(mocker: MockerFixture, name: str):
+    env_mock = mocker.MagicMock()
+    env_mock.name = name
+    return env_mock
+
+
+def container_event(action: str, id: str) -> Dict:
+    return {"Type": "container", "Action": action, "id": id, "Actor": {"ID": id}}
+
+
+@pytest.fixture
+def env1_container(mocker: MockerFixture):
+    return make_container(mocker, "id1", "yc-env1-survival", "env1", "running")
+
+
+@pytest.fixture
+def env2_container(mocker: MockerFixture):
+    return make_container(mocker, "id2", "yc-env2-survival", "env2", "exited")
+
+
+@pytest.fixture
+def client(mocker: MockerFixture, env1_container, env2_container):
+    client = mocker.MagicMock()
+    client.containers.list.return_value = [env1_container, env2_container]
+    return client
+
+
+@pytest.fixture
+def inventory(client) -> ContainerInventory:
+    inventory = ContainerInventory(client, sleep=lambda secs: None)
+    inventory.resync()
+    return inventory
+
+
+class TestContainerInventory:
+    def test_resync_lists_all_yc_containers_once(
+        self, mocker: MockerFixture, client, inventory
+    ):
+        client.containers.list.assert_called_once_with(
+            all=True, filters={"label": YC_ENV_LABEL}
+        )
+        assert [
+            c.name for c in inventory.list_containers(make_env(mocker, "env1"))
+        ] == ["yc-env1-survival"]
+
+    def test_get_by_name_or_id(self, inventory, env1_container):
+        assert inventory.get("yc-env1-survival") is env1_container
+        assert inventory.get("id1") is env1_container
+        assert inventory.get("nope") is None
+
+    def test_event_reinspects_only_that_container(
+        self, mocker: MockerFixture, client, inventory
+    ):
+        restarted = make_container(mocker, "id2", "yc-env2-survival", "env2", "running")
+        client.containers.get.return_value = restarted
+
+        inventory.apply_event(container_event("start", "id2"))
+
+        client.containers.get.assert_called_once_with("id2")
+        assert inventory.get("yc-env2-survival").status == "running"
+
+    def test_destroy_removes_without_inspect(self, client, inventory):
+        inventory.apply_event(container_event("destroy", "id1"))
+
+        client.containers.get.assert_not_called()
+        assert inventory.get("yc-env1-survival") is None
+
+    def test_exec_events_are_ignored(self, client, inventory):
+        inventory.apply_event(container_event("exec_start: rcon-cli list", "id1"))
+        client.containers.get.assert_not_called()
+
+    def test_listeners_are_notified(self, client, inventory, env1_container):
+        seen = []
+        inventory.add_listener(lambda *args: seen.append(args))
+        client.containers.get.return_value = env1_container
+
+        inventory.apply_event(container_event("health_status: healthy", "id1"))
+
+        assert seen == [("health_status: healthy", "id1", env1_container)]
+
+    def test_run_resyncs_after_stream_drops(self, client, inventory):
+        inventory.ready = False
+        calls = []
+
+        def events(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                raise docker.errors.APIError("Stream dropped")
+            inventory.stop()
+            return iter([])
+
+        client.events.side_effect = events
+        inventory.run()
+
+        assert len(calls) == 2
+        assert client.containers.list.call_count == 2
+        assert inventory.ready is False
+
+
+class TestDockerManagementWithInventory:
+    def test_list_active_containers_served_from_inventory(
+        self, mocker: MockerFixture, client, inventory
+    ):
+        inventory.ready = True
+        docker_mgmt = DockerManagement(client=client, inventory=inventory)
+        client.containers.list.reset_mock()
+
+        containers = docker_mgmt.list_active_containers(make_env(mocker, "env2"))
+
+        assert [c.name for c in containers] == ["yc-env2-survival"]
+        client.containers.list.assert_not_called()
+
+    def test_falls_back_to_docker_when_not_ready(
+        self, mocker: MockerFixture, client, inventory
+    ):
+        docker_mgmt = DockerManagement(client=client, inventory=inventory)
+        client.containers.list.reset_mock()
+
+        docker_mgmt.list_active_containers(make_env(mocker, "env1"))
+
+        client.containers.list.assert_called_once()
+
+    def test_is_container_up_falls_back_for_unknown_containers(
+        self, mocker: MockerFixture, client, inventory
+    ):
+        inventory.ready = True
+        docker_mgmt = DockerManagement(client=client, inventory=inventory)
+        client.containers.get.side_effect = docker.errors.NotFound("nope")
+
+        assert docker_mgmt.is_container_up("yc-env1-survival") is True
+        assert docker_mgmt.is_container_up("yc-env1-survival_backup_adhoc") is False
+        client.containers.get.assert_called_once_with("yc-env1-survival_backup_adhoc")
@@ -0,0 +1,49 @@
+import pytest  # type: ignore
+
+from sqlalchemy import create_engine, text  # type: ignore
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError  # type: ignore
+
+from src.api.lib.db_pool import InstrumentedQueuePool, engine_options, pool_stats
+from src.api.lib.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        **engine_options(
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.05,
+            pool_recycle=3600,
+            pool_pre_ping=True,
+        ),
+    )
+    yield engine
+    engine.dispose()
+
+
+class TestInstrumentedQueuePool:
+    def test_engine_uses_instrumented_pool(self, engine):
+        assert isinstance(engine.pool, InstrumentedQueuePool)
+
+    def test_records_checkout_wait_and_stats(self, engine):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            assert pool_stats(engine.pool)["checked_out"] == 1
+
+        stats = pool_stats(engine.pool)
+        assert stats["checked_out"] == 0 and stats["checked_in"] == 1
+        assert metrics.snapshot()["timings"]["db.pool.checkout_wait"]["count"] == 1
+
+    def test_counts_checkout_timeouts(self, engine):
+        with engine.connect():
+            with pytest.raises(PoolTimeoutError):
+                engine.connect()
+
+        assert metrics.snapshot()["counters"]["db.pool.checkout_timeouts"] == 1
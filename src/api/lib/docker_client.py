@@ -0,0 +1,110 @@
+"""One lazily created, tuned Docker client per process.
+
+Blueprints and helpers used to call `docker.from_env()` at import time, each getting its own client and urllib3
+pool, and each talking to the daemon before the app had even started. `docker_client` is instead a stand-in that
+creates the real client on first use, with a pool size and timeout from `constants`. Under gevent a single worker
+can have dozens of requests in flight, far more than docker-py's default pool of 10 connections.
+"""
+
+import threading
+
+from typing import Any, Callable, Dict, Optional
+
+import docker  # type: ignore
+from docker import DockerClient
+
+from src.api.constants import DOCKER_MAX_POOL_SIZE, DOCKER_TIMEOUT_SECS
+from src.api.lib import structured_logging as slog
+
+
+class DockerClientProvider:
+    """Creates the process's `DockerClient` on first `get()`
+
+    Args:
+        max_pool_size (int): Connections kept per urllib3 pool
+        timeout_secs (float): Default timeout for Docker API calls
+        factory (Callable): Builds the client. `docker.DockerClient.from_env` by default.
+    """
+
+    def __init__(
+        self,
+        max_pool_size: int = 10,
+        timeout_secs: float = 60,
+        factory: Optional[Callable[..., DockerClient]] = None,
+    ):
+        self.max_pool_size = max_pool_size
+        self.timeout_secs = timeout_secs
+        self.factory = factory or docker.DockerClient.from_env
+        self._client: Optional[DockerClient] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> DockerClient:
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None:
+                self._client = self.factory(
+                    max_pool_size=self.max_pool_size, timeout=self.timeout_secs
+                )
+                slog.info(
+                    "docker_client.created",
+                    max_pool_size=self.max_pool_size,
+                    timeout_secs=self.timeout_secs,
+                )
+            return self._client
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool usage, summed over every urllib3 pool the client has opened"""
+        stats: Dict[str, Any] = {
+            "created": self._client is not None,
+            "max_pool_size": self.max_pool_size,
+            "pools": 0,
+            "connections_opened": 0,
+            "connections_idle": 0,
+            "requests": 0,
+        }
+        if self._client is None:
+            return stats
+
+        for adapter in self._client.api.adapters.values():
+            pools = getattr(adapter, "pools", None)
+            if pools is None:
+                continue
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                stats["pools"] += 1
+                stats["connections_opened"] += pool.num_connections
+                stats["connections_idle"] += pool.pool.qsize() if pool.pool else 0
+                stats["requests"] += pool.num_requests
+        return stats
+
+
+class LazyDockerClient:
+    """Stands in for a `DockerClient`, deferring to the provider's client on every attribute access"""
+
+    def __init__(self, provider: DockerClientProvider):
+        object.__setattr__(self, "_provider", provider)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._provider.get(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._provider.get(), name, value)
+
+    def __repr__(self) -> str:
+        return f"<LazyDockerClient created={self._provider._client is not None}>"
+
+
+docker_client_provider = DockerClientProvider(
+    max_pool_size=DOCKER_MAX_POOL_SIZE, timeout_secs=DOCKER_TIMEOUT_SECS
+)
+docker_client = LazyDockerClient(docker_client_provider)
@@ -0,0 +1,79 @@
+import threading
+
+from unittest.mock import MagicMock
+
+from src.api.lib.docker_client import DockerClientProvider, LazyDockerClient
+
+
+def test_client_is_created_lazily_once():
+    # SETUP
+    factory = MagicMock()
+    provider = DockerClientProvider(max_pool_size=42, timeout_secs=7, factory=factory)
+    client = LazyDockerClient(provider)
+    barrier = threading.Barrier(8)
+
+    def use_client():
+        barrier.wait()
+        client.containers.list()
+
+    threads = [threading.Thread(target=use_client) for _ in range(8)]
+
+    # EXECUTE
+    created_before_use = factory.call_count
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # ASSERT
+    assert created_before_use == 0
+    factory.assert_called_once_with(max_pool_size=42, timeout=7)
+    assert factory.return_value.containers.list.call_count == 8
+
+
+def test_pool_stats():
+    # SETUP
+    pool = MagicMock()
+    pool.num_connections = 3
+    pool.num_requests = 20
+    pool.pool.qsize.return_value = 2
+    adapter = MagicMock()
+    adapter.pools = {"http+docker://localhost": pool}
+    factory = MagicMock()
+    factory.return_value.api.adapters = {
+        "http+docker://": adapter,
+        "https://": object(),
+    }
+    provider = DockerClientProvider(max_pool_size=50, factory=factory)
+
+    # EXECUTE
+    before = provider.pool_stats()
+    provider.get()
+    after = provider.pool_stats()
+
+    # ASSERT
+    assert before["created"] is False and before["pools"] == 0
+    assert after == {
+        "created": True,
+        "max_pool_size": 50,
+        "pools": 1,
+        "connections_opened": 3,
+        "connections_idle": 2,
+        "requests": 20,
+    }
+
+
+def test_close_recreates_on_next_use():
+    # SETUP
+    factory = MagicMock(side_effect=lambda **kwargs: MagicMock())
+    provider = DockerClientProvider(factory=factory)
+    first = provider.get()
+
+    # EXECUTE
+    provider.close()
+    second = provider.get()
+
+    # ASSERT
+    first.close.assert_called_once()
+    assert first is not second
+    assert factory.call_count == 2
@@ -1,26 +1,36 @@
 import os
+import re
 import json
 from datetime import datetime, timedelta, timezone
 import docker
 from docker.models.containers import Container
-from docker import DockerClient, from_env
-from concurrent.futures import ThreadPoolExecutor
+from docker import DockerClient
+from concurrent.futures import ThreadPoolExecutor, wait
 
-from pprint import pformat
 from typing import Any, Callable, List, Optional, Dict
-from ptyprocess import PtyProcessUnicode  # type: ignore
 
-from src.api.lib import LegacyActiveContainer, LegacyDefinedContainer
+from src.api.lib import (
+    ContainerCommandResult,
+    LegacyActiveContainer,
+    LegacyDefinedContainer,
+)
+from src.api.lib.compose_cache import ComposeCache
+from src.api.lib.compose_cache import compose_cache as default_compose_cache
+from src.api.lib.compose_orchestrator import ComposeOrchestrator, ComposeStartedError
+from src.api.lib.container_inventory import ContainerInventory
+from src.api.lib.docker_client import docker_client
+from src.api.lib.pty_attach import PtyAttachRegistry, pty_attach_registry
+from src.api.lib.rcon import RconCommandSentError, RconError, RconPool
 from src.api.lib.runner import Runner
 from src.api.lib.helpers import InvalidContainerNameError, seconds_to_string
+from src.api.lib import structured_logging as slog
 from src.common.config.config_node import ConfigNode
 from src.common.environment import Env
 from src.common.helpers import get_now_dt, log_exception
 from src.common import server_paths
 from src.common.logger_setup import logger
-from src.common.config import load_yaml_config
 from src.common.constants import (
-    YC_CONTAINER_TYPE_LABEL,
+    MC_DOCKER_CONTAINER_NAME_FMT,
     YC_ENV_LABEL,
     YC_CONTAINER_NAME_LABEL,
 )
@@ -35,16 +45,17 @@ from src.common.constants import (
 # Instead, we'll just use this transformer function to convert dockerpy's Container back to our old ContainerDefinition shapes for now.
 def convert_dockerpy_container_to_legacy_active_container(
     container: Container,
+    now: Optional[datetime] = None,
 ) -> LegacyActiveContainer:
     config = container.attrs.get("Config", {})
     state = container.attrs.get("State", {})
     labels = config.get("Labels", {})
 
-    logger.info(pformat(container))
-    logger.info(pformat(container.attrs))
-    logger.info(pformat(config))
-    logger.info(pformat(state))
-    logger.info(pformat(labels))
+    slog.debug(
+        "Converting container",
+        container=container.name,
+        attrs=slog.lazy_pformat(container.attrs),
+    )
 
     mounts = list(
         map(
@@ -69,7 +80,8 @@ def convert_dockerpy_container_to_legacy_active_container(
     started_at = state.get("StartedAt", None)
     running_for_str = None
     status = None
-    if started_at is None:
+    # Stopped containers keep the `StartedAt` of their last run.
+    if started_at is None or state.get("Status") != "running":
         running_for_str = "Container is down"
         status = "Container is down (unhealthy)"
     else:
@@ -79,7 +91,9 @@ def convert_dockerpy_container_to_legacy_active_container(
         started_at_truncated_ms = started_at.split(".")[0] + "Z"  # Add timezone back on
 
         try:
-            running_for = get_now_dt() - datetime.fromisoformat(started_at_truncated_ms)
+            running_for = (now or get_now_dt()) - datetime.fromisoformat(
+                started_at_truncated_ms
+            )
         except ValueError:
             running_for = timedelta(seconds=0)
         running_for_str = seconds_to_string(int(running_for.total_seconds()))
@@ -97,8 +111,15 @@ def convert_dockerpy_container_to_legacy_active_container(
             "Labels": labels,
             "Mounts": mounts,
             "Names": names,
+            # Inspect puts `NetworkSettings` next to `Config`, not in it.
             "Networks": list(
-                config.get("NetworkSettings", {}).get("Networks", {}).keys()
+                (
+                    container.attrs.get("NetworkSettings")
+                    or config.get("NetworkSettings")
+                    or {}
+                )
+                .get("Networks", {})
+                .keys()
             ),
             "Ports": list(config.get("ExposedPorts", {}).keys()),
             "RunningFor": running_for_str,
@@ -108,6 +129,125 @@ def convert_dockerpy_container_to_legacy_active_container(
     )
 
 
+def world_group_container_names(env: Env) -> Dict[str, str]:
+    """Minecraft container name per world group in `env`"""
+    return {
+        world_group: MC_DOCKER_CONTAINER_NAME_FMT.format(env=env.name, name=world_group)
+        for world_group in env.world_groups
+    }
+
+
+HEALTH_IN_STATUS_RE = re.compile(r"\((?:health: )?(?P<health>[a-z ]+)\)$")
+
+
+# Docker's `Status` renders how long a container has been up with go-units' `HumanDuration`.
+UP_FOR_IN_STATUS_RE = re.compile(
+    r"^Up (?:(?P<less>Less than a second)|About an? (?P<about>minute|hour)|"
+    r"(?P<count>\d+) (?P<unit>second|minute|hour|day|week|month|year)s?)"
+)
+DURATION_UNIT_SECS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 60 * 60,
+    "day": 24 * 60 * 60,
+    "week": 7 * 24 * 60 * 60,
+    "month": 30 * 24 * 60 * 60,
+    "year": 365 * 24 * 60 * 60,
+}
+
+
+def parse_up_for_secs(docker_status: str) -> Optional[int]:
+    """Eg 7200 for "Up 2 hours (healthy)", or None if `docker_status` isn't a running container's `Status`"""
+    match = UP_FOR_IN_STATUS_RE.search(docker_status)
+    if match is None:
+        return None
+    if match.group("less"):
+        return 0
+    if match.group("about"):
+        return DURATION_UNIT_SECS[match.group("about")]
+    return int(match.group("count")) * DURATION_UNIT_SECS[match.group("unit")]
+
+
+def container_summary_to_attrs(
+    summary: Dict[str, Any], now: datetime
+) -> Dict[str, Any]:
+    """Rebuilds, from an entry of the low-level `client.api.containers()` (ie `docker ps`), the parts of a container
+    inspect that `convert_dockerpy_container_to_legacy_active_container` reads.
+
+    Our generated compose files set each service's hostname to its container name, so the name stands in for
+    `Config.Hostname`. `State.StartedAt` is only as precise as the duration in the summary's `Status`.
+    """
+    labels = summary.get("Labels") or {}
+    names = summary.get("Names") or []
+    container_name = names[0].lstrip("/") if names else summary.get("Id", "unknown")
+    docker_status = summary.get("Status", "")
+
+    state: Dict[str, Any] = {"Status": summary.get("State", "unknown")}
+    if state["Status"] == "running":
+        up_for_secs = parse_up_for_secs(docker_status) or 0
+        state["StartedAt"] = (now - timedelta(seconds=up_for_secs)).strftime(
+            "%Y-%m-%dT%H:%M:%S.%fZ"
+        )
+    # Docker includes the health in `Status` for every container with a healthcheck.
+    health = HEALTH_IN_STATUS_RE.search(docker_status)
+    if health:
+        state["Health"] = {"Status": health.group("health")}
+
+    created = summary.get("Created")
+    return {
+        "Name": container_name,
+        "Id": summary.get("Id", "unknown"),
+        "Created": (
+            # Inspect's format. The summary only has whole seconds.
+            datetime.fromtimestamp(created, timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%S.000000000Z"
+            )
+            if isinstance(created, (int, float))
+            else "unknown"
+        ),
+        "Config": {
+            "Hostname": container_name,
+            "Labels": labels,
+            # The summary only has entrypoint and command joined, which is what the converter makes of an
+            # entrypoint without a command.
+            "Cmd": None,
+            "Entrypoint": [summary["Command"]] if summary.get("Command") else [],
+            "Image": summary.get("Image", "unknown"),
+            "ExposedPorts": {
+                f"{p['PrivatePort']}/{p.get('Type', 'tcp')}": {}
+                for p in summary.get("Ports") or []
+                if "PrivatePort" in p
+            },
+        },
+        "NetworkSettings": summary.get("NetworkSettings") or {},
+        "State": state,
+        "Mounts": [
+            m
+            for m in summary.get("Mounts") or []
+            if "Source" in m and "Destination" in m
+        ],
+    }
+
+
+def convert_container_summary_to_legacy_active_container(
+    summary: Dict[str, Any], now: Optional[datetime] = None
+) -> LegacyActiveContainer:
+    """Maps an entry from the low-level `client.api.containers()` (ie `docker ps`) into a `LegacyActiveContainer`,
+    the same way `convert_dockerpy_container_to_legacy_active_container` maps an inspected container, but without
+    an inspect.
+
+    Args:
+        summary (Dict[str, Any]): One container summary from `/containers/json`
+
+    Returns:
+        LegacyActiveContainer: Container in the legacy `docker ps --format json` shape
+    """
+    now = now or get_now_dt()
+    return convert_dockerpy_container_to_legacy_active_container(
+        Container(attrs=container_summary_to_attrs(summary, now)), now=now
+    )
+
+
 def convert_docker_compose_container_to_legacy_defined_container(
     svc_name: str, svc_data: ConfigNode, env: Env
 ) -> LegacyDefinedContainer:
@@ -135,8 +275,21 @@ def convert_docker_compose_container_to_legacy_defined_container(
 
 
 class DockerManagement:
-    def __init__(self, client: Optional[DockerClient] = None):
-        self.client = client if client else from_env()
+    def __init__(
+        self,
+        client: Optional[DockerClient] = None,
+        inventory: Optional[ContainerInventory] = None,
+        rcon_pool: Optional[RconPool] = None,
+        orchestrator: Optional[ComposeOrchestrator] = None,
+        pty_registry: Optional[PtyAttachRegistry] = None,
+        compose_cache: Optional[ComposeCache] = None,
+    ):
+        self.client = client if client else docker_client
+        self.inventory = inventory
+        self.rcon_pool = rcon_pool
+        self.orchestrator = orchestrator
+        self.pty_registry = pty_registry if pty_registry else pty_attach_registry
+        self.compose_cache = compose_cache if compose_cache else default_compose_cache
 
     def pty_attach_container(self, container: Container):
         # This is super weird.
@@ -150,30 +303,9 @@ class DockerManagement:
         # The final workaround that worked was to create a PTY process from the server using ptyprocess and run the `docker attach` inside of that.
         #
         # Wtf lol.
-        if (
-            YC_CONTAINER_TYPE_LABEL in container.labels
-            and container.labels[YC_CONTAINER_TYPE_LABEL] == "minecraft"
-        ):
-            logger.info("Spawning process")
-            p = PtyProcessUnicode.spawn(["docker", "attach", container.name])
-            logger.info(f"Spawned. {pformat(p)}")
-            try:
-                logger.info("Is Alive?")
-                logger.info(p.isalive())
-                with ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(lambda: p.write("list\n"))
-                    logger.info(future.result(timeout=1))
-
-                    future = executor.submit(lambda: p.read(1024))
-                    logger.info(future.result(timeout=1))
-            except EOFError:
-                logger.info("Got EOFError - Did not read from ptyprocess.")
-            except TimeoutError:
-                logger.info("Got TimeoutError - read() on PTY process failed!")
-            except:
-                log_exception()
-            finally:
-                logger.info("Done")
+        #
+        # The attach is kept alive and reused by `pty_registry` - see `src.api.lib.pty_attach`.
+        self.pty_registry.ensure_attached(container)
 
     def exec_run(
         self,
@@ -213,15 +345,30 @@ class DockerManagement:
         return exit_code, rtn_msg.strip()
 
     def send_command_to_container(self, container_name: str, command: str):
-        """Send a command to the minecraft console using rcon-cli
+        """Send a command to the minecraft console
+
+        Goes over the pooled RCON connection when an `rcon_pool` was provided, falling back to `rcon-cli` via
+        `docker exec` if the container can't be reached directly (eg yc-api isn't on a network shared with it).
+        There's no fallback once the command has been sent over RCON, as it may already have run.
 
         Args:
             container_name (str): A docker container name or id
             command (str): Command string such as 'say hello', 'list', 'op remi_scarlet' etc
 
         Returns:
-            str: Response from rcon-cli
+            str: Response from the server
         """
+        if self.rcon_pool is not None:
+            try:
+                return self.rcon_pool.command(container_name, command)
+            except RconCommandSentError:
+                raise
+            except (OSError, RconError) as e:
+                slog.info(
+                    "RCON failed, falling back to rcon-cli",
+                    container=container_name,
+                    error=repr(e),
+                )
 
         return self.perform_cb_on_container(
             container_name=container_name,
@@ -230,7 +377,66 @@ class DockerManagement:
             ],
         )
 
+    def send_command_to_env(
+        self, env: Env, command: str, timeout_secs: float = 10
+    ) -> Dict[str, ContainerCommandResult]:
+        """Send a command to every world group's minecraft container in `env` concurrently
+
+        Args:
+            env (Env): Environment
+            command (str): Command string such as 'say Restarting in 5 minutes!' or 'save-all'
+            timeout_secs (float): Deadline for all containers. Containers that haven't answered by then are reported as timed out.
+
+        Returns:
+            Dict[str, ContainerCommandResult]: Result per container name
+        """
+        container_names = list(world_group_container_names(env).values())
+        if not container_names:
+            return {}
+
+        results: Dict[str, ContainerCommandResult] = {}
+        executor = ThreadPoolExecutor(max_workers=len(container_names))
+        try:
+            futures = {
+                executor.submit(
+                    self._send_command_to_container_for_env, container_name, command
+                ): container_name
+                for container_name in container_names
+            }
+            done, _ = wait(futures, timeout=timeout_secs)
+            for future, container_name in futures.items():
+                if future not in done:
+                    results[container_name] = ContainerCommandResult(
+                        success=False, error=f"Timed out after {timeout_secs}s"
+                    )
+                elif future.exception() is not None:
+                    results[container_name] = ContainerCommandResult(
+                        success=False, error=repr(future.exception())
+                    )
+                else:
+                    results[container_name] = future.result()
+        finally:
+            # Don't wait on stragglers; their results are already reported as timed out.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return results
+
+    def _send_command_to_container_for_env(
+        self, container_name: str, command: str
+    ) -> ContainerCommandResult:
+        if not self.is_container_up(container_name):
+            return ContainerCommandResult(success=False, error="Container is not up")
+
+        output = self.send_command_to_container(container_name, command)
+        if output is None:
+            return ContainerCommandResult(
+                success=False, error="Could not send command to container"
+            )
+        return ContainerCommandResult(success=True, output=output)
+
     def prepare_container_for_ws_attach(self, container_name: str):
+        if self.pty_registry.is_attached(container_name):
+            return True
         container = self.container_name_to_container(container_name)
         self.pty_attach_container(container)
         return True
@@ -252,7 +458,13 @@ class DockerManagement:
             bool: True if container is up. False otherwise.
         """
         try:
-            container = self.container_name_to_container(container_name)
+            container = None
+            if self.inventory is not None and self.inventory.ready:
+                container = self.inventory.get(container_name)
+            if container is None:
+                # Not every container we check carries `YC_ENV_LABEL` (eg adhoc backup containers), so a miss
+                # in the inventory isn't proof it doesn't exist.
+                container = self.container_name_to_container(container_name)
             return container.status in ["running", "created", "restarting"]
         except docker.errors.NotFound:
             return False
@@ -271,18 +483,20 @@ class DockerManagement:
         """
 
         filepath = server_paths.get_generated_docker_compose_path(env.name)
-        docker_compose = load_yaml_config(filepath, no_cache=True)
 
-        logger.info(pformat(docker_compose))
-        defined_containers: List = []
-        for svc_name, svc_data in docker_compose.services.items():
-            defined_containers.append(
+        def convert(docker_compose: ConfigNode) -> List[LegacyDefinedContainer]:
+            return [
                 convert_docker_compose_container_to_legacy_defined_container(
                     svc_name, svc_data, env
                 )
-            )
+                for svc_name, svc_data in docker_compose.services.items()
+            ]
 
-        return defined_containers
+        return list(
+            self.compose_cache.derived(
+                filepath, f"defined_containers:{env.name}", convert
+            )
+        )
 
     def list_active_containers(self, env: Env) -> List[Container]:
         """List containers for env that are currently up and running.
@@ -293,6 +507,8 @@ class DockerManagement:
         Returns:
             List[Container]: Container definitions as returned from `docker ps`
         """
+        if self.inventory is not None and self.inventory.ready:
+            return self.inventory.list_containers(env)
 
         containers = self.client.containers.list(
             all=True, filters={"label": f"{YC_ENV_LABEL}={env.name}"}
@@ -300,6 +516,32 @@ class DockerManagement:
 
         return containers
 
+    def list_active_container_summaries(self, env: Env) -> List[LegacyActiveContainer]:
+        """Same containers as `list_active_containers`, but as `LegacyActiveContainer`s built without a per-container inspect.
+
+        Served from the inventory when it's ready, otherwise from a single low-level `/containers/json` call.
+
+        Args:
+            env (Env): Environment
+
+        Returns:
+            List[LegacyActiveContainer]: Containers in the legacy `docker ps --format json` shape
+        """
+        if self.inventory is not None and self.inventory.ready:
+            return [
+                convert_dockerpy_container_to_legacy_active_container(container)
+                for container in self.inventory.list_containers(env)
+            ]
+
+        summaries = self.client.api.containers(
+            all=True, filters={"label": f"{YC_ENV_LABEL}={env.name}"}
+        )
+
+        return [
+            convert_container_summary_to_legacy_active_container(summary)
+            for summary in summaries
+        ]
+
     def perform_cb_on_container(
         self,
         container_name: str,
@@ -327,7 +569,12 @@ class DockerManagement:
         try:
             container = self.container_name_to_container(container_name)
             data["container"] = container
-            logger.info(pformat(container.attrs))
+            slog.info("Performing callback on container", container=container.name)
+            slog.debug(
+                "Container attrs",
+                container=container.name,
+                attrs=slog.lazy_pformat(container.attrs),
+            )
 
             return callback(container)
         except docker.errors.NotFound:
@@ -453,11 +700,23 @@ class DockerManagement:
     """
 
     def up_containers(self, env: Env):
-        """
-        REFACTOR TO NOT USE MAKE
+        """Start every service of `env`. Uses the `ComposeOrchestrator` if one is configured, else `make up`.
 
-        TODO: When refactoring, ensure existence of all mount dirs and create+chown appropriately if not exists
+        Only falls back to `make up` if the orchestrator failed before touching any container, eg while generating.
+
+        TODO: Ensure existence of all mount dirs and create+chown appropriately if not exists
         """
+        if self.orchestrator is not None:
+            try:
+                return self.orchestrator.up(env)
+            except ComposeStartedError:
+                # The containers are already being changed. `make` would only repeat the same failure.
+                raise
+            except Exception:
+                log_exception(
+                    message="Compose orchestrator failed to bring up cluster! Falling back to 'make up'.",
+                    data={"env": env.name},
+                )
 
         cmd = [
             "make",
@@ -469,9 +728,18 @@ class DockerManagement:
         return resp
 
     def down_containers(self, env: Env):
-        """
-        REFACTOR TO NOT USE MAKE
-        """
+        """Stop every service of `env`. Uses the `ComposeOrchestrator` if one is configured, else `make down`."""
+        if self.orchestrator is not None:
+            try:
+                return self.orchestrator.down(env)
+            except ComposeStartedError:
+                raise
+            except Exception:
+                log_exception(
+                    message="Compose orchestrator failed to bring down cluster! Falling back to 'make down'.",
+                    data={"env": env.name},
+                )
+
         cmd = [
             "make",
             "down",
@@ -480,9 +748,18 @@ class DockerManagement:
         return Runner.run_make_cmd(cmd, env)
 
     def restart_containers(self, env: Env):
-        """
-        REFACTOR TO NOT USE MAKE
-        """
+        """Restart every service of `env`. Uses the `ComposeOrchestrator` if one is configured, else `make restart`."""
+        if self.orchestrator is not None:
+            try:
+                return self.orchestrator.restart(env)
+            except ComposeStartedError:
+                raise
+            except Exception:
+                log_exception(
+                    message="Compose orchestrator failed to restart cluster! Falling back to 'make restart'.",
+                    data={"env": env.name},
+                )
+
         cmd = [
             "make",
             "restart",
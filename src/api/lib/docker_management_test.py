@@ -1,17 +1,28 @@
+import threading
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 from typing import Dict, Tuple
 from unittest.mock import call
 import docker
 import pytest
+from docker.models.containers import Container
 from pytest_mock import MockerFixture  # type: ignore
 
 from src.api.lib.docker_management import (
     DockerManagement,
+    convert_container_summary_to_legacy_active_container,
     convert_docker_compose_container_to_legacy_defined_container,
     convert_dockerpy_container_to_legacy_active_container,
 )
+from src.api.lib.compose_cache import ComposeCache
+from src.api.lib.compose_orchestrator import ComposeOrchestrator, ComposeStartedError
 from src.api.lib.helpers import InvalidContainerNameError
+from src.api.lib.pty_attach import PtyAttachRegistry
+from src.api.lib.rcon import RconCommandSentError
 from src.common.config.config_node import ConfigNode
 from src.common.constants import (
+    MC_DOCKER_CONTAINER_NAME_FMT,
     YC_CONTAINER_NAME_LABEL,
     YC_CONTAINER_TYPE_LABEL,
     YC_ENV_LABEL,
@@ -22,7 +33,14 @@ from src.common.environment import Env
 @pytest.fixture
 def docker_mgmt(mocker: MockerFixture) -> DockerManagement:
     mock_docker_client = mocker.MagicMock()
-    return DockerManagement(client=mock_docker_client)
+    pty_registry = PtyAttachRegistry(
+        spawn=mocker.MagicMock(), start_task=mocker.MagicMock()
+    )
+    return DockerManagement(
+        client=mock_docker_client,
+        pty_registry=pty_registry,
+        compose_cache=ComposeCache(),
+    )
 
 
 @pytest.fixture
@@ -282,6 +300,26 @@ def extra_data_to_log(string_to_search_in_log):
     }
 
 
+@pytest.fixture
+def container_summary(config_labels, mounts):
+    return {
+        "Id": "An Id String",
+        "Names": ["/yc-env1-survival"],
+        "Image": "An Image",
+        "Command": "A Command",
+        "Created": 0,
+        "Ports": [
+            {"PrivatePort": 25565, "Type": "tcp"},
+            {"PrivatePort": 25565, "PublicPort": 25565, "Type": "tcp"},
+        ],
+        "Labels": config_labels,
+        "State": "running",
+        "Status": "Up 2 hours (health: starting)",
+        "NetworkSettings": {"Networks": {"Key1": {}, "Key2": {}}},
+        "Mounts": mounts,
+    }
+
+
 class TestDockerManagement:
     """Docker Management lib unit tests"""
 
@@ -405,22 +443,21 @@ class TestDockerManagement:
     def test__pty_attach_container__success(
         self, mocker: MockerFixture, docker_container, docker_mgmt: DockerManagement
     ):
-        """Ensures the function calls the PtyProcessUnicode.spawn() method with the docker attach command."""
+        """Ensures the function spawns a PTY process with the docker attach command, once per container."""
         # SETUP
-        spawn_mock = mocker.patch(
-            "src.api.lib.docker_management.PtyProcessUnicode.spawn"
-        )
+        spawn_mock = docker_mgmt.pty_registry.spawn
 
         # EXECUTE
         docker_mgmt.pty_attach_container(docker_container)
+        docker_mgmt.pty_attach_container(docker_container)
 
         # ASSERT
         expected_call_args = call(
-            ["docker", "attach", docker_container.name],
+            ["docker", "attach", "--sig-proxy=false", docker_container.name],
         )
-        assert (
-            spawn_mock.call_args_list[0] == expected_call_args
-        ), "Did not get the expected calls to PtyProcessUnicode.spawn()!"
+        assert spawn_mock.call_args_list == [
+            expected_call_args
+        ], "Did not get the expected calls to PtyProcessUnicode.spawn()!"
 
     def test__exec_run__args_correct_no_extras(
         self,
@@ -519,6 +556,166 @@ class TestDockerManagement:
         )
         assert exec_run_mock.call_args_list[0][0][1] == ["rcon-cli", config_cmd]
 
+    def test__send_command_to_container__rcon_pool(
+        self,
+        mocker: MockerFixture,
+        docker_container,
+        docker_mgmt: DockerManagement,
+        config_cmd: str,
+    ):
+        """Tests that commands go over the RCON pool without touching docker exec when one is configured."""
+        # SETUP
+        docker_mgmt.rcon_pool = mocker.MagicMock()
+        docker_mgmt.rcon_pool.command.return_value = "An RCON Response"
+        exec_run_mock = mocker.patch(
+            "src.api.lib.docker_management.DockerManagement.exec_run"
+        )
+
+        # EXECUTE
+        out = docker_mgmt.send_command_to_container(docker_container.name, config_cmd)
+
+        # ASSERT
+        assert out == "An RCON Response"
+        docker_mgmt.rcon_pool.command.assert_called_once_with(
+            docker_container.name, config_cmd
+        )
+        exec_run_mock.assert_not_called()
+
+    def test__send_command_to_container__rcon_unreachable_falls_back(
+        self,
+        mocker: MockerFixture,
+        docker_container,
+        docker_mgmt: DockerManagement,
+        config_cmd: str,
+        success_exit_code,
+    ):
+        """Tests that we fall back to rcon-cli when the container can't be reached over RCON."""
+        # SETUP
+        docker_mgmt.rcon_pool = mocker.MagicMock()
+        docker_mgmt.rcon_pool.command.side_effect = ConnectionRefusedError()
+        mocker.patch.object(
+            DockerManagement, "container_name_to_container", return_value=docker_container
+        )
+        exec_run_mock = mocker.patch(
+            "src.api.lib.docker_management.DockerManagement.exec_run",
+            return_value=(success_exit_code, "An exec_run() Return Value"),
+        )
+
+        # EXECUTE
+        out = docker_mgmt.send_command_to_container(docker_container.name, config_cmd)
+
+        # ASSERT
+        assert out == "An exec_run() Return Value"
+        assert exec_run_mock.call_args_list[0][0][1] == ["rcon-cli", config_cmd]
+
+    def test__send_command_to_container__rcon_sent_does_not_fall_back(
+        self,
+        mocker: MockerFixture,
+        docker_container,
+        docker_mgmt: DockerManagement,
+        config_cmd: str,
+    ):
+        """Tests that a command RCON sent but got no answer to isn't sent again through rcon-cli."""
+        # SETUP
+        docker_mgmt.rcon_pool = mocker.MagicMock()
+        docker_mgmt.rcon_pool.command.side_effect = RconCommandSentError(
+            docker_container.name, config_cmd
+        )
+        exec_run_mock = mocker.patch(
+            "src.api.lib.docker_management.DockerManagement.exec_run"
+        )
+
+        with pytest.raises(RconCommandSentError):
+            # EXECUTE
+            docker_mgmt.send_command_to_container(docker_container.name, config_cmd)
+
+        # ASSERT
+        exec_run_mock.assert_not_called()
+
+    def test__send_command_to_env__runs_concurrently(
+        self,
+        mocker: MockerFixture,
+        docker_mgmt: DockerManagement,
+        env1_object: Env,
+        config_cmd: str,
+    ):
+        """Tests that every world group gets the command at the same time and results are keyed by container name."""
+        # SETUP
+        env1_object.world_groups = ["lobby", "survival", "creative"]
+        barrier = threading.Barrier(len(env1_object.world_groups), timeout=5)
+
+        def send(container_name, command):
+            # Only returns once every world group's send is in flight
+            barrier.wait()
+            return f"{container_name}: {command}"
+
+        mocker.patch.object(DockerManagement, "is_container_up", return_value=True)
+        mocker.patch.object(
+            DockerManagement, "send_command_to_container", side_effect=send
+        )
+
+        # EXECUTE
+        results = docker_mgmt.send_command_to_env(env1_object, config_cmd)
+
+        # ASSERT
+        assert sorted(results) == sorted(
+            MC_DOCKER_CONTAINER_NAME_FMT.format(env=env1_object.name, name=wg)
+            for wg in env1_object.world_groups
+        )
+        for container_name, result in results.items():
+            assert result.success
+            assert result.output == f"{container_name}: {config_cmd}"
+
+    def test__send_command_to_env__timeouts_and_failures(
+        self,
+        mocker: MockerFixture,
+        docker_mgmt: DockerManagement,
+        env1_object: Env,
+        config_cmd: str,
+    ):
+        """Tests that a hung, a down and a failing container each get their own result without holding up the others."""
+        # SETUP
+        env1_object.world_groups = ["ok", "hung", "down", "broken"]
+        release_hung = threading.Event()
+
+        def send(container_name, command):
+            if container_name.endswith("-hung"):
+                release_hung.wait(5)
+            if container_name.endswith("-broken"):
+                return None
+            return "done"
+
+        mocker.patch.object(
+            DockerManagement,
+            "is_container_up",
+            side_effect=lambda container_name: not container_name.endswith("-down"),
+        )
+        mocker.patch.object(
+            DockerManagement, "send_command_to_container", side_effect=send
+        )
+
+        # EXECUTE
+        try:
+            results = docker_mgmt.send_command_to_env(
+                env1_object, config_cmd, timeout_secs=0.2
+            )
+        finally:
+            release_hung.set()
+
+        # ASSERT
+        def result_for(world_group):
+            return results[
+                MC_DOCKER_CONTAINER_NAME_FMT.format(env=env1_object.name, name=world_group)
+            ]
+
+        assert result_for("ok").success
+        assert result_for("ok").output == "done"
+        assert not result_for("hung").success
+        assert "Timed out" in result_for("hung").error
+        assert not result_for("down").success
+        assert "not up" in result_for("down").error
+        assert not result_for("broken").success
+
     def test__prepare_container_for_ws_attach__success(
         self, mocker: MockerFixture, docker_container, docker_mgmt: DockerManagement
     ):
@@ -542,6 +739,24 @@ class TestDockerManagement:
             container_name_to_container_return_value,
         ), "Expected call to pty_attach_container() to include the container mock object"
 
+    def test__prepare_container_for_ws_attach__already_attached(
+        self, mocker: MockerFixture, docker_container, docker_mgmt: DockerManagement
+    ):
+        """Ensures we skip the container lookup entirely when the container already has a live PTY attach"""
+        # SETUP
+        docker_mgmt.pty_attach_container(docker_container)
+        container_name_to_container_mock = mocker.patch(
+            "src.api.lib.docker_management.DockerManagement.container_name_to_container",
+        )
+
+        # EXECUTE
+        prepared = docker_mgmt.prepare_container_for_ws_attach(docker_container.name)
+
+        # ASSERT
+        assert prepared
+        assert container_name_to_container_mock.call_count == 0
+        assert docker_mgmt.pty_registry.spawn.call_count == 1
+
     def test__container_name_to_container__success(
         self, docker_container, docker_mgmt: DockerManagement
     ):
@@ -605,8 +820,9 @@ class TestDockerManagement:
             return_value=filepath,
         )
 
+        mocker.patch("src.api.lib.compose_cache.stat_key", return_value=(1, 1))
         load_yaml_config_patch = mocker.patch(
-            "src.api.lib.docker_management.load_yaml_config",
+            "src.api.lib.compose_cache.load_yaml_config",
             return_value=docker_compose_services_config,
         )
 
@@ -623,7 +839,7 @@ class TestDockerManagement:
             env1_object.name
         ), f"Was expecting get_generated_docker_compose_path() to get called with '{env1_object.name}'"
         assert load_yaml_config_patch.call_args_list[0] == call(
-            filepath, no_cache=True
+            Path(filepath), no_cache=True
         ), f"Was expecting load_yaml_config to be called with '{filepath}' and 'no_cache=True'"
 
         assert convert_container_patch.call_args_list[0] == call(
@@ -634,6 +850,46 @@ class TestDockerManagement:
             docker_container_legacy_defined_container
         ], f"Did not get the expected LegacyDefinedContainer from list_defined_containers()!"
 
+    def test__list_defined_containers__cached_until_file_changes(
+        self,
+        mocker: MockerFixture,
+        docker_mgmt: DockerManagement,
+        docker_container_legacy_defined_container,
+        env1_object: Env,
+        filepath: str,
+        docker_compose_services_config: ConfigNode,
+    ):
+        """Ensure the compose file is only parsed again once its mtime/size change"""
+        # SETUP
+        mocker.patch(
+            "src.api.lib.docker_management.server_paths.get_generated_docker_compose_path",
+            return_value=filepath,
+        )
+        stat_key_patch = mocker.patch(
+            "src.api.lib.compose_cache.stat_key", return_value=(1, 1)
+        )
+        load_yaml_config_patch = mocker.patch(
+            "src.api.lib.compose_cache.load_yaml_config",
+            return_value=docker_compose_services_config,
+        )
+        convert_container_patch = mocker.patch(
+            "src.api.lib.docker_management.convert_docker_compose_container_to_legacy_defined_container",
+            return_value=docker_container_legacy_defined_container,
+        )
+
+        # EXECUTE
+        docker_mgmt.list_defined_containers(env1_object)
+        docker_mgmt.list_defined_containers(env1_object)
+        parses_before_change = load_yaml_config_patch.call_count
+        stat_key_patch.return_value = (2, 1)
+        containers = docker_mgmt.list_defined_containers(env1_object)
+
+        # ASSERT
+        assert parses_before_change == 1, "Expected the second call to be served from cache"
+        assert load_yaml_config_patch.call_count == 2
+        assert convert_container_patch.call_count == 2
+        assert containers == [docker_container_legacy_defined_container]
+
     def test__list_active_containers__success(
         self, docker_mgmt: DockerManagement, env1_object: Env, docker_container_fields
     ):
@@ -651,6 +907,140 @@ class TestDockerManagement:
             all=True, filters={"label": f"{YC_ENV_LABEL}={env1_object.name}"}
         ), f"Did not get the expected call args to containers.list()"
 
+    def test__convert_container_summary_to_legacy_active_container__success(
+        self, container_summary, config_labels
+    ):
+        # EXECUTE
+        container = convert_container_summary_to_legacy_active_container(
+            container_summary
+        )
+
+        # ASSERT
+        assert container.ContainerName == "yc-env1-survival"
+        assert container.Names == [
+            config_labels[YC_CONTAINER_NAME_LABEL],
+            config_labels["com.docker.compose.service"],
+            "yc-env1-survival",
+        ]
+        assert container.CreatedAt == "1970-01-01T00:00:00.000000000Z"
+        assert container.Command == "A Command"
+        assert container.Mounts == ["source1:dest1", "source2:dest2"]
+        assert container.Networks == ["Key1", "Key2"]
+        assert container.Ports == ["25565/tcp"]
+        assert container.RunningFor == "2 hours"
+        assert container.Status == "Up 2 hours (starting)"
+
+    def test__convert_container_summary_to_legacy_active_container__exited(
+        self, container_summary
+    ):
+        # SETUP
+        container_summary["State"] = "exited"
+        container_summary["Status"] = "Exited (0) 3 minutes ago"
+
+        # EXECUTE
+        container = convert_container_summary_to_legacy_active_container(
+            container_summary
+        )
+
+        # ASSERT
+        assert container.RunningFor == "Container is down"
+        assert container.Status == "Container is down (unhealthy)"
+
+    def test__list_active_container_summaries__single_docker_call(
+        self, docker_mgmt: DockerManagement, env1_object: Env, container_summary
+    ):
+        # SETUP
+        docker_mgmt.client.api.containers.return_value = [container_summary]
+
+        # EXECUTE
+        containers = docker_mgmt.list_active_container_summaries(env1_object)
+
+        # ASSERT
+        assert [c.ID for c in containers] == [container_summary["Id"]]
+        assert docker_mgmt.client.api.containers.call_args_list == [
+            call(all=True, filters={"label": f"{YC_ENV_LABEL}={env1_object.name}"})
+        ], "Expected exactly one low-level containers() call!"
+        docker_mgmt.client.containers.list.assert_not_called()
+        docker_mgmt.client.api.inspect_container.assert_not_called()
+
+    @pytest.mark.parametrize(
+        "state,health,status",
+        [
+            ("running", "healthy", "Up 2 hours (healthy)"),
+            ("running", "starting", "Up 2 hours (health: starting)"),
+            ("running", None, "Up 2 hours"),
+            ("exited", None, "Exited (0) 2 hours ago"),
+        ],
+    )
+    def test__list_active_container_summaries__same_with_and_without_inventory(
+        self,
+        mocker: MockerFixture,
+        docker_mgmt: DockerManagement,
+        env1_object: Env,
+        config_labels,
+        mounts,
+        state,
+        health,
+        status,
+    ):
+        # SETUP
+        now = datetime(2024, 2, 11, 22, 16, 57, 510507, tzinfo=timezone.utc)
+        mocker.patch("src.api.lib.docker_management.get_now_dt", return_value=now)
+        started_at = now - timedelta(hours=2, milliseconds=300)
+        inspected = {
+            "Name": "/YC-env1-survival",
+            "Id": "An Id String",
+            "Created": "2024-02-11T20:00:00.000000000Z",
+            "Config": {
+                "Hostname": "YC-env1-survival",
+                "Labels": config_labels,
+                "Cmd": None,
+                "Entrypoint": ["/start"],
+                "Image": "itzg/minecraft-server",
+                "ExposedPorts": {"25565/tcp": {}, "25575/tcp": {}},
+            },
+            "NetworkSettings": {"Networks": {"env1_ycnet": {}}},
+            "State": {
+                "Status": state,
+                "StartedAt": started_at.strftime("%Y-%m-%dT%H:%M:%S.%f000Z"),
+                **({"Health": {"Status": health}} if health else {}),
+            },
+            "Mounts": mounts,
+        }
+        summary = {
+            "Id": "An Id String",
+            "Names": ["/YC-env1-survival"],
+            "Image": "itzg/minecraft-server",
+            "Command": "/start",
+            "Created": int(datetime(2024, 2, 11, 20, tzinfo=timezone.utc).timestamp()),
+            "Ports": [
+                {"PrivatePort": 25565, "Type": "tcp"},
+                {"PrivatePort": 25575, "Type": "tcp"},
+            ],
+            "Labels": config_labels,
+            "State": state,
+            "Status": status,
+            "NetworkSettings": {"Networks": {"env1_ycnet": {}}},
+            "Mounts": mounts,
+        }
+        docker_mgmt.client.api.containers.return_value = [summary]
+        without_inventory = docker_mgmt.list_active_container_summaries(env1_object)
+        docker_mgmt.inventory = mocker.MagicMock(ready=True)
+        docker_mgmt.inventory.list_containers.return_value = [
+            Container(attrs=inspected)
+        ]
+
+        # EXECUTE
+        with_inventory = docker_mgmt.list_active_container_summaries(env1_object)
+
+        # ASSERT
+        assert without_inventory == with_inventory
+        assert with_inventory[0].Status == (
+            f"Up 2 hours ({health or 'unknown'})"
+            if state == "running"
+            else "Container is down (unhealthy)"
+        )
+
     def test__perform_cb_on_container__docker_errors_not_found(
         self,
         caplog: pytest.LogCaptureFixture,
@@ -878,6 +1268,71 @@ class TestDockerManagement:
         # ASSERT
         run_make_cmd_mock.assert_called_once_with(["make", "up"], env1_object)
 
+    def test__up_containers__orchestrator(
+        self, mocker: MockerFixture, docker_mgmt: DockerManagement, env1_object: Env
+    ):
+        # SETUP
+        docker_mgmt.orchestrator = mocker.MagicMock()
+        docker_mgmt.orchestrator.up.return_value = {"waves": [["mysql"]]}
+        run_make_cmd_mock = mocker.patch(
+            "src.api.lib.docker_management.Runner.run_make_cmd"
+        )
+
+        # EXECUTE
+        resp = docker_mgmt.up_containers(env1_object)
+
+        # ASSERT
+        assert resp == {"waves": [["mysql"]]}
+        run_make_cmd_mock.assert_not_called()
+
+    def test__up_containers__orchestrator_failure_falls_back_to_make(
+        self, mocker: MockerFixture, docker_mgmt: DockerManagement, env1_object: Env
+    ):
+        # SETUP
+        docker_mgmt.orchestrator = mocker.MagicMock()
+        docker_mgmt.orchestrator.up.side_effect = RuntimeError("No compose plugin")
+        run_make_cmd_mock = mocker.patch(
+            "src.api.lib.docker_management.Runner.run_make_cmd"
+        )
+
+        # EXECUTE
+        docker_mgmt.up_containers(env1_object)
+
+        # ASSERT
+        run_make_cmd_mock.assert_called_once_with(["make", "up"], env1_object)
+
+    def test__up_containers__unhealthy_service_does_not_fall_back_to_make(
+        self, mocker: MockerFixture, docker_mgmt: DockerManagement, env1_object: Env
+    ):
+        # SETUP
+        client = mocker.MagicMock()
+        client.api.inspect_container.return_value = {
+            "State": {"Status": "running", "Health": {"Status": "unhealthy"}}
+        }
+        orchestrator = ComposeOrchestrator(client, sleep=lambda secs: None)
+        mocker.patch.object(orchestrator, "generate_if_changed", return_value=False)
+        mocker.patch.object(
+            orchestrator,
+            "load_services",
+            return_value={
+                "mysql": {"container_name": "YC-env1-mysql"},
+                "velocity": {"depends_on": {"mysql": {"condition": "service_healthy"}}},
+            },
+        )
+        compose_mock = mocker.patch.object(orchestrator, "compose")
+        docker_mgmt.orchestrator = orchestrator
+        run_make_cmd_mock = mocker.patch(
+            "src.api.lib.docker_management.Runner.run_make_cmd"
+        )
+
+        # EXECUTE
+        with pytest.raises(ComposeStartedError, match="YC-env1-mysql' is unhealthy"):
+            docker_mgmt.up_containers(env1_object)
+
+        # ASSERT
+        compose_mock.assert_called_once()
+        run_make_cmd_mock.assert_not_called()
+
     def test__down_containers__success(
         self, mocker: MockerFixture, docker_mgmt: DockerManagement, env1_object: Env
     ):
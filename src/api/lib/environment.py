@@ -3,6 +3,7 @@ from typing import Callable, List, Optional
 from pprint import pformat
 
 from src.api.constants import MIN_VALID_PROXY_PORT, MAX_VALID_PROXY_PORT
+from src.api.lib.compose_cache import compose_cache
 
 from src.common.types import KnownServerTypes
 from src.common.environment import Env, InvalidPortException
@@ -163,6 +164,7 @@ def generate_velocity_and_docker(env: Env):
     # Generate docker compose file
     gen = get_generator(GeneratorType.DOCKER_COMPOSE, env)
     gen.run()
+    compose_cache.invalidate(server_paths.get_generated_docker_compose_path(env.name))
 
     # Generate velocity file
     gen = get_generator(GeneratorType.VELOCITY_CONFIG, env)
@@ -0,0 +1,204 @@
+"""Caching transport for Google's OAuth2 signing certificates.
+
+`id_token.verify_oauth2_token()` fetches Google's certs through whatever `google.auth.transport.Request`
+it's handed. With a fresh `g_requests.Request()` per login, that's a cold HTTPS round trip every time.
+
+`CachedCertsRequest` is a drop in transport that serves GETs from a cache for as long as the upstream
+`Cache-Control: max-age` allows. Responses are also written to a file so every gunicorn worker shares a
+single fetch, and cache misses go through a pluggable fetcher, which by default reuses one `requests.Session`.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+from typing import Callable, Dict, Mapping, Optional
+
+from google.auth import transport  # type: ignore
+
+from src.common.logger_setup import logger
+
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+@dataclass
+class CachedResponse(transport.Response):
+    """`google.auth.transport.Response` backed by plain values so it can be cached and serialized"""
+
+    _status: int
+    _headers: Dict[str, str] = field(default_factory=dict)
+    _data: bytes = b""
+    expires_at: float = 0
+
+    @property
+    def status(self) -> int:
+        return self._status
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return self._headers
+
+    @property
+    def data(self) -> bytes:
+        return self._data
+
+    def to_json(self) -> Dict:
+        return {
+            "status": self._status,
+            "headers": self._headers,
+            "data": self._data.decode("utf-8"),
+            "expires_at": self.expires_at,
+        }
+
+    @classmethod
+    def from_json(cls, obj: Dict) -> "CachedResponse":
+        return cls(
+            _status=int(obj["status"]),
+            _headers=dict(obj["headers"]),
+            _data=obj["data"].encode("utf-8"),
+            expires_at=float(obj["expires_at"]),
+        )
+
+
+Fetcher = Callable[[str], CachedResponse]
+
+
+def cache_lifetime_secs(headers: Mapping[str, str]) -> int:
+    """Seconds a response may be cached for according to its `Cache-Control` and `Age` headers.
+
+    Returns 0 if the response must not be cached.
+    """
+    lowered = {k.lower(): v for k, v in headers.items()}
+    cache_control = lowered.get("cache-control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+
+    match = MAX_AGE_RE.search(cache_control)
+    if match is None:
+        return 0
+
+    try:
+        age = int(lowered.get("age", "0"))
+    except ValueError:
+        age = 0
+
+    return max(int(match.group(1)) - age, 0)
+
+
+def session_fetcher(timeout: float = 10) -> Fetcher:
+    """Default fetcher. Keeps a single `requests.Session` so connections to Google are reused between refreshes."""
+    import requests  # type: ignore
+
+    session = requests.Session()
+
+    def fetch(url: str) -> CachedResponse:
+        resp = session.get(url, timeout=timeout)
+        return CachedResponse(
+            _status=resp.status_code,
+            _headers=dict(resp.headers),
+            _data=resp.content,
+        )
+
+    return fetch
+
+
+class CachedCertsRequest(transport.Request):
+    """Transport for `id_token.verify_oauth2_token()` that caches GET responses per `Cache-Control`.
+
+    Args:
+        fetcher (Optional[Fetcher]): Called with the URL on a cache miss. Defaults to `session_fetcher()`.
+        cache_file (Optional[Path]): File shared between workers. Disabled when `None`.
+        now_fn (Callable[[], float]): Clock. Overridable for tests.
+    """
+
+    def __init__(
+        self,
+        fetcher: Optional[Fetcher] = None,
+        cache_file: Optional[Path] = None,
+        now_fn: Callable[[], float] = time.time,
+    ):
+        self._fetcher = fetcher
+        self.cache_file = cache_file
+        self.now_fn = now_fn
+        self._cache: Dict[str, CachedResponse] = {}
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    @property
+    def fetcher(self) -> Fetcher:
+        if self._fetcher is None:
+            self._fetcher = session_fetcher()
+        return self._fetcher
+
+    def __call__(
+        self, url, method="GET", body=None, headers=None, timeout=None, **kwargs
+    ):
+        if method != "GET" or body is not None:
+            raise ValueError(
+                f"CachedCertsRequest only supports bodiless GETs. Got {method} {url}"
+            )
+
+        cached = self._get_fresh(url)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            # Another greenlet may have refreshed it while we waited.
+            cached = self._get_fresh(url)
+            if cached is not None:
+                return cached
+
+            resp = self.fetcher(url)
+            self.fetches += 1
+            if resp.status == HTTPStatus.OK:
+                lifetime = cache_lifetime_secs(resp.headers)
+                if lifetime > 0:
+                    resp.expires_at = self.now_fn() + lifetime
+                    self._cache[url] = resp
+                    self._write_shared()
+            return resp
+
+    def _get_fresh(self, url: str) -> Optional[CachedResponse]:
+        now = self.now_fn()
+        cached = self._cache.get(url)
+        if cached is not None and cached.expires_at > now:
+            return cached
+
+        self._read_shared()
+        cached = self._cache.get(url)
+        if cached is not None and cached.expires_at > now:
+            return cached
+
+        return None
+
+    def _read_shared(self) -> None:
+        if self.cache_file is None or not self.cache_file.exists():
+            return
+        try:
+            entries = json.loads(self.cache_file.read_text())
+            for url, entry in entries.items():
+                resp = CachedResponse.from_json(entry)
+                current = self._cache.get(url)
+                if current is None or resp.expires_at > current.expires_at:
+                    self._cache[url] = resp
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning(f"Ignoring unreadable google cert cache '{self.cache_file}'")
+
+    def _write_shared(self) -> None:
+        if self.cache_file is None:
+            return
+        tmp_file = self.cache_file.with_name(
+            f".{self.cache_file.name}.{os.getpid()}.tmp"
+        )
+        try:
+            tmp_file.write_text(
+                json.dumps({url: resp.to_json() for url, resp in self._cache.items()})
+            )
+            os.replace(tmp_file, self.cache_file)
+        except OSError:
+            logger.warning(f"Could not write google cert cache '{self.cache_file}'")
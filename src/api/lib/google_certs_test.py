@@ -0,0 +1,105 @@
+import json
+
+import pytest  # type: ignore
+
+from src.api.lib.google_certs import (
+    CachedCertsRequest,
+    CachedResponse,
+    cache_lifetime_secs,
+)
+
+CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+LOCAL_KEY_SET = {"kid-1": "-----BEGIN CERTIFICATE-----\n...\n"}
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LocalKeySetFetcher:
+    def __init__(self, headers=None, status=200):
+        self.headers = headers or {"Cache-Control": "public, max-age=300"}
+        self.status = status
+        self.urls = []
+
+    def __call__(self, url: str) -> CachedResponse:
+        self.urls.append(url)
+        return CachedResponse(
+            _status=self.status,
+            _headers=dict(self.headers),
+            _data=json.dumps(LOCAL_KEY_SET).encode("utf-8"),
+        )
+
+
+class TestCacheLifetime:
+    @pytest.mark.parametrize(
+        "headers,expected",
+        [
+            ({"Cache-Control": "public, max-age=300"}, 300),
+            ({"cache-control": "public, max-age=300", "Age": "100"}, 200),
+            ({"Cache-Control": "no-store, max-age=300"}, 0),
+            ({"Cache-Control": "public"}, 0),
+            ({}, 0),
+        ],
+    )
+    def test_lifetime(self, headers, expected):
+        assert cache_lifetime_secs(headers) == expected
+
+
+class TestCachedCertsRequest:
+    def test_serves_from_cache_until_max_age(self):
+        clock = FakeClock()
+        fetcher = LocalKeySetFetcher()
+        request = CachedCertsRequest(fetcher=fetcher, now_fn=clock)
+
+        assert json.loads(request(CERTS_URL).data) == LOCAL_KEY_SET
+        clock.now += 299
+        request(CERTS_URL)
+        assert len(fetcher.urls) == 1
+
+        clock.now += 1
+        request(CERTS_URL)
+        assert len(fetcher.urls) == 2
+
+    def test_does_not_cache_failures(self):
+        fetcher = LocalKeySetFetcher(status=500)
+        request = CachedCertsRequest(fetcher=fetcher, now_fn=FakeClock())
+
+        assert request(CERTS_URL).status == 500
+        request(CERTS_URL)
+        assert len(fetcher.urls) == 2
+
+    def test_shares_cache_through_file(self, tmp_path):
+        clock = FakeClock()
+        cache_file = tmp_path / "certs.json"
+        first_fetcher, second_fetcher = LocalKeySetFetcher(), LocalKeySetFetcher()
+
+        CachedCertsRequest(fetcher=first_fetcher, cache_file=cache_file, now_fn=clock)(
+            CERTS_URL
+        )
+        resp = CachedCertsRequest(
+            fetcher=second_fetcher, cache_file=cache_file, now_fn=clock
+        )(CERTS_URL)
+
+        assert json.loads(resp.data) == LOCAL_KEY_SET
+        assert second_fetcher.urls == []
+
+    def test_ignores_corrupt_cache_file(self, tmp_path):
+        cache_file = tmp_path / "certs.json"
+        cache_file.write_text("{not json")
+        fetcher = LocalKeySetFetcher()
+
+        CachedCertsRequest(fetcher=fetcher, cache_file=cache_file, now_fn=FakeClock())(
+            CERTS_URL
+        )
+
+        assert len(fetcher.urls) == 1
+        assert CERTS_URL in json.loads(cache_file.read_text())
+
+    def test_rejects_non_get(self):
+        with pytest.raises(ValueError):
+            CachedCertsRequest(fetcher=LocalKeySetFetcher())(CERTS_URL, method="POST")
@@ -0,0 +1,248 @@
+"""Blocks until containers reach a target state, woken by Docker events instead of polling.
+
+After bringing a container up or restarting it, the dashboard used to poll `/active` until the health status flipped.
+`HealthWaiter` registers each waiting caller against the containers it cares about. `ContainerInventory` re-inspects
+a container on every lifecycle event, including `health_status: ...`, and the waiter's listener wakes only the
+callers waiting on that container, which then re-check its state.
+
+While the inventory isn't `ready` (events stream down or disabled) waiters fall back to asking Docker directly every
+`poll_interval_secs`.
+"""
+
+import threading
+import time
+
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+import docker  # type: ignore
+from docker import DockerClient
+from docker.models.containers import Container
+
+from src.api.lib import ContainerWaitResult
+from src.api.lib import structured_logging as slog
+from src.api.lib.container_inventory import ContainerInventory
+from src.api.lib.metrics import metrics
+
+TARGET_RUNNING = "running"
+TARGET_HEALTHY = "healthy"
+TARGET_STOPPED = "stopped"
+TARGET_STATES = (TARGET_RUNNING, TARGET_HEALTHY, TARGET_STOPPED)
+
+OUTCOME_REACHED = "reached"
+OUTCOME_FAILED = "failed"
+OUTCOME_TIMED_OUT = "timed_out"
+
+STOPPED_STATUSES = ("created", "exited", "dead")
+
+
+def container_state(
+    container: Optional[Container],
+) -> Tuple[Optional[str], Optional[str]]:
+    """`(status, health)` of a container. Both `None` if it doesn't exist; `health` is `None` without a healthcheck."""
+    if container is None:
+        return None, None
+    state = container.attrs.get("State", {})
+    return state.get("Status"), (state.get("Health") or {}).get("Status")
+
+
+def check_target(container: Optional[Container], target: str) -> Optional[str]:
+    """Whether `container` has reached `target`
+
+    Returns:
+        Optional[str]: `OUTCOME_REACHED`, `OUTCOME_FAILED` if it can't get there without outside help, or `None` if it's
+            still on its way. A container that doesn't exist yet is still on its way to running.
+    """
+    status, health = container_state(container)
+    if target == TARGET_STOPPED:
+        return OUTCOME_REACHED if status is None or status in STOPPED_STATUSES else None
+
+    if status in ("exited", "dead") or health == "unhealthy":
+        return OUTCOME_FAILED
+    if status != "running":
+        return None
+    if target == TARGET_RUNNING:
+        return OUTCOME_REACHED
+    # Containers without a healthcheck are as healthy as they'll ever be once running.
+    return OUTCOME_REACHED if health in (None, "healthy") else None
+
+
+def started_at_ts(container: Container) -> Optional[float]:
+    started_at = container.attrs.get("State", {}).get("StartedAt")
+    if not started_at or started_at.startswith("0001-"):
+        return None
+    # Same truncation as `convert_dockerpy_container_to_legacy_active_container()`: fromisoformat() can't take nanoseconds.
+    seconds, _, fraction = started_at.rstrip("Z").partition(".")
+    try:
+        ts = datetime.fromisoformat(seconds + "+00:00").timestamp()
+    except ValueError:
+        return None
+    return ts + float(f"0.{fraction[:6] or 0}")
+
+
+class HealthWaiter:
+    """Waits for containers to reach a target state
+
+    Args:
+        inventory (ContainerInventory): Container inventory. Register `on_container_event` as one of its listeners.
+        client (DockerClient): Docker client, used while the inventory isn't ready
+        poll_interval_secs (float): Re-check interval while the inventory isn't ready
+    """
+
+    def __init__(
+        self,
+        inventory: ContainerInventory,
+        client: DockerClient,
+        poll_interval_secs: float = 5,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.inventory = inventory
+        self.client = client
+        self.poll_interval_secs = poll_interval_secs
+        self.clock = clock
+
+        self._waiters: Dict[str, Set[threading.Event]] = {}
+        self._lock = threading.Lock()
+
+    def on_container_event(
+        self, action: str, container_id: str, container: Optional[Container]
+    ) -> None:
+        """`ContainerInventory` listener"""
+        with self._lock:
+            if container is not None:
+                wakes = set(self._waiters.get(container.name, ()))
+            else:
+                # Removed, so we no longer know its name. Rare enough to just wake everyone.
+                wakes = set().union(*self._waiters.values())
+        for wake in wakes:
+            wake.set()
+
+    def wait(
+        self, container_names: Iterable[str], target: str, timeout_secs: float
+    ) -> Dict[str, ContainerWaitResult]:
+        """Blocks until every container has reached `target` or failed, or `timeout_secs` passes
+
+        Returns:
+            Dict[str, ContainerWaitResult]: Result per container name
+        """
+        if target not in TARGET_STATES:
+            raise ValueError(f"Unknown target state '{target}'")
+
+        container_names = list(container_names)
+        start = self.clock()
+        deadline = start + timeout_secs
+        pending = set(container_names)
+        results: Dict[str, ContainerWaitResult] = {}
+        wake = threading.Event()
+        first_check = True
+        recovering: Set[str] = set()
+
+        # Register before the first check so an event between the two can't be missed.
+        with self._lock:
+            for container_name in pending:
+                self._waiters.setdefault(container_name, set()).add(wake)
+        try:
+            while True:
+                wake.clear()
+                for container_name in list(pending):
+                    container = self._lookup(container_name)
+                    outcome = check_target(container, target)
+                    if outcome == OUTCOME_FAILED and container_name not in recovering:
+                        # Exited or unhealthy from before we started waiting. It may be about to be (re)started, so
+                        # only count it as failed once we've seen it on its way.
+                        continue
+                    if outcome is None:
+                        recovering.add(container_name)
+                    else:
+                        pending.discard(container_name)
+                        results[container_name] = self._result(
+                            container_name,
+                            container,
+                            target,
+                            outcome,
+                            start,
+                            transitioned=not first_check,
+                        )
+                first_check = False
+
+                remaining = deadline - self.clock()
+                if not pending or remaining <= 0:
+                    break
+                wake.wait(
+                    remaining
+                    if self.inventory.ready
+                    else min(remaining, self.poll_interval_secs)
+                )
+        finally:
+            with self._lock:
+                for container_name in container_names:
+                    waiters = self._waiters.get(container_name)
+                    if waiters is None:
+                        continue
+                    waiters.discard(wake)
+                    if not waiters:
+                        del self._waiters[container_name]
+
+        for container_name in pending:
+            status, health = container_state(self._lookup(container_name))
+            results[container_name] = ContainerWaitResult(
+                outcome=OUTCOME_TIMED_OUT,
+                status=status,
+                health=health,
+                elapsed_secs=self.clock() - start,
+                error=f"Not {target} after {timeout_secs}s",
+            )
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "containers": len(self._waiters),
+                "waiters": len(set().union(*self._waiters.values())),
+            }
+
+    def _lookup(self, container_name: str) -> Optional[Container]:
+        if self.inventory.ready:
+            return self.inventory.get(container_name)
+        try:
+            return self.client.containers.get(container_name)
+        except docker.errors.NotFound:
+            return None
+
+    def _result(
+        self,
+        container_name: str,
+        container: Optional[Container],
+        target: str,
+        outcome: str,
+        start: float,
+        transitioned: bool,
+    ) -> ContainerWaitResult:
+        now = self.clock()
+        status, health = container_state(container)
+        result = ContainerWaitResult(
+            outcome=outcome,
+            status=status,
+            health=health,
+            elapsed_secs=now - start,
+        )
+        if outcome == OUTCOME_FAILED:
+            result.error = (
+                f"'{container_name}' is {health if health == 'unhealthy' else status}"
+            )
+        elif transitioned and container is not None and target != TARGET_STOPPED:
+            # Only meaningful if we saw it happen. A container that was healthy an hour ago isn't slow to start.
+            started_at = started_at_ts(container)
+            if started_at is not None:
+                result.secs_since_start = max(now - started_at, 0.0)
+                metrics.observe(f"containers.time_to_{target}", result.secs_since_start)
+
+        slog.info(
+            "health_waiter.resolved",
+            container=container_name,
+            target=target,
+            outcome=outcome,
+            elapsed_secs=result.elapsed_secs,
+            secs_since_start=result.secs_since_start,
+        )
+        return result
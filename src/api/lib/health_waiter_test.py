@@ -0,0 +1,195 @@
+import threading
+import time
+
+from unittest.mock import MagicMock
+
+import docker
+import pytest
+
+from src.api.lib.health_waiter import (
+    OUTCOME_FAILED,
+    OUTCOME_REACHED,
+    OUTCOME_TIMED_OUT,
+    HealthWaiter,
+    check_target,
+    started_at_ts,
+)
+
+
+def make_container(name, status="running", health=None, started_at=None):
+    container = MagicMock()
+    container.name = name
+    state = {"Status": status}
+    if health is not None:
+        state["Health"] = {"Status": health}
+    if started_at is not None:
+        state["StartedAt"] = started_at
+    container.attrs = {"State": state}
+    return container
+
+
+class CountingClock:
+    """Fixed clock that counts reads. `HealthWaiter.wait()` reads it once before and once after its first check."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.now
+
+    def wait_for_first_check(self):
+        while self.reads < 2:
+            time.sleep(0.01)
+
+
+class FakeInventory:
+    def __init__(self, *containers):
+        self.ready = True
+        self.containers = {c.name: c for c in containers}
+
+    def get(self, name):
+        return self.containers.get(name)
+
+
+@pytest.mark.parametrize(
+    "status, health, target, expected",
+    [
+        ("running", "healthy", "healthy", OUTCOME_REACHED),
+        ("running", None, "healthy", OUTCOME_REACHED),
+        ("running", "starting", "healthy", None),
+        ("running", "starting", "running", OUTCOME_REACHED),
+        ("running", "unhealthy", "healthy", OUTCOME_FAILED),
+        ("exited", None, "running", OUTCOME_FAILED),
+        ("restarting", None, "running", None),
+        ("exited", None, "stopped", OUTCOME_REACHED),
+        ("running", "healthy", "stopped", None),
+    ],
+)
+def test_check_target(status, health, target, expected):
+    assert check_target(make_container("c", status, health), target) == expected
+
+
+def test_check_target_missing_container():
+    assert check_target(None, "healthy") is None
+    assert check_target(None, "stopped") == OUTCOME_REACHED
+
+
+def test_started_at_ts_truncates_nanoseconds():
+    # SETUP
+    container = make_container("c", started_at="2024-02-11T22:16:57.510507768Z")
+
+    # EXECUTE
+    ts = started_at_ts(container)
+
+    # ASSERT
+    assert ts == pytest.approx(1707689817.510507)
+
+
+def test_wait_resolves_on_health_event():
+    # SETUP
+    container = make_container(
+        "YC-dev-survival", health="starting", started_at="2024-02-11T22:16:57Z"
+    )
+    inventory = FakeInventory(container)
+    clock = CountingClock(1707689877.0)
+    waiter = HealthWaiter(inventory, MagicMock(), clock=clock)
+
+    def become_healthy():
+        clock.wait_for_first_check()
+        container.attrs["State"]["Health"]["Status"] = "healthy"
+        waiter.on_container_event("health_status: healthy", "id", container)
+
+    thread = threading.Thread(target=become_healthy)
+    thread.start()
+
+    # EXECUTE
+    results = waiter.wait(["YC-dev-survival"], "healthy", timeout_secs=5)
+    thread.join()
+
+    # ASSERT
+    result = results["YC-dev-survival"]
+    assert result.outcome == OUTCOME_REACHED
+    assert result.health == "healthy"
+    assert result.secs_since_start == 60
+    assert waiter.stats() == {"containers": 0, "waiters": 0}
+
+
+def test_wait_already_reached_has_no_time_to_healthy():
+    # SETUP
+    container = make_container(
+        "YC-dev-survival", health="healthy", started_at="2024-02-11T22:16:57Z"
+    )
+    waiter = HealthWaiter(FakeInventory(container), MagicMock())
+
+    # EXECUTE
+    results = waiter.wait(["YC-dev-survival"], "healthy", timeout_secs=5)
+
+    # ASSERT
+    assert results["YC-dev-survival"].outcome == OUTCOME_REACHED
+    assert results["YC-dev-survival"].secs_since_start is None
+
+
+def test_wait_times_out_and_ignores_stale_failure():
+    """A container that was already exited may be about to start, so it times out rather than failing"""
+    # SETUP
+    now = [0.0]
+    waiter = HealthWaiter(
+        FakeInventory(make_container("YC-dev-lobby", status="exited")),
+        MagicMock(),
+        clock=lambda: now[0],
+    )
+
+    def advance(*args):
+        now[0] += 10
+        return False
+
+    # EXECUTE
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(threading.Event, "wait", lambda self, timeout=None: advance())
+        results = waiter.wait(["YC-dev-lobby"], "healthy", timeout_secs=5)
+
+    # ASSERT
+    assert results["YC-dev-lobby"].outcome == OUTCOME_TIMED_OUT
+    assert results["YC-dev-lobby"].status == "exited"
+
+
+def test_wait_fails_after_seeing_container_start():
+    # SETUP
+    container = make_container("YC-dev-survival", health="starting")
+    inventory = FakeInventory(container)
+    clock = CountingClock()
+    waiter = HealthWaiter(inventory, MagicMock(), clock=clock)
+
+    def crash():
+        clock.wait_for_first_check()
+        container.attrs["State"] = {"Status": "exited"}
+        waiter.on_container_event("die", "id", container)
+
+    thread = threading.Thread(target=crash)
+    thread.start()
+
+    # EXECUTE
+    results = waiter.wait(["YC-dev-survival"], "healthy", timeout_secs=5)
+    thread.join()
+
+    # ASSERT
+    assert results["YC-dev-survival"].outcome == OUTCOME_FAILED
+    assert "exited" in results["YC-dev-survival"].error
+
+
+def test_wait_asks_docker_while_inventory_is_not_ready():
+    # SETUP
+    inventory = FakeInventory()
+    inventory.ready = False
+    client = MagicMock()
+    client.containers.get.side_effect = docker.errors.NotFound("gone")
+    waiter = HealthWaiter(inventory, client)
+
+    # EXECUTE
+    results = waiter.wait(["YC-dev-survival"], "stopped", timeout_secs=5)
+
+    # ASSERT
+    assert results["YC-dev-survival"].outcome == OUTCOME_REACHED
+    client.containers.get.assert_called_with("YC-dev-survival")
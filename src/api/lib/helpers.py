@@ -1,3 +1,4 @@
+import logging
 import os
 import re
 import pwd
@@ -6,10 +7,10 @@ from docker.models.containers import Container
 
 from typing import Callable, Optional
 from functools import wraps
-from collections import OrderedDict
-from pprint import pformat
 from flask import request
-from src.api.constants import HOST_PASSWD  # type: ignore
+from src.api.constants import HOST_PASSWD, LOG_REQUEST_SAMPLE_EVERY  # type: ignore
+from src.api.lib import structured_logging as slog
+from src.common.constants import YC_CONTAINER_TYPE_LABEL
 from src.common.helpers import log_exception
 from src.common.logger_setup import logger
 
@@ -21,39 +22,37 @@ class InvalidContainerNameError(Exception):
 def log_request(func: Callable) -> Callable:
     """Decorator for logging funcname and *args/**kwargs
 
+    Logged at INFO with credentials redacted. Nothing is formatted unless INFO is enabled, and handlers listed in
+    `LOG_REQUEST_SAMPLE_EVERY` are only logged once every N invocations.
+
     Args:
         func (Callable): Function to be decorated.
 
     Returns:
         Callable: Decorated function
     """
+    should_log = slog.Sampler(LOG_REQUEST_SAMPLE_EVERY.get(func.__name__, 1))
 
     @wraps(func)
     def decorated_function(*args, **kwargs):
-        request_json = None
-        try:
-            if request.is_json:
-                request_json = request.get_json()
-        except Exception:
-            log_exception(
-                message="Failed to get json from request object",
-                data={"request": request},
-            )
-
-        logger.info(
-            "\n\n"
-            + pformat(
-                OrderedDict(
-                    {
-                        "msg": "Logging Func Invocation:",
-                        "funcname": func.__name__,
-                        "args": args,
-                        "kwargs": kwargs,
-                        "request_json": request_json,
-                    }
+        if logger.isEnabledFor(logging.INFO) and should_log():
+            request_json = None
+            try:
+                if request.is_json:
+                    request_json = request.get_json()
+            except Exception:
+                log_exception(
+                    message="Failed to get json from request object",
+                    data={"request": request},
                 )
+
+            slog.info(
+                "Logging Func Invocation:",
+                funcname=func.__name__,
+                args=args,
+                kwargs=kwargs,
+                request_json=request_json,
             )
-        )
         return func(*args, **kwargs)
 
     return decorated_function
@@ -117,6 +116,10 @@ def container_name_to_container(
         )
 
 
+def is_minecraft_container(container: Container) -> bool:
+    return container.labels.get(YC_CONTAINER_TYPE_LABEL) == "minecraft"
+
+
 PASSWD_RE = r"\n(?P<user>[^:]+):\w+:{uid}:\d+:.*\n"
 
 
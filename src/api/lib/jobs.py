@@ -0,0 +1,395 @@
+"""Runs long operations (cluster up/down, backups, restores) off the request path.
+
+`JobManager.submit()` records a `Job` row and returns straight away; a bounded pool of worker threads (greenlets
+under gunicorn's gevent workers) runs the job and writes its status, progress and result back to the row. Because
+state lives in the DB, any gunicorn worker can answer `/jobs/<id>`, not just the one running the job. Every state
+change is also pushed to authenticated Socket.IO clients as a `job` event.
+
+Jobs declare the resources they touch. A resource is held by at most one unfinished job at a time, across every
+worker: locks are `JobLock` rows keyed by resource, so a second insert for the same resource fails atomically.
+
+A job only ever runs in the worker that accepted it, which renews the job's lease every `heartbeat_secs` while the
+job is unfinished. If that worker dies, or its whole container is recreated, nothing renews the lease, and the next
+sweep by any worker fails the job and releases its locks.
+"""
+
+import json
+import os
+import random
+import socket
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from flask import Flask  # type: ignore
+from sqlalchemy import or_  # type: ignore
+from sqlalchemy.exc import IntegrityError  # type: ignore
+
+from src.api.constants import (
+    JOB_HEARTBEAT_SECS,
+    JOB_LEASE_SECS,
+    JOB_MAX_WORKERS,
+    JOB_PROGRESS_INTERVAL_SECS,
+)
+from src.api.db import db
+from src.api.lib import structured_logging as slog
+from src.api.lib.metrics import metrics
+from src.api.lib.sockets import AUTHED_ROOM, socketio
+from src.api.models import Job, JobLock
+from src.common.environment import Env
+from src.common.helpers import log_exception
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+UNFINISHED_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+JOB_EVENT = "job"
+
+
+class JobNotFoundError(Exception):
+    pass
+
+
+class ResourceBusyError(Exception):
+    def __init__(self, resource: str, job_id: Optional[str]):
+        super().__init__(f"'{resource}' is busy with job '{job_id}'")
+        self.resource = resource
+        self.job_id = job_id
+
+
+def env_resources(env: Env) -> List[str]:
+    """Resources held by jobs that affect a whole env. Covers each world group so per-world-group jobs conflict too."""
+    return [env.name] + world_group_resources(env, *env.world_groups)
+
+
+def world_group_resources(env: Env, *world_groups: str) -> List[str]:
+    return [f"{env.name}/{world_group}" for world_group in world_groups]
+
+
+def job_to_dict(job: Job) -> Dict[str, Any]:
+    data = job.to_dict()
+    data["resources"] = job.resources.split(",") if job.resources else []
+    data["details"] = json.loads(job.details) if job.details is not None else None
+    data["result"] = json.loads(job.result) if job.result is not None else None
+    return data
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobContext:
+    """Handed to every job function so it can report progress.
+
+    DB writes and events are throttled to one per `progress_interval_secs`, except for the final 100%.
+    """
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self.manager = manager
+        self.job_id = job_id
+        self._last_report = 0.0
+
+    def progress(
+        self,
+        fraction: Optional[float] = None,
+        message: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        now = self.manager.clock()
+        if (
+            now - self._last_report < self.manager.progress_interval_secs
+            and fraction != 1.0
+        ):
+            return
+        self._last_report = now
+
+        try:
+            job = db.session.get(Job, self.job_id)
+            if fraction is not None:
+                job.progress = max(0.0, min(1.0, fraction))
+            if message is not None:
+                job.message = message[:512]
+            if details is not None:
+                job.details = json.dumps(details)
+            db.session.commit()
+        except Exception:
+            # Leave the session usable for the next update and the job's result.
+            db.session.rollback()
+            raise
+        self.manager.publish(job)
+
+
+JobFunction = Callable[..., Any]
+"""Called with a `JobContext` followed by the `kwargs` given to `submit()`. Must return something JSON serializable."""
+
+
+class JobManager:
+    """Submits, runs and tracks `Job`s
+
+    Args:
+        max_workers (int): Jobs run concurrently in this worker process. Further jobs queue.
+        emit (Optional[Callable]): `socketio.emit`, bound to the authenticated room. Called with `("job", job_dict)` on
+            every state change.
+        progress_interval_secs (float): Minimum time between progress writes per job.
+        heartbeat_secs (float): Time between lease renewals and sweeps for expired jobs.
+        lease_secs (float): How long a job's lease lasts past each renewal. Must be well over `heartbeat_secs`.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        emit: Optional[Callable[[str, Dict], None]] = None,
+        progress_interval_secs: float = 1.0,
+        heartbeat_secs: float = 30,
+        lease_secs: float = 120,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_workers = max_workers
+        self.emit = emit
+        self.progress_interval_secs = progress_interval_secs
+        self.heartbeat_secs = heartbeat_secs
+        self.lease_secs = lease_secs
+        self.clock = clock
+        self.app: Optional[Flask] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="yc-job"
+        )
+        # Ids of unfinished jobs submitted to this process, whose leases it renews
+        self._owned: Set[str] = set()
+
+    def init_app(self, app: Flask) -> None:
+        self.app = app
+        with app.app_context():
+            self.fail_orphaned_jobs()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    # -----------
+    # Submission
+    # -----------
+
+    def submit(
+        self,
+        kind: str,
+        fn: JobFunction,
+        resources: Iterable[str] = (),
+        user: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Job:
+        """Records a queued job, takes its resource locks and hands it to the worker pool.
+
+        Must be called inside an app context.
+
+        Raises:
+            ResourceBusyError: If an unfinished job already holds one of `resources`.
+        """
+        if self.app is None:
+            raise RuntimeError("JobManager.init_app() was never called!")
+
+        resources = sorted(set(resources))
+        job = Job(
+            id=os.urandom(16).hex(),
+            kind=kind,
+            resources=",".join(resources),
+            status=JOB_QUEUED,
+            user=user,
+            owner=worker_id(),
+            created_at=int(self.clock()),
+            lease_expires_at=int(self.clock() + self.lease_secs),
+        )
+        db.session.add(job)
+        for resource in resources:
+            db.session.add(JobLock(resource=resource, job_id=job.id))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            holder = (
+                db.session.query(JobLock)
+                .filter(JobLock.resource.in_(resources))
+                .first()
+            )
+            if holder is None:
+                # Released between our insert and the lookup. Let the caller retry.
+                raise ResourceBusyError(",".join(resources), None)
+            raise ResourceBusyError(holder.resource, holder.job_id)
+
+        metrics.inc(f"jobs.{kind}.submitted")
+        slog.info("job.submitted", job_id=job.id, kind=kind, resources=resources)
+        self.publish(job)
+        self._owned.add(job.id)
+        self._executor.submit(self._run, job.id, fn, kwargs)
+        return job
+
+    # -----------
+    # Reads
+    # -----------
+
+    def get(self, job_id: str) -> Job:
+        job = db.session.get(Job, job_id)
+        if job is None:
+            raise JobNotFoundError(job_id)
+        return job
+
+    def list_jobs(
+        self,
+        limit: int = 50,
+        status: Optional[str] = None,
+        kind: Optional[str] = None,
+    ) -> List[Job]:
+        query = db.session.query(Job)
+        if status is not None:
+            query = query.filter(Job.status == status)
+        if kind is not None:
+            query = query.filter(Job.kind == kind)
+        return query.order_by(Job.created_at.desc()).limit(limit).all()
+
+    # -----------
+    # Execution
+    # -----------
+
+    def publish(self, job: Job) -> None:
+        if self.emit is None:
+            return
+        try:
+            self.emit(JOB_EVENT, job_to_dict(job))
+        except Exception:
+            log_exception(message="Failed to emit job update!", data={"job": job.id})
+
+    def _run(self, job_id: str, fn: JobFunction, kwargs: Dict[str, Any]) -> None:
+        try:
+            self._run_job(job_id, fn, kwargs)
+        except Exception:
+            # Executor futures swallow exceptions; this is the only place a DB outage here would surface.
+            log_exception(message="Job runner crashed!", data={"job": job_id})
+        finally:
+            self._owned.discard(job_id)
+
+    def _run_job(self, job_id: str, fn: JobFunction, kwargs: Dict[str, Any]) -> None:
+        with self.app.app_context():  # type: ignore
+            job = db.session.get(Job, job_id)
+            job.status = JOB_RUNNING
+            job.started_at = int(self.clock())
+            db.session.commit()
+            self.publish(job)
+
+            try:
+                with metrics.timer(f"jobs.{job.kind}.duration"):
+                    result = fn(JobContext(self, job_id), **kwargs)
+                job = db.session.get(Job, job_id)
+                job.result = json.dumps(result, default=str)
+                job.status = JOB_SUCCEEDED
+                job.progress = 1.0
+            except Exception as e:
+                log_exception(
+                    message="Job failed!", data={"job": job_id, "kind": job.kind}
+                )
+                db.session.rollback()
+                job = db.session.get(Job, job_id)
+                job.status = JOB_FAILED
+                job.error = f"{type(e).__name__}: {e}"
+
+            job.finished_at = int(self.clock())
+            db.session.query(JobLock).filter(JobLock.job_id == job_id).delete()
+            db.session.commit()
+
+            metrics.inc(f"jobs.{job.kind}.{job.status}")
+            slog.info(
+                "job.finished",
+                job_id=job_id,
+                kind=job.kind,
+                status=job.status,
+                secs=job.finished_at - job.started_at,
+            )
+            self.publish(job)
+
+    # -----------
+    # Leases
+    # -----------
+
+    def renew_leases(self) -> int:
+        """Extends the lease of every unfinished job this process runs. Must be called inside an app context.
+
+        Returns:
+            int: Number of leases renewed
+        """
+        owned = list(self._owned)
+        if not owned:
+            return 0
+        renewed = (
+            db.session.query(Job)
+            .filter(Job.id.in_(owned), Job.status.in_(UNFINISHED_STATUSES))
+            .update(
+                {Job.lease_expires_at: int(self.clock() + self.lease_secs)},
+                synchronize_session=False,
+            )
+        )
+        db.session.commit()
+        return renewed
+
+    def fail_orphaned_jobs(self) -> int:
+        """Fails unfinished jobs whose lease has expired, releasing their locks. Must be called inside an app context.
+
+        Jobs only run in the worker that accepted them, and a live worker renews their leases, so nothing will ever
+        finish these. Doesn't care which host or pid owned them: containers get new hostnames when recreated, and pids
+        are reused.
+
+        Returns:
+            int: Number of jobs failed
+        """
+        now = int(self.clock())
+        orphans = [
+            job
+            for job in db.session.query(Job).filter(
+                Job.status.in_(UNFINISHED_STATUSES),
+                # Jobs from before leases existed have none.
+                or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now),
+            )
+            # Still running here, just late renewing.
+            if job.id not in self._owned
+        ]
+        for job in orphans:
+            job.status = JOB_FAILED
+            job.error = f"Worker {job.owner} stopped renewing the job's lease before it finished"
+            job.finished_at = now
+            db.session.query(JobLock).filter(JobLock.job_id == job.id).delete()
+        db.session.commit()
+        if orphans:
+            metrics.inc("jobs.orphans_failed", len(orphans))
+            slog.warning("job.orphans_failed", job_ids=[job.id for job in orphans])
+        for job in orphans:
+            self.publish(job)
+        return len(orphans)
+
+    def run_forever(self, app, sleep=time.sleep, iterations: Optional[int] = None):
+        """Lease loop: renews this process's leases, then fails jobs whose lease ran out. Meant to be started with
+        `socketio.start_background_task()`."""
+        while iterations is None or iterations > 0:
+            sleep(self.heartbeat_secs * (1 + random.uniform(0, 0.1)))
+            with app.app_context():
+                try:
+                    self.renew_leases()
+                    self.fail_orphaned_jobs()
+                except Exception:
+                    db.session.rollback()
+                    log_exception(message="Failed to renew or sweep job leases!")
+                finally:
+                    db.session.remove()
+
+            if iterations is not None:
+                iterations -= 1
+
+
+job_manager = JobManager(
+    max_workers=JOB_MAX_WORKERS,
+    # Jobs carry env and world names, snapshot ids and errors. Only for authenticated sockets.
+    emit=partial(socketio.emit, to=AUTHED_ROOM),
+    progress_interval_secs=JOB_PROGRESS_INTERVAL_SECS,
+    heartbeat_secs=JOB_HEARTBEAT_SECS,
+    lease_secs=JOB_LEASE_SECS,
+)
@@ -0,0 +1,231 @@
+import json
+import threading
+
+import flask  # type: ignore
+import pytest  # type: ignore
+
+from src.api.db import db
+from src.api.lib.jobs import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    JobManager,
+    JobNotFoundError,
+    ResourceBusyError,
+    env_resources,
+    world_group_resources,
+)
+from src.api.models import Job, JobLock
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = flask.Flask(__name__)
+    # In-memory SQLite shares one connection between threads, so job threads could commit the test's transaction.
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/jobs.db"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def manager(app, events):
+    manager = JobManager(
+        max_workers=2,
+        emit=lambda event, data: events.append((event, data)),
+        progress_interval_secs=0,
+    )
+    manager.init_app(app)
+    yield manager
+    manager.shutdown()
+
+
+@pytest.fixture
+def env(mocker):
+    env = mocker.MagicMock()
+    env.name = "env1"
+    env.world_groups = ["lobby", "survival"]
+    return env
+
+
+def refresh(job_id):
+    db.session.expire_all()
+    return db.session.get(Job, job_id)
+
+
+class TestJobManager:
+    def test_submit_runs_job_and_records_result(self, manager, events):
+        def fn(job, a, b):
+            job.progress(0.5, "halfway")
+            return {"sum": a + b}
+
+        job_id = manager.submit("add", fn, resources=["env1"], a=1, b=2).id
+        manager.shutdown()
+
+        job = refresh(job_id)
+        assert job.status == JOB_SUCCEEDED
+        assert json.loads(job.result) == {"sum": 3}
+        assert job.progress == 1.0
+        assert job.message == "halfway"
+        assert db.session.query(JobLock).count() == 0, "Locks must be released"
+        assert [data["status"] for _, data in events] == [
+            JOB_QUEUED,
+            JOB_RUNNING,
+            JOB_RUNNING,
+            JOB_SUCCEEDED,
+        ]
+        assert events[1][1]["resources"] == ["env1"]
+
+    def test_failed_job_records_error_and_releases_locks(self, manager):
+        def fn(job):
+            raise RuntimeError("restic exploded")
+
+        job_id = manager.submit("boom", fn, resources=["env1/lobby"]).id
+        manager.shutdown()
+
+        job = refresh(job_id)
+        assert job.status == JOB_FAILED
+        assert job.error == "RuntimeError: restic exploded"
+        assert db.session.query(JobLock).count() == 0
+
+    def test_busy_resource_is_rejected(self, manager, env):
+        release = threading.Event()
+        first = manager.submit(
+            "cluster_up", lambda job: release.wait(5), resources=env_resources(env)
+        ).id
+
+        try:
+            with pytest.raises(ResourceBusyError) as e:
+                manager.submit(
+                    "backup_create",
+                    lambda job: None,
+                    resources=world_group_resources(env, "lobby"),
+                )
+            assert e.value.job_id == first
+            assert e.value.resource == "env1/lobby"
+        finally:
+            release.set()
+        manager.shutdown()
+
+        # Released once the first job finished
+        assert db.session.query(Job).count() == 1
+        assert refresh(first).status == JOB_SUCCEEDED
+
+    def test_unrelated_resources_run_concurrently(self, manager, env):
+        barrier = threading.Barrier(2, timeout=5)
+
+        ids = [
+            manager.submit(
+                "backup_create",
+                lambda job: barrier.wait(),
+                resources=world_group_resources(env, world_group),
+            ).id
+            for world_group in env.world_groups
+        ]
+        manager.shutdown()
+
+        assert [refresh(job_id).status for job_id in ids] == [JOB_SUCCEEDED] * 2
+
+    def test_get_unknown_job(self, manager):
+        with pytest.raises(JobNotFoundError):
+            manager.get("nope")
+
+    def test_list_jobs_newest_first(self, manager):
+        for i in range(3):
+            db.session.add(
+                Job(id=f"job{i}", kind="k", status=JOB_SUCCEEDED, created_at=i)
+            )
+        db.session.commit()
+
+        assert [job.id for job in manager.list_jobs(limit=2)] == ["job2", "job1"]
+
+    def test_jobs_with_expired_leases_are_failed(self, app):
+        # Whatever host or pid owned them: the API container may have been recreated since.
+        for job_id, lease_expires_at in (
+            ("dead", 99),
+            ("legacy", None),
+            ("alive", 101),
+        ):
+            db.session.add(
+                Job(
+                    id=job_id,
+                    kind="k",
+                    status=JOB_RUNNING,
+                    owner="yc-api-old:1",
+                    created_at=0,
+                    lease_expires_at=lease_expires_at,
+                )
+            )
+            db.session.add(JobLock(resource=f"env1/{job_id}", job_id=job_id))
+        db.session.commit()
+        events = []
+
+        failed = JobManager(
+            emit=lambda event, data: events.append(data), clock=lambda: 100
+        ).fail_orphaned_jobs()
+
+        assert failed == 2
+        assert refresh("dead").status == JOB_FAILED
+        assert refresh("legacy").status == JOB_FAILED
+        assert refresh("alive").status == JOB_RUNNING
+        assert [lock.job_id for lock in db.session.query(JobLock)] == ["alive"]
+        assert sorted(data["id"] for data in events) == ["dead", "legacy"]
+
+    def test_running_jobs_keep_renewing_their_lease(self, app, events):
+        now = [1000.0]
+        manager = JobManager(
+            emit=lambda event, data: events.append((event, data)),
+            progress_interval_secs=0,
+            lease_secs=120,
+            clock=lambda: now[0],
+        )
+        manager.init_app(app)
+        release = threading.Event()
+        job_id = manager.submit("k", lambda job: release.wait(5), resources=["env1"]).id
+
+        try:
+            now[0] += 100
+            assert manager.renew_leases() == 1
+            now[0] += 100
+            # Past the lease taken at submission, but renewed since
+            assert manager.fail_orphaned_jobs() == 0
+            assert refresh(job_id).lease_expires_at == 1220
+        finally:
+            release.set()
+        manager.shutdown()
+
+        assert refresh(job_id).status == JOB_SUCCEEDED
+        assert manager.renew_leases() == 0
+
+    def test_run_forever_survives_db_errors(self, app, mocker):
+        manager = JobManager()
+        mocker.patch.object(
+            manager, "renew_leases", side_effect=RuntimeError("db down")
+        )
+        sleep = mocker.MagicMock()
+
+        manager.run_forever(app, sleep=sleep, iterations=2)
+
+        assert manager.renew_leases.call_count == 2
+        assert sleep.call_count == 2
+
+    def test_progress_details_are_recorded_and_published(self, manager, events):
+        def fn(job):
+            job.progress(0.25, "Restoring", details={"bytes_done": 1024})
+            return None
+
+        job_id = manager.submit("backup_restore", fn, resources=["env1"]).id
+        manager.shutdown()
+
+        assert json.loads(refresh(job_id).details) == {"bytes_done": 1024}
+        assert events[2][1]["details"] == {"bytes_done": 1024}
+        assert events[2][1]["progress"] == 0.25
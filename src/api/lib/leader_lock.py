@@ -0,0 +1,45 @@
+"""Elects one gunicorn worker to run a background task that must not run in every worker at once.
+
+Workers don't share memory, but they do share a filesystem. Whichever worker takes an exclusive `flock` on the
+lock file first is the leader until its process exits, at which point the kernel releases the lock and the next
+worker to try takes over.
+"""
+
+import fcntl
+import os
+
+from pathlib import Path
+from typing import Optional
+
+from src.api.lib import structured_logging as slog
+
+
+class LeaderLock:
+    """Exclusive, non-blocking `flock` on a file, held until the process exits
+
+    Args:
+        path (Path): Lock file. Every worker must use the same one.
+        name (str): What the leader runs. Logged as `<name>.leader` on election.
+    """
+
+    def __init__(self, path: Path, name: str = "leader_lock"):
+        self.path = path
+        self.name = name
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        slog.info(f"{self.name}.leader", pid=os.getpid())
+        return True
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
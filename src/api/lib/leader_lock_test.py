@@ -0,0 +1,13 @@
+from src.api.lib.leader_lock import LeaderLock
+
+
+def test_only_one_leader(tmp_path):
+    # SETUP
+    first = LeaderLock(tmp_path / "leader.lock")
+    second = LeaderLock(tmp_path / "leader.lock")
+
+    # EXECUTE / ASSERT
+    assert first.acquire() is True
+    assert second.acquire() is False
+    assert first.acquire() is True
+    assert first.held and not second.held
@@ -0,0 +1,77 @@
+"""Tiny in-process metrics registry.
+
+Holds gauges, counters and timings for the running worker. Values are per gunicorn worker - there
+is no cross-process aggregation - which is good enough for spotting trends from the `/metrics` endpoint.
+
+Subsystems that already track their own numbers (caches, pools) can register a collector instead of
+pushing values on every event; collectors are only called when a snapshot is taken.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator
+
+
+class Metrics:
+    def __init__(self):
+        self._gauges: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+        self._timings: Dict[str, Dict[str, float]] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self._gauges[name] = value
+
+    def inc(self, name: str, amount: int = 1) -> None:
+        self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, secs: float) -> None:
+        timing = self._timings.get(name)
+        if timing is None:
+            timing = self._timings[name] = {
+                "count": 0,
+                "total_secs": 0.0,
+                "max_secs": 0.0,
+                "last_secs": 0.0,
+            }
+        timing["count"] += 1
+        timing["total_secs"] += secs
+        timing["max_secs"] = max(timing["max_secs"], secs)
+        timing["last_secs"] = secs
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def register_collector(
+        self, name: str, collector: Callable[[], Dict[str, Any]]
+    ) -> None:
+        """Registers `collector`, whose returned dict is reported under `name` in every snapshot."""
+        self._collectors[name] = collector
+
+    def snapshot(self) -> Dict[str, Any]:
+        collected = {}
+        for name, collector in self._collectors.items():
+            try:
+                collected[name] = collector()
+            except Exception as e:
+                collected[name] = {"error": type(e).__name__}
+
+        return {
+            "gauges": dict(self._gauges),
+            "counters": dict(self._counters),
+            "timings": {name: dict(timing) for name, timing in self._timings.items()},
+            "collected": collected,
+        }
+
+    def reset(self) -> None:
+        self._gauges.clear()
+        self._counters.clear()
+        self._timings.clear()
+
+
+metrics = Metrics()
@@ -0,0 +1,158 @@
+"""Keeps one long-lived `docker attach` PTY per minecraft container.
+
+See `DockerManagement.pty_attach_container()` for why a PTY-backed `docker attach` is needed at all. Spawning a new
+one on every `/prepare_ws_attach` call leaked a process per call, and nothing read from them. `PtyAttachRegistry`
+spawns at most one per container and drains its output so Docker never blocks on it. It also listens to the
+container inventory: the PTY is closed when its container stops and respawned when the container comes back.
+"""
+
+import select
+import threading
+
+from typing import Any, Callable, Dict, Optional, Set
+
+from docker.models.containers import Container
+from ptyprocess import PtyProcessUnicode  # type: ignore
+
+from src.api.lib import structured_logging as slog
+from src.api.lib.helpers import is_minecraft_container
+from src.common.helpers import log_exception
+
+STOPPED_ACTIONS = ("die", "stop", "kill", "destroy")
+STARTED_ACTIONS = ("start", "restart", "unpause")
+DRAIN_POLL_SECS = 1.0
+
+
+class PtyAttachRegistry:
+    """At most one live PTY `docker attach` per container
+
+    Args:
+        spawn (Callable): Spawns a PTY process from an argv list. `PtyProcessUnicode.spawn` by default.
+        start_task (Callable): Runs `target(*args)` in the background. Used to drain each PTY.
+    """
+
+    def __init__(
+        self,
+        spawn: Callable[[list], Any] = PtyProcessUnicode.spawn,
+        start_task: Optional[Callable[..., Any]] = None,
+    ):
+        self.spawn = spawn
+        self.start_task = start_task or self._start_thread
+        self._ptys: Dict[str, Any] = {}
+        # Containers that were attached and should be reattached when they start again
+        self._wanted: Set[str] = set()
+        self._names_by_id: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def is_attached(self, container_name: str) -> bool:
+        pty = self._ptys.get(container_name)
+        return pty is not None and pty.isalive()
+
+    def ensure_attached(self, container: Container) -> bool:
+        """Attaches to `container` unless a live PTY already is
+
+        Returns:
+            bool: Whether `container` now has a live PTY attach. Always False for non-minecraft containers.
+        """
+        if not is_minecraft_container(container):
+            return False
+
+        with self._lock:
+            self._wanted.add(container.name)
+            self._names_by_id[container.id] = container.name
+            if self.is_attached(container.name):
+                return True
+            self._close(container.name)
+            return self._spawn(container.name)
+
+    def detach(self, container_name: str) -> None:
+        """Closes the PTY for `container_name` and stops reattaching it"""
+        with self._lock:
+            self._wanted.discard(container_name)
+            self._close(container_name)
+
+    def close_all(self) -> None:
+        with self._lock:
+            for container_name in list(self._ptys):
+                self._close(container_name)
+
+    def on_container_event(
+        self, action: str, container_id: str, container: Optional[Container]
+    ) -> None:
+        """`ContainerInventory` listener"""
+        container_name = (
+            container.name if container is not None else None
+        ) or self._names_by_id.get(container_id)
+        if container_name is None or container_name not in self._wanted:
+            return
+
+        with self._lock:
+            if action in STOPPED_ACTIONS:
+                self._close(container_name)
+                if action == "destroy":
+                    self._names_by_id.pop(container_id, None)
+            elif action in STARTED_ACTIONS:
+                if container is not None:
+                    self._names_by_id[container.id] = container_name
+                if not self.is_attached(container_name):
+                    self._close(container_name)
+                    self._spawn(container_name)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "attached": sum(1 for name in list(self._ptys) if self.is_attached(name)),
+            "wanted": len(self._wanted),
+        }
+
+    # -----------
+    # Internals. Callers hold `_lock`.
+    # -----------
+
+    def _spawn(self, container_name: str) -> bool:
+        try:
+            # --sig-proxy=false so closing the PTY can never signal the server itself.
+            pty = self.spawn(["docker", "attach", "--sig-proxy=false", container_name])
+        except Exception:
+            log_exception(
+                message="Failed to spawn PTY attach!",
+                data={"container": container_name},
+            )
+            return False
+
+        self._ptys[container_name] = pty
+        self.start_task(self._drain, container_name, pty)
+        slog.info("pty_attach.spawned", container=container_name)
+        return True
+
+    def _close(self, container_name: str) -> None:
+        pty = self._ptys.pop(container_name, None)
+        if pty is None:
+            return
+        try:
+            pty.terminate(force=True)
+        except Exception:
+            log_exception(
+                message="Failed to terminate PTY attach!",
+                data={"container": container_name},
+            )
+        slog.info("pty_attach.closed", container=container_name)
+
+    def _drain(self, container_name: str, pty: Any) -> None:
+        """Reads and discards PTY output until the process exits. `select` keeps this cooperative under gevent."""
+        while self._ptys.get(container_name) is pty:
+            try:
+                readable, _, _ = select.select([pty.fd], [], [], DRAIN_POLL_SECS)
+                if readable:
+                    pty.read(4096)
+            except (EOFError, OSError, ValueError):
+                # Process exited or was closed. The next `ensure_attached()`/start event respawns it.
+                return
+
+    @staticmethod
+    def _start_thread(target: Callable[..., Any], *args: Any) -> threading.Thread:
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+
+
+pty_attach_registry = PtyAttachRegistry()
@@ -0,0 +1,162 @@
+import os
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.api.lib.pty_attach import PtyAttachRegistry
+from src.common.constants import YC_CONTAINER_TYPE_LABEL
+
+
+class FakePty:
+    def __init__(self, argv):
+        self.argv = argv
+        self.alive = True
+        self.terminated = False
+
+    def isalive(self):
+        return self.alive
+
+    def terminate(self, force=False):
+        self.alive = False
+        self.terminated = True
+
+
+@pytest.fixture
+def spawned():
+    return []
+
+
+@pytest.fixture
+def registry(spawned):
+    def spawn(argv):
+        pty = FakePty(argv)
+        spawned.append(pty)
+        return pty
+
+    return PtyAttachRegistry(spawn=spawn, start_task=lambda target, *args: None)
+
+
+def make_container(name="YC-dev-survival", container_type="minecraft"):
+    container = MagicMock()
+    container.id = f"{name}-id"
+    container.name = name
+    container.labels = {YC_CONTAINER_TYPE_LABEL: container_type}
+    return container
+
+
+def test_ensure_attached_spawns_once(registry, spawned):
+    # SETUP
+    container = make_container()
+
+    # EXECUTE
+    first = registry.ensure_attached(container)
+    second = registry.ensure_attached(container)
+
+    # ASSERT
+    assert first and second
+    assert len(spawned) == 1
+    assert spawned[0].argv == [
+        "docker",
+        "attach",
+        "--sig-proxy=false",
+        "YC-dev-survival",
+    ]
+    assert registry.is_attached("YC-dev-survival")
+
+
+def test_ensure_attached_ignores_non_minecraft_containers(registry, spawned):
+    # SETUP
+    container = make_container("YC-dev-velocity", container_type="velocity")
+
+    # EXECUTE
+    attached = registry.ensure_attached(container)
+
+    # ASSERT
+    assert not attached
+    assert spawned == []
+
+
+def test_ensure_attached_respawns_dead_pty(registry, spawned):
+    # SETUP
+    container = make_container()
+    registry.ensure_attached(container)
+    spawned[0].alive = False
+
+    # EXECUTE
+    registry.ensure_attached(container)
+
+    # ASSERT
+    assert len(spawned) == 2
+    assert spawned[0].terminated
+    assert registry.is_attached(container.name)
+
+
+def test_container_events_close_and_respawn(registry, spawned):
+    # SETUP
+    container = make_container()
+    registry.ensure_attached(container)
+
+    # EXECUTE
+    registry.on_container_event("die", container.id, container)
+    closed = not registry.is_attached(container.name)
+    registry.on_container_event("start", container.id, container)
+
+    # ASSERT
+    assert closed
+    assert spawned[0].terminated
+    assert len(spawned) == 2
+    assert registry.is_attached(container.name)
+    assert registry.stats() == {"attached": 1, "wanted": 1}
+
+
+def test_container_events_ignore_unattached_containers(registry, spawned):
+    # SETUP
+    container = make_container()
+
+    # EXECUTE
+    registry.on_container_event("start", container.id, container)
+
+    # ASSERT
+    assert spawned == []
+
+
+def test_destroy_event_without_container_uses_known_name(registry, spawned):
+    # SETUP
+    container = make_container()
+    registry.ensure_attached(container)
+
+    # EXECUTE
+    registry.on_container_event("destroy", container.id, None)
+
+    # ASSERT
+    assert spawned[0].terminated
+    assert not registry.is_attached(container.name)
+
+
+def test_drain_reads_until_eof():
+    # SETUP
+    read_fd, write_fd = os.pipe()
+    pty = MagicMock()
+    pty.fd = read_fd
+    reads = []
+
+    def read(size):
+        data = os.read(read_fd, size)
+        if not data:
+            raise EOFError()
+        reads.append(data)
+        return data
+
+    pty.read.side_effect = read
+    registry = PtyAttachRegistry(spawn=MagicMock(return_value=pty))
+    registry._ptys["YC-dev-survival"] = pty
+    os.write(write_fd, b"[Server thread/INFO]: Done\n")
+    os.close(write_fd)
+
+    # EXECUTE
+    registry._drain("YC-dev-survival", pty)
+    os.close(read_fd)
+
+    # ASSERT
+    assert reads == [b"[Server thread/INFO]: Done\n"]
@@ -0,0 +1,285 @@
+"""Native Source RCON client with one pooled, authenticated connection per minecraft container.
+
+`rcon-cli` via `docker exec` costs an exec instance, a process spawn, a TCP handshake and an RCON login for every
+single command. `RconPool` keeps a logged-in socket per container and reuses it, so a command is one round trip.
+
+Protocol (https://developer.valvesoftware.com/wiki/Source_RCON_Protocol), all ints little endian:
+
+    int32 length | int32 request id | int32 type | body (ascii) | \\x00\\x00
+
+Minecraft fragments responses larger than 4096 bytes without marking the last fragment, so every command is
+followed by a packet of an unknown type. The server answers that with its own id once the real response has been
+fully sent, which tells us where the response ends. Every request carries its own id; packets answering any other
+id (eg left over from an earlier, abandoned command) are discarded rather than handed to the wrong caller.
+
+Commands such as `give` or `ban` aren't idempotent, so a command is only ever retried if it provably never reached
+the server: connecting or logging in failed, or writing it failed. Once it has been written, any failure, including
+a read timeout, raises `RconCommandSentError`, which is never retried.
+"""
+
+import select
+import socket
+import struct
+import threading
+
+from itertools import count
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from src.common.logger_setup import logger
+
+SERVERDATA_AUTH = 3
+SERVERDATA_AUTH_RESPONSE = 2
+SERVERDATA_EXECCOMMAND = 2
+SERVERDATA_RESPONSE_VALUE = 0
+# Any type the server doesn't know. Used to find the end of fragmented responses.
+END_OF_RESPONSE_TYPE = 200
+
+PACKET_HEADER = struct.Struct("<ii")
+MAX_REQUEST_ID = 2**31 - 1
+
+
+class RconError(RuntimeError):
+    pass
+
+
+class RconAuthError(RconError):
+    def __init__(self, host: str):
+        super().__init__(f"RCON authentication to '{host}' failed! Wrong password?")
+
+
+class RconCommandSentError(RconError):
+    """The command was sent but its response never arrived, so it may well have run. Must not be retried."""
+
+    def __init__(self, host: str, command: str):
+        super().__init__(f"No RCON response from '{host}' to '{command}'!")
+
+
+class RconConnection:
+    """A single authenticated RCON socket. Not thread safe - `RconPool` serializes access."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        password: str,
+        timeout: float,
+        socket_factory: Callable[..., socket.socket] = socket.create_connection,
+    ):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.socket_factory = socket_factory
+        self._sock: Optional[socket.socket] = None
+        self._ids = count(1)
+
+    def connect(self) -> None:
+        self._sock = self.socket_factory((self.host, self.port), timeout=self.timeout)
+        request_id = self._next_id()
+        self._send(request_id, SERVERDATA_AUTH, self.password)
+
+        # Some servers send an empty RESPONSE_VALUE before the AUTH_RESPONSE.
+        while True:
+            response_id, response_type, _ = self._recv()
+            if response_type == SERVERDATA_AUTH_RESPONSE:
+                break
+
+        if response_id == -1 or response_id != request_id:
+            self.close()
+            raise RconAuthError(self.host)
+
+    def command(self, command: str) -> str:
+        """Runs `command` and returns the server's response
+
+        Raises:
+            RconCommandSentError: If anything failed after the command was written. It may have run.
+            RconError | OSError: If the command couldn't be written. It didn't run.
+        """
+        if self._sock is None:
+            raise RconError(f"RCON connection to '{self.host}' is not open!")
+
+        request_id = self._next_id()
+        end_id = self._next_id()
+        # `sendall()` only raises if part of the packet wasn't written, and the server ignores partial packets.
+        self._send(request_id, SERVERDATA_EXECCOMMAND, command)
+
+        try:
+            self._send(end_id, END_OF_RESPONSE_TYPE, "")
+            fragments = []
+            while True:
+                response_id, _, body = self._recv()
+                if response_id == end_id:
+                    break
+                if response_id == request_id:
+                    fragments.append(body)
+                else:
+                    logger.debug(
+                        f"Dropping stale RCON packet {response_id} from {self.host}"
+                    )
+        except (OSError, RconError) as e:
+            raise RconCommandSentError(self.host, command) from e
+
+        return "".join(fragments)
+
+    def peer_closed(self) -> bool:
+        """Whether the server has closed the socket, eg while it sat idle in the pool. Doesn't block."""
+        if self._sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            # Readable with nothing to read means EOF. Anything else is a stale packet `command()` will drop.
+            return bool(readable) and not self._sock.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def close(self) -> None:
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    @property
+    def is_open(self) -> bool:
+        return self._sock is not None
+
+    def _next_id(self) -> int:
+        request_id = next(self._ids)
+        if request_id >= MAX_REQUEST_ID:
+            self._ids = count(1)
+        return request_id
+
+    def _send(self, request_id: int, packet_type: int, body: str) -> None:
+        payload = PACKET_HEADER.pack(request_id, packet_type) + body.encode("utf-8")
+        payload += b"\x00\x00"
+        self._sock.sendall(struct.pack("<i", len(payload)) + payload)  # type: ignore
+
+    def _recv(self) -> Tuple[int, int, str]:
+        (length,) = struct.unpack("<i", self._recv_exactly(4))
+        packet = self._recv_exactly(length)
+        request_id, packet_type = PACKET_HEADER.unpack(packet[: PACKET_HEADER.size])
+        return (
+            request_id,
+            packet_type,
+            packet[PACKET_HEADER.size : -2].decode("utf-8", errors="replace"),
+        )
+
+    def _recv_exactly(self, num_bytes: int) -> bytes:
+        buf = bytearray()
+        while len(buf) < num_bytes:
+            chunk = self._sock.recv(num_bytes - len(buf))  # type: ignore
+            if not chunk:
+                raise RconError(f"RCON connection to '{self.host}' closed by server!")
+            buf.extend(chunk)
+        return bytes(buf)
+
+
+class RconPool:
+    """Hands out one lazily opened, authenticated `RconConnection` per host, reconnecting on failure.
+
+    Args:
+        password_files (Iterable[Path]): Candidate RCON password files. The first that exists is used.
+        port (int): RCON port of the minecraft servers
+        timeout (float): Socket timeout per connect/command
+    """
+
+    def __init__(
+        self,
+        password_files: Iterable[Path],
+        port: int = 25575,
+        timeout: float = 5,
+        connection_factory: Callable[..., RconConnection] = RconConnection,
+    ):
+        self.password_files = [Path(p) for p in password_files]
+        self.port = port
+        self.timeout = timeout
+        self.connection_factory = connection_factory
+        self._password: Optional[str] = None
+        self._connections: Dict[str, RconConnection] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    def command(self, host: str, command: str) -> str:
+        """Runs `command` on `host`, retrying once on a fresh connection if the pooled one went bad before the
+        command could be sent.
+
+        Raises:
+            RconAuthError: If the server rejects our password.
+            RconCommandSentError: If the command was sent but not answered, eg a read timeout. It may have run.
+            RconError | OSError: If the server can't be reached. The command didn't run.
+        """
+        with self._lock_for(host):
+            pooled = host in self._connections
+            try:
+                return self._command(host, command)
+            except (RconAuthError, RconCommandSentError):
+                raise
+            except (OSError, RconError):
+                # A fresh connection failing means the server is unreachable; retrying won't help.
+                if not pooled:
+                    raise
+                logger.info(f"RCON connection to '{host}' went bad. Reconnecting.")
+
+            return self._command(host, command)
+
+    def close(self, host: str) -> None:
+        with self._lock_for(host):
+            connection = self._connections.pop(host, None)
+            if connection is not None:
+                connection.close()
+
+    def close_all(self) -> None:
+        for host in list(self._connections):
+            self.close(host)
+
+    def _command(self, host: str, command: str) -> str:
+        connection = self._connection_for(host)
+        try:
+            return connection.command(command)
+        except (OSError, RconError):
+            connection.close()
+            self._connections.pop(host, None)
+            raise
+
+    def _lock_for(self, host: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(host, threading.Lock())
+
+    def _connection_for(self, host: str) -> RconConnection:
+        connection = self._connections.get(host)
+        if connection is not None:
+            if connection.is_open and not connection.peer_closed():
+                return connection
+            # Reconnect now rather than send a command the server would never read.
+            logger.info(f"RCON connection to '{host}' was closed. Reconnecting.")
+            connection.close()
+            del self._connections[host]
+
+        connection = self.connection_factory(
+            host, self.port, self._read_password(), self.timeout
+        )
+        try:
+            connection.connect()
+        except RconAuthError:
+            # The password may have been rotated - re-read it next time.
+            self._password = None
+            raise
+        except Exception:
+            connection.close()
+            raise
+        self._connections[host] = connection
+        return connection
+
+    def _read_password(self) -> str:
+        if self._password is None:
+            for password_file in self.password_files:
+                if password_file.exists():
+                    self._password = password_file.read_text().strip()
+                    break
+            else:
+                raise RconError(
+                    f"No RCON password file found! Tried {[str(p) for p in self.password_files]}"
+                )
+        return self._password
@@ -0,0 +1,187 @@
+import socket
+import struct
+import threading
+
+import pytest  # type: ignore
+
+from src.api.lib.rcon import (
+    SERVERDATA_AUTH,
+    SERVERDATA_AUTH_RESPONSE,
+    SERVERDATA_EXECCOMMAND,
+    SERVERDATA_RESPONSE_VALUE,
+    RconAuthError,
+    RconCommandSentError,
+    RconConnection,
+    RconPool,
+)
+
+PASSWORD = "hunter2"
+
+
+def send_packet(conn: socket.socket, request_id: int, packet_type: int, body: str):
+    payload = struct.pack("<ii", request_id, packet_type) + body.encode() + b"\x00\x00"
+    conn.sendall(struct.pack("<i", len(payload)) + payload)
+
+
+def recv_packet(conn: socket.socket):
+    header = conn.recv(4, socket.MSG_WAITALL)
+    if len(header) < 4:
+        return None
+    (length,) = struct.unpack("<i", header)
+    packet = conn.recv(length, socket.MSG_WAITALL)
+    request_id, packet_type = struct.unpack("<ii", packet[:8])
+    return request_id, packet_type, packet[8:-2].decode()
+
+
+class FakeMinecraftRcon:
+    """Speaks just enough RCON: auth, commands echoed back in two fragments, and the unknown-type reply."""
+
+    def __init__(self):
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen()
+        self.port = self.server.getsockname()[1]
+        self.connections = []
+        self.commands = []
+        self.stale_packet_id = None
+        self.answer_commands = True
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket):
+        while (packet := recv_packet(conn)) is not None:
+            request_id, packet_type, body = packet
+            if packet_type == SERVERDATA_AUTH:
+                send_packet(
+                    conn,
+                    request_id if body == PASSWORD else -1,
+                    SERVERDATA_AUTH_RESPONSE,
+                    "",
+                )
+            elif packet_type == SERVERDATA_EXECCOMMAND:
+                self.commands.append(body)
+                if not self.answer_commands:
+                    continue
+                if self.stale_packet_id is not None:
+                    send_packet(
+                        conn, self.stale_packet_id, SERVERDATA_RESPONSE_VALUE, "stale"
+                    )
+                    self.stale_packet_id = None
+                response = f"ran {body}"
+                send_packet(conn, request_id, SERVERDATA_RESPONSE_VALUE, response[:4])
+                send_packet(conn, request_id, SERVERDATA_RESPONSE_VALUE, response[4:])
+            elif self.answer_commands:
+                send_packet(
+                    conn,
+                    request_id,
+                    SERVERDATA_RESPONSE_VALUE,
+                    f"Unknown request {packet_type:x}",
+                )
+
+    def drop_connections(self):
+        for conn in self.connections:
+            conn.shutdown(socket.SHUT_RDWR)
+            conn.close()
+        self.connections.clear()
+
+    def close(self):
+        self.drop_connections()
+        self.server.close()
+
+
+@pytest.fixture
+def rcon_server():
+    server = FakeMinecraftRcon()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def password_file(tmp_path):
+    path = tmp_path / "rcon.password"
+    path.write_text(f"{PASSWORD}\n")
+    return path
+
+
+class TestRconConnection:
+    def test_reassembles_fragmented_responses(self, rcon_server):
+        connection = RconConnection("127.0.0.1", rcon_server.port, PASSWORD, timeout=2)
+        connection.connect()
+        assert connection.command("list") == "ran list"
+        connection.close()
+
+    def test_drops_packets_for_other_request_ids(self, rcon_server):
+        connection = RconConnection("127.0.0.1", rcon_server.port, PASSWORD, timeout=2)
+        connection.connect()
+        rcon_server.stale_packet_id = 9999
+        assert connection.command("list") == "ran list"
+        connection.close()
+
+    def test_wrong_password(self, rcon_server):
+        connection = RconConnection("127.0.0.1", rcon_server.port, "nope", timeout=2)
+        with pytest.raises(RconAuthError):
+            connection.connect()
+
+
+class TestRconPool:
+    def test_reuses_one_connection_per_host(self, rcon_server, password_file):
+        pool = RconPool([password_file], port=rcon_server.port, timeout=2)
+
+        assert pool.command("127.0.0.1", "say hi") == "ran say hi"
+        assert pool.command("127.0.0.1", "list") == "ran list"
+
+        assert len(rcon_server.connections) == 1
+        pool.close_all()
+
+    def test_reconnects_when_pooled_connection_drops(self, rcon_server, password_file):
+        pool = RconPool([password_file], port=rcon_server.port, timeout=2)
+        pool.command("127.0.0.1", "list")
+
+        rcon_server.drop_connections()
+
+        assert pool.command("127.0.0.1", "list") == "ran list"
+        pool.close_all()
+
+    def test_read_timeout_is_not_retried(self, rcon_server, password_file):
+        pool = RconPool([password_file], port=rcon_server.port, timeout=0.2)
+        pool.command("127.0.0.1", "list")
+        rcon_server.answer_commands = False
+
+        with pytest.raises(RconCommandSentError):
+            pool.command("127.0.0.1", "give remi_scarlet diamond 64")
+
+        assert rcon_server.commands == ["list", "give remi_scarlet diamond 64"]
+        assert len(rcon_server.connections) == 1
+        pool.close_all()
+
+    def test_uses_first_existing_password_file(
+        self, rcon_server, password_file, tmp_path
+    ):
+        pool = RconPool(
+            [tmp_path / "missing.password", password_file],
+            port=rcon_server.port,
+            timeout=2,
+        )
+        assert pool.command("127.0.0.1", "list") == "ran list"
+        pool.close_all()
+
+    def test_unreachable_host_raises_without_retrying(self, password_file):
+        attempts = []
+
+        class UnreachableConnection(RconConnection):
+            def connect(self):
+                attempts.append(self.host)
+                raise ConnectionRefusedError()
+
+        pool = RconPool([password_file], connection_factory=UnreachableConnection)
+        with pytest.raises(OSError):
+            pool.command("yc-env1-survival", "list")
+        assert attempts == ["yc-env1-survival"]
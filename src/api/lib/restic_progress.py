@@ -0,0 +1,171 @@
+"""Live progress for restic backups and restores.
+
+With `--json`, restic prints a `status` message per progress tick (`RESTIC_PROGRESS_FPS` per second) carrying
+percent done, bytes, files and, for backups, an ETA. `run_with_progress()` runs a container and hands each of
+those, normalized by `parse_status()`, to a callback as the container's logs stream in, instead of blocking until
+the container exits. Jobs forward them to `JobContext.progress()`, which throttles DB writes and Socket.IO events.
+
+Progress is best effort. Nothing that goes wrong while reporting it stops the container: killing a restore midway
+leaves the world half restored, and killing `restic.sh backup_now` leaves the server in `save-off`.
+"""
+
+import codecs
+import json
+
+from typing import Any, Callable, Dict, Optional
+
+import docker  # type: ignore
+from docker import DockerClient
+
+from src.api.lib import structured_logging as slog
+from src.common.helpers import log_exception
+
+StatusListener = Callable[[Dict[str, Any]], None]
+
+
+def parse_status(line: str) -> Optional[Dict[str, Any]]:
+    """Parses a restic `--json` status message, from a backup or a restore
+
+    Tolerates a prefix before the JSON object, eg the timestamp and level `mc-backup`'s logger adds.
+
+    Returns:
+        Optional[Dict[str, Any]]: `percent_done`, `bytes_done`, `total_bytes`, `files_done`, `total_files`,
+            `seconds_elapsed`, `seconds_remaining` and `bytes_per_sec`. None if `line` isn't a status message.
+    """
+    start = line.find("{")
+    if start < 0:
+        return None
+    try:
+        d = json.loads(line[start:])
+    except ValueError:
+        return None
+    if not isinstance(d, dict) or d.get("message_type") != "status":
+        return None
+
+    percent_done = float(d.get("percent_done") or 0)
+    seconds_elapsed = float(d.get("seconds_elapsed") or 0)
+    # Restores report `*_restored` and no ETA.
+    bytes_done = int(d.get("bytes_done", d.get("bytes_restored")) or 0)
+    files_done = int(d.get("files_done", d.get("files_restored")) or 0)
+    seconds_remaining = d.get("seconds_remaining")
+    if seconds_remaining is None and percent_done > 0:
+        seconds_remaining = seconds_elapsed * (1 - percent_done) / percent_done
+
+    return {
+        "percent_done": percent_done,
+        "bytes_done": bytes_done,
+        "total_bytes": int(d.get("total_bytes") or 0),
+        "files_done": files_done,
+        "total_files": int(d.get("total_files") or 0),
+        "seconds_elapsed": seconds_elapsed,
+        "seconds_remaining": (
+            float(seconds_remaining) if seconds_remaining is not None else None
+        ),
+        "bytes_per_sec": bytes_done / seconds_elapsed if seconds_elapsed > 0 else None,
+    }
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024:
+            return f"{n:.1f} {unit}" if unit != "B" else f"{int(n)} B"
+        n /= 1024
+    return f"{n:.1f} TiB"
+
+
+def format_duration(secs: float) -> str:
+    secs = int(secs)
+    hours, rest = divmod(secs, 3600)
+    mins, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {mins}m"
+    if mins:
+        return f"{mins}m {secs}s"
+    return f"{secs}s"
+
+
+def format_status(status: Dict[str, Any]) -> str:
+    """Eg "42% (1.2 GiB of 3.0 GiB, 55.0 MiB/s, ETA 1m 23s)" """
+    details = [
+        f"{format_bytes(status['bytes_done'])} of {format_bytes(status['total_bytes'])}"
+    ]
+    if status["bytes_per_sec"] is not None:
+        details.append(f"{format_bytes(status['bytes_per_sec'])}/s")
+    if status["seconds_remaining"] is not None:
+        details.append(f"ETA {format_duration(status['seconds_remaining'])}")
+    return f"{status['percent_done']:.0%} ({', '.join(details)})"
+
+
+def without_status(logs: bytes) -> str:
+    """`logs` decoded, minus restic status messages"""
+    lines = logs.decode("utf-8", errors="replace").split("\n")
+    return "\n".join(line for line in lines if parse_status(line) is None)
+
+
+def run_with_progress(
+    client: DockerClient, progress: StatusListener, **run_kwargs: Any
+) -> str:
+    """Like `client.containers.run()`, but follows the logs while the container runs, passing restic status
+    messages to `progress`
+
+    Both stdout and stderr are followed: `restic.sh` logs restic's output to stderr. The container always runs to
+    completion. Status messages `progress` raises on are dropped, and if the log stream breaks, the container is
+    waited for all the same.
+
+    Args:
+        client (DockerClient): Docker client
+        progress (StatusListener): Called with each `parse_status()` result, in the calling thread
+        **run_kwargs: As for `client.containers.run()`. `remove` is honoured once the container has exited.
+
+    Returns:
+        str: The container's stdout, like `client.containers.run()`, minus status messages
+
+    Raises:
+        docker.errors.ContainerError: If the container exits non-zero, like `client.containers.run()`
+    """
+    remove = run_kwargs.pop("remove", False)
+    container = client.containers.run(detach=True, **run_kwargs)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+
+    def handle(line: str) -> None:
+        status = parse_status(line)
+        if status is None:
+            return
+        try:
+            progress(status)
+        except Exception:
+            log_exception(message="Failed to report restic progress! Dropping it.")
+
+    try:
+        for chunk in container.logs(stdout=True, stderr=True, stream=True, follow=True):
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                handle(line)
+    except Exception:
+        log_exception(
+            message="Lost restic's log stream! Waiting for it to finish regardless."
+        )
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        handle(pending)
+
+    # Only remove the container once it has exited. If even waiting fails, leave it be.
+    exit_code = container.wait().get("StatusCode", 0)
+    try:
+        if exit_code != 0:
+            raise docker.errors.ContainerError(
+                container,
+                exit_code,
+                run_kwargs.get("command"),
+                run_kwargs.get("image"),
+                without_status(container.logs(stdout=False, stderr=True)),
+            )
+        return without_status(container.logs(stdout=True, stderr=False))
+    finally:
+        if remove:
+            try:
+                container.remove()
+            except docker.errors.APIError:
+                slog.warning("restic_progress.remove_failed", container=container.id)
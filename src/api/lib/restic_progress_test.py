@@ -0,0 +1,182 @@
+import json
+
+from unittest.mock import MagicMock
+
+import docker
+import pytest
+
+from src.api.lib.restic_progress import (
+    format_status,
+    parse_status,
+    run_with_progress,
+)
+
+
+def backup_status(**overrides):
+    return {
+        "message_type": "status",
+        "seconds_elapsed": 10,
+        "seconds_remaining": 30,
+        "percent_done": 0.25,
+        "total_files": 400,
+        "files_done": 100,
+        "total_bytes": 4 * 1024**3,
+        "bytes_done": 1024**3,
+        **overrides,
+    }
+
+
+def test_parse_backup_status_behind_log_prefix():
+    # SETUP
+    line = f"2024-05-01T00:00:00+0000 INFO {json.dumps(backup_status())}"
+
+    # EXECUTE
+    status = parse_status(line)
+
+    # ASSERT
+    assert status == {
+        "percent_done": 0.25,
+        "bytes_done": 1024**3,
+        "total_bytes": 4 * 1024**3,
+        "files_done": 100,
+        "total_files": 400,
+        "seconds_elapsed": 10.0,
+        "seconds_remaining": 30.0,
+        "bytes_per_sec": 1024**3 / 10,
+    }
+
+
+def test_parse_restore_status_estimates_eta():
+    # SETUP
+    line = json.dumps(
+        {
+            "message_type": "status",
+            "seconds_elapsed": 20,
+            "percent_done": 0.5,
+            "total_files": 10,
+            "files_restored": 5,
+            "total_bytes": 2000,
+            "bytes_restored": 1000,
+        }
+    )
+
+    # EXECUTE
+    status = parse_status(line)
+
+    # ASSERT
+    assert status["seconds_remaining"] == 20
+    assert status["bytes_done"] == 1000
+    assert status["files_done"] == 5
+    assert status["bytes_per_sec"] == 50
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "",
+        "Fatal: wrong password",
+        '{"message_type":"summary","files_new":3}',
+        "{not json",
+    ],
+)
+def test_parse_status_ignores_other_lines(line):
+    assert parse_status(line) is None
+
+
+def test_format_status():
+    assert (
+        format_status(parse_status(json.dumps(backup_status())))
+        == "25% (1.0 GiB of 4.0 GiB, 102.4 MiB/s, ETA 30s)"
+    )
+
+
+def container_with_logs(chunks, exit_code=0, stdout=b"", stderr=b""):
+    """`chunks` are what following both streams yields. `stdout`/`stderr` are what each holds once exited."""
+    container = MagicMock()
+    container.logs.side_effect = lambda stream=False, **kwargs: (
+        iter(chunks) if stream else stdout if kwargs["stdout"] else stderr
+    )
+    container.wait.return_value = {"StatusCode": exit_code}
+    return container
+
+
+def test_run_with_progress_streams_status_and_returns_other_output():
+    # SETUP
+    status_line = json.dumps(backup_status()).encode()
+    container = container_with_logs(
+        [b"using parent snapshot\n" + status_line[:20], status_line[20:] + b"\ndone"],
+        stdout=status_line + b"\ndone",
+        stderr=b"using parent snapshot",
+    )
+    client = MagicMock()
+    client.containers.run.return_value = container
+    progress = MagicMock()
+
+    # EXECUTE
+    out = run_with_progress(client, progress, image="restic/restic", remove=True)
+
+    # ASSERT
+    assert out == "done", "Only stdout, like containers.run()"
+    progress.assert_called_once()
+    assert progress.call_args.args[0]["percent_done"] == 0.25
+    client.containers.run.assert_called_once_with(detach=True, image="restic/restic")
+    container.remove.assert_called_once_with()
+
+
+def test_run_with_progress_raises_on_nonzero_exit():
+    # SETUP
+    container = container_with_logs(
+        [b"Fatal: repository is locked\n"],
+        exit_code=1,
+        stderr=b"Fatal: repository is locked\n",
+    )
+    client = MagicMock()
+    client.containers.run.return_value = container
+
+    # EXECUTE / ASSERT
+    with pytest.raises(docker.errors.ContainerError) as e:
+        run_with_progress(client, MagicMock(), image="restic/restic", remove=True)
+    assert e.value.exit_status == 1
+    assert e.value.stderr == "Fatal: repository is locked\n"
+    container.remove.assert_called_once_with()
+
+
+def test_run_with_progress_never_kills_the_container_when_progress_fails():
+    # SETUP
+    status_line = json.dumps(backup_status()).encode()
+    container = container_with_logs(
+        [status_line + b"\n", b"restored\n"], stdout=b"restored"
+    )
+    client = MagicMock()
+    client.containers.run.return_value = container
+    progress = MagicMock(side_effect=RuntimeError("MySQL server has gone away"))
+
+    # EXECUTE
+    out = run_with_progress(client, progress, image="restic/restic", remove=True)
+
+    # ASSERT
+    assert out == "restored"
+    progress.assert_called_once()
+    assert [c[0] for c in container.method_calls] == ["logs", "wait", "logs", "remove"]
+    container.remove.assert_called_once_with()
+
+
+def test_run_with_progress_waits_for_the_container_when_logs_break():
+    # SETUP
+    def logs(**kwargs):
+        yield b"using parent snapshot\n"
+        raise docker.errors.APIError("connection reset")
+
+    container = container_with_logs([])
+    container.logs.side_effect = lambda stream=False, **kwargs: (
+        logs() if stream else b"using parent snapshot\nadded"
+    )
+    client = MagicMock()
+    client.containers.run.return_value = container
+
+    # EXECUTE
+    out = run_with_progress(client, MagicMock(), image="restic/restic", remove=True)
+
+    # ASSERT
+    assert out == "using parent snapshot\nadded"
+    assert [c[0] for c in container.method_calls] == ["logs", "wait", "logs", "remove"]
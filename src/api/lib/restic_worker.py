@@ -0,0 +1,242 @@
+"""Drives restic through `docker exec` into one long-lived container instead of a fresh container per command.
+
+`BackupManagement.call_restic()` used to `docker run restic/restic` for every `snapshots` and `ls`, paying for
+container creation every time and starting with an empty restic cache, so every call re-downloaded the repository
+index. `ResticWorker` keeps a single idle `restic/restic` container around with the repository, the password file
+and a persistent cache volume mounted, and execs restic inside it. The cache volume is shared with the one-off
+containers `call_restic()` still uses for commands that need extra mounts, like `restore`.
+
+Read-only commands run concurrently and with `--no-lock`, so they neither wait on nor write lock files to the
+repository. Everything else is serialized within the process.
+
+Only stdout is returned, like `containers.run()` did, so warnings restic prints to stderr (eg about its cache or
+stale locks) never end up in output callers parse as JSON. Stderr only goes into `ResticError`.
+"""
+
+import codecs
+import shlex
+import threading
+
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import docker  # type: ignore
+from docker import DockerClient
+from docker.models.containers import Container
+
+from src.api.lib import structured_logging as slog
+from src.api.lib.metrics import metrics
+from src.common import server_paths
+from src.common.constants import RESTIC_REPO_PATH
+
+RESTIC_IMAGE = "restic/restic"
+RESTIC_WORKER_CONTAINER_NAME = "yc-api-restic-worker"
+RESTIC_CACHE_VOLUME = "yc-restic-cache"
+RESTIC_CACHE_DIR = "/cache"
+
+READ_ONLY_COMMANDS = frozenset(
+    ("snapshots", "ls", "list", "cat", "find", "stats", "diff", "dump", "version")
+)
+
+
+class ResticError(Exception):
+    def __init__(self, command: str, exit_code: int, output: str):
+        super().__init__(f"'restic {command}' exited with {exit_code}: {output[-500:]}")
+        self.command = command
+        self.exit_code = exit_code
+        self.output = output
+
+
+def restic_environment() -> Dict[str, str]:
+    return {
+        "RESTIC_REPOSITORY": "/backups",
+        "RESTIC_PASSWORD_FILE": "/restic.password",
+        "RESTIC_CACHE_DIR": RESTIC_CACHE_DIR,
+    }
+
+
+def restic_volumes() -> Dict[str, Dict[str, str]]:
+    return {
+        str(RESTIC_REPO_PATH): {
+            "bind": "/backups",
+            "mode": "rw",
+        },
+        str(server_paths.get_restic_password_file_path()): {
+            "bind": "/restic.password",
+            "mode": "ro",
+        },
+        RESTIC_CACHE_VOLUME: {
+            "bind": RESTIC_CACHE_DIR,
+            "mode": "rw",
+        },
+    }
+
+
+def is_read_only(args: List[str]) -> bool:
+    return bool(args) and args[0] in READ_ONLY_COMMANDS
+
+
+class ResticWorker:
+    """Runs restic commands inside a persistent worker container
+
+    Args:
+        client (DockerClient): Docker client
+        container_name (str): Name of the worker container. Shared by every gunicorn worker.
+        max_concurrent_reads (int): Read-only commands allowed to run at once
+    """
+
+    def __init__(
+        self,
+        client: DockerClient,
+        container_name: str = RESTIC_WORKER_CONTAINER_NAME,
+        max_concurrent_reads: int = 4,
+    ):
+        self.client = client
+        self.container_name = container_name
+        self._container: Optional[Container] = None
+        self._container_lock = threading.Lock()
+        self._reads = threading.BoundedSemaphore(max_concurrent_reads)
+        self._writes = threading.Lock()
+
+    def run(self, command: str) -> str:
+        """Runs `restic <command>` and returns its output
+
+        Raises:
+            ResticError: If restic exits non-zero
+        """
+        args = shlex.split(command)
+        read_only = is_read_only(args)
+        if read_only:
+            args.insert(1, "--no-lock")
+
+        with self._reads if read_only else self._writes:
+            with metrics.timer(f"restic.{args[0] if args else 'unknown'}"):
+                exit_code, stdout, stderr = self._exec(["restic", *args])
+
+        if exit_code != 0:
+            raise ResticError(command, exit_code, stderr or stdout)
+        return stdout
+
+    def stream(self, command: str) -> Iterator[str]:
+        """Runs `restic <command>`, yielding its stdout line by line as it arrives
+
+        Stopping iteration early closes the exec's output; restic exits once it can no longer write to it.
+
+        Raises:
+            ResticError: If restic exits non-zero, once its output has been read to the end. Carries the end of
+                stderr, or of stdout if restic printed nothing to stderr.
+        """
+        args = shlex.split(command)
+        read_only = is_read_only(args)
+        if read_only:
+            args.insert(1, "--no-lock")
+
+        with self._reads if read_only else self._writes:
+            with metrics.timer(f"restic.{args[0] if args else 'unknown'}"):
+                exec_id = self._exec_create(["restic", *args])
+                chunks = self.client.api.exec_start(exec_id, stream=True, demux=True)
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                tail: deque = deque(maxlen=20)
+                stderr_tail: deque = deque(maxlen=20)
+                pending = ""
+                try:
+                    for stdout, stderr in chunks:
+                        if stderr:
+                            stderr_tail.append(stderr.decode("utf-8", errors="replace"))
+                        if not stdout:
+                            continue
+                        pending += decoder.decode(stdout)
+                        *lines, pending = pending.split("\n")
+                        for line in lines:
+                            tail.append(line)
+                            yield line
+                    pending += decoder.decode(b"", final=True)
+                    if pending:
+                        tail.append(pending)
+                        yield pending
+                finally:
+                    close = getattr(chunks, "close", None)
+                    if close is not None:
+                        close()
+
+                exit_code = self.client.api.exec_inspect(exec_id)["ExitCode"]
+
+        if exit_code != 0:
+            raise ResticError(
+                command, exit_code, "".join(stderr_tail).strip() or "\n".join(tail)
+            )
+
+    def ensure_running(self) -> Container:
+        """Returns the worker container, creating or starting it if needed"""
+        with self._container_lock:
+            container = self._container
+            if container is not None:
+                try:
+                    container.reload()
+                except docker.errors.NotFound:
+                    container = None
+
+            if container is None:
+                container = self._get_or_create()
+            if container.status != "running":
+                container.start()
+                container.reload()
+
+            self._container = container
+            return container
+
+    def stop(self) -> None:
+        with self._container_lock:
+            container, self._container = self._container, None
+        if container is not None:
+            container.remove(force=True)
+
+    def _exec(self, cmd: List[str]) -> Tuple[int, str, str]:
+        """Returns the exit code, stdout and stderr of `cmd`"""
+        container = self._container or self.ensure_running()
+        try:
+            result = container.exec_run(cmd, demux=True)
+        except docker.errors.APIError:
+            # Removed or stopped under us, eg by `docker system prune` or a daemon restart. Bring it back once.
+            slog.warning("restic_worker.exec_failed", container=self.container_name)
+            container = self.ensure_running()
+            result = container.exec_run(cmd, demux=True)
+
+        stdout, stderr = result.output
+        return (
+            result.exit_code,
+            (stdout or b"").decode("utf-8"),
+            (stderr or b"").decode("utf-8", errors="replace"),
+        )
+
+    def _exec_create(self, cmd: List[str]) -> str:
+        container = self._container or self.ensure_running()
+        try:
+            return self.client.api.exec_create(container.id, cmd)["Id"]
+        except docker.errors.APIError:
+            slog.warning("restic_worker.exec_failed", container=self.container_name)
+            container = self.ensure_running()
+            return self.client.api.exec_create(container.id, cmd)["Id"]
+
+    def _get_or_create(self) -> Container:
+        try:
+            return self.client.containers.get(self.container_name)
+        except docker.errors.NotFound:
+            pass
+
+        slog.info("restic_worker.create", container=self.container_name)
+        try:
+            return self.client.containers.run(
+                image=RESTIC_IMAGE,
+                name=self.container_name,
+                entrypoint=["tail", "-f", "/dev/null"],
+                detach=True,
+                restart_policy={"Name": "unless-stopped"},
+                environment=restic_environment(),
+                volumes=restic_volumes(),
+            )
+        except docker.errors.APIError as e:
+            if e.status_code != 409:
+                raise
+            # Another gunicorn worker created it first.
+            return self.client.containers.get(self.container_name)
@@ -0,0 +1,196 @@
+import threading
+
+from unittest.mock import MagicMock
+
+import docker
+import pytest
+
+from src.api.lib.restic_worker import (
+    RESTIC_WORKER_CONTAINER_NAME,
+    ResticError,
+    ResticWorker,
+)
+
+
+def exec_result(exit_code=0, stdout=b"[]", stderr=None):
+    result = MagicMock()
+    result.exit_code = exit_code
+    result.output = (stdout, stderr)
+    return result
+
+
+@pytest.fixture
+def container():
+    container = MagicMock()
+    container.status = "running"
+    container.exec_run.return_value = exec_result()
+    return container
+
+
+@pytest.fixture
+def client(container):
+    client = MagicMock()
+    client.containers.get.return_value = container
+    return client
+
+
+def test_run_read_only_command_without_lock(client, container):
+    # EXECUTE
+    output = ResticWorker(client).run("snapshots --json --tag env1")
+
+    # ASSERT
+    assert output == "[]"
+    container.exec_run.assert_called_once_with(
+        ["restic", "snapshots", "--no-lock", "--json", "--tag", "env1"], demux=True
+    )
+
+
+def test_run_returns_stdout_only(client, container):
+    # SETUP
+    container.exec_run.return_value = exec_result(
+        0, b'[{"id": "abc"}]', b"Warning: unable to open cache: permission denied\n"
+    )
+
+    # EXECUTE
+    output = ResticWorker(client).run("snapshots --json")
+
+    # ASSERT
+    assert output == '[{"id": "abc"}]'
+
+
+def test_run_raises_on_nonzero_exit(client, container):
+    # SETUP
+    container.exec_run.return_value = exec_result(
+        1, None, b"Fatal: repository is locked"
+    )
+
+    # EXECUTE / ASSERT
+    with pytest.raises(ResticError) as e:
+        ResticWorker(client).run("forget --prune")
+    assert e.value.exit_code == 1
+    assert "locked" in e.value.output
+
+
+def test_worker_container_created_once(client, container):
+    # SETUP
+    client.containers.get.side_effect = docker.errors.NotFound("missing")
+    client.containers.run.return_value = container
+    worker = ResticWorker(client)
+
+    # EXECUTE
+    worker.run("snapshots --json")
+    worker.run("ls abc --json")
+
+    # ASSERT
+    client.containers.run.assert_called_once()
+    kwargs = client.containers.run.call_args.kwargs
+    assert kwargs["name"] == RESTIC_WORKER_CONTAINER_NAME
+    assert kwargs["detach"] is True
+    assert kwargs["environment"]["RESTIC_CACHE_DIR"] == "/cache"
+
+
+def test_worker_container_started_if_stopped(client, container):
+    # SETUP
+    container.status = "exited"
+
+    # EXECUTE
+    ResticWorker(client).run("snapshots --json")
+
+    # ASSERT
+    container.start.assert_called_once()
+
+
+def test_exec_retries_once_after_container_vanishes(client, container):
+    # SETUP
+    container.exec_run.side_effect = [
+        docker.errors.APIError("container is not running"),
+        exec_result(),
+    ]
+
+    # EXECUTE
+    output = ResticWorker(client).run("snapshots --json")
+
+    # ASSERT
+    assert output == "[]"
+    assert container.exec_run.call_count == 2
+
+
+def test_reads_run_concurrently_and_writes_serialize(client, container):
+    # SETUP
+    worker = ResticWorker(client, max_concurrent_reads=4)
+    worker.ensure_running()
+    running = []
+    peaks = {"read": 0, "write": 0}
+    lock = threading.Lock()
+    release = threading.Event()
+
+    def exec_run(cmd, demux):
+        kind = "read" if "--no-lock" in cmd else "write"
+        with lock:
+            running.append(kind)
+            peaks[kind] = max(peaks[kind], running.count(kind))
+        release.wait(5)
+        with lock:
+            running.remove(kind)
+        return exec_result()
+
+    container.exec_run.side_effect = exec_run
+    commands = ["snapshots --json"] * 3 + ["forget --keep-last 8"] * 2
+    threads = [threading.Thread(target=worker.run, args=(c,)) for c in commands]
+
+    # EXECUTE
+    for thread in threads:
+        thread.start()
+    while True:
+        with lock:
+            if running.count("read") == 3 and running.count("write") == 1:
+                break
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    # ASSERT
+    assert peaks == {"read": 3, "write": 1}
+
+
+def test_stream_yields_lines_as_they_arrive(client, container):
+    # SETUP
+    client.api.exec_create.return_value = {"Id": "exec-1"}
+    client.api.exec_start.return_value = iter(
+        [
+            (b'{"a":1}\n{"b"', None),
+            (None, b"Warning: unable to open cache\n"),
+            (b":2}\n\xc3", None),
+            (b"\xa9", None),
+        ]
+    )
+    client.api.exec_inspect.return_value = {"ExitCode": 0}
+
+    # EXECUTE
+    lines = list(ResticWorker(client).stream("ls abc /worlds-bindmount --json"))
+
+    # ASSERT
+    assert lines == ['{"a":1}', '{"b":2}', "é"]
+    client.api.exec_create.assert_called_once_with(
+        container.id,
+        ["restic", "ls", "--no-lock", "abc", "/worlds-bindmount", "--json"],
+    )
+    client.api.exec_start.assert_called_once_with("exec-1", stream=True, demux=True)
+
+
+def test_stream_raises_after_output_on_nonzero_exit(client, container):
+    # SETUP
+    client.api.exec_create.return_value = {"Id": "exec-1"}
+    client.api.exec_start.return_value = iter(
+        [(b"partial\n", None), (None, b"Fatal: no matching ID found\n")]
+    )
+    client.api.exec_inspect.return_value = {"ExitCode": 1}
+    lines = []
+
+    # EXECUTE / ASSERT
+    with pytest.raises(ResticError) as e:
+        for line in ResticWorker(client).stream("ls abc --json"):
+            lines.append(line)
+    assert lines == ["partial"]
+    assert e.value.output == "Fatal: no matching ID found"
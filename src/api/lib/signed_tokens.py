@@ -0,0 +1,203 @@
+"""Stateless HMAC-signed access tokens.
+
+Opaque access tokens (`secrets.token_hex()`) can only be validated with a DB lookup. When
+`ACCESS_TOKEN_MODE` is `"signed"`, we instead issue tokens that carry their own claims:
+
+    yc1.<base64url(json claims)>.<base64url(hmac-sha256 signature)>
+
+Claims are `sub`, `email`, `exp` and a random `jti`. Verifying one is a signature check and a clock
+comparison - no I/O.
+
+Logout can't un-sign a token, so we keep a small in-memory `RevocationList` keyed by `jti`. Tokens are
+still recorded in the `AccessToken` table at login (under `signed_token_row_id()` rather than the full
+token, which can outgrow the column) and `invalidate_access_token` still rewrites `exp` to "now", so each
+worker periodically pulls recently rewritten rows to learn about logouts handled by other workers.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+from dataclasses import dataclass
+from pathlib import Path
+from secrets import token_hex
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+SIGNED_TOKEN_PREFIX = "yc1"
+SIGNED_TOKEN_ROW_ID_PREFIX = f"{SIGNED_TOKEN_PREFIX}:"
+
+
+class InvalidSignedTokenError(RuntimeError):
+    pass
+
+
+class MissingSigningKeyError(RuntimeError):
+    def __init__(self, key_file: Path):
+        super().__init__(
+            f"ACCESS_TOKEN_MODE is 'signed' but no signing key was found at '{key_file}'!"
+        )
+
+
+@dataclass(frozen=True)
+class SignedTokenClaims:
+    sub: str
+    email: str
+    exp: int
+    jti: str
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(encoded: str) -> bytes:
+    return base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+
+
+def _sign(key: bytes, signing_input: str) -> str:
+    return _b64encode(
+        hmac.new(key, signing_input.encode("ascii"), hashlib.sha256).digest()
+    )
+
+
+def is_signed_access_token(token: str) -> bool:
+    return token.startswith(f"{SIGNED_TOKEN_PREFIX}.")
+
+
+def sign_access_token(
+    sub: str, email: str, exp: int, key: bytes
+) -> Tuple[str, SignedTokenClaims]:
+    """Issues a signed access token for `sub` that expires at `exp`
+
+    Args:
+        sub (str): Subject ID
+        email (str): Email of the subject
+        exp (int): Expiration as an epoch timestamp
+        key (bytes): HMAC signing key
+
+    Returns:
+        Tuple[str, SignedTokenClaims]: The signed token and the claims it carries
+    """
+    claims = SignedTokenClaims(sub=sub, email=email, exp=exp, jti=token_hex(8))
+    payload = _b64encode(
+        json.dumps(
+            {"sub": sub, "email": email, "exp": exp, "jti": claims.jti},
+            separators=(",", ":"),
+        ).encode("utf-8")
+    )
+    signing_input = f"{SIGNED_TOKEN_PREFIX}.{payload}"
+    return f"{signing_input}.{_sign(key, signing_input)}", claims
+
+
+def decode_signed_access_token(token: str, key: bytes) -> SignedTokenClaims:
+    """Checks the signature of `token` and returns its claims. Does NOT check expiry.
+
+    Raises:
+        InvalidSignedTokenError: If the token is malformed or its signature doesn't match.
+    """
+    try:
+        prefix, payload, signature = token.split(".")
+    except ValueError:
+        raise InvalidSignedTokenError("Malformed signed token!")
+
+    if prefix != SIGNED_TOKEN_PREFIX:
+        raise InvalidSignedTokenError(f"Unknown signed token version '{prefix}'!")
+
+    expected = _sign(key, f"{prefix}.{payload}")
+    if not hmac.compare_digest(expected, signature):
+        raise InvalidSignedTokenError("Signed token signature mismatch!")
+
+    try:
+        claims = json.loads(_b64decode(payload))
+        return SignedTokenClaims(
+            sub=str(claims["sub"]),
+            email=str(claims["email"]),
+            exp=int(claims["exp"]),
+            jti=str(claims["jti"]),
+        )
+    except (ValueError, KeyError, TypeError):
+        raise InvalidSignedTokenError("Signed token claims could not be parsed!")
+
+
+def signed_token_row_id(claims: SignedTokenClaims) -> str:
+    """`AccessToken.id` we record a signed token under."""
+    return f"{SIGNED_TOKEN_ROW_ID_PREFIX}{claims.jti}"
+
+
+class SigningKey:
+    """Lazily loaded signing key so importing auth doesn't require the key file in opaque mode."""
+
+    def __init__(self, key_file: Path):
+        self.key_file = key_file
+        self._key: Optional[bytes] = None
+
+    def get(self) -> bytes:
+        if self._key is None:
+            if not self.key_file.exists():
+                raise MissingSigningKeyError(self.key_file)
+            key = self.key_file.read_bytes().strip()
+            if not key:
+                raise MissingSigningKeyError(self.key_file)
+            self._key = key
+        return self._key
+
+
+class RevocationList:
+    """In-memory set of logged out signed token `jti`s, synced from the `AccessToken` table.
+
+    Entries are dropped after one token lifetime since the token would have expired by then anyway,
+    which keeps the set no larger than the number of logouts in one token lifetime.
+    """
+
+    def __init__(
+        self,
+        sync_interval: float,
+        max_token_lifetime: float,
+        now_fn: Callable[[], float] = time.time,
+    ):
+        self.sync_interval = sync_interval
+        self.max_token_lifetime = max_token_lifetime
+        self._revoked: Dict[str, float] = {}
+        # A fresh worker must still learn about logouts that happened before it started. Any token
+        # that's still alive was logged out within one token lifetime, so start the watermark there.
+        self._last_sync: float = now_fn() - max_token_lifetime
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._revoked
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, jti: str, now: float) -> None:
+        self._revoked.setdefault(jti, now)
+
+    def prune(self, now: float) -> None:
+        cutoff = now - self.max_token_lifetime
+        for jti in [
+            j for j, revoked_at in self._revoked.items() if revoked_at < cutoff
+        ]:
+            del self._revoked[jti]
+
+    def needs_sync(self, now: float) -> bool:
+        return now - self._last_sync >= self.sync_interval
+
+    def sync(
+        self,
+        fetch_revoked_since: Callable[[int, int], Iterable[str]],
+        now: float,
+    ) -> None:
+        """Adds signed tokens whose stored `exp` was rewritten since our last sync.
+
+        Args:
+            fetch_revoked_since (Callable[[int, int], Iterable[str]]): Given `(since, until)` epoch seconds,
+                returns the `AccessToken.id`s whose `exp` falls within that window.
+            now (float): Current epoch timestamp
+        """
+        since = int(self._last_sync) - 1
+        for row_id in fetch_revoked_since(since, int(now)):
+            if row_id.startswith(SIGNED_TOKEN_ROW_ID_PREFIX):
+                self.add(row_id[len(SIGNED_TOKEN_ROW_ID_PREFIX) :], now)
+        self.prune(now)
+        self._last_sync = now
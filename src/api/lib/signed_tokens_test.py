@@ -0,0 +1,102 @@
+import pytest  # type: ignore
+
+from src.api.lib.signed_tokens import (
+    InvalidSignedTokenError,
+    MissingSigningKeyError,
+    RevocationList,
+    SigningKey,
+    decode_signed_access_token,
+    is_signed_access_token,
+    sign_access_token,
+    signed_token_row_id,
+)
+
+
+@pytest.fixture
+def key() -> bytes:
+    return b"a-test-signing-key"
+
+
+class TestSignedTokens:
+    def test_round_trip(self, key):
+        token, claims = sign_access_token("sub", "a@b.c", 1999999999, key)
+
+        decoded = decode_signed_access_token(token, key)
+
+        assert is_signed_access_token(token)
+        assert decoded == claims
+        assert (decoded.sub, decoded.email, decoded.exp) == ("sub", "a@b.c", 1999999999)
+
+    def test_opaque_tokens_are_not_signed_tokens(self):
+        assert not is_signed_access_token("deadbeef" * 8)
+
+    def test_rejects_wrong_key(self, key):
+        token, _ = sign_access_token("sub", "a@b.c", 1999999999, key)
+        with pytest.raises(InvalidSignedTokenError):
+            decode_signed_access_token(token, b"some-other-key")
+
+    def test_rejects_tampered_claims(self, key):
+        token, _ = sign_access_token("sub", "a@b.c", 1999999999, key)
+        _, _, signature = token.split(".")
+        forged, _ = sign_access_token("admin", "a@b.c", 1999999999, b"attacker-key")
+        prefix, payload, _ = forged.split(".")
+
+        with pytest.raises(InvalidSignedTokenError):
+            decode_signed_access_token(f"{prefix}.{payload}.{signature}", key)
+
+    def test_rejects_malformed_token(self, key):
+        with pytest.raises(InvalidSignedTokenError):
+            decode_signed_access_token("yc1.not-enough-parts", key)
+
+    def test_row_id_is_keyed_by_jti(self, key):
+        token, claims = sign_access_token("sub", "a@b.c", 1999999999, key)
+        row_id = signed_token_row_id(claims)
+        assert claims.jti in row_id
+        assert len(row_id) < len(token)
+
+
+class TestSigningKey:
+    def test_missing_key_file(self, tmp_path):
+        with pytest.raises(MissingSigningKeyError):
+            SigningKey(tmp_path / "nope.key").get()
+
+    def test_reads_and_strips_key(self, tmp_path):
+        key_file = tmp_path / "signing.key"
+        key_file.write_bytes(b"secret\n")
+        assert SigningKey(key_file).get() == b"secret"
+
+
+class TestRevocationList:
+    def test_starts_watermark_one_lifetime_back(self):
+        windows = []
+        revocations = RevocationList(
+            sync_interval=5, max_token_lifetime=1800, now_fn=lambda: 10000.0
+        )
+
+        revocations.sync(
+            lambda since, until: windows.append((since, until)) or [], 10000
+        )
+
+        assert windows == [(10000 - 1800 - 1, 10000)]
+
+    def test_sync_only_picks_up_signed_rows(self):
+        revocations = RevocationList(
+            sync_interval=5, max_token_lifetime=1800, now_fn=lambda: 10000.0
+        )
+
+        revocations.sync(lambda since, until: ["yc1:abc", "deadbeef"], 10000)
+
+        assert "abc" in revocations
+        assert len(revocations) == 1
+
+    def test_prunes_after_one_token_lifetime(self):
+        revocations = RevocationList(
+            sync_interval=5, max_token_lifetime=1800, now_fn=lambda: 10000.0
+        )
+        revocations.add("abc", 10000)
+
+        revocations.prune(11800)
+        assert "abc" in revocations
+
+        revocations.prune(11801)
+        assert "abc" not in revocations
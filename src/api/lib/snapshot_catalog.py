@@ -0,0 +1,246 @@
+"""Indexed catalog of the restic repository's snapshots, kept in the API database.
+
+`restic snapshots` reads and decrypts every snapshot file in the repository, so listing backups got slower with
+every backup ever taken, and filtering by world group or time meant fetching everything first. `SnapshotCatalog`
+mirrors the snapshot list into the `snapshot` and `snapshot_tag` tables, indexed by hostname (env and world group),
+tag and time, and answers listings with paged queries against those.
+
+The catalog is refreshed for one world group after each backup, and fully reconciled against the repository
+periodically, which also picks up snapshots created or forgotten by the backup sidecars. Snapshots are immutable
+in restic (`restic tag` writes a new snapshot), so syncing is only ever inserts and deletes.
+
+Every gunicorn worker reconciles the same tables, all of them at startup. A worker whose inserts collide with
+another's just rolls back and syncs again against what the other worker committed.
+"""
+
+import json
+import random
+import time
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func  # type: ignore
+from sqlalchemy.exc import IntegrityError  # type: ignore
+
+from src.api.db import db
+from src.api.lib import Backup
+from src.api.lib import structured_logging as slog
+from src.api.lib.metrics import metrics
+from src.api.models import Snapshot, SnapshotTag, SnapshotWorlds
+from src.common.helpers import log_exception
+
+DELETE_CHUNK_SIZE = 500
+# Syncs attempted before giving up on collisions with other workers' inserts
+SYNC_ATTEMPTS = 3
+
+
+def snapshot_timestamp(time_str: str) -> float:
+    """Epoch timestamp of a restic snapshot `time`. Times without an offset are taken as UTC."""
+    dt = datetime.fromisoformat(time_str.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def chunked(items: List[str], size: int) -> Iterable[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+class SnapshotCatalog:
+    """Mirrors `restic snapshots --json` into the database
+
+    Args:
+        run_restic (Callable[[str], str]): Runs `restic <command>` and returns its output. Usually `BackupManagement.call_restic`.
+        interval (float): Seconds between full reconciles. Jittered by up to 10% so gunicorn workers don't reconcile in lockstep.
+        clock (Callable[[], float]): Time source
+    """
+
+    def __init__(
+        self,
+        run_restic: Callable[[str], str],
+        interval: float = 900,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.run_restic = run_restic
+        self.interval = interval
+        self.clock = clock
+        self.ready = False
+        self.last_reconciled_at: Optional[float] = None
+
+    def reconcile(self) -> Dict[str, int]:
+        """Syncs the whole catalog with the repository. Must be called inside an app context."""
+        with metrics.timer("snapshot_catalog.reconcile.duration"):
+            changes = self._sync(self._fetch("snapshots --json"))
+        self.ready = True
+        self.last_reconciled_at = self.clock()
+        slog.info("snapshot_catalog.reconciled", **changes)
+        return changes
+
+    def refresh(self, hostname: str) -> Dict[str, int]:
+        """Syncs the snapshots of a single host, eg after backing it up. Must be called inside an app context."""
+        with metrics.timer("snapshot_catalog.refresh.duration"):
+            changes = self._sync(
+                self._fetch(f"snapshots --json --host {hostname}"), hostname=hostname
+            )
+        slog.info("snapshot_catalog.refreshed", hostname=hostname, **changes)
+        return changes
+
+    def query(
+        self,
+        tags: List[str],
+        hostname: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Backup], int]:
+        """Finds snapshots carrying every tag in `tags`, oldest first like `restic snapshots`
+
+        Args:
+            tags (List[str]): Snapshots must have all of these
+            hostname (Optional[str]): Only snapshots of this host
+            since (Optional[float]): Only snapshots at or after this epoch timestamp
+            until (Optional[float]): Only snapshots before this epoch timestamp
+            limit (Optional[int]): Max snapshots returned. All of them if None.
+            offset (int): Matching snapshots skipped before the first one returned
+
+        Returns:
+            Tuple[List[Backup], int]: The page of snapshots, and the total number matching
+        """
+        query = db.session.query(Snapshot)
+        for tag in sorted(set(tags)):
+            query = query.filter(
+                Snapshot.id.in_(
+                    db.session.query(SnapshotTag.snapshot_id).filter(
+                        SnapshotTag.tag == tag
+                    )
+                )
+            )
+        if hostname is not None:
+            query = query.filter(Snapshot.hostname == hostname)
+        if since is not None:
+            query = query.filter(Snapshot.time >= since)
+        if until is not None:
+            query = query.filter(Snapshot.time < until)
+
+        total = query.count()
+        query = query.order_by(Snapshot.time, Snapshot.id).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+
+        return [Backup(**json.loads(row.data)) for row in query.all()], total
+
+    def last_snapshot_time(self, hostname: str) -> Optional[float]:
+        """Epoch timestamp of the newest snapshot of `hostname`. None if there is none or the catalog isn't ready."""
+        if not self.ready:
+            return None
+        return (
+            db.session.query(func.max(Snapshot.time))
+            .filter(Snapshot.hostname == hostname)
+            .scalar()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "last_reconciled_at": self.last_reconciled_at,
+        }
+
+    def run_forever(self, app, sleep=time.sleep, iterations: Optional[int] = None):
+        """Reconcile loop. Meant to be started with `socketio.start_background_task()`. Reconciles once right away."""
+        while iterations is None or iterations > 0:
+            with app.app_context():
+                try:
+                    self.reconcile()
+                except Exception:
+                    db.session.rollback()
+                    log_exception(message="Failed to reconcile snapshot catalog!")
+                finally:
+                    db.session.remove()
+
+            if iterations is not None:
+                iterations -= 1
+                if iterations == 0:
+                    break
+            sleep(self.interval * (1 + random.uniform(0, 0.1)))
+
+    def _fetch(self, command: str) -> List[Dict]:
+        return json.loads(self.run_restic(command) or "[]") or []
+
+    def _known(self, hostname: Optional[str] = None) -> Dict[str, str]:
+        """Short ids of the snapshots in the catalog, by id"""
+        known_query = db.session.query(Snapshot.id, Snapshot.short_id)
+        if hostname is not None:
+            known_query = known_query.filter(Snapshot.hostname == hostname)
+        return {row[0]: row[1] for row in known_query.all()}
+
+    def _sync(
+        self, snapshots: List[Dict], hostname: Optional[str] = None
+    ) -> Dict[str, int]:
+        """Inserts snapshots missing from the catalog and deletes those no longer in `snapshots`
+
+        Args:
+            snapshots (List[Dict]): `restic snapshots --json` output
+            hostname (Optional[str]): `snapshots` only covers this host, so only its rows may be deleted
+
+        Raises:
+            IntegrityError: If inserts still collided with other workers' after `SYNC_ATTEMPTS`
+        """
+        for _ in range(SYNC_ATTEMPTS - 1):
+            try:
+                return self._sync_once(snapshots, hostname)
+            except IntegrityError:
+                # Another worker inserted some of the same snapshots since we read the catalog.
+                db.session.rollback()
+                metrics.inc("snapshot_catalog.sync_conflicts")
+        return self._sync_once(snapshots, hostname)
+
+    def _sync_once(
+        self, snapshots: List[Dict], hostname: Optional[str]
+    ) -> Dict[str, int]:
+        fetched = {snapshot["id"]: snapshot for snapshot in snapshots}
+        short_ids = self._known(hostname)
+        known = short_ids.keys()
+
+        removed = sorted(known - fetched.keys())
+        for ids in chunked(removed, DELETE_CHUNK_SIZE):
+            db.session.query(SnapshotWorlds).filter(
+                SnapshotWorlds.snapshot_id.in_(ids + [short_ids[i] for i in ids])
+            ).delete(synchronize_session=False)
+            db.session.query(SnapshotTag).filter(
+                SnapshotTag.snapshot_id.in_(ids)
+            ).delete(synchronize_session=False)
+            db.session.query(Snapshot).filter(Snapshot.id.in_(ids)).delete(
+                synchronize_session=False
+            )
+
+        added = 0
+        for snapshot_id in fetched.keys() - known:
+            snapshot = fetched[snapshot_id]
+            try:
+                backup = Backup(**snapshot)
+                timestamp = snapshot_timestamp(backup.time)
+            except ValueError:  # Includes pydantic's `ValidationError`
+                slog.warning("snapshot_catalog.invalid_snapshot", snapshot=snapshot_id)
+                continue
+
+            db.session.add(
+                Snapshot(
+                    id=backup.id,
+                    short_id=backup.short_id,
+                    hostname=backup.hostname,
+                    time=timestamp,
+                    data=json.dumps(snapshot),
+                )
+            )
+            for tag in set(backup.tags or []):
+                db.session.add(SnapshotTag(snapshot_id=backup.id, tag=tag))
+            added += 1
+
+        db.session.commit()
+
+        metrics.inc("snapshot_catalog.added", added)
+        metrics.inc("snapshot_catalog.removed", len(removed))
+        return {"added": added, "removed": len(removed)}
@@ -0,0 +1,211 @@
+import json
+
+from unittest.mock import MagicMock
+
+import flask  # type: ignore
+import pytest  # type: ignore
+
+from src.api.db import db
+from src.api.lib.snapshot_catalog import SnapshotCatalog, snapshot_timestamp
+from src.api.models import Snapshot, SnapshotTag
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/snapshots.db"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def snapshot(
+    snapshot_id, hostname="YC-env1-lobby", time="2024-05-01T00:00:00Z", tags=None
+):
+    return {
+        "gid": 1000,
+        "hostname": hostname,
+        "id": snapshot_id,
+        "paths": ["/worlds-bindmount"],
+        "program_version": "restic 0.16.4",
+        "short_id": snapshot_id[:8],
+        "time": time,
+        "tree": "a-tree",
+        "uid": 1000,
+        "username": "root",
+        "tags": tags if tags is not None else ["env1", "adhoc"],
+    }
+
+
+@pytest.fixture
+def repo():
+    """Snapshots currently in the fake restic repository"""
+    return []
+
+
+@pytest.fixture
+def run_restic(repo):
+    def run(command):
+        args = command.split()
+        hosts = [args[i + 1] for i, arg in enumerate(args) if arg == "--host"]
+        return json.dumps([s for s in repo if not hosts or s["hostname"] in hosts])
+
+    return MagicMock(side_effect=run)
+
+
+@pytest.fixture
+def catalog(app, run_restic):
+    return SnapshotCatalog(run_restic, clock=lambda: 123.0)
+
+
+def test_snapshot_timestamp():
+    assert snapshot_timestamp("1970-01-01T00:01:00") == 60
+    assert snapshot_timestamp("1970-01-01T09:01:00.123456789+09:00") == 60.123456
+    assert snapshot_timestamp("1970-01-01T00:01:00Z") == 60
+
+
+def test_reconcile_inserts_and_deletes(catalog, repo):
+    # SETUP
+    repo.extend([snapshot("a" * 64), snapshot("b" * 64)])
+    catalog.reconcile()
+    repo.pop(0)
+    repo.append(snapshot("c" * 64))
+
+    # EXECUTE
+    changes = catalog.reconcile()
+
+    # ASSERT
+    assert changes == {"added": 1, "removed": 1}
+    assert sorted(row.id[0] for row in db.session.query(Snapshot).all()) == ["b", "c"]
+    assert {row.snapshot_id[0] for row in db.session.query(SnapshotTag).all()} == {
+        "b",
+        "c",
+    }
+    assert catalog.stats() == {"ready": True, "last_reconciled_at": 123.0}
+
+
+def test_refresh_only_touches_its_host(catalog, repo, run_restic):
+    # SETUP
+    repo.extend([snapshot("a" * 64), snapshot("b" * 64, hostname="YC-env1-survival")])
+    catalog.reconcile()
+    repo[:] = [snapshot("c" * 64)]
+
+    # EXECUTE
+    changes = catalog.refresh("YC-env1-lobby")
+
+    # ASSERT
+    assert changes == {"added": 1, "removed": 1}
+    assert run_restic.call_args.args[0] == "snapshots --json --host YC-env1-lobby"
+    assert sorted(row.id[0] for row in db.session.query(Snapshot).all()) == ["b", "c"]
+
+
+def test_invalid_snapshots_are_skipped(catalog, repo):
+    # SETUP
+    broken = snapshot("b" * 64)
+    del broken["tree"]
+    repo.extend([snapshot("a" * 64), broken])
+
+    # EXECUTE
+    changes = catalog.reconcile()
+
+    # ASSERT
+    assert changes == {"added": 1, "removed": 0}
+
+
+def test_query_filters_by_every_tag_host_and_time(catalog, repo):
+    # SETUP
+    repo.extend(
+        [
+            snapshot("a" * 64, time="2024-05-01T00:00:00Z"),
+            snapshot("b" * 64, time="2024-05-02T00:00:00Z", tags=["env1"]),
+            snapshot("c" * 64, time="2024-05-03T00:00:00Z", tags=["env2", "adhoc"]),
+            snapshot(
+                "d" * 64, time="2024-05-04T00:00:00Z", hostname="YC-env1-survival"
+            ),
+            snapshot("e" * 64, time="2024-05-05T00:00:00Z"),
+        ]
+    )
+    catalog.reconcile()
+
+    # EXECUTE
+    by_tags, by_tags_total = catalog.query(["adhoc", "env1"])
+    by_host, _ = catalog.query(["env1"], hostname="YC-env1-lobby")
+    by_time, _ = catalog.query(
+        ["env1"],
+        since=snapshot_timestamp("2024-05-02T00:00:00Z"),
+        until=snapshot_timestamp("2024-05-04T00:00:00Z"),
+    )
+
+    # ASSERT
+    assert [b.id[0] for b in by_tags] == ["a", "d", "e"]
+    assert by_tags_total == 3
+    assert [b.id[0] for b in by_host] == ["a", "b", "e"]
+    assert [b.id[0] for b in by_time] == ["b"]
+
+
+def test_query_pages_oldest_first(catalog, repo):
+    # SETUP
+    repo.extend(
+        snapshot(str(i) * 64, time=f"2024-05-0{i}T00:00:00Z") for i in range(1, 8)
+    )
+    catalog.reconcile()
+
+    # EXECUTE
+    first, first_total = catalog.query(["env1"], limit=3)
+    last, last_total = catalog.query(["env1"], limit=3, offset=6)
+
+    # ASSERT
+    assert [b.id[0] for b in first] == ["1", "2", "3"]
+    assert [b.id[0] for b in last] == ["7"]
+    assert first_total == last_total == 7
+    assert first[0].tags == ["env1", "adhoc"]
+
+
+def test_reconcile_survives_another_worker_inserting_first(app, catalog, repo, mocker):
+    # SETUP
+    repo.extend([snapshot("a" * 64), snapshot("b" * 64)])
+    known = catalog._known
+
+    def lose_the_race(hostname=None):
+        stale = known(hostname)
+        if mocker_known.call_count == 1:
+            # Another gunicorn worker commits "a" between our read and our insert.
+            with db.engine.begin() as conn:
+                conn.execute(
+                    Snapshot.__table__.insert(),
+                    {
+                        "id": "a" * 64,
+                        "short_id": "a" * 8,
+                        "hostname": "YC-env1-lobby",
+                        "time": 0.0,
+                        "data": json.dumps(snapshot("a" * 64)),
+                    },
+                )
+        return stale
+
+    mocker_known = mocker.patch.object(catalog, "_known", side_effect=lose_the_race)
+
+    # EXECUTE
+    changes = catalog.reconcile()
+
+    # ASSERT
+    assert changes == {"added": 1, "removed": 0}
+    assert catalog.ready is True
+    assert sorted(row.id[0] for row in db.session.query(Snapshot).all()) == ["a", "b"]
+
+
+def test_run_forever_survives_restic_failures(app, catalog, run_restic):
+    # SETUP
+    run_restic.side_effect = RuntimeError("repository is locked")
+    sleep = MagicMock()
+
+    # EXECUTE
+    catalog.run_forever(app, sleep=sleep, iterations=2)
+
+    # ASSERT
+    assert run_restic.call_count == 2
+    sleep.assert_called_once()
+    assert catalog.ready is False
@@ -0,0 +1,99 @@
+"""Permanent cache of which worlds each restic snapshot contains.
+
+Opening the restore dialog asks for the worlds in a snapshot, which used to run `restic ls` every time. Snapshots are
+immutable, so the answer never changes: `SnapshotWorldsCache` keeps it in memory and in the `snapshot_worlds`
+table, so it survives restarts and is shared by every gunicorn worker. On a miss, `worlds_in_listing()` parses the
+listing line by line as restic streams it, rather than buffering the whole output first.
+"""
+
+import json
+import re
+import threading
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy.exc import IntegrityError  # type: ignore
+
+from src.api.db import db
+from src.api.lib.metrics import metrics
+from src.api.models import SnapshotWorlds
+
+SNAPSHOT_ID_PATTERN = re.compile(r"[0-9a-f]{8,64}")
+
+
+def is_cacheable(snapshot_id: str) -> bool:
+    """Only literal snapshot ids name the same snapshot forever. `latest` and friends don't."""
+    return SNAPSHOT_ID_PATTERN.fullmatch(snapshot_id) is not None
+
+
+def worlds_in_listing(lines: Iterable[str], root: str) -> List[str]:
+    """Names of the entries directly under `root` in `restic ls --json` output
+
+    `root` itself and anything nested deeper are skipped, as are lines that aren't JSON objects, eg restic errors.
+
+    Args:
+        lines (Iterable[str]): `restic ls --json` output, one JSON object per line
+        root (str): Directory whose children are the worlds, eg `/worlds-bindmount`
+
+    Returns:
+        List[str]: Sorted world names
+    """
+    prefix = f"{root.rstrip('/')}/"
+    worlds = set()
+    for line in lines:
+        line = line.strip()
+        if not line.startswith("{"):
+            continue
+
+        d = json.loads(line)
+        path = d.get("path")
+        name = d.get("name")
+        if name is None or not isinstance(path, str) or not path.startswith(prefix):
+            # Only file objects have the "name" field. The snapshot object and `root` itself are skipped here.
+            continue
+        if "/" in path[len(prefix) :]:
+            continue
+
+        worlds.add(name)
+
+    return sorted(worlds)
+
+
+class SnapshotWorldsCache:
+    """Worlds per snapshot id, in memory and in the database. Must be used inside an app context."""
+
+    def __init__(self):
+        self._worlds: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, snapshot_id: str) -> Optional[List[str]]:
+        with self._lock:
+            worlds = self._worlds.get(snapshot_id)
+        if worlds is None and is_cacheable(snapshot_id):
+            row = db.session.get(SnapshotWorlds, snapshot_id)
+            if row is not None:
+                worlds = json.loads(row.worlds)
+                with self._lock:
+                    self._worlds[snapshot_id] = worlds
+
+        metrics.inc(f"snapshot_worlds.{'miss' if worlds is None else 'hit'}")
+        return list(worlds) if worlds is not None else None
+
+    def put(self, snapshot_id: str, worlds: List[str]) -> None:
+        if not is_cacheable(snapshot_id):
+            return
+
+        with self._lock:
+            self._worlds[snapshot_id] = list(worlds)
+        try:
+            db.session.add(
+                SnapshotWorlds(snapshot_id=snapshot_id, worlds=json.dumps(worlds))
+            )
+            db.session.commit()
+        except IntegrityError:
+            # Another worker listed the same snapshot at the same time. Same answer either way.
+            db.session.rollback()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"snapshots": len(self._worlds)}
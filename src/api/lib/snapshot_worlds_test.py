@@ -0,0 +1,90 @@
+import json
+
+import flask  # type: ignore
+import pytest  # type: ignore
+
+from src.api.db import db
+from src.api.lib.snapshot_worlds import SnapshotWorldsCache, worlds_in_listing
+from src.api.models import SnapshotWorlds
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path}/worlds.db"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def node(path):
+    return json.dumps(
+        {
+            "name": path.rsplit("/", 1)[-1],
+            "type": "dir",
+            "path": path,
+            "struct_type": "node",
+        }
+    )
+
+
+def test_worlds_in_listing_keeps_only_direct_children():
+    # SETUP
+    lines = [
+        json.dumps({"id": "abc", "paths": ["/worlds-bindmount"]}),
+        node("/worlds-bindmount"),
+        node("/worlds-bindmount/lobby"),
+        node("/worlds-bindmount/lobby/region"),
+        node("/worlds-bindmount/lobby_nether"),
+        node("/worlds-bindmount-other/nope"),
+        "",
+        "Fatal: unexpected EOF",
+    ]
+
+    # EXECUTE
+    worlds = worlds_in_listing(iter(lines), "/worlds-bindmount")
+
+    # ASSERT
+    assert worlds == ["lobby", "lobby_nether"]
+
+
+def test_cache_survives_a_new_process(app):
+    # SETUP
+    SnapshotWorldsCache().put("0123abcd", ["lobby", "survival"])
+
+    # EXECUTE
+    worlds = SnapshotWorldsCache().get("0123abcd")
+
+    # ASSERT
+    assert worlds == ["lobby", "survival"]
+
+
+def test_cache_miss_and_concurrent_put(app):
+    # SETUP
+    cache = SnapshotWorldsCache()
+    db.session.add(SnapshotWorlds(snapshot_id="0123abcd", worlds='["lobby"]'))
+    db.session.commit()
+
+    # EXECUTE
+    missing = cache.get("4567abcd")
+    cache.put("0123abcd", ["lobby"])
+
+    # ASSERT
+    assert missing is None
+    assert cache.get("0123abcd") == ["lobby"]
+    assert db.session.query(SnapshotWorlds).count() == 1
+
+
+def test_symbolic_snapshot_ids_are_never_cached(app):
+    # SETUP
+    cache = SnapshotWorldsCache()
+
+    # EXECUTE
+    cache.put("latest", ["lobby"])
+
+    # ASSERT
+    assert cache.get("latest") is None
+    assert db.session.query(SnapshotWorlds).count() == 0
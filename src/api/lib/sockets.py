@@ -11,6 +11,8 @@ socketio = SocketIO(
     logger=True,
     engineio_logger=True,
 )
+# Room every socket joins once it has presented a valid access token. Broadcasts that aren't for everyone go here.
+AUTHED_ROOM = "authed"
 
 
 class ConsoleSocketMessage:
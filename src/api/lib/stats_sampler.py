@@ -0,0 +1,508 @@
+"""Samples CPU, memory, network and block I/O for every running minecraft container.
+
+`StatsSampler` keeps one streaming `docker stats` connection per container instead of making one-shot
+`stats(stream=False)` calls, which block for ~2s each while Docker takes a second sample to diff against.
+Every sample is folded into a set of `Rollup`s - 1s, 1m and 1h buckets by default - each backed by a fixed-size
+`RingBuffer`, so memory use is constant no matter how long the API runs.
+
+Only one gunicorn worker samples: whichever holds an exclusive `flock` on `data_dir/leader.lock`. Its ring buffers
+are `mmap`ed files under `data_dir`, which the other workers map read-only, so any worker can answer
+`/server/cluster/<env>/stats`.
+"""
+
+import mmap
+import os
+import threading
+import time
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import docker  # type: ignore
+from docker import DockerClient
+from docker.models.containers import Container
+
+from src.api.lib import structured_logging as slog
+from src.api.lib.helpers import is_minecraft_container
+from src.api.lib.leader_lock import LeaderLock
+from src.common.constants import YC_ENV_LABEL
+from src.common.helpers import log_exception
+
+SAMPLE_FIELDS = (
+    "cpu_percent",
+    "mem_bytes",
+    "mem_limit_bytes",
+    "net_rx_bytes",
+    "net_tx_bytes",
+    "blk_read_bytes",
+    "blk_write_bytes",
+)
+# Cumulative since container start. Rollups keep the last value instead of averaging.
+COUNTER_FIELDS = frozenset(
+    ("net_rx_bytes", "net_tx_bytes", "blk_read_bytes", "blk_write_bytes")
+)
+
+# (resolution_secs, capacity): 1h of 1s samples, 1d of 1m samples, 30d of 1h samples
+DEFAULT_ROLLUPS: Tuple[Tuple[int, int], ...] = ((1, 3600), (60, 1440), (3600, 720))
+
+RANGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Ring buffer files start with (next, size) as two int64s.
+RING_HEADER_BYTES = 16
+
+Sample = Dict[str, float]
+
+
+def parse_range_secs(value: str) -> int:
+    """Parses eg `"90"`, `"15m"`, `"6h"` or `"7d"` into seconds
+
+    Raises:
+        ValueError: If `value` isn't a positive number with an optional s/m/h/d suffix
+    """
+    value = value.strip().lower()
+    multiplier = RANGE_UNITS.get(value[-1:], None)
+    number = value[:-1] if multiplier is not None else value
+    secs = int(number) * (multiplier or 1)
+    if secs <= 0:
+        raise ValueError(f"Range must be positive, got '{value}'")
+    return secs
+
+
+def parse_stats(raw: Dict[str, Any]) -> Sample:
+    """Flattens one decoded `docker stats` record into `SAMPLE_FIELDS`"""
+    cpu = raw.get("cpu_stats") or {}
+    precpu = raw.get("precpu_stats") or {}
+    cpu_delta = (cpu.get("cpu_usage") or {}).get("total_usage", 0) - (
+        precpu.get("cpu_usage") or {}
+    ).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    online_cpus = (
+        cpu.get("online_cpus")
+        or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or [])
+        or 1
+    )
+    cpu_percent = (
+        cpu_delta / system_delta * online_cpus * 100.0
+        if cpu_delta > 0 and system_delta > 0
+        else 0.0
+    )
+
+    # Same as the docker CLI: page cache can be reclaimed, so it doesn't count as used.
+    memory = raw.get("memory_stats") or {}
+    memory_stats = memory.get("stats") or {}
+    cache = memory_stats.get(
+        "inactive_file", memory_stats.get("total_inactive_file", 0)
+    )
+
+    networks = (raw.get("networks") or {}).values()
+    blkio = (raw.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+
+    return {
+        "cpu_percent": cpu_percent,
+        "mem_bytes": float(max(memory.get("usage", 0) - cache, 0)),
+        "mem_limit_bytes": float(memory.get("limit", 0)),
+        "net_rx_bytes": float(sum(n.get("rx_bytes", 0) for n in networks)),
+        "net_tx_bytes": float(sum(n.get("tx_bytes", 0) for n in networks)),
+        "blk_read_bytes": float(
+            sum(e.get("value", 0) for e in blkio if e.get("op", "").lower() == "read")
+        ),
+        "blk_write_bytes": float(
+            sum(e.get("value", 0) for e in blkio if e.get("op", "").lower() == "write")
+        ),
+    }
+
+
+def map_file(path: Path, nbytes: int, readonly: bool = False) -> mmap.mmap:
+    """Maps `nbytes` of `path`, creating it zero-filled if it doesn't exist
+
+    A writable file of the wrong size is replaced rather than resized, so readers that already mapped it keep a
+    valid mapping of the old one.
+
+    Raises:
+        FileNotFoundError: If `readonly` and `path` doesn't exist
+        ValueError: If `readonly` and `path` isn't `nbytes` long
+    """
+    if readonly:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size != nbytes:
+                raise ValueError(f"Expected {path} to be {nbytes} bytes, got {size}")
+            return mmap.mmap(f.fileno(), nbytes, access=mmap.ACCESS_READ)
+
+    if not path.exists() or path.stat().st_size != nbytes:
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.truncate(nbytes)
+        os.replace(tmp_path, path)
+    with open(path, "r+b") as f:
+        return mmap.mmap(f.fileno(), nbytes, access=mmap.ACCESS_WRITE)
+
+
+class RingBuffer:
+    """Fixed-size time series. One preallocated column of doubles per field; the oldest point is overwritten when full.
+
+    With a `path` the columns live in a shared `mmap` of that file instead of process memory, so another process can
+    map the same file with `readonly=True` and read every point the writer appends.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        fields: Iterable[str] = SAMPLE_FIELDS,
+        path: Optional[Path] = None,
+        readonly: bool = False,
+    ):
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        column_bytes = 8 * capacity
+        nbytes = RING_HEADER_BYTES + column_bytes * (1 + len(self.fields))
+        self._buf = (
+            map_file(path, nbytes, readonly) if path is not None else bytearray(nbytes)
+        )
+        view = memoryview(self._buf)
+        self._header = view[:RING_HEADER_BYTES].cast("q")
+        columns = [
+            view[start : start + column_bytes].cast("d")
+            for start in range(RING_HEADER_BYTES, nbytes, column_bytes)
+        ]
+        self.timestamps = columns[0]
+        self.values = dict(zip(self.fields, columns[1:]))
+
+    def __len__(self) -> int:
+        return self._header[1]
+
+    def append(self, ts: float, sample: Sample) -> None:
+        i = self._header[0]
+        self.timestamps[i] = ts
+        for field in self.fields:
+            self.values[field][i] = sample.get(field, 0.0)
+        # Header last, so a reader never sees a point before its values are written.
+        self._header[0] = (i + 1) % self.capacity
+        self._header[1] = min(self._header[1] + 1, self.capacity)
+
+    def points(self, since: float = 0) -> List[Dict[str, float]]:
+        """Points at or after `since`, oldest first"""
+        next_i, size = self._header[0], self._header[1]
+        start = (next_i - size) % self.capacity
+        points = []
+        for offset in range(size):
+            i = (start + offset) % self.capacity
+            if self.timestamps[i] < since:
+                continue
+            point = {"ts": self.timestamps[i]}
+            for field in self.fields:
+                point[field] = self.values[field][i]
+            points.append(point)
+        return points
+
+
+class Rollup:
+    """Folds samples into `resolution_secs` buckets and appends each finished bucket to a `RingBuffer`
+
+    Gauges are averaged over the bucket. `COUNTER_FIELDS` keep their last value.
+    """
+
+    def __init__(
+        self,
+        resolution_secs: int,
+        capacity: int,
+        path: Optional[Path] = None,
+        readonly: bool = False,
+    ):
+        self.resolution_secs = resolution_secs
+        self.buffer = RingBuffer(capacity, path=path, readonly=readonly)
+        self._bucket: Optional[float] = None
+        self._count = 0
+        self._sums: Sample = {}
+        self._last: Sample = {}
+
+    def add(self, ts: float, sample: Sample) -> None:
+        bucket = ts - ts % self.resolution_secs
+        if self._bucket is not None and bucket != self._bucket:
+            self.flush()
+        self._bucket = bucket
+        self._count += 1
+        for field, value in sample.items():
+            self._sums[field] = self._sums.get(field, 0.0) + value
+            self._last[field] = value
+
+    def flush(self) -> None:
+        if self._bucket is None or not self._count:
+            return
+        self.buffer.append(
+            self._bucket,
+            {
+                field: (
+                    self._last[field]
+                    if field in COUNTER_FIELDS
+                    else self._sums[field] / self._count
+                )
+                for field in self._sums
+            },
+        )
+        self._bucket = None
+        self._count = 0
+        self._sums = {}
+        self._last = {}
+
+
+def rollup_index(rollups: Iterable[Tuple[int, int]], range_secs: int) -> int:
+    """Index of the finest `(resolution_secs, capacity)` rollup that still covers `range_secs`"""
+    rollups = list(rollups)
+    for i, (resolution_secs, capacity) in enumerate(rollups):
+        if resolution_secs * capacity >= range_secs:
+            return i
+    return len(rollups) - 1
+
+
+class ContainerSeries:
+    """Every rollup for one container
+
+    Args:
+        rollups (Iterable[Tuple[int, int]]): `(resolution_secs, capacity)` per rollup, finest first
+        path_prefix (Optional[Path]): Backs each rollup with the file `<path_prefix>.<resolution_secs>s.ring`
+        readonly (bool): Map the files read-only. For reading another process's series.
+    """
+
+    def __init__(
+        self,
+        rollups: Iterable[Tuple[int, int]] = DEFAULT_ROLLUPS,
+        path_prefix: Optional[Path] = None,
+        readonly: bool = False,
+    ):
+        self.spec = tuple(rollups)
+        self.rollups = [
+            Rollup(
+                resolution_secs,
+                capacity,
+                path=(
+                    Path(f"{path_prefix}.{resolution_secs}s.ring")
+                    if path_prefix is not None
+                    else None
+                ),
+                readonly=readonly,
+            )
+            for resolution_secs, capacity in self.spec
+        ]
+
+    def add(self, ts: float, sample: Sample) -> None:
+        for rollup in self.rollups:
+            rollup.add(ts, sample)
+
+    def rollup_for(self, range_secs: int) -> Rollup:
+        return self.rollups[rollup_index(self.spec, range_secs)]
+
+    def flush(self) -> None:
+        for rollup in self.rollups:
+            rollup.flush()
+
+
+class StatsSampler:
+    """Streams `docker stats` for every running minecraft container into per-container `ContainerSeries`
+
+    Args:
+        client (DockerClient): Docker client
+        start_task (Callable): Runs `target(*args)` in the background. `socketio.start_background_task` in the app.
+        sync_interval_secs (float): How often `run()` looks for running containers that aren't being sampled.
+            Container start events from the inventory pick up new containers sooner.
+        rollups (Iterable[Tuple[int, int]]): `(resolution_secs, capacity)` per rollup, finest first
+        data_dir (Optional[Path]): Shared by every worker. Holds the leader lock and the rollup files. Without it,
+            this sampler always samples and keeps its series in memory.
+    """
+
+    def __init__(
+        self,
+        client: DockerClient,
+        start_task: Optional[Callable[..., Any]] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.time,
+        sync_interval_secs: float = 60,
+        rollups: Iterable[Tuple[int, int]] = DEFAULT_ROLLUPS,
+        data_dir: Optional[Path] = None,
+    ):
+        self.client = client
+        self.start_task = start_task or self._start_thread
+        self.sleep = sleep
+        self.clock = clock
+        self.sync_interval_secs = sync_interval_secs
+        self.rollups = tuple(rollups)
+        self.data_dir = data_dir
+        self.leader = (
+            LeaderLock(data_dir / "leader.lock", "stats_sampler")
+            if data_dir is not None
+            else None
+        )
+
+        self._series: Dict[str, ContainerSeries] = {}
+        self._readers: Dict[str, ContainerSeries] = {}
+        self._streams: Dict[str, Any] = {}
+        self._streaming: Set[str] = set()
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    # -----------
+    # Reads
+    # -----------
+
+    def query(
+        self, container_names: Iterable[str], range_secs: int
+    ) -> Tuple[int, Dict[str, List[Dict[str, float]]]]:
+        """Points for the last `range_secs` per container, from the finest rollup that covers the whole range
+
+        Returns:
+            Tuple[int, Dict[str, List[Dict[str, float]]]]: Resolution of the points in seconds, and points per container
+                name. Containers that were never sampled get an empty list.
+        """
+        since = self.clock() - range_secs
+        resolution_secs = self.rollups[rollup_index(self.rollups, range_secs)][0]
+        points = {}
+        with self._lock:
+            for container_name in container_names:
+                series = self._series.get(container_name) or self._reader(
+                    container_name
+                )
+                points[container_name] = (
+                    series.rollup_for(range_secs).buffer.points(since)
+                    if series is not None
+                    else []
+                )
+        return resolution_secs, points
+
+    def stats(self) -> Dict[str, int]:
+        return {"containers": len(self._series), "streams": len(self._streaming)}
+
+    @property
+    def is_sampling(self) -> bool:
+        """Whether this worker streams stats. Other workers read its series from `data_dir`."""
+        return self.leader is None or self.leader.held
+
+    def _reader(self, container_name: str) -> Optional[ContainerSeries]:
+        """The sampling worker's series for `container_name`, mapped read-only. Call with `_lock` held."""
+        if self.data_dir is None:
+            return None
+        series = self._readers.get(container_name)
+        if series is None:
+            try:
+                series = ContainerSeries(
+                    self.rollups, self.data_dir / container_name, readonly=True
+                )
+            except (FileNotFoundError, ValueError):
+                return None
+            self._readers[container_name] = series
+        return series
+
+    # -----------
+    # Sampling
+    # -----------
+
+    def record(self, container_name: str, sample: Sample) -> None:
+        with self._lock:
+            series = self._series.get(container_name)
+            if series is None:
+                series = self._series[container_name] = ContainerSeries(
+                    self.rollups,
+                    (
+                        self.data_dir / container_name
+                        if self.data_dir is not None
+                        else None
+                    ),
+                )
+            series.add(self.clock(), sample)
+
+    def watch(self, container_name: str) -> bool:
+        """Starts streaming stats for `container_name` unless it already is
+
+        Returns:
+            bool: Whether a new stream was started
+        """
+        if not self.is_sampling:
+            return False
+        with self._lock:
+            if self._stopped or container_name in self._streaming:
+                return False
+            self._streaming.add(container_name)
+        self.start_task(self._pump, container_name)
+        return True
+
+    def sync(self) -> None:
+        """Watches every running minecraft container"""
+        for container in self.client.containers.list(
+            filters={"label": YC_ENV_LABEL, "status": "running"}
+        ):
+            if is_minecraft_container(container):
+                self.watch(container.name)
+
+    def on_container_event(
+        self, action: str, container_id: str, container: Optional[Container]
+    ) -> None:
+        """`ContainerInventory` listener. Streams end on their own when their container stops."""
+        if action == "start" and container is not None:
+            if is_minecraft_container(container):
+                self.watch(container.name)
+
+    def run(self) -> None:
+        """Syncs every `sync_interval_secs` until `stop()` is called. Meant to be started with `socketio.start_background_task()`.
+
+        Workers that aren't sampling retry the leader lock each interval, so one takes over if the sampling worker exits.
+        """
+        if self.data_dir is not None:
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+        while not self._stopped:
+            try:
+                if self.leader is None or self.leader.acquire():
+                    self.sync()
+            except Exception:
+                log_exception(message="Stats sampler sync failed!")
+            self.sleep(self.sync_interval_secs)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+            streams = list(self._streams.values())
+        for stream in streams:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def _pump(self, container_name: str) -> None:
+        slog.info("stats_sampler.stream.start", container=container_name)
+        try:
+            stream = self.client.api.stats(container_name, stream=True, decode=True)
+            with self._lock:
+                self._streams[container_name] = stream
+            for raw in stream:
+                if self._stopped:
+                    break
+                # Docker keeps streaming zeroed records for a stopped container.
+                if raw.get("read", "").startswith("0001-"):
+                    break
+                self.record(container_name, parse_stats(raw))
+        except docker.errors.NotFound:
+            pass
+        except Exception:
+            if not self._stopped:
+                log_exception(
+                    message="Stats stream failed!",
+                    data={"container": container_name},
+                )
+        finally:
+            with self._lock:
+                self._streaming.discard(container_name)
+                stream = self._streams.pop(container_name, None)
+                # Keep the container's last partial buckets instead of waiting for a next sample that may never come.
+                series = self._series.get(container_name)
+                if series is not None:
+                    series.flush()
+            if stream is not None:
+                try:
+                    stream.close()
+                except Exception:
+                    pass
+            slog.info("stats_sampler.stream.stop", container=container_name)
+
+    @staticmethod
+    def _start_thread(target: Callable[..., Any], *args: Any) -> threading.Thread:
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,286 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.api.lib.leader_lock import LeaderLock
+from src.api.lib.stats_sampler import (
+    RingBuffer,
+    Rollup,
+    StatsSampler,
+    parse_range_secs,
+    parse_stats,
+)
+from src.common.constants import YC_CONTAINER_TYPE_LABEL
+
+
+def raw_stats(total_usage=200, system_usage=2000, read="2026-01-01T00:00:00Z"):
+    return {
+        "read": read,
+        "cpu_stats": {
+            "cpu_usage": {"total_usage": total_usage},
+            "system_cpu_usage": system_usage,
+            "online_cpus": 4,
+        },
+        "precpu_stats": {
+            "cpu_usage": {"total_usage": 100},
+            "system_cpu_usage": 1000,
+        },
+        "memory_stats": {
+            "usage": 1000,
+            "limit": 4000,
+            "stats": {"inactive_file": 200},
+        },
+        "networks": {
+            "eth0": {"rx_bytes": 10, "tx_bytes": 20},
+            "eth1": {"rx_bytes": 1, "tx_bytes": 2},
+        },
+        "blkio_stats": {
+            "io_service_bytes_recursive": [
+                {"op": "Read", "value": 300},
+                {"op": "Write", "value": 400},
+                {"op": "read", "value": 5},
+            ]
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("90", 90), ("90s", 90), ("15m", 900), ("6H", 21600), ("7d", 604800)],
+)
+def test_parse_range_secs(value, expected):
+    assert parse_range_secs(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "0", "m", "-5m", "1w"])
+def test_parse_range_secs_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        parse_range_secs(value)
+
+
+def test_parse_stats():
+    # EXECUTE
+    sample = parse_stats(raw_stats())
+
+    # ASSERT
+    assert sample == {
+        "cpu_percent": 40.0,
+        "mem_bytes": 800.0,
+        "mem_limit_bytes": 4000.0,
+        "net_rx_bytes": 11.0,
+        "net_tx_bytes": 22.0,
+        "blk_read_bytes": 305.0,
+        "blk_write_bytes": 400.0,
+    }
+
+
+def test_parse_stats_handles_first_sample():
+    """The first record of a stream has an empty `precpu_stats`"""
+    # SETUP
+    raw = raw_stats()
+    raw["precpu_stats"] = {}
+    raw["cpu_stats"]["system_cpu_usage"] = 0
+
+    # EXECUTE
+    sample = parse_stats(raw)
+
+    # ASSERT
+    assert sample["cpu_percent"] == 0.0
+
+
+def test_ring_buffer_overwrites_oldest():
+    # SETUP
+    buffer = RingBuffer(3, fields=("cpu_percent",))
+
+    # EXECUTE
+    for ts in range(5):
+        buffer.append(ts, {"cpu_percent": ts * 10})
+
+    # ASSERT
+    assert len(buffer) == 3
+    assert buffer.points() == [
+        {"ts": 2, "cpu_percent": 20},
+        {"ts": 3, "cpu_percent": 30},
+        {"ts": 4, "cpu_percent": 40},
+    ]
+    assert [p["ts"] for p in buffer.points(since=3)] == [3, 4]
+
+
+def test_rollup_averages_gauges_and_keeps_last_counter():
+    # SETUP
+    rollup = Rollup(60, 10)
+
+    # EXECUTE
+    rollup.add(120, {"cpu_percent": 10, "net_rx_bytes": 100})
+    rollup.add(150, {"cpu_percent": 30, "net_rx_bytes": 250})
+    before_next_bucket = len(rollup.buffer)
+    rollup.add(185, {"cpu_percent": 50, "net_rx_bytes": 300})
+
+    # ASSERT
+    assert before_next_bucket == 0
+    [point] = rollup.buffer.points()
+    assert point["ts"] == 120
+    assert point["cpu_percent"] == 20
+    assert point["net_rx_bytes"] == 250
+
+
+def test_query_picks_rollup_covering_range():
+    # SETUP
+    now = [1000.0]
+    sampler = StatsSampler(
+        MagicMock(), clock=lambda: now[0], rollups=((1, 10), (5, 10))
+    )
+    for _ in range(30):
+        sampler.record("YC-dev-survival", {"cpu_percent": 50})
+        now[0] += 1
+
+    # EXECUTE
+    fine_resolution, fine = sampler.query(["YC-dev-survival", "YC-dev-lobby"], 8)
+    coarse_resolution, coarse = sampler.query(["YC-dev-survival"], 30)
+
+    # ASSERT
+    assert fine_resolution == 1
+    assert [p["ts"] for p in fine["YC-dev-survival"]] == list(range(1022, 1029))
+    assert fine["YC-dev-lobby"] == []
+    assert coarse_resolution == 5
+    assert [p["ts"] for p in coarse["YC-dev-survival"]] == [
+        1000,
+        1005,
+        1010,
+        1015,
+        1020,
+    ]
+
+
+def test_watch_streams_once_per_container():
+    # SETUP
+    client = MagicMock()
+    client.api.stats.return_value = iter(
+        [raw_stats(), raw_stats(read="0001-01-01T00:00:00Z"), raw_stats()]
+    )
+    tasks = []
+    sampler = StatsSampler(
+        client, start_task=lambda target, *args: tasks.append((target, args))
+    )
+
+    # EXECUTE
+    first = sampler.watch("YC-dev-survival")
+    second = sampler.watch("YC-dev-survival")
+    target, args = tasks[0]
+    target(*args)
+    after_stream = sampler.watch("YC-dev-survival")
+
+    # ASSERT
+    assert first and not second
+    assert len(tasks) == 2
+    assert after_stream, "Expected a new stream once the previous one ended"
+    client.api.stats.assert_called_once_with(
+        "YC-dev-survival", stream=True, decode=True
+    )
+    assert sampler.stats() == {"containers": 1, "streams": 1}
+
+
+def test_start_events_watch_minecraft_containers():
+    # SETUP
+    sampler = StatsSampler(MagicMock(), start_task=lambda target, *args: None)
+    minecraft = MagicMock()
+    minecraft.name = "YC-dev-survival"
+    minecraft.labels = {YC_CONTAINER_TYPE_LABEL: "minecraft"}
+    velocity = MagicMock()
+    velocity.name = "YC-dev-velocity"
+    velocity.labels = {YC_CONTAINER_TYPE_LABEL: "velocity"}
+
+    # EXECUTE
+    sampler.on_container_event("start", "id-1", minecraft)
+    sampler.on_container_event("start", "id-2", velocity)
+    sampler.on_container_event("die", "id-3", minecraft)
+
+    # ASSERT
+    assert sampler.stats()["streams"] == 1
+
+
+def test_ring_buffer_file_keeps_points_across_reopen(tmp_path):
+    # SETUP
+    path = tmp_path / "survival.1s.ring"
+    writer = RingBuffer(3, fields=("cpu_percent",), path=path)
+    for ts in range(4):
+        writer.append(ts, {"cpu_percent": ts * 10})
+
+    # EXECUTE
+    reader = RingBuffer(3, fields=("cpu_percent",), path=path, readonly=True)
+    reopened = RingBuffer(3, fields=("cpu_percent",), path=path)
+    reopened.append(4, {"cpu_percent": 40})
+
+    # ASSERT
+    assert [p["ts"] for p in reader.points()] == [2, 3, 4]
+    with pytest.raises(ValueError):
+        RingBuffer(4, fields=("cpu_percent",), path=path, readonly=True)
+
+
+def test_stream_end_flushes_partial_buckets():
+    # SETUP
+    now = [1000.0]
+    client = MagicMock()
+    client.api.stats.return_value = iter([raw_stats(), raw_stats()])
+    sampler = StatsSampler(
+        client,
+        start_task=lambda target, *args: target(*args),
+        clock=lambda: now[0],
+        rollups=((60, 10),),
+    )
+
+    # EXECUTE
+    sampler.watch("YC-dev-survival")
+    _, points = sampler.query(["YC-dev-survival"], 600)
+
+    # ASSERT
+    assert [p["ts"] for p in points["YC-dev-survival"]] == [960]
+
+
+def test_only_leader_samples_and_followers_read_its_series(tmp_path):
+    # SETUP
+    now = [1000.0]
+    tasks = []
+    samplers = [
+        StatsSampler(
+            MagicMock(),
+            start_task=lambda target, *args: tasks.append(target),
+            clock=lambda: now[0],
+            rollups=((1, 10),),
+            data_dir=tmp_path,
+        )
+        for _ in range(2)
+    ]
+    leader, follower = samplers
+    assert leader.leader.acquire() and not follower.leader.acquire()
+
+    # EXECUTE
+    watched = [sampler.watch("YC-dev-survival") for sampler in samplers]
+    for _ in range(3):
+        leader.record("YC-dev-survival", {"cpu_percent": 50})
+        now[0] += 1
+
+    # ASSERT
+    assert watched == [True, False]
+    assert len(tasks) == 1
+    assert follower.query(["YC-dev-survival"], 5) == leader.query(
+        ["YC-dev-survival"], 5
+    )
+    assert [
+        p["ts"] for p in follower.query(["YC-dev-survival"], 5)[1]["YC-dev-survival"]
+    ] == [1000, 1001]
+    assert follower.query(["YC-dev-lobby"], 5) == (1, {"YC-dev-lobby": []})
+
+
+def test_run_does_not_sync_without_leadership(tmp_path):
+    # SETUP
+    client = MagicMock()
+    assert LeaderLock(tmp_path / "leader.lock").acquire()
+    sampler = StatsSampler(client, data_dir=tmp_path)
+    sampler.sleep = lambda secs: sampler.stop()
+
+    # EXECUTE
+    sampler.run()
+
+    # ASSERT
+    client.containers.list.assert_not_called()
@@ -0,0 +1,123 @@
+"""Level gated, lazily formatted `key=value` logging.
+
+Hot paths used to build `pformat()` dumps of whole request bodies and `container.attrs` before handing them
+to the logger, paying for the formatting even when nothing would be written. `log_event()` checks the level
+first and hands the logger an object that only renders itself if a handler actually emits the record.
+
+Any field whose name looks like a credential (see `SENSITIVE_KEYS`) is redacted, including inside nested
+dicts and pydantic models, so tokens and request bodies can be passed through without thinking about it.
+"""
+
+import logging
+
+from itertools import count
+from pprint import pformat
+from typing import Any, Callable, Dict, Iterator, Mapping
+
+from pydantic import BaseModel
+
+from src.common.logger_setup import logger
+
+SENSITIVE_KEYS = frozenset(
+    {
+        "access_token",
+        "auth",
+        "authorization",
+        "id_token",
+        "password",
+        "token",
+    }
+)
+REDACTED_VISIBLE_CHARS = 4
+
+
+class Lazy:
+    """Defers `fn()` until the value is rendered. `Lazy(lambda: pformat(container.attrs))`"""
+
+    __slots__ = ("fn",)
+
+    def __init__(self, fn: Callable[[], Any]):
+        self.fn = fn
+
+    def __str__(self) -> str:
+        return str(self.fn())
+
+    __repr__ = __str__
+
+
+def lazy_pformat(obj: Any) -> Lazy:
+    return Lazy(lambda: pformat(obj))
+
+
+def redact_token(token: Any) -> str:
+    """Keeps just enough of a token to correlate log lines. `"deadbeefcafe"` -> `"dead…(12 chars)"`"""
+    if token is None:
+        return "None"
+    token = str(token)
+    if len(token) <= REDACTED_VISIBLE_CHARS * 2:
+        return f"…({len(token)} chars)"
+    return f"{token[:REDACTED_VISIBLE_CHARS]}…({len(token)} chars)"
+
+
+def redact(value: Any, key: str = "") -> Any:
+    """Recursively redacts values stored under `SENSITIVE_KEYS`. Pydantic models are redacted as their `model_dump()`."""
+    if key.lower() in SENSITIVE_KEYS:
+        return redact_token(value)
+    if isinstance(value, BaseModel):
+        return redact(value.model_dump())
+    if isinstance(value, Mapping):
+        return {k: redact(v, str(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(redact(v) for v in value)
+    return value
+
+
+class _Event:
+    __slots__ = ("event", "fields")
+
+    def __init__(self, event: str, fields: Dict[str, Any]):
+        self.event = event
+        self.fields = fields
+
+    def __str__(self) -> str:
+        parts = [self.event]
+        for key, value in self.fields.items():
+            value = redact(value, key)
+            rendered = str(value) if isinstance(value, Lazy) else repr(value)
+            parts.append(f"{key}={rendered}")
+        return " ".join(parts)
+
+
+def log_event(level: int, event: str, **fields: Any) -> None:
+    """Logs `event` followed by `key=value` pairs, formatting nothing unless `level` is enabled.
+
+    Args:
+        level (int): `logging` level
+        event (str): Short, greppable description of what happened
+        **fields: Values to log. Wrap expensive ones in `Lazy`/`lazy_pformat`.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, "%s", _Event(event, fields))
+
+
+def debug(event: str, **fields: Any) -> None:
+    log_event(logging.DEBUG, event, **fields)
+
+
+def info(event: str, **fields: Any) -> None:
+    log_event(logging.INFO, event, **fields)
+
+
+def warning(event: str, **fields: Any) -> None:
+    log_event(logging.WARNING, event, **fields)
+
+
+class Sampler:
+    """Lets through one out of every `every` calls. `every <= 1` lets everything through."""
+
+    def __init__(self, every: int = 1):
+        self.every = max(int(every), 1)
+        self._counter: Iterator[int] = count()
+
+    def __call__(self) -> bool:
+        return self.every == 1 or next(self._counter) % self.every == 0
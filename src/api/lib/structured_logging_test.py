@@ -0,0 +1,76 @@
+import logging
+
+import pytest  # type: ignore
+
+from src.api.blueprints import LoginRequestBody
+from src.api.lib import structured_logging as slog
+from src.common.logger_setup import logger
+
+
+class TestRedaction:
+    def test_redact_token_keeps_prefix_and_length(self):
+        assert slog.redact_token("deadbeefcafebabe") == "dead…(16 chars)"
+
+    def test_redact_token_hides_short_tokens_entirely(self):
+        assert slog.redact_token("abc") == "…(3 chars)"
+
+    def test_redacts_nested_sensitive_keys(self):
+        redacted = slog.redact(
+            {
+                "id_token": "deadbeefcafebabe",
+                "nested": [{"Authorization": "Bearer xyzxyzxyz"}],
+                "env": "env1",
+            }
+        )
+        assert redacted == {
+            "id_token": "dead…(16 chars)",
+            "nested": [{"Authorization": "Bear…(16 chars)"}],
+            "env": "env1",
+        }
+
+
+class TestLogEvent:
+    def test_formats_fields_and_redacts(self, caplog: pytest.LogCaptureFixture):
+        with caplog.at_level(logging.INFO, logger=logger.name):
+            slog.info("Checked token", scheme="Bearer", token="deadbeefcafebabe")
+
+        assert "Checked token scheme='Bearer' token='dead…(16 chars)'" in caplog.text
+        assert "deadbeefcafebabe" not in caplog.text
+
+    def test_redacts_request_bodies(self, caplog: pytest.LogCaptureFixture):
+        body = LoginRequestBody(id_token="eyJdeadbeefcafebabe")
+
+        with caplog.at_level(logging.INFO, logger=logger.name):
+            slog.info("Logging Func Invocation:", args=(), kwargs={"body": body})
+
+        assert "kwargs={'body': {'id_token': 'eyJd…(19 chars)'}}" in caplog.text
+        assert "eyJdeadbeefcafebabe" not in caplog.text
+
+    def test_does_not_format_when_level_disabled(
+        self, caplog: pytest.LogCaptureFixture
+    ):
+        def explode():
+            pytest.fail("Lazy value was rendered for a disabled level!")
+
+        with caplog.at_level(logging.INFO, logger=logger.name):
+            slog.debug("Container attrs", attrs=slog.Lazy(explode))
+
+        assert caplog.text == ""
+
+
+class TestSampler:
+    def test_lets_through_one_in_every_n(self):
+        sampler = slog.Sampler(every=3)
+        assert [sampler() for _ in range(7)] == [
+            True,
+            False,
+            False,
+            True,
+            False,
+            False,
+            True,
+        ]
+
+    def test_every_one_lets_everything_through(self):
+        sampler = slog.Sampler()
+        assert all(sampler() for _ in range(5))
@@ -0,0 +1,112 @@
+"""Background purge of expired `AccessToken` and `JTI` rows.
+
+Nothing else ever deletes these rows, and every login plus every token cache miss queries them, so
+without this the tables grow forever and slowly degrade every authenticated call.
+
+Deletes are chunked by primary key with a commit per chunk so no single statement holds a long lock
+on a table the auth hot path is reading.
+"""
+
+import random
+import time
+
+from typing import Dict, Optional, Type
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import func  # type: ignore
+from sqlalchemy.orm import scoped_session  # type: ignore
+
+from src.api.db import db
+from src.api.lib.metrics import metrics
+from src.api.models import AccessToken, JTI
+from src.common.helpers import get_now_dt, log_exception
+from src.common.logger_setup import logger
+
+
+def purge_expired_rows(
+    session: scoped_session[Session],
+    model: Type[db.Model],  # type: ignore
+    cutoff: int,
+    chunk_size: int,
+) -> int:
+    """Deletes rows of `model` whose `exp` is older than `cutoff`, `chunk_size` rows at a time.
+
+    Args:
+        session (sqlalchemy.orm.session): Database session
+        model (Type[db.Model]): `AccessToken` or `JTI`. Anything with an `exp` column and a single column primary key.
+        cutoff (int): Epoch timestamp. Rows with `exp` strictly before this are deleted.
+        chunk_size (int): Max rows deleted per statement/transaction.
+
+    Returns:
+        int: Number of rows deleted
+    """
+    pk = model.__mapper__.primary_key[0]
+    deleted = 0
+    while True:
+        ids = [
+            row[0]
+            for row in session.query(pk)
+            .filter(model.exp < cutoff)
+            .limit(chunk_size)
+            .all()
+        ]
+        if not ids:
+            break
+
+        session.query(model).filter(pk.in_(ids)).delete(synchronize_session=False)
+        session.commit()
+        deleted += len(ids)
+
+        if len(ids) < chunk_size:
+            break
+
+    return deleted
+
+
+class TokenSweeper:
+    """Periodically purges expired token rows and records table sizes and purge durations in `metrics`.
+
+    Args:
+        interval (float): Seconds between sweeps. Jittered by up to 10% so gunicorn workers don't sweep in lockstep.
+        chunk_size (int): Max rows deleted per statement.
+        grace_secs (int): Rows are only purged this long after they expire. Must be at least one access
+            token lifetime: signed token revocation lists are seeded from rows expired within that window.
+    """
+
+    def __init__(self, interval: float, chunk_size: int, grace_secs: int):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self.grace_secs = grace_secs
+
+    def sweep(self, session: scoped_session[Session]) -> Dict[str, int]:
+        cutoff = int(get_now_dt().timestamp()) - self.grace_secs
+        purged = {}
+        with metrics.timer("auth.token_purge.duration"):
+            for name, model in (("access_token", AccessToken), ("jti", JTI)):
+                purged[name] = purge_expired_rows(
+                    session, model, cutoff, self.chunk_size
+                )
+                metrics.inc(f"auth.{name}.purged", purged[name])
+                metrics.set_gauge(
+                    f"auth.{name}.rows",
+                    session.query(func.count()).select_from(model).scalar() or 0,
+                )
+
+        logger.info(f"Purged expired token rows: {purged}")
+        return purged
+
+    def run_forever(self, app, sleep=time.sleep, iterations: Optional[int] = None):
+        """Sweep loop. Meant to be started with `socketio.start_background_task()`."""
+        while iterations is None or iterations > 0:
+            sleep(self.interval * (1 + random.uniform(0, 0.1)))
+            with app.app_context():
+                try:
+                    self.sweep(db.session)
+                except Exception:
+                    db.session.rollback()
+                    log_exception(message="Failed to purge expired token rows!")
+                finally:
+                    db.session.remove()
+
+            if iterations is not None:
+                iterations -= 1
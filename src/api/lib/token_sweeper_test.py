@@ -0,0 +1,138 @@
+import pytest  # type: ignore
+import flask  # type: ignore
+
+from sqlalchemy import inspect  # type: ignore
+
+from src.api.db import (
+    SchemaLockTimeoutError,
+    create_missing_indexes,
+    db,
+    schema_lock,
+)
+from src.api.lib.metrics import metrics
+from src.api.lib.token_sweeper import TokenSweeper, purge_expired_rows
+from src.api.models import JTI, AccessToken, User
+from src.common.helpers import get_now_dt
+
+
+@pytest.fixture
+def session():
+    app = flask.Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(sub="sub", email="a@b.c"))
+        db.session.commit()
+        yield db.session
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+
+
+def add_access_tokens(session, exps):
+    for i, exp in enumerate(exps):
+        session.add(AccessToken(id=f"token-{i}-{exp}", user="sub", exp=exp))
+    session.commit()
+
+
+class TestPurgeExpiredRows:
+    def test_deletes_only_rows_before_cutoff(self, session):
+        add_access_tokens(session, [100, 200, 299, 300, 400])
+
+        assert purge_expired_rows(session, AccessToken, 300, chunk_size=500) == 3
+        assert sorted(t.exp for t in session.query(AccessToken).all()) == [300, 400]
+
+    def test_deletes_in_chunks(self, session, mocker):
+        add_access_tokens(session, range(100, 107))
+        commit = mocker.spy(session, "commit")
+
+        assert purge_expired_rows(session, AccessToken, 1000, chunk_size=3) == 7
+        assert commit.call_count == 3
+        assert session.query(AccessToken).count() == 0
+
+
+class TestTokenSweeper:
+    def test_sweep_respects_grace_and_records_metrics(self, session):
+        now = int(get_now_dt().timestamp())
+        add_access_tokens(session, [now - 7200, now - 60, now + 1800])
+        session.add(JTI(jti="old", exp=now - 7200, iat=now - 10800, user="sub"))
+        session.add(JTI(jti="recent", exp=now - 60, iat=now - 3660, user="sub"))
+        session.commit()
+
+        purged = TokenSweeper(interval=600, chunk_size=500, grace_secs=3600).sweep(
+            session
+        )
+
+        assert purged == {"access_token": 1, "jti": 1}
+        snapshot = metrics.snapshot()
+        assert snapshot["gauges"]["auth.access_token.rows"] == 2
+        assert snapshot["gauges"]["auth.jti.rows"] == 1
+        assert snapshot["counters"]["auth.access_token.purged"] == 1
+        assert snapshot["timings"]["auth.token_purge.duration"]["count"] == 1
+
+    def test_create_missing_indexes_adds_exp_index_to_existing_table(self, session):
+        AccessToken.__table__.indexes.copy().pop().drop(bind=db.engine)
+        create_missing_indexes()
+
+        index_names = {
+            index["name"]
+            for index in db.inspect(db.engine).get_indexes(AccessToken.__tablename__)
+        }
+        assert "ix_access_token_exp" in index_names
+
+    def test_create_missing_indexes_tolerates_another_worker_winning(
+        self, session, mocker
+    ):
+        # This worker inspected before another worker created the index.
+        real = inspect(db.engine)
+        stale = mocker.MagicMock(wraps=real)
+        stale.get_indexes.side_effect = lambda table_name: (
+            []
+            if table_name == AccessToken.__tablename__
+            else real.get_indexes(table_name)
+        )
+        inspectors = iter([stale])
+        mocker.patch(
+            "src.api.db.inspect",
+            side_effect=lambda bind: next(inspectors, None) or inspect(bind),
+        )
+
+        create_missing_indexes()
+
+        index_names = {
+            i["name"] for i in inspect(db.engine).get_indexes(AccessToken.__tablename__)
+        }
+        assert "ix_access_token_exp" in index_names
+
+
+class TestSchemaLock:
+    def mysql(self, mocker, got_lock):
+        db_mock = mocker.patch("src.api.db.db")
+        db_mock.engine.dialect.name = "mysql"
+        conn = db_mock.engine.connect.return_value.__enter__.return_value
+        conn.execute.return_value.scalar.return_value = got_lock
+        return conn
+
+    def test_held_for_the_duration_of_schema_setup(self, mocker):
+        conn = self.mysql(mocker, got_lock=1)
+
+        with schema_lock(timeout_secs=5):
+            assert conn.execute.call_count == 1
+
+        statements = [str(c.args[0]) for c in conn.execute.call_args_list]
+        assert statements == [
+            "SELECT GET_LOCK(:name, :timeout)",
+            "SELECT RELEASE_LOCK(:name)",
+        ]
+
+    def test_times_out(self, mocker):
+        self.mysql(mocker, got_lock=0)
+
+        with pytest.raises(SchemaLockTimeoutError):
+            with schema_lock(timeout_secs=5):
+                pytest.fail("Must not run without the lock")
@@ -0,0 +1,118 @@
+"""Hot-reloadable login whitelist.
+
+Merges the subject IDs in `WHITELISTED_USERS_FILE` with those in the `WhitelistedUser` table into a single
+frozenset that lookups hit directly. The file's mtime is checked at most every `file_check_interval` seconds
+and the table is re-read every `db_refresh_interval` seconds; whenever either changes a new frozenset is
+built and swapped in with a single assignment, so readers never see a half built set and adding someone
+never needs a worker restart.
+"""
+
+import time
+
+from pathlib import Path
+from typing import Callable, FrozenSet, Iterable, Optional, Tuple
+
+from src.common.helpers import log_exception
+from src.common.logger_setup import logger
+
+
+class WhitelistProvider:
+    """Supports `sub in provider`, just like the set it replaces.
+
+    Args:
+        whitelist_file (Path): Newline separated subject IDs.
+        load_db_subs (Optional[Callable[[], Iterable[str]]]): Returns the subject IDs stored in the DB. Skipped when `None`.
+        file_check_interval (float): Minimum seconds between `stat()`s of `whitelist_file`.
+        db_refresh_interval (float): Minimum seconds between calls to `load_db_subs`.
+        now_fn (Callable[[], float]): Clock. Overridable for tests.
+    """
+
+    def __init__(
+        self,
+        whitelist_file: Path,
+        load_db_subs: Optional[Callable[[], Iterable[str]]] = None,
+        file_check_interval: float = 2,
+        db_refresh_interval: float = 30,
+        now_fn: Callable[[], float] = time.monotonic,
+    ):
+        self.whitelist_file = Path(whitelist_file)
+        self.load_db_subs = load_db_subs
+        self.file_check_interval = file_check_interval
+        self.db_refresh_interval = db_refresh_interval
+        self.now_fn = now_fn
+
+        self._file_stamp: Optional[Tuple[int, int]] = None
+        self._file_missing = False
+        self._file_subs: FrozenSet[str] = frozenset()
+        self._db_subs: FrozenSet[str] = frozenset()
+        self._subs: FrozenSet[str] = frozenset()
+        self._last_file_check = float("-inf")
+        self._last_db_refresh = float("-inf")
+
+    def __contains__(self, sub: object) -> bool:
+        self.refresh()
+        return sub in self._subs
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._subs)
+
+    def refresh(self, force: bool = False) -> None:
+        now = self.now_fn()
+        changed = False
+
+        if force or now - self._last_file_check >= self.file_check_interval:
+            self._last_file_check = now
+            changed |= self._reload_file()
+
+        if self.load_db_subs is not None and (
+            force or now - self._last_db_refresh >= self.db_refresh_interval
+        ):
+            self._last_db_refresh = now
+            changed |= self._reload_db()
+
+        if changed:
+            self._subs = self._file_subs | self._db_subs
+
+    def _reload_file(self) -> bool:
+        try:
+            stat = self.whitelist_file.stat()
+        except FileNotFoundError:
+            if not self._file_missing:
+                logger.warning(f"Whitelist file '{self.whitelist_file}' not found!")
+            self._file_missing = True
+            self._file_stamp = None
+            changed = bool(self._file_subs)
+            self._file_subs = frozenset()
+            return changed
+
+        self._file_missing = False
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._file_stamp:
+            return False
+
+        self._file_stamp = stamp
+        self._file_subs = frozenset(
+            line.strip()
+            for line in self.whitelist_file.read_text().splitlines()
+            if line.strip()
+        )
+        logger.info(
+            f"Loaded {len(self._file_subs)} whitelisted users from '{self.whitelist_file}'"
+        )
+        return True
+
+    def _reload_db(self) -> bool:
+        try:
+            db_subs = frozenset(self.load_db_subs())  # type: ignore
+        except Exception:
+            # Keep serving the last known good set rather than locking everyone out.
+            log_exception(message="Failed to load whitelisted users from the DB!")
+            return False
+
+        if db_subs == self._db_subs:
+            return False
+
+        self._db_subs = db_subs
+        return True
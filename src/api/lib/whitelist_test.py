@@ -0,0 +1,88 @@
+import os
+
+import pytest  # type: ignore
+
+from src.api.lib.whitelist import WhitelistProvider
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def whitelist_file(tmp_path):
+    path = tmp_path / "whitelist.txt"
+    path.write_text("sub-a\nsub-b\n")
+    return path
+
+
+def rewrite(path, content: str):
+    path.write_text(content)
+    # Make sure the mtime moves even on filesystems with coarse timestamps.
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestWhitelistProvider:
+    def test_reads_file(self, whitelist_file):
+        whitelist = WhitelistProvider(whitelist_file)
+        assert "sub-a" in whitelist
+        assert "sub-c" not in whitelist
+
+    def test_picks_up_file_changes_after_check_interval(self, whitelist_file):
+        clock = FakeClock()
+        whitelist = WhitelistProvider(
+            whitelist_file, file_check_interval=2, now_fn=clock
+        )
+        assert "sub-c" not in whitelist
+
+        rewrite(whitelist_file, "sub-a\nsub-c\n")
+        clock.now = 1
+        assert "sub-c" not in whitelist
+
+        clock.now = 2
+        assert "sub-c" in whitelist
+        assert "sub-b" not in whitelist
+
+    def test_merges_db_subs(self, whitelist_file):
+        clock = FakeClock()
+        db_subs = ["sub-db"]
+        whitelist = WhitelistProvider(
+            whitelist_file,
+            load_db_subs=lambda: db_subs,
+            db_refresh_interval=30,
+            now_fn=clock,
+        )
+        assert "sub-a" in whitelist and "sub-db" in whitelist
+
+        db_subs.append("sub-new")
+        clock.now = 29
+        assert "sub-new" not in whitelist
+        clock.now = 30
+        assert "sub-new" in whitelist
+
+    def test_keeps_last_db_subs_when_db_fails(self, whitelist_file):
+        clock = FakeClock()
+        calls = []
+
+        def load_db_subs():
+            calls.append(clock.now)
+            if len(calls) > 1:
+                raise RuntimeError("DB went away")
+            return ["sub-db"]
+
+        whitelist = WhitelistProvider(
+            whitelist_file, load_db_subs=load_db_subs, now_fn=clock
+        )
+        assert "sub-db" in whitelist
+
+        clock.now = 60
+        assert "sub-db" in whitelist
+        assert len(calls) == 2
+
+    def test_missing_file_is_empty(self, tmp_path):
+        assert "sub-a" not in WhitelistProvider(tmp_path / "nope.txt")
@@ -23,7 +23,7 @@ class JTI(db.Model, SerializerMixin):
     jti = db.Column(db.String(128), primary_key=True)
 
     # Expiration
-    exp = db.Column(db.Integer)
+    exp = db.Column(db.Integer, index=True)
 
     # Issued at Time
     iat = db.Column(db.Integer)
@@ -37,7 +37,132 @@ class JTI(db.Model, SerializerMixin):
 class AccessToken(db.Model, SerializerMixin):
     id = db.Column(db.String(256), primary_key=True)
     user = db.Column(db.String(64), db.ForeignKey("user.sub"))
-    exp = db.Column(db.Integer)
+    exp = db.Column(db.Integer, index=True)
 
     def __repr__(self):
         return f"<AccessToken{self.user} {self.token_id[:16]}... >"
+
+
+class WhitelistedUser(db.Model, SerializerMixin):
+    """Subject IDs allowed to log in, in addition to those in `WHITELISTED_USERS_FILE`"""
+
+    __tablename__ = "whitelisted_user"
+
+    # Subject ID. Not a foreign key - users don't exist until their first login.
+    sub = db.Column(db.String(64), primary_key=True)
+
+    # Free-form note on who this is
+    note = db.Column(db.String(256))
+
+    def __repr__(self):
+        return f"<WhitelistedUser {self.sub}>"
+
+
+class Job(db.Model, SerializerMixin):
+    """A long-running operation (cluster up/down, backup, restore) run by `JobManager`. See `src/api/lib/jobs.py`."""
+
+    serialize_only = [
+        "id",
+        "kind",
+        "resources",
+        "status",
+        "progress",
+        "message",
+        "details",
+        "result",
+        "error",
+        "user",
+        "created_at",
+        "started_at",
+        "finished_at",
+    ]
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    # Comma separated lock keys, eg "env1,env1/lobby"
+    resources = db.Column(db.String(1024), nullable=False, default="")
+
+    # queued | running | succeeded | failed
+    status = db.Column(db.String(16), nullable=False, index=True)
+    # 0.0 - 1.0, if the job reports progress at all
+    progress = db.Column(db.Float)
+    message = db.Column(db.String(512))
+    # JSON encoded structured progress, eg restic's bytes done and ETA
+    details = db.Column(db.Text)
+    # JSON encoded return value of the job
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+
+    user = db.Column(db.String(64), db.ForeignKey("user.sub"))
+    # "<hostname>:<pid>" of the worker running the job
+    owner = db.Column(db.String(128))
+    # Epoch timestamp the owner last promised to be alive until. Renewed every `JOB_HEARTBEAT_SECS`.
+    lease_expires_at = db.Column(db.Integer, index=True)
+
+    created_at = db.Column(db.Integer, nullable=False, index=True)
+    started_at = db.Column(db.Integer)
+    finished_at = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} {self.status}>"
+
+
+class JobLock(db.Model, SerializerMixin):
+    """One row per resource held by an unfinished `Job`. The primary key makes acquiring a lock atomic across workers."""
+
+    __tablename__ = "job_lock"
+
+    resource = db.Column(db.String(256), primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey("job.id"), nullable=False)
+
+    def __repr__(self):
+        return f"<JobLock {self.resource} held by {self.job_id}>"
+
+
+class Snapshot(db.Model, SerializerMixin):
+    """A restic snapshot, as last seen in the repository. See `src/api/lib/snapshot_catalog.py`."""
+
+    __tablename__ = "snapshot"
+    __table_args__ = (db.Index("ix_snapshot_hostname_time", "hostname", "time"),)
+
+    # Full restic snapshot id
+    id = db.Column(db.String(64), primary_key=True)
+    short_id = db.Column(db.String(16), nullable=False)
+    # Container name of the backed up world group, eg "YC-env1-lobby"
+    hostname = db.Column(db.String(256), nullable=False)
+    # Epoch timestamp of the snapshot. Double precision: MySQL's FLOAT is only accurate to minutes at this magnitude.
+    time = db.Column(db.Double, nullable=False, index=True)
+    # `restic snapshots --json` object, as is
+    data = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f"<Snapshot {self.short_id} {self.hostname}>"
+
+
+class SnapshotTag(db.Model, SerializerMixin):
+    """One row per tag on a `Snapshot`, so tag filters can use an index"""
+
+    __tablename__ = "snapshot_tag"
+    __table_args__ = (db.Index("ix_snapshot_tag_tag", "tag", "snapshot_id"),)
+
+    snapshot_id = db.Column(
+        db.String(64), db.ForeignKey("snapshot.id"), primary_key=True
+    )
+    tag = db.Column(db.String(128), primary_key=True)
+
+    def __repr__(self):
+        return f"<SnapshotTag {self.snapshot_id[:8]} {self.tag}>"
+
+
+class SnapshotWorlds(db.Model, SerializerMixin):
+    """Worlds backed up in a restic snapshot. Snapshots are immutable, so rows never go stale. See `src/api/lib/snapshot_worlds.py`."""
+
+    __tablename__ = "snapshot_worlds"
+
+    # Snapshot id as requested: full or short
+    snapshot_id = db.Column(db.String(64), primary_key=True)
+    # JSON encoded list of world names
+    worlds = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f"<SnapshotWorlds {self.snapshot_id[:8]}>"
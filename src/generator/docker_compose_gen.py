@@ -25,6 +25,19 @@ from src.common.logger_setup import logger
 WORLD_GROUP_INTERP_STR = "<<WORLDGROUP>>"
 
 
+def backups_enabled(env: Env) -> bool:
+    return bool(env.is_prod() or env.config.general.get("enable_backups", None))
+
+
+def backup_sidecars_enabled(env: Env) -> bool:
+    """Whether each world group gets a `mc_<world>_backup` sidecar. Set `backup_sidecars = false` under `[general]`
+    to leave backups to the API's scheduler instead. See `src/api/lib/backup_scheduler.py`.
+    """
+    return backups_enabled(env) and bool(
+        env.config.general.get("backup_sidecars", True)
+    )
+
+
 class DockerComposeGen(BaseGenerator):
     minecraft_uid = None
     minecraft_gid = None
@@ -109,9 +122,7 @@ class DockerComposeGen(BaseGenerator):
             mc_service_key = f"mc_{world}"
             services[mc_service_key] = mc_service_template
 
-            if self.env.is_prod() or self.env.config.general.get(
-                "enable_backups", None
-            ):
+            if backup_sidecars_enabled(self.env):
                 backup_service_template = copy.deepcopy(
                     self.docker_compose_template.custom_extensions.mc_backups_sidecar_template.as_dict()
                 )